@@ -0,0 +1,177 @@
+"""
+Benchmark dell'arricchimento DBpedia contro un endpoint SPARQL locale.
+
+Avvia uno `StubSparqlServer` con latenza, risposte 429 ed errori 500
+configurabili, esegue l'arricchimento sull'intero catalogo di movies.csv
+(unito a links.csv) con una cache SQLite temporanea e riporta titoli al
+secondo, tentativi, hit rate della cache e tempo totale. Il secondo
+passaggio ("warm") riusa la cache del primo.
+
+I risultati vengono stampati e aggiunti come una riga JSON al file di
+output, così da poter confrontare versioni diverse.
+
+Esempio:
+    python benchmarks/bench_enrichment.py --latency 0.05 --throttle-rate 0.02 --error-rate 0.01
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from common import RESULTS_DIR, record_result, result_header  # noqa: E402
+from dbpedia_cache import SQLiteCache  # noqa: E402
+from dbpedia_queries import dbpedia_label, enrich_movies_async  # noqa: E402
+from sparql_stub import StubSparqlServer  # noqa: E402
+
+RESULTS_PATH = os.path.join(RESULTS_DIR, "enrichment.jsonl")
+
+
+def load_catalog(movies_path, links_path):
+    """Carica il catalogo dei film con gli imdbId di links.csv."""
+    movies = pd.read_csv(movies_path)
+    if links_path and os.path.exists(links_path):
+        links = pd.read_csv(links_path, usecols=["movieId", "imdbId"])
+        movies = pd.merge(movies, links, on="movieId", how="left")
+    return movies
+
+
+def synthetic_fixtures(movies, hit_rate=0.9, seed=0):
+    """
+    Genera binding fittizi per una frazione dei film del catalogo.
+
+    I film con imdbId rispondono alle query per ID, gli altri a quelle per etichetta.
+
+    Args:
+        movies (DataFrame): Catalogo dei film.
+        hit_rate (float): Frazione dei film per cui l'endpoint restituisce un risultato.
+        seed (int): Seed della scelta dei film.
+
+    Returns:
+        dict: Chiave (letterale cercato) -> lista di binding.
+    """
+    rng = random.Random(seed)
+    imdb_ids = movies["imdbId"] if "imdbId" in movies.columns else pd.Series([None] * len(movies))
+    fixtures = {}
+    for title, imdb_id in zip(movies["title"], imdb_ids):
+        if rng.random() >= hit_rate:
+            continue
+        label = dbpedia_label(title)
+        binding = {
+            "title": {"value": label},
+            "abstract": {"value": f"{label} is a film."},
+            "director": {"value": f"http://dbpedia.org/resource/Director_of_{label.replace(' ', '_')}"},
+            "starring": {"value": "http://dbpedia.org/resource/Actor_1|http://dbpedia.org/resource/Actor_2"},
+            "genre": {"value": "http://dbpedia.org/resource/Drama"},
+        }
+        if pd.notna(imdb_id):
+            imdb_id = f"{int(imdb_id):07d}"
+            fixtures[imdb_id] = [dict(binding, imdbId={"value": imdb_id})]
+        else:
+            fixtures[label] = [dict(binding, label={"value": label})]
+    return fixtures
+
+
+def run_pass(movies, cache, endpoint, pipeline_options):
+    """Esegue un passaggio di arricchimento e ne misura il tempo."""
+    started = time.perf_counter()
+    enriched, stats = asyncio.run(enrich_movies_async(movies.copy(), cache, endpoint, **pipeline_options))
+    wall_time = time.perf_counter() - started
+    result = stats.as_dict()
+    result.update({
+        "titles": len(movies),
+        "enriched_titles": int(enriched["abstract"].notna().sum()),
+        "wall_time": round(wall_time, 4),
+        "titles_per_second": round(len(movies) / wall_time, 2) if wall_time else None,
+        "cache_hit_rate": round(stats.cache_hits / stats.keys, 4) if stats.keys else None,
+        "latency_p50": round(pd.Series(stats.latencies).quantile(0.5), 4) if stats.latencies else None,
+        "latency_p99": round(pd.Series(stats.latencies).quantile(0.99), 4) if stats.latencies else None,
+    })
+    return result
+
+
+def run_benchmark(movies, fixtures, latency=0.05, latency_jitter=0.0, throttle_rate=0.0, error_rate=0.0,
+                  retry_after=0, seed=0, pipeline_options=None):
+    """
+    Esegue il benchmark: un passaggio a cache vuota e uno a cache piena.
+
+    Args:
+        movies (DataFrame): Catalogo dei film.
+        fixtures (dict): Binding restituiti dall'endpoint locale.
+        latency (float): Latenza di ogni risposta, in secondi.
+        latency_jitter (float): Variazione casuale massima della latenza, in secondi.
+        throttle_rate (float): Probabilità di una risposta 429.
+        error_rate (float): Probabilità di una risposta 500.
+        retry_after (float): Valore del Retry-After dei 429.
+        seed (int): Seed delle iniezioni.
+        pipeline_options (dict): Parametri di `run_pipeline`.
+
+    Returns:
+        dict: Configurazione e risultati dei due passaggi.
+    """
+    pipeline_options = pipeline_options or {}
+    server_options = {"latency": latency, "latency_jitter": latency_jitter, "throttle_rate": throttle_rate,
+                      "error_rate": error_rate, "retry_after": retry_after, "seed": seed}
+    with tempfile.TemporaryDirectory() as tmp, StubSparqlServer(fixtures, **server_options) as server:
+        with SQLiteCache(os.path.join(tmp, "cache.sqlite3")) as cache:
+            cold = run_pass(movies, cache, server.url, pipeline_options)
+            warm = run_pass(movies, cache, server.url, pipeline_options)
+        server_stats = {"requests": server.requests, "throttled": server.throttled, "errors": server.errors}
+    return dict(result_header("enrichment"), **{
+        "config": dict(server_options, fixtures=len(fixtures), **pipeline_options),
+        "server": server_stats,
+        "cold": cold,
+        "warm": warm,
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dell'arricchimento DBpedia su un endpoint locale.")
+    parser.add_argument("--movies", default="data/raw/movies.csv", help="CSV dei film.")
+    parser.add_argument("--links", default="data/raw/links.csv", help="CSV dei link (imdbId); '' per cercare per titolo.")
+    parser.add_argument("--limit", type=int, default=None, help="Numero massimo di film da arricchire.")
+    parser.add_argument("--fixtures", default=None, help="File JSON con i binding (default: generati dal catalogo).")
+    parser.add_argument("--hit-rate", type=float, default=0.9, help="Frazione di film con binding generati.")
+    parser.add_argument("--latency", type=float, default=0.05, help="Latenza dell'endpoint in secondi.")
+    parser.add_argument("--latency-jitter", type=float, default=0.0, help="Variazione massima della latenza.")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Probabilità di una risposta 429.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probabilità di una risposta 500.")
+    parser.add_argument("--retry-after", type=float, default=0, help="Retry-After dei 429 in secondi.")
+    parser.add_argument("--rate", type=float, default=None, help="Richieste al secondo (default: configurazione).")
+    parser.add_argument("--max-concurrency", type=int, default=None, help="Richieste contemporanee massime.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed delle fixture e delle iniezioni.")
+    parser.add_argument("--output", default=RESULTS_PATH, help="File JSON Lines a cui aggiungere i risultati.")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    movies = load_catalog(args.movies, args.links)
+    if args.limit:
+        movies = movies.head(args.limit)
+    if args.fixtures:
+        with open(args.fixtures, encoding="utf-8") as f:
+            fixtures = json.load(f)
+    else:
+        fixtures = synthetic_fixtures(movies, args.hit_rate, args.seed)
+
+    pipeline_options = {}
+    if args.rate is not None:
+        pipeline_options["rate"] = args.rate
+    if args.max_concurrency is not None:
+        pipeline_options["max_concurrency"] = args.max_concurrency
+
+    result = run_benchmark(movies, fixtures, latency=args.latency, latency_jitter=args.latency_jitter,
+                           throttle_rate=args.throttle_rate, error_rate=args.error_rate,
+                           retry_after=args.retry_after, seed=args.seed, pipeline_options=pipeline_options)
+    record_result(result, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Benchmark del recommender su dataset sintetici con la forma di MovieLens.
+
+Per ogni scala richiesta (100k, 1m, 10m, 25m) genera il dataset, se non è
+già presente in `--data-dir`, e misura in un processo dedicato:
+
+- il tempo di `load_raw_data` (formato colonnare e CSV) e di costruzione dell'indice;
+- la latenza p50/p99 di `recommend_movies` per un singolo utente, con e senza indice;
+- il throughput di `recommend_for_users` (utenti al secondo);
+- la memoria residente di picco del processo.
+
+I risultati vengono stampati e aggiunti come una riga JSON al file di output.
+
+Esempio:
+    python benchmarks/bench_recommender.py --scales 100k 1m --users 200
+"""
+import argparse
+import contextlib
+import io
+import os
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import columnar  # noqa: E402
+from common import BENCH_DIR, RESULTS_DIR, record_result, result_header  # noqa: E402
+from recommender import load_raw_data, recommend_for_users, recommend_movies  # noqa: E402
+from recommender_index import RecommenderIndex  # noqa: E402
+from scoring import GenreScorer  # noqa: E402
+from synthetic import SCALES, write_dataset  # noqa: E402
+
+DATA_DIR = os.path.join(BENCH_DIR, "data")
+RESULTS_PATH = os.path.join(RESULTS_DIR, "recommender.jsonl")
+
+
+def timed(function, *args, **kwargs):
+    """Esegue una funzione senza output su stdout e ne restituisce (risultato, secondi)."""
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = function(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def latency_summary(samples):
+    """Riassume una lista di latenze (secondi) in millisecondi."""
+    samples = np.asarray(samples) * 1000
+    return {
+        "samples": len(samples),
+        "p50_ms": round(float(np.percentile(samples, 50)), 3),
+        "p99_ms": round(float(np.percentile(samples, 99)), 3),
+        "mean_ms": round(float(samples.mean()), 3),
+    }
+
+
+def peak_rss_mb():
+    """Memoria residente di picco del processo corrente, in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss è in KB su Linux e in byte su macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_scale(directory, n_users, n_frame_users, batch_users, n_workers, top_k, seed):
+    """
+    Esegue le misure su un dataset già generato (in un processo dedicato).
+
+    Returns:
+        dict: Le misure della scala.
+    """
+    result = {}
+    (movies, ratings), result["load_raw_data_s"] = timed(load_raw_data, directory)
+    result.update({"ratings": len(ratings), "users": int(ratings["userId"].nunique()), "movies": len(movies)})
+    _, result["load_raw_data_csv_s"] = timed(
+        pd.read_csv, os.path.join(directory, "ratings_processed.csv"), dtype=columnar.RATINGS_DTYPES)
+    scorer, result["scorer_build_s"] = timed(GenreScorer.from_movies, movies)
+    columnar_path = os.path.join(directory, "columnar")
+    if columnar.has_table(columnar_path, "ratings"):
+        index, result["index_load_s"] = timed(RecommenderIndex.from_columnar, columnar_path)
+    else:
+        index, result["index_load_s"] = timed(RecommenderIndex.from_frames, movies, ratings, scorer)
+
+    rng = np.random.default_rng(seed)
+    user_ids = rng.choice(index.user_ids, min(n_users, len(index.user_ids)), replace=False)
+    result["recommend_index"] = latency_summary(
+        [timed(recommend_movies, user_id, ratings, movies, top_k, index=index)[1] for user_id in user_ids])
+    result["recommend_frame"] = latency_summary(
+        [timed(recommend_movies, user_id, ratings, movies, top_k, scorer=scorer)[1]
+         for user_id in user_ids[:n_frame_users]])
+
+    batch_ids = rng.choice(index.user_ids, min(batch_users, len(index.user_ids)), replace=False)
+    batch, elapsed = timed(recommend_for_users, batch_ids, ratings, movies, top_k, index=index, n_workers=n_workers)
+    result["batch"] = {
+        "users": len(batch_ids),
+        "workers": n_workers or os.cpu_count(),
+        "seconds": round(elapsed, 4),
+        "users_per_second": round(len(batch_ids) / elapsed, 1),
+        "recommendations": len(batch),
+    }
+    for key, value in result.items():
+        if isinstance(value, float):
+            result[key] = round(value, 4)
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def benchmark_scale(scale, data_dir=DATA_DIR, seed=0, **options):
+    """
+    Genera (se necessario) il dataset di una scala e ne misura le prestazioni.
+
+    Le misure avvengono in un processo nuovo, così la memoria di picco non
+    include la generazione del dataset né le scale precedenti.
+
+    Args:
+        scale (str): Una delle chiavi di SCALES.
+        data_dir (str): Cartella dei dataset generati.
+        seed (int): Seed del dataset e della scelta degli utenti.
+        **options: Parametri di `run_scale`.
+
+    Returns:
+        dict: Le misure della scala.
+    """
+    directory = os.path.join(data_dir, f"{scale}-seed{seed}")
+    generation_s = None
+    if not os.path.exists(os.path.join(directory, "ratings_processed.csv")):
+        started = time.perf_counter()
+        write_dataset(directory, scale, seed)
+        generation_s = round(time.perf_counter() - started, 2)
+
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+        result = executor.submit(run_scale, directory, seed=seed, **options).result()
+    return dict({"scale": scale, "generation_s": generation_s}, **result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del recommender su dataset sintetici.")
+    parser.add_argument("--scales", nargs="+", default=["100k", "1m"], choices=list(SCALES), help="Scale da misurare.")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="Cartella dei dataset generati.")
+    parser.add_argument("--users", type=int, default=200, help="Utenti per la latenza con indice.")
+    parser.add_argument("--frame-users", type=int, default=20, help="Utenti per la latenza senza indice.")
+    parser.add_argument("--batch-users", type=int, default=5000, help="Utenti per il throughput batch.")
+    parser.add_argument("--workers", type=int, default=None, help="Processi per il batch (default: CPU).")
+    parser.add_argument("--top-k", type=int, default=5, help="Raccomandazioni per utente.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed dei dataset e della scelta degli utenti.")
+    parser.add_argument("--output", default=RESULTS_PATH, help="File JSON Lines a cui aggiungere i risultati.")
+    args = parser.parse_args()
+
+    result = dict(result_header("recommender"), **{
+        "scales": [benchmark_scale(scale, args.data_dir, args.seed, n_users=args.users,
+                                   n_frame_users=args.frame_users, batch_users=args.batch_users,
+                                   n_workers=args.workers, top_k=args.top_k)
+                   for scale in args.scales],
+    })
+    record_result(result, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Benchmark di carico del servizio di raccomandazione.
+
+Avvia `RecommendationService` sui dati processati (o su un dataset sintetico
+con `--scale`) e lo interroga con client HTTP concorrenti su connessioni
+persistenti, con e senza micro-batching, misurando latenza p50/p99 lato
+client, throughput e dimensione media dei batch.
+
+Esempio:
+    python benchmarks/bench_service.py --scale 1m --concurrency 1 16 64 --requests 2000
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from common import BENCH_DIR, RESULTS_DIR, record_result, result_header  # noqa: E402
+from recommender import PROCESSED_DATA_PATH  # noqa: E402
+from service import MAX_BATCH_SIZE, RecommendationService, load_index  # noqa: E402
+from synthetic import SCALES, write_dataset  # noqa: E402
+
+DATA_DIR = os.path.join(BENCH_DIR, "data")
+RESULTS_PATH = os.path.join(RESULTS_DIR, "service.jsonl")
+
+
+async def client(host, port, user_ids, latencies):
+    """Invia le richieste in sequenza su una connessione persistente, registrando le latenze."""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for user_id in user_ids:
+            started = time.perf_counter()
+            writer.write(f"GET /recommend?user_id={user_id}&top_k=5 HTTP/1.1\r\nHost: {host}\r\n\r\n".encode())
+            await writer.drain()
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b""):
+                    break
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":")[1])
+            json.loads(await reader.readexactly(length))
+            latencies.append(time.perf_counter() - started)
+    finally:
+        writer.close()
+
+
+async def run_load(index, concurrency, n_requests, max_batch_size, workers, seed):
+    """Misura un livello di concorrenza con un servizio appena avviato."""
+    service = RecommendationService(index=index, n_workers=workers, max_batch_size=max_batch_size)
+    await service.start("127.0.0.1", 0)
+    await service.wait_ready()
+    users = np.random.default_rng(seed).choice(index.user_ids, n_requests)
+    latencies = []
+    started = time.perf_counter()
+    await asyncio.gather(*(client("127.0.0.1", service.port, users[i::concurrency].tolist(), latencies)
+                           for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    metrics = service.metrics.as_dict()
+    await service.close()
+    samples = np.asarray(latencies) * 1000
+    return {
+        "concurrency": concurrency,
+        "max_batch_size": max_batch_size,
+        "requests": len(samples),
+        "p50_ms": round(float(np.percentile(samples, 50)), 3),
+        "p99_ms": round(float(np.percentile(samples, 99)), 3),
+        "throughput_rps": round(len(samples) / elapsed, 1),
+        "mean_batch_size": metrics["mean_batch_size"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark di carico del servizio di raccomandazione.")
+    parser.add_argument("--scale", choices=list(SCALES), default=None,
+                        help="Dataset sintetico da usare (default: i dati processati del progetto).")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="Cartella dei dataset generati.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64], help="Client concorrenti.")
+    parser.add_argument("--requests", type=int, default=2000, help="Richieste per livello di concorrenza.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Thread di valutazione.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed della scelta degli utenti.")
+    parser.add_argument("--output", default=RESULTS_PATH, help="File JSON Lines a cui aggiungere i risultati.")
+    args = parser.parse_args()
+
+    data_path = PROCESSED_DATA_PATH
+    if args.scale:
+        data_path = os.path.join(args.data_dir, args.scale)
+        if not os.path.exists(os.path.join(data_path, "ratings_processed.csv")):
+            write_dataset(data_path, args.scale, args.seed, with_columnar=True)
+    index = load_index(data_path)
+
+    runs = []
+    for concurrency in args.concurrency:
+        for max_batch_size in (1, MAX_BATCH_SIZE):
+            runs.append(asyncio.run(run_load(index, concurrency, args.requests, max_batch_size,
+                                             args.workers, args.seed)))
+    record_result(dict(result_header("service"), scale=args.scale or "processed", workers=args.workers,
+                       runs=runs), args.output)
+
+
+if __name__ == "__main__":
+    main()
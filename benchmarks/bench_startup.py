@@ -0,0 +1,70 @@
+"""
+Benchmark del tempo di avvio.
+
+Misura in processi nuovi (a freddo rispetto all'interprete, con la cache
+del filesystem già calda) il tempo di parete di:
+
+- un interprete vuoto, come riferimento;
+- `import src` (il package, che carica i moduli solo al primo accesso);
+- `filminsight --help` (parsing della CLI senza dipendenze pesanti);
+- l'importazione dei moduli usati dai worker (`recommender`, `service`) e dal
+  client DBpedia (`dbpedia_queries`), per vedere il costo delle dipendenze.
+
+Per ogni comando riporta mediana e minimo su `--repeats` esecuzioni.
+
+Esempio:
+    python benchmarks/bench_startup.py --repeats 20
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from common import RESULTS_DIR, record_result, result_header
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC = os.path.join(ROOT, "src")
+RESULTS_PATH = os.path.join(RESULTS_DIR, "startup.jsonl")
+
+COMMANDS = {
+    "python": [sys.executable, "-c", "pass"],
+    "import_src": [sys.executable, "-c", "import src"],
+    "cli_help": [sys.executable, os.path.join(ROOT, "filminsight"), "--help"],
+    "import_recommender": [sys.executable, "-c", f"import sys; sys.path.insert(0, {SRC!r}); import recommender"],
+    "import_service": [sys.executable, "-c", f"import sys; sys.path.insert(0, {SRC!r}); import service"],
+    "import_dbpedia_queries": [sys.executable, "-c",
+                               f"import sys; sys.path.insert(0, {SRC!r}); import dbpedia_queries"],
+}
+
+
+def time_command(command, repeats):
+    """Esegue il comando `repeats` volte e restituisce le durate in millisecondi."""
+    durations = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        subprocess.run(command, cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+        durations.append((time.perf_counter() - started) * 1000)
+    return durations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del tempo di avvio.")
+    parser.add_argument("--repeats", type=int, default=10, help="Esecuzioni per comando.")
+    parser.add_argument("--commands", nargs="+", default=list(COMMANDS), choices=list(COMMANDS),
+                        help="Comandi da misurare.")
+    parser.add_argument("--output", default=RESULTS_PATH, help="File JSON Lines a cui aggiungere i risultati.")
+    args = parser.parse_args()
+
+    runs = {}
+    for name in args.commands:
+        time_command(COMMANDS[name], 1)  # Riscalda la cache del filesystem e dei bytecode
+        durations = time_command(COMMANDS[name], args.repeats)
+        runs[name] = {"median_ms": round(float(np.median(durations)), 1), "min_ms": round(min(durations), 1)}
+    record_result(dict(result_header("startup"), repeats=args.repeats, runs=runs), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""Funzioni comuni ai benchmark: revisione del codice e registrazione dei risultati."""
+import json
+import os
+import platform
+import subprocess
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+
+def git_revision():
+    """Restituisce il commit corrente, se disponibile."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=BENCH_DIR).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def result_header(name):
+    """Intestazione comune dei risultati: nome del benchmark, data, revisione e ambiente."""
+    return {
+        "benchmark": name,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def record_result(result, output):
+    """
+    Stampa i risultati e li aggiunge come una riga JSON al file di output.
+
+    Args:
+        result (dict): Risultati del benchmark.
+        output (str): File JSON Lines (None o '' per non salvare).
+    """
+    print(json.dumps(result, indent=4))
+    if output:
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, "a", encoding="utf-8") as f:
+            f.write(json.dumps(result) + "\n")
@@ -0,0 +1,189 @@
+"""
+Generatore di dataset sintetici con la forma di MovieLens.
+
+Produce un catalogo di film (titoli con anno, 1-4 generi tra quelli di
+MovieLens con frequenze realistiche) e rating con popolarità dei film e
+attività degli utenti a coda lunga, rating a mezze stelle e timestamp
+distribuiti in un anno di attività per utente. I rating vengono generati a blocchi di utenti e
+accodati sia al CSV sia alle colonne del formato colonnare, per cui anche la scala da 25M
+tiene in memoria un solo blocco (più gli ID degli utenti) e mai l'intero dataset.
+
+I file prodotti hanno gli stessi nomi e colonne di `data/processed/`
+(`movies_enriched.csv`, `ratings_processed.csv` e la sottocartella
+`columnar/`), così `recommender.load_raw_data(directory)` li legge senza modifiche.
+
+Esempio:
+    python benchmarks/synthetic.py 1m benchmarks/data/1m
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import columnar  # noqa: E402
+
+# Scala -> (rating, utenti, film), come le release MovieLens corrispondenti
+SCALES = {
+    "100k": (100_836, 610, 9_742),
+    "1m": (1_000_209, 6_040, 3_706),
+    "10m": (10_000_054, 69_878, 10_681),
+    "25m": (25_000_095, 162_541, 62_423),
+}
+
+# Generi di MovieLens con la frequenza relativa nel catalogo
+GENRES = {
+    "Drama": 0.45, "Comedy": 0.39, "Thriller": 0.19, "Action": 0.18, "Romance": 0.16,
+    "Adventure": 0.14, "Crime": 0.12, "Sci-Fi": 0.10, "Horror": 0.10, "Fantasy": 0.08,
+    "Children": 0.07, "Animation": 0.06, "Mystery": 0.06, "Documentary": 0.05, "War": 0.04,
+    "Musical": 0.03, "Western": 0.02, "IMAX": 0.02, "Film-Noir": 0.01,
+}
+
+MIN_USER_RATINGS = 20  # Come in MovieLens, ogni utente ha almeno 20 rating
+USER_BLOCK = 4096  # Utenti generati per blocco
+MAX_DRAWS = 20  # Estrazioni massime per sostituire i film duplicati di un utente
+
+
+def generate_movies(n_movies, seed=0):
+    """
+    Genera il catalogo dei film.
+
+    Args:
+        n_movies (int): Numero di film.
+        seed (int): Seed del generatore.
+
+    Returns:
+        DataFrame: Colonne 'movieId', 'title' e 'genres' (stringhe separate da '|').
+    """
+    rng = np.random.default_rng(seed)
+    names = np.array(list(GENRES))
+    probabilities = np.array(list(GENRES.values()))
+    membership = rng.random((n_movies, len(names))) < probabilities
+    # Ogni film ha almeno un genere
+    empty = ~membership.any(axis=1)
+    membership[empty, rng.choice(len(names), empty.sum(), p=probabilities / probabilities.sum())] = True
+    years = rng.integers(1920, 2020, n_movies)
+    movie_ids = np.cumsum(rng.integers(1, 4, n_movies))
+    return pd.DataFrame({
+        "movieId": movie_ids,
+        "title": [f"Movie {i} ({year})" for i, year in zip(movie_ids, years)],
+        "genres": ["|".join(names[row]) for row in membership],
+    })
+
+
+def user_activity(n_ratings, n_users, rng):
+    """Distribuisce i rating tra gli utenti con una coda lunga (lognormale), almeno 20 per utente."""
+    weights = rng.lognormal(0.0, 1.2, n_users)
+    extra = n_ratings - MIN_USER_RATINGS * n_users
+    counts = MIN_USER_RATINGS + np.floor(weights / weights.sum() * max(extra, 0)).astype(np.int64)
+    counts[: max(n_ratings - counts.sum(), 0)] += 1
+    return counts
+
+
+def generate_rating_blocks(n_ratings, n_users, movies, seed=0):
+    """
+    Genera i rating a blocchi di utenti, in ordine di utente.
+
+    La popolarità dei film segue una legge di Zipf e ogni utente valuta film
+    distinti; il numero di rating generati può essere di poco inferiore a
+    `n_ratings` se gli utenti più attivi esauriscono il catalogo.
+
+    Args:
+        n_ratings (int): Numero di rating richiesto.
+        n_users (int): Numero di utenti.
+        movies (DataFrame): Catalogo dei film.
+        seed (int): Seed del generatore.
+
+    Yields:
+        DataFrame: Blocchi con le colonne 'userId', 'movieId', 'rating' e 'timestamp'.
+    """
+    rng = np.random.default_rng(seed + 1)
+    movie_ids = movies["movieId"].to_numpy()
+    n_movies = len(movie_ids)
+    popularity = 1.0 / np.arange(1, n_movies + 1) ** 0.9
+    popularity_cdf = np.cumsum(rng.permutation(popularity))
+    popularity_cdf /= popularity_cdf[-1]
+    quality = rng.normal(0.0, 0.5, n_movies)
+    counts = np.minimum(user_activity(n_ratings, n_users, rng), n_movies)
+
+    for start in range(0, n_users, USER_BLOCK):
+        block_counts = counts[start:start + USER_BLOCK]
+        keys, missing = np.array([], dtype=np.int64), block_counts
+        # Un film al massimo una volta per utente: si ripete l'estrazione per i duplicati
+        for _ in range(MAX_DRAWS):
+            users = np.repeat(np.arange(start, start + len(block_counts), dtype=np.int64), missing)
+            rows = np.searchsorted(popularity_cdf, rng.random(len(users)))
+            keys = np.unique(np.concatenate((keys, users * n_movies + rows)))
+            missing = block_counts - np.bincount(keys // n_movies - start, minlength=len(block_counts))
+            if not missing.any():
+                break
+        users, rows = keys // n_movies, keys % n_movies
+
+        bias = rng.normal(0.0, 0.4, len(block_counts))[users - start]
+        scores = 3.5 + bias + quality[rows] + rng.normal(0.0, 0.8, len(users))
+        ratings = np.clip(np.round(scores * 2) / 2, 0.5, 5.0).astype(np.float32)
+
+        first = rng.integers(828_000_000, 1_500_000_000, len(block_counts))[users - start]
+        timestamps = first + rng.integers(0, 86_400 * 365, len(users))
+        yield pd.DataFrame({
+            "userId": (users + 1).astype(np.int32),
+            "movieId": movie_ids[rows].astype(np.int32),
+            "rating": ratings,
+            "timestamp": timestamps.astype(np.int64),
+        })
+
+
+def write_dataset(directory, scale="100k", seed=0, with_columnar=True):
+    """
+    Genera e salva un dataset sintetico nel formato di `data/processed/`.
+
+    Args:
+        directory (str): Cartella di destinazione.
+        scale (str): Una delle chiavi di SCALES.
+        seed (int): Seed del generatore.
+        with_columnar (bool): Se salvare anche il formato colonnare.
+
+    Returns:
+        dict: Dimensioni effettive del dataset generato.
+    """
+    n_ratings, n_users, n_movies = SCALES[scale]
+    os.makedirs(directory, exist_ok=True)
+    movies = generate_movies(n_movies, seed)
+    movies.to_csv(os.path.join(directory, "movies_enriched.csv"), index=False)
+
+    ratings_path = os.path.join(directory, "ratings_processed.csv")
+
+    def csv_blocks():
+        # Ogni blocco viene accodato al CSV e poi passato al formato colonnare, senza accumularli
+        for i, block in enumerate(generate_rating_blocks(n_ratings, n_users, movies, seed)):
+            block.to_csv(ratings_path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+            yield block
+
+    if with_columnar:
+        columnar_path = os.path.join(directory, "columnar")
+        columnar.save_movies(movies, columnar_path)
+        written = columnar.save_ratings_blocks(csv_blocks(), movies["movieId"], columnar_path)
+    else:
+        written = sum(len(block) for block in csv_blocks())
+    return {"scale": scale, "movies": n_movies, "users": n_users, "ratings": written}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera un dataset sintetico con la forma di MovieLens.")
+    parser.add_argument("scale", choices=list(SCALES), help="Dimensione del dataset.")
+    parser.add_argument("directory", help="Cartella di destinazione.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed del generatore.")
+    parser.add_argument("--no-columnar", action="store_true", help="Non salvare il formato colonnare.")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    info = write_dataset(args.directory, args.scale, args.seed, with_columnar=not args.no_columnar)
+    print(f"Dataset {info} generato in {time.perf_counter() - started:.1f} secondi.")
+
+
+if __name__ == "__main__":
+    main()
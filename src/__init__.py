@@ -1,32 +1,50 @@
 """
 FilmInsight: Knowledge-based Recommender System
 Autore: [Il tuo nome]
-"""
 
-import logging
+L'importazione del package non ha effetti collaterali e non carica pandas né
+i client DBpedia: le funzioni di alto livello vengono importate al primo
+accesso (PEP 562). Il logging e il file .env sono configurati dalla CLI
+(`cli.py`) o dall'applicazione che usa il package.
+"""
+import importlib
 import os
-from dotenv import load_dotenv  # Per gestire variabili d'ambiente
-
-# Configurazione base del logging
-logging.basicConfig(level=logging.INFO)  # Puoi cambiare a DEBUG, WARNING, ecc. secondo necessità
-logger = logging.getLogger(__name__)
-
-# Carica variabili d'ambiente da un file .env (se presente)
-load_dotenv()
-
-# Importa moduli di alto livello
-try:
-    from .data_processing import process_data, load_data
-    from .dbpedia_queries import query_dbpedia
-    from .recommender import recommend_movies
-except ImportError as e:
-    logger.error(f"Errore durante l'importazione dei moduli: {e}")
-    raise
+import sys
 
 # Percorsi configurabili tramite variabili d'ambiente o valori di default
 DATA_PATH = os.getenv("DATA_PATH", "data/")  # Puoi impostarlo in un file .env
 RAW_DATA_PATH = os.getenv("RAW_DATA_PATH", os.path.join(DATA_PATH, "raw/"))
 PROCESSED_DATA_PATH = os.getenv("PROCESSED_DATA_PATH", os.path.join(DATA_PATH, "processed/"))
-CACHE_PATH = os.getenv("CACHE_PATH", os.path.join(DATA_PATH, "dbpedia/query_results.json"))
+CACHE_PATH = os.getenv("CACHE_PATH", os.path.join(DATA_PATH, "dbpedia/query_results.sqlite3"))
+
+# Nome esportato -> modulo che lo definisce
+_EXPORTS = {
+    "run_data_processing": "data_processing",
+    "enrich_movies": "dbpedia_queries",
+    "load_raw_data": "recommender",
+    "recommend_movies": "recommender",
+    "recommend_for_users": "recommender",
+    "RecommenderIndex": "recommender_index",
+    "evaluate_recommender": "evaluation",
+    "RecommendationService": "service",
+    "main": "cli",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    # I moduli si importano a vicenda senza prefisso di package
+    directory = os.path.dirname(os.path.abspath(__file__))
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
+    value = getattr(importlib.import_module(module_name), name)
+    globals()[name] = value
+    return value
+
 
-logger.info("Configurazione del sistema completata.")
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
@@ -0,0 +1,302 @@
+import hashlib
+import io
+import logging
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+import columnar
+from mab import ArmStore
+
+logger = logging.getLogger(__name__)
+
+BANDIT_STATE_PATH = os.getenv("BANDIT_STATE_PATH", "data/processed/bandit_state/")
+FEEDBACK_LOG_PATH = os.getenv("FEEDBACK_LOG_PATH", "data/feedback/feedback.csv")
+CURRENT_FILE = "CURRENT"  # Nome della snapshot corrente, aggiornato in modo atomico
+FEEDBACK_COLUMNS = ["userId", "movieId", "reward", "timestamp"]
+FEEDBACK_DTYPES = {"userId": "int64", "movieId": "int64", "reward": "float64", "timestamp": "int64"}
+LOG_MARK_BYTES = 4096  # Byte prima della posizione applicata che identificano il log (rotazione, troncamento)
+
+
+def encode_keys(user_ids, arms):
+    """
+    Codifica le coppie (utente, azione) come chiavi uint64: utente nei 32 bit alti, azione nei bassi.
+
+    Args:
+        user_ids (array-like): ID degli utenti.
+        arms (array-like): ID delle azioni (film).
+
+    Returns:
+        ndarray: Le chiavi.
+    """
+    users = np.asarray(user_ids, dtype=np.uint64)
+    arms = np.asarray(arms, dtype=np.int64).astype(np.uint64) & np.uint64(0xFFFFFFFF)
+    return (users << np.uint64(32)) | arms
+
+
+def decode_arms(keys):
+    """Estrae l'ID dell'azione dalle chiavi."""
+    return (np.asarray(keys, dtype=np.uint64) & np.uint64(0xFFFFFFFF)).astype(np.int64)
+
+
+def merge_stats(keys, counts, sums):
+    """
+    Somma le statistiche con la stessa chiave.
+
+    Args:
+        keys (ndarray): Chiavi (anche ripetute, in qualsiasi ordine).
+        counts (ndarray): Conteggi.
+        sums (ndarray): Somme delle ricompense.
+
+    Returns:
+        tuple: (chiavi ordinate e distinte, conteggi, somme).
+    """
+    unique, codes = np.unique(keys, return_inverse=True)
+    return (unique,
+            np.bincount(codes, weights=counts, minlength=len(unique)).astype(np.int64),
+            np.bincount(codes, weights=sums, minlength=len(unique)).astype(np.float64))
+
+
+def _log_mark(f, offset):
+    """Hash degli ultimi byte applicati del log, per riconoscere un file ruotato o riscritto."""
+    start = max(offset - LOG_MARK_BYTES, 0)
+    f.seek(start)
+    return hashlib.sha1(f.read(offset - start)).hexdigest()
+
+
+def append_feedback(path, user_ids, movie_ids, rewards, timestamps=None):
+    """
+    Aggiunge eventi di feedback al log (CSV con intestazione, una riga per evento).
+
+    Args:
+        path (str): Percorso del log.
+        user_ids (array-like): ID degli utenti.
+        movie_ids (array-like): ID dei film.
+        rewards (array-like): Ricompense (es. 1 per un click, 0 per un'impressione ignorata).
+        timestamps (array-like): Istanti degli eventi (default: ora).
+    """
+    if timestamps is None:
+        timestamps = np.full(len(user_ids), int(time.time()))
+    events = pd.DataFrame({"userId": user_ids, "movieId": movie_ids, "reward": rewards, "timestamp": timestamps})
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    exists = os.path.exists(path) and os.path.getsize(path) > 0
+    events[FEEDBACK_COLUMNS].to_csv(path, mode="a", header=not exists, index=False)
+
+
+class BanditStateStore:
+    """
+    Statistiche dei bandit per coppia (utente, film), persistenti su disco.
+
+    Lo stato è una snapshot immutabile (chiavi uint64 ordinate, conteggi e
+    somme delle ricompense in file .npy mappati in memoria, caricata in pochi
+    millisecondi) più un delta in memoria con gli eventi ricevuti dopo la
+    snapshot. `consume_log` legge solo la parte nuova del log di feedback e
+    `snapshot` fonde delta e snapshot in una nuova generazione, resa corrente
+    con la rinomina atomica di un unico file: un lettore vede sempre o la
+    vecchia o la nuova snapshot, insieme alla posizione del log già applicata.
+    """
+
+    def __init__(self, directory=BANDIT_STATE_PATH, cache=None):
+        """
+        Apre lo stato (vuoto se la cartella non contiene ancora una snapshot).
+
+        Args:
+            directory (str): Cartella dello stato.
+            cache (RecommendationCache): Cache dei risultati in cui invalidare gli utenti
+                con nuovi feedback, opzionale.
+        """
+        self.directory = directory
+        self.cache = cache
+        self.generation = 0
+        self.log_offset = 0
+        self.log_mark = None
+        self.keys = np.array([], dtype=np.uint64)
+        self.counts = np.array([], dtype=np.int64)
+        self.sums = np.array([], dtype=np.float64)
+        self._pending = []
+        self._delta = (self.keys, self.counts, self.sums)
+        self._load()
+
+    def _load(self):
+        current = os.path.join(self.directory, CURRENT_FILE)
+        if not os.path.exists(current):
+            return
+        with open(current, encoding="utf-8") as f:
+            name = f.read().strip()
+        columns, meta = columnar.load_table(self.directory, name)
+        self.keys, self.counts, self.sums = columns["keys"], columns["counts"], columns["sums"]
+        self.generation = meta["generation"]
+        self.log_offset = meta["log_offset"]
+        self.log_mark = meta.get("log_mark")
+
+    def __len__(self):
+        """Numero di coppie (utente, film) con statistiche."""
+        return len(self._merged()[0])
+
+    def record(self, user_ids, movie_ids, rewards):
+        """
+        Registra un blocco di eventi nel delta in memoria e invalida gli utenti nella cache.
+
+        Args:
+            user_ids (array-like): ID degli utenti.
+            movie_ids (array-like): ID dei film.
+            rewards (array-like): Ricompense.
+        """
+        rewards = np.asarray(rewards, dtype=np.float64)
+        if len(rewards):
+            self._pending.append((encode_keys(user_ids, movie_ids), np.ones(len(rewards)), rewards))
+            if self.cache is not None:
+                self.cache.invalidate_users(user_ids)
+
+    def _compact(self):
+        """Fonde gli eventi in attesa nel delta ordinato."""
+        if self._pending:
+            keys, counts, sums = (np.concatenate(parts) for parts in zip(self._delta, *self._pending))
+            self._delta = merge_stats(keys, counts, sums)
+            self._pending = []
+        return self._delta
+
+    def _merged(self):
+        """Snapshot e delta fusi (in memoria)."""
+        delta_keys, delta_counts, delta_sums = self._compact()
+        if not len(delta_keys):
+            return self.keys, self.counts, self.sums
+        return merge_stats(np.concatenate((self.keys, delta_keys)),
+                           np.concatenate((self.counts, delta_counts)),
+                           np.concatenate((self.sums, delta_sums)))
+
+    def consume_log(self, path=FEEDBACK_LOG_PATH):
+        """
+        Applica al delta gli eventi del log aggiunti dall'ultima lettura.
+
+        Viene letta solo la parte del file successiva alla posizione già
+        applicata e fino all'ultima riga completa, per cui una riga in corso di
+        scrittura viene letta alla chiamata successiva. Se il log è stato
+        ruotato o troncato (file più corto della posizione applicata, o byte
+        prima di essa diversi da quelli letti) viene riletto dall'inizio.
+
+        Args:
+            path (str): Percorso del log di feedback.
+
+        Returns:
+            int: Numero di eventi applicati.
+        """
+        if not os.path.exists(path):
+            return 0
+        with open(path, "rb") as f:
+            header = f.readline()
+            start = max(self.log_offset, len(header))
+            size = os.fstat(f.fileno()).st_size
+            if self.log_offset and (size < self.log_offset or
+                                    (self.log_mark is not None and _log_mark(f, self.log_offset) != self.log_mark)):
+                logger.warning(f"Log di feedback '{path}' ruotato o troncato: rilettura dall'inizio.")
+                start = len(header)
+            f.seek(start)
+            tail = f.read()
+            complete = tail.rfind(b"\n") + 1
+            if not complete:
+                return 0
+            mark = _log_mark(f, start + complete)
+        events = pd.read_csv(io.BytesIO(header + tail[:complete]), dtype=FEEDBACK_DTYPES)
+        self.record(events["userId"].to_numpy(), events["movieId"].to_numpy(), events["reward"].to_numpy())
+        self.log_offset, self.log_mark = start + complete, mark
+        return len(events)
+
+    def user_stats(self, user_id):
+        """
+        Statistiche di un utente, in O(log n) sulla snapshot e sul delta.
+
+        Args:
+            user_id (int): ID dell'utente.
+
+        Returns:
+            tuple: (ID dei film, conteggi, somme delle ricompense), ordinati per ID del film.
+        """
+        low, high = encode_keys([user_id, user_id + 1], [0, 0])
+        parts = []
+        for keys, counts, sums in ((self.keys, self.counts, self.sums), self._compact()):
+            start, stop = np.searchsorted(keys, [low, high])
+            parts.append((keys[start:stop], counts[start:stop], sums[start:stop]))
+        keys, counts, sums = merge_stats(*(np.concatenate(column) for column in zip(*parts)))
+        return decode_arms(keys), counts, sums
+
+    def arm_store(self, user_id):
+        """
+        Costruisce l'`ArmStore` di un utente, da usare con i bandit di `mab`.
+
+        Args:
+            user_id (int): ID dell'utente.
+
+        Returns:
+            ArmStore: Azioni (ID dei film) con conteggi e ricompense medie.
+        """
+        movie_ids, counts, sums = self.user_stats(user_id)
+        store = ArmStore(capacity=max(len(movie_ids), 1))
+        indices = store.indices(movie_ids.tolist(), register=True)
+        store.counts[indices] = counts
+        store.values[indices] = sums / np.maximum(counts, 1)
+        store.tree.update(indices, store.values[indices])
+        return store
+
+    def snapshot(self):
+        """
+        Salva una nuova snapshot con il delta applicato e la rende corrente.
+
+        Returns:
+            str: Nome della snapshot salvata.
+        """
+        keys, counts, sums = self._merged()
+        generation = self.generation + 1
+        name = f"snapshot-{generation:06d}"
+        columnar.save_table(self.directory, name, {"keys": keys, "counts": counts, "sums": sums},
+                            {"generation": generation, "log_offset": self.log_offset, "log_mark": self.log_mark})
+        current = os.path.join(self.directory, CURRENT_FILE)
+        with open(current + ".tmp", "w", encoding="utf-8") as f:
+            f.write(name)
+        os.replace(current + ".tmp", current)
+
+        previous = os.path.join(self.directory, f"snapshot-{self.generation:06d}")
+        if self.generation and os.path.isdir(previous):
+            shutil.rmtree(previous, ignore_errors=True)
+        self.generation = generation
+        self._delta = (np.array([], dtype=np.uint64), np.array([], dtype=np.int64), np.array([], dtype=np.float64))
+        self._load()
+        logger.info(f"Snapshot dello stato dei bandit salvata: {name} ({len(keys)} coppie utente-film).")
+        return name
+
+    def stats(self):
+        """Riepilogo dello stato (per log e metriche)."""
+        return {"generation": self.generation, "log_offset": self.log_offset,
+                "snapshot_pairs": len(self.keys), "delta_pairs": len(self._compact()[0])}
+
+
+def blend_scores(prior, movie_rows, counts, sums, pseudo_count=5.0):
+    """
+    Combina i punteggi a priori dei film con le ricompense osservate.
+
+    Il prior viene normalizzato in [0, 1] (diviso per il massimo) e vale come
+    `pseudo_count` osservazioni: un film con n feedback e somma s ottiene
+    (pseudo_count * prior + s) / (pseudo_count + n). I film senza feedback
+    mantengono il prior normalizzato, per cui senza feedback l'ordinamento non cambia.
+
+    Args:
+        prior (ndarray): Punteggi a priori dei film (tutto il catalogo o i soli candidati).
+        movie_rows (ndarray): Posizioni in `prior` dei film con feedback (-1 se assenti).
+        counts (ndarray): Numero di feedback di ogni film.
+        sums (ndarray): Somma delle ricompense di ogni film.
+        pseudo_count (float): Peso del prior in numero di osservazioni.
+
+    Returns:
+        ndarray: I punteggi combinati.
+    """
+    scale = prior.max() if len(prior) and prior.max() > 0 else 1.0
+    blended = prior / scale
+    valid = movie_rows >= 0
+    rows = movie_rows[valid]
+    blended[rows] = (pseudo_count * blended[rows] + sums[valid]) / (pseudo_count + counts[valid])
+    return blended
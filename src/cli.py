@@ -0,0 +1,223 @@
+"""
+Interfaccia a riga di comando di FilmInsight.
+
+Il modulo importa solo la libreria standard: pandas, numpy, scipy e i client
+DBpedia vengono caricati dal sottocomando che li usa, così l'avvio (e
+`--help`) resta rapido. Il file .env, se presente e se python-dotenv è
+installato, viene letto prima di importare i moduli che leggono la
+configurazione dalle variabili d'ambiente.
+
+Esempio:
+    ./filminsight process --incremental
+    ./filminsight resolve --labels data/dbpedia/film_labels.nt
+    ./filminsight enrich --limit 100
+    ./filminsight recommend 1 2 3 --top-k 10
+    ./filminsight evaluate --k 10
+    ./filminsight bench recommender --scales 100k
+"""
+import argparse
+import json
+import logging
+import os
+import runpy
+import sys
+
+BENCHMARKS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks")
+# Sottocomandi che inoltrano le opzioni rimanenti: numero di argomenti propri prima delle opzioni
+PASSTHROUGH_COMMANDS = {"serve": 0, "bench": 1}
+
+
+def load_environment():
+    """Carica le variabili d'ambiente dal file .env (se python-dotenv è disponibile)."""
+    try:
+        from dotenv import load_dotenv
+    except ImportError:
+        return
+    load_dotenv()
+
+
+def cmd_process(args):
+    from data_processing import run_data_processing
+
+    run_data_processing(incremental=args.incremental)
+
+
+def cmd_enrich(args):
+    from dbpedia_queries import run_enrichment
+
+    run_enrichment(args.movies, args.links or None, args.output, limit=args.limit, labels_path=args.labels or None)
+
+
+def cmd_resolve(args):
+    import pandas as pd
+    from entity_resolver import (ENTITY_RESOLVER_PATH, ENTITY_RESOLVER_TABLE, EntityResolver, load_entity_resolver,
+                                 resolve_movies)
+
+    if args.rebuild:
+        resolver = EntityResolver.from_dump(args.labels)
+        resolver.save(ENTITY_RESOLVER_PATH, ENTITY_RESOLVER_TABLE)
+    else:
+        resolver = load_entity_resolver(labels_path=args.labels)
+    if resolver is None:
+        raise SystemExit(f"Dump delle etichette non trovato: {args.labels}")
+    movies = pd.read_csv(args.movies, usecols=["movieId", "title"])
+    resolved = resolve_movies(movies, resolver, args.min_confidence, args.workers)
+    resolved.to_csv(args.output, index=False)
+    print(f"Risolti {resolved['dbpediaUri'].notna().sum()} film su {len(resolved)} "
+          f"(da cercare in rete: {resolved['dbpediaUri'].isna().sum()}); risultati in {args.output}.")
+
+
+def cmd_recommend(args):
+    from recommender import recommend_movies
+    from service import load_index
+
+    index = load_index(args.data_path)
+    for user_id in args.user_ids:
+        recommendations = recommend_movies(user_id, None, None, top_k=args.top_k, index=index)
+        if args.json:
+            print(json.dumps({"userId": user_id, "recommendations": recommendations.to_dict("records")},
+                             ensure_ascii=False))
+        elif recommendations.empty:
+            print(f"Nessuna raccomandazione trovata per l'utente {user_id}.")
+        else:
+            print(f"Raccomandazioni per l'utente {user_id}:")
+            print(recommendations.to_string(index=False))
+
+
+def cmd_evaluate(args):
+    from evaluation import METRICS, evaluate_recommender, temporal_split
+    from recommender import load_raw_data
+
+    movies, ratings = load_raw_data(args.data_path)
+    train, test = temporal_split(ratings, test_fraction=args.test_fraction)
+    per_user, summary = evaluate_recommender(train, test, movies, k=args.k, n_workers=args.workers)
+    if args.output:
+        per_user.to_csv(args.output, index=False)
+    print(f"Metriche @{args.k} su {summary['users']} utenti:")
+    for metric in METRICS:
+        print(f"{metric}: {summary[metric]:.4f}")
+
+
+def cmd_serve(args):
+    from service import main as serve
+
+    serve(args.options)
+
+
+def cmd_bench(args):
+    path = os.path.join(BENCHMARKS_PATH, f"bench_{args.name}.py")
+    if not os.path.exists(path):
+        available = sorted(name[6:-3] for name in os.listdir(BENCHMARKS_PATH)
+                           if name.startswith("bench_") and name.endswith(".py"))
+        raise SystemExit(f"Benchmark sconosciuto: {args.name} (disponibili: {', '.join(available)})")
+    # Il benchmark legge i propri argomenti da sys.argv e importa i moduli vicini, come se fosse eseguito direttamente
+    sys.argv = [path] + args.options
+    sys.path.insert(0, BENCHMARKS_PATH)
+    runpy.run_path(path, run_name="__main__")
+
+
+def split_passthrough(argv):
+    """
+    Separa le opzioni inoltrate da `serve` e `bench` (es. --help del benchmark) da quelle della CLI.
+
+    Returns:
+        tuple: (argomenti della CLI, opzioni da inoltrare).
+    """
+    for i, token in enumerate(argv):
+        if token.startswith("-") or (i and argv[i - 1] == "--log-level"):
+            continue
+        if token not in PASSTHROUGH_COMMANDS:
+            break
+        end = i + 1 + PASSTHROUGH_COMMANDS[token]
+        return argv[:end], argv[end:]
+    return argv, []
+
+
+def build_parser():
+    """Costruisce il parser degli argomenti con un sottocomando per operazione."""
+    parser = argparse.ArgumentParser(prog="filminsight", description="FilmInsight: raccomandazioni di film.")
+    parser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+                        help="Livello dei messaggi di log.")
+    parser.add_argument("--metrics", action="store_true",
+                        help="Attiva la strumentazione e stampa le metriche (formato Prometheus) su stderr.")
+    commands = parser.add_subparsers(dest="command", metavar="COMANDO", required=True)
+
+    process = commands.add_parser("process", help="Elabora i dati MovieLens grezzi.")
+    process.add_argument("--incremental", action="store_true",
+                         help="Elabora solo le modifiche ai file raw dall'ultima esecuzione.")
+    process.set_defaults(handler=cmd_process)
+
+    enrich = commands.add_parser("enrich", help="Arricchisce i film con le informazioni di DBpedia.")
+    enrich.add_argument("--movies", default=os.getenv("MOVIES_CSV_PATH", "data/raw/movies.csv"), help="CSV dei film.")
+    enrich.add_argument("--links", default=os.getenv("LINKS_CSV_PATH", "data/raw/links.csv"),
+                        help="CSV dei link (imdbId); '' per cercare per titolo.")
+    enrich.add_argument("--output", default="data/processed/movies_enriched.csv", help="CSV di destinazione.")
+    enrich.add_argument("--limit", type=int, default=None, help="Numero massimo di film da arricchire.")
+    enrich.add_argument("--labels", default=os.getenv("DBPEDIA_LABELS_PATH", "data/dbpedia/film_labels.nt"),
+                        help="Dump delle etichette DBpedia per risolvere i titoli offline; '' per non usarlo.")
+    enrich.set_defaults(handler=cmd_enrich)
+
+    resolve = commands.add_parser("resolve", help="Risolve offline i titoli nelle entità DBpedia.")
+    resolve.add_argument("--labels", default=os.getenv("DBPEDIA_LABELS_PATH", "data/dbpedia/film_labels.nt"),
+                         help="Dump delle etichette dei film (N-Triples, anche .gz/.bz2, o TSV/CSV uri,label).")
+    resolve.add_argument("--movies", default=os.getenv("MOVIES_CSV_PATH", "data/raw/movies.csv"), help="CSV dei film.")
+    resolve.add_argument("--output", default="data/processed/movie_entities.csv", help="CSV di destinazione.")
+    resolve.add_argument("--min-confidence", type=float, default=float(os.getenv("ENTITY_RESOLVER_MIN_CONFIDENCE", 0.8)),
+                         help="Confidenza minima di una risoluzione.")
+    resolve.add_argument("--workers", type=int, default=None, help="Processi di risoluzione (default: CPU).")
+    resolve.add_argument("--rebuild", action="store_true", help="Ricostruisce l'indice dal dump anche se è salvato.")
+    resolve.set_defaults(handler=cmd_resolve)
+
+    recommend = commands.add_parser("recommend", help="Raccomanda film a uno o più utenti.")
+    recommend.add_argument("user_ids", type=int, nargs="+", help="ID degli utenti.")
+    recommend.add_argument("--top-k", type=int, default=5, help="Raccomandazioni per utente.")
+    recommend.add_argument("--data-path", default="data/processed/", help="Cartella dei dati processati.")
+    recommend.add_argument("--json", action="store_true", help="Una riga JSON per utente.")
+    recommend.set_defaults(handler=cmd_recommend)
+
+    evaluate = commands.add_parser("evaluate", help="Valutazione offline su una divisione temporale.")
+    evaluate.add_argument("--k", type=int, default=10, help="Raccomandazioni per utente.")
+    evaluate.add_argument("--test-fraction", type=float, default=0.2, help="Frazione dei rating di ogni utente nel test.")
+    evaluate.add_argument("--data-path", default="data/processed/", help="Cartella dei dati processati.")
+    evaluate.add_argument("--workers", type=int, default=None, help="Processi di valutazione (default: CPU).")
+    evaluate.add_argument("--output", default=None, help="CSV a cui scrivere le metriche per utente.")
+    evaluate.set_defaults(handler=cmd_evaluate)
+
+    serve = commands.add_parser("serve", help="Avvia il servizio HTTP (opzioni di src/service.py).", add_help=False)
+    serve.set_defaults(handler=cmd_serve)
+
+    bench = commands.add_parser("bench", help="Esegue un benchmark di benchmarks/ (es. recommender, startup).")
+    bench.add_argument("name", help="Nome del benchmark (bench_<nome>.py).")
+    bench.set_defaults(handler=cmd_bench)
+    return parser
+
+
+def main(argv=None):
+    """
+    Esegue la CLI.
+
+    Args:
+        argv (list): Argomenti (default: sys.argv[1:]).
+
+    Returns:
+        int: Codice di uscita.
+    """
+    load_environment()
+    argv, options = split_passthrough(sys.argv[1:] if argv is None else list(argv))
+    args = build_parser().parse_args(argv)
+    args.options = options
+    logging.basicConfig(level=getattr(logging, args.log_level))
+    if args.metrics:
+        import instrumentation
+
+        instrumentation.enable()
+    try:
+        args.handler(args)
+    finally:
+        if args.metrics:
+            sys.stderr.write(instrumentation.prometheus_text())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,669 @@
+import json
+import logging
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from scoring import GenreScorer, genre_matrix, split_genres
+
+logger = logging.getLogger(__name__)
+
+META_FILE = "meta.json"
+CURRENT_FILE = "CURRENT"  # Nome della revisione corrente di una tabella, aggiornato in modo atomico
+REVISION_PREFIX = "r-"
+FORMAT_VERSION = 1
+SEGMENT_PREFIX = "delta-"  # Sotto-tabelle con le righe accodate dopo l'ultimo salvataggio completo
+# Le righe accodate vengono fuse nella tabella quando superano questa frazione delle sue righe
+SEGMENT_COMPACT_FRACTION = float(os.getenv("SEGMENT_COMPACT_FRACTION", 0.1))
+MAX_SEGMENTS = int(os.getenv("MAX_SEGMENTS", 64))  # Segmenti massimi prima di fondere comunque la tabella
+RATING_COLUMNS = ("userId", "movieId", "rating", "timestamp", "movieRow")
+
+# Tipi compatti per la lettura dei CSV (gli ID MovieLens rientrano in int32)
+RATINGS_DTYPES = {"userId": "int32", "movieId": "int32", "rating": "float32", "timestamp": "int64"}
+TAGS_DTYPES = {"userId": "int32", "movieId": "int32", "timestamp": "int64"}
+
+
+def _downcast_int(values):
+    """Restituisce gli interi come int32 se rientrano nell'intervallo, altrimenti int64."""
+    values = np.asarray(values, dtype=np.int64)
+    info = np.iinfo(np.int32)
+    if not len(values) or (values.min() >= info.min and values.max() <= info.max):
+        return values.astype(np.int32)
+    return values
+
+
+def _nullable_int(series):
+    """Converte una colonna intera con valori mancanti in int32 con -1 come sentinella."""
+    return series.fillna(-1).to_numpy().astype(np.int32)
+
+
+def encode_genres(genre_lists, vocabulary=None):
+    """
+    Codifica i generi di ogni film come bitmask.
+
+    Args:
+        genre_lists (iterable): Generi di ogni film (liste o stringhe '|').
+        vocabulary (list): Vocabolario dei generi; se assente viene ricavato dai dati.
+
+    Returns:
+        tuple: (bitmask per film, vocabolario dei generi).
+    """
+    lists = [split_genres(g) for g in genre_lists]
+    if vocabulary is None:
+        vocabulary = sorted({genre for genres in lists for genre in genres})
+    if len(vocabulary) > 64:
+        raise ValueError(f"Troppi generi per una bitmask a 64 bit: {len(vocabulary)}")
+    dtype = np.uint32 if len(vocabulary) <= 32 else np.uint64
+    bits = {genre: 1 << i for i, genre in enumerate(vocabulary)}
+    masks = np.array([sum(bits[g] for g in set(genres)) for genres in lists], dtype=dtype)
+    return masks, list(vocabulary)
+
+
+def decode_genres(masks, vocabulary):
+    """
+    Decodifica le bitmask dei generi in liste.
+
+    Args:
+        masks (ndarray): Bitmask dei generi di ogni film.
+        vocabulary (list): Vocabolario dei generi.
+
+    Returns:
+        list: Lista dei generi di ogni film.
+    """
+    matrix = genre_matrix(masks, len(vocabulary))
+    return [[vocabulary[j] for j in np.flatnonzero(row)] for row in matrix]
+
+
+def encode_strings(strings):
+    """
+    Codifica una sequenza di stringhe come un unico buffer di byte UTF-8 con gli offset.
+
+    Args:
+        strings (iterable): Le stringhe.
+
+    Returns:
+        tuple: (offset int64 di lunghezza n + 1, byte uint8).
+    """
+    encoded = [string.encode("utf-8") for string in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(e) for e in encoded], out=offsets[1:])
+    return offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+
+class StringColumn:
+    """Sequenza di stringhe decodificate su richiesta dal buffer di `encode_strings` (anche mappato in memoria)."""
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return bytes(self.data[self.offsets[i]:self.offsets[i + 1]]).decode("utf-8")
+
+
+def save_table(directory, name, columns, meta=None):
+    """
+    Salva una tabella come un file .npy per colonna più un file di metadati.
+
+    Colonne e metadati vengono scritti in una nuova cartella di revisione
+    della tabella, resa corrente con la rinomina atomica del file CURRENT
+    (come le snapshot di `bandit_state`); la revisione precedente, con i
+    segmenti accodati con `append_segment`, viene poi eliminata. Un lettore
+    vede quindi o la vecchia o la nuova tabella, mai colonne di revisioni
+    diverse; chi ha già mappato i file della revisione precedente continua a
+    leggerli finché non li rilascia.
+
+    Args:
+        directory (str): Cartella del formato colonnare.
+        name (str): Nome della tabella.
+        columns (dict): Colonne da salvare (nome -> ndarray).
+        meta (dict): Metadati aggiuntivi (categorie, vocabolari, ...).
+    """
+    revision_dir, revision = _new_revision(directory, name)
+    _write_columns(revision_dir, columns, dict(meta or {}, revision=revision))
+    _publish(directory, name, revision_dir)
+
+
+def _table_dir(directory, name):
+    """Cartella della revisione corrente della tabella (la tabella stessa se non ha revisioni, come i segmenti)."""
+    table_dir = os.path.join(directory, name)
+    current = os.path.join(table_dir, CURRENT_FILE)
+    if not os.path.exists(current):
+        return table_dir
+    with open(current, encoding="utf-8") as f:
+        return os.path.join(table_dir, f.read().strip())
+
+
+def _new_revision(directory, name):
+    """Crea la cartella vuota della prossima revisione; restituisce (cartella, revisione corrente)."""
+    revision = load_meta(directory, name).get("revision", 0) if has_table(directory, name) else 0
+    revision_dir = os.path.join(directory, name, f"{REVISION_PREFIX}{revision + 1:06d}")
+    # Resti di un salvataggio interrotto
+    shutil.rmtree(revision_dir, ignore_errors=True)
+    os.makedirs(revision_dir)
+    return revision_dir, revision
+
+
+def _publish(directory, name, revision_dir):
+    """Rende corrente una revisione rinominando CURRENT ed elimina tutto il resto della tabella."""
+    table_dir = os.path.join(directory, name)
+    current = os.path.join(table_dir, CURRENT_FILE)
+    with open(current + ".tmp", "w", encoding="utf-8") as f:
+        f.write(os.path.basename(revision_dir))
+    os.replace(current + ".tmp", current)
+    for entry in os.listdir(table_dir):
+        path = os.path.join(table_dir, entry)
+        if entry in (CURRENT_FILE, os.path.basename(revision_dir)):
+            continue
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            os.remove(path)
+
+
+def _write_columns(table_dir, columns, meta):
+    """Scrive colonne e metadati in una cartella non ancora visibile ai lettori."""
+    os.makedirs(table_dir, exist_ok=True)
+    for column, values in columns.items():
+        _save_column(table_dir, column, values)
+    _write_meta(table_dir, list(columns), meta)
+
+
+def _save_column(table_dir, column, values):
+    """Salva una colonna su un file temporaneo e lo rinomina."""
+    path = os.path.join(table_dir, f"{column}.npy")
+    with open(path + ".tmp", "wb") as f:
+        np.save(f, np.ascontiguousarray(values))
+    os.replace(path + ".tmp", path)
+
+
+def _write_meta(table_dir, columns, meta=None):
+    """
+    Scrive i metadati della tabella (per ultimi, tramite un file temporaneo).
+
+    Ogni scrittura incrementa la revisione presente in `meta`, che identifica
+    i dati per le cache (vedi `RecommenderIndex.data_version`).
+    """
+    meta = dict(meta or {})
+    meta["version"] = FORMAT_VERSION
+    meta["columns"] = columns
+    meta["revision"] = meta.get("revision", 0) + 1
+    meta_path = os.path.join(table_dir, META_FILE)
+    with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(meta_path + ".tmp", meta_path)
+
+
+def _load_dir(table_dir, mmap_mode):
+    with open(os.path.join(table_dir, META_FILE), encoding="utf-8") as f:
+        meta = json.load(f)
+    columns = {column: np.load(os.path.join(table_dir, f"{column}.npy"), mmap_mode=mmap_mode)
+               for column in meta["columns"]}
+    return columns, meta
+
+
+def load_table(directory, name, mmap_mode="r"):
+    """
+    Carica una tabella colonnare mappando i file in memoria.
+
+    Args:
+        directory (str): Cartella del formato colonnare.
+        name (str): Nome della tabella.
+        mmap_mode (str): Modalità di np.load ('r' per condividere le pagine tra processi, None per copiare).
+
+    Returns:
+        tuple: (colonne come dict nome -> ndarray, metadati).
+    """
+    return _load_dir(_table_dir(directory, name), mmap_mode)
+
+
+def has_table(directory, name):
+    """Indica se la tabella colonnare esiste."""
+    return os.path.exists(os.path.join(_table_dir(directory, name), META_FILE))
+
+
+def load_meta(directory, name):
+    """Carica solo i metadati di una tabella colonnare."""
+    with open(os.path.join(_table_dir(directory, name), META_FILE), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def append_segment(directory, name, columns, meta=None):
+    """
+    Accoda un segmento a una tabella esistente senza riscriverla.
+
+    Il segmento è una sotto-cartella della revisione corrente; i metadati
+    della tabella, che lo elencano, vengono riscritti per ultimi con una
+    rinomina atomica. Chi legge la tabella fonde i segmenti con
+    `load_table_with_segments`, e il successivo `save_table` li compatta.
+
+    Args:
+        directory (str): Cartella del formato colonnare.
+        name (str): Nome della tabella.
+        columns (dict): Colonne del segmento (nome -> ndarray).
+        meta (dict): Metadati del segmento.
+
+    Returns:
+        int: Numero di segmenti della tabella.
+    """
+    table_dir = _table_dir(directory, name)
+    table_meta = load_meta(directory, name)
+    segments = table_meta.get("segments", [])
+    segment = f"{SEGMENT_PREFIX}{len(segments) + 1:06d}"
+    shutil.rmtree(os.path.join(table_dir, segment), ignore_errors=True)
+    _write_columns(os.path.join(table_dir, segment), columns, meta)
+    table_meta["segments"] = segments + [segment]
+    _write_meta(table_dir, table_meta.pop("columns"), table_meta)
+    return len(table_meta["segments"])
+
+
+def load_table_with_segments(directory, name, mmap_mode="r"):
+    """
+    Carica una tabella e i segmenti accodati, in ordine di scrittura, dalla stessa revisione.
+
+    Args:
+        directory (str): Cartella del formato colonnare.
+        name (str): Nome della tabella.
+        mmap_mode (str): Modalità di np.load.
+
+    Returns:
+        tuple: (colonne, metadati, lista di coppie (colonne, metadati) dei segmenti).
+    """
+    table_dir = _table_dir(directory, name)
+    columns, meta = _load_dir(table_dir, mmap_mode)
+    segments = [_load_dir(os.path.join(table_dir, segment), mmap_mode) for segment in meta.get("segments", [])]
+    return columns, meta, segments
+
+
+def load_segments(directory, name, mmap_mode="r"):
+    """
+    Carica i segmenti accodati a una tabella, in ordine di scrittura.
+
+    Args:
+        directory (str): Cartella del formato colonnare.
+        name (str): Nome della tabella.
+        mmap_mode (str): Modalità di np.load.
+
+    Returns:
+        list: Coppie (colonne, metadati) di ogni segmento.
+    """
+    return load_table_with_segments(directory, name, mmap_mode)[2]
+
+
+def save_movies(movies, directory):
+    """
+    Salva il catalogo dei film: ID int32, titoli categorici e generi come bitmask.
+
+    Args:
+        movies (DataFrame): DataFrame dei film processati.
+        directory (str): Cartella del formato colonnare.
+    """
+    title_codes, titles = pd.factorize(movies["title"])
+    masks, vocabulary = encode_genres(movies["genres"])
+    save_table(directory, "movies", {
+        "movieId": _downcast_int(movies["movieId"]),
+        "title": title_codes.astype(np.int32),
+        "genres": masks,
+    }, {"categories": {"title": list(titles)}, "genres": vocabulary})
+
+
+def load_genre_scorer(directory, mmap_mode="r"):
+    """
+    Costruisce il motore dei generi dalla tabella colonnare dei film (titoli e bitmask dei generi).
+
+    Args:
+        directory (str): Cartella del formato colonnare.
+        mmap_mode (str): Modalità di np.load.
+
+    Returns:
+        GenreScorer: Il motore dei generi del catalogo.
+    """
+    movies, meta = load_table(directory, "movies", mmap_mode)
+    titles = np.asarray(meta["categories"]["title"], dtype=object)[movies["title"]]
+    return GenreScorer.from_bitmasks(movies["movieId"], titles, movies["genres"], meta["genres"])
+
+
+def save_ratings(ratings, catalog_ids, directory):
+    """
+    Salva i rating ordinati per utente, con gli offset di ogni utente.
+
+    Oltre alle colonne del CSV viene salvata la posizione di ogni film nel
+    catalogo (-1 se assente), così l'indice di raccomandazione si costruisce
+    senza alcun calcolo.
+
+    Args:
+        ratings (DataFrame): DataFrame dei rating.
+        catalog_ids (array-like): ID dei film nell'ordine del catalogo (per le posizioni).
+        directory (str): Cartella del formato colonnare.
+    """
+    save_table(directory, "ratings", _rating_columns(ratings, catalog_ids), {"aux": ["movieRow", "users", "offsets"]})
+
+
+def _rating_columns(ratings, catalog_ids):
+    """Colonne della tabella dei rating: righe ordinate per utente, posizioni nel catalogo e offset."""
+    users = ratings["userId"].to_numpy()
+    order = np.argsort(users, kind="stable")
+    user_ids, counts = np.unique(users[order], return_counts=True)
+    movie_ids = ratings["movieId"].to_numpy()[order]
+    return {
+        "userId": _downcast_int(users[order]),
+        "movieId": _downcast_int(movie_ids),
+        "rating": ratings["rating"].to_numpy()[order].astype(np.float32),
+        "timestamp": _downcast_int(ratings["timestamp"].to_numpy()[order]),
+        "movieRow": pd.Index(np.asarray(catalog_ids)).get_indexer(movie_ids).astype(np.int32),
+        "users": _downcast_int(user_ids),
+        "offsets": np.concatenate(([0], np.cumsum(counts))).astype(np.int64),
+    }
+
+
+def _int_dtype(low, high):
+    """Restituisce int32 se l'intervallo [low, high] vi rientra, altrimenti int64."""
+    info = np.iinfo(np.int32)
+    return np.dtype(np.int32) if low >= info.min and high <= info.max else np.dtype(np.int64)
+
+
+def _raw_to_npy(raw_path, npy_path, raw_dtype, dtype, chunk_rows=1 << 20):
+    """Converte un file di valori grezzi in un file .npy, a blocchi di righe."""
+    n_rows = os.path.getsize(raw_path) // raw_dtype.itemsize
+    tmp_path = npy_path + ".tmp"
+    with open(raw_path, "rb") as src, open(tmp_path, "wb") as dst:
+        np.lib.format.write_array_header_1_0(dst, {"descr": np.lib.format.dtype_to_descr(dtype),
+                                                   "fortran_order": False, "shape": (n_rows,)})
+        while True:
+            chunk = np.fromfile(src, dtype=raw_dtype, count=chunk_rows)
+            if not len(chunk):
+                break
+            dst.write(chunk.astype(dtype, copy=False).tobytes())
+    os.replace(tmp_path, npy_path)
+    os.remove(raw_path)
+
+
+def save_ratings_blocks(blocks, catalog_ids, directory):
+    """
+    Salva i rating ricevuti a blocchi già ordinati per utente, senza tenerli tutti in memoria.
+
+    Il risultato è identico a `save_ratings`, ma ogni colonna viene accodata a
+    un file grezzo e convertita in .npy alla fine: in memoria restano un blocco
+    e gli utenti distinti. Gli utenti devono essere in ordine non decrescente
+    (come nel `ratings.csv` di MovieLens): i rating di un utente possono
+    proseguire nel blocco successivo.
+
+    Args:
+        blocks (iterable): DataFrame con le colonne 'userId', 'movieId', 'rating' e 'timestamp'.
+        catalog_ids (array-like): ID dei film nell'ordine del catalogo (per le posizioni).
+        directory (str): Cartella del formato colonnare.
+
+    Returns:
+        int: Numero di rating salvati.
+
+    Raises:
+        ValueError: Se i rating non sono ordinati per utente.
+    """
+    table_dir, revision = _new_revision(directory, "ratings")
+    catalog = pd.Index(np.asarray(catalog_ids))
+    raw_dtypes = {"userId": np.dtype(np.int64), "movieId": np.dtype(np.int64), "rating": np.dtype(np.float32),
+                  "timestamp": np.dtype(np.int64), "movieRow": np.dtype(np.int32)}
+    bounds = {column: (0, 0) for column in ("userId", "movieId", "timestamp")}
+    user_ids, counts, last_user = [], [], None
+    raw = {column: open(os.path.join(table_dir, f"{column}.raw"), "wb") for column in raw_dtypes}
+    try:
+        for block in blocks:
+            users = block["userId"].to_numpy()
+            if not len(users):
+                continue
+            if np.any(np.diff(users) < 0) or (last_user is not None and users[0] < last_user):
+                raise ValueError("I rating devono essere ordinati per utente")
+            block_users, block_counts = np.unique(users, return_counts=True)
+            if block_users[0] == last_user:
+                # L'ultimo utente del blocco precedente prosegue in questo blocco
+                counts[-1][-1] += block_counts[0]
+                block_users, block_counts = block_users[1:], block_counts[1:]
+            if len(block_users):
+                user_ids.append(block_users)
+                counts.append(block_counts)
+            last_user = users[-1]
+            movie_ids = block["movieId"].to_numpy()
+            columns = {"userId": users, "movieId": movie_ids, "rating": block["rating"].to_numpy(),
+                       "timestamp": block["timestamp"].to_numpy(),
+                       "movieRow": catalog.get_indexer(movie_ids)}
+            for column, values in columns.items():
+                if column in bounds:
+                    low, high = bounds[column]
+                    bounds[column] = (min(low, int(values.min())), max(high, int(values.max())))
+                raw[column].write(np.ascontiguousarray(values, dtype=raw_dtypes[column]).tobytes())
+    finally:
+        for f in raw.values():
+            f.close()
+
+    for column, raw_dtype in raw_dtypes.items():
+        dtype = _int_dtype(*bounds[column]) if column in bounds else raw_dtype
+        _raw_to_npy(os.path.join(table_dir, f"{column}.raw"), os.path.join(table_dir, f"{column}.npy"),
+                    raw_dtype, dtype)
+    user_ids = np.concatenate(user_ids) if user_ids else np.array([], dtype=np.int64)
+    counts = np.concatenate(counts) if counts else np.array([], dtype=np.int64)
+    _save_column(table_dir, "users", _downcast_int(user_ids))
+    _save_column(table_dir, "offsets", np.concatenate(([0], np.cumsum(counts))).astype(np.int64))
+    _write_meta(table_dir, list(raw_dtypes) + ["users", "offsets"],
+                {"aux": ["movieRow", "users", "offsets"], "revision": revision})
+    _publish(directory, "ratings", table_dir)
+    return int(counts.sum())
+
+
+def save_links(links, directory):
+    """
+    Salva i link verso IMDb e TMDb come int32 (-1 per i valori mancanti).
+
+    Args:
+        links (DataFrame): DataFrame dei link.
+        directory (str): Cartella del formato colonnare.
+    """
+    save_table(directory, "links", {
+        "movieId": _downcast_int(links["movieId"]),
+        "imdbId": _nullable_int(links["imdbId"]),
+        "tmdbId": _nullable_int(links["tmdbId"]),
+    })
+
+
+def save_tags(tags, directory):
+    """
+    Salva i tag con ID int32 e testo del tag categorico.
+
+    Args:
+        tags (DataFrame): DataFrame dei tag.
+        directory (str): Cartella del formato colonnare.
+    """
+    tag_codes, tag_values = pd.factorize(tags["tag"].astype(str))
+    save_table(directory, "tags", {
+        "userId": _downcast_int(tags["userId"]),
+        "movieId": _downcast_int(tags["movieId"]),
+        "tag": tag_codes.astype(np.int32),
+        "timestamp": _downcast_int(tags["timestamp"]),
+    }, {"categories": {"tag": list(tag_values)}})
+
+
+def save_columnar(movies, ratings, links, tags, directory):
+    """
+    Salva tutti i dati processati nel formato colonnare.
+
+    Args:
+        movies (DataFrame): DataFrame dei film processati.
+        ratings (DataFrame): DataFrame dei rating.
+        links (DataFrame): DataFrame dei links.
+        tags (DataFrame): DataFrame dei tags.
+        directory (str): Cartella del formato colonnare.
+    """
+    logger.info(f"Salvataggio dei dati in formato colonnare in '{directory}'...")
+    save_movies(movies, directory)
+    save_ratings(ratings, movies["movieId"], directory)
+    save_links(links, directory)
+    save_tags(tags, directory)
+
+
+def _should_compact(directory, name):
+    """Indica se i segmenti accodati vanno fusi nella tabella: troppi, o troppe righe rispetto alla tabella."""
+    columns, meta, segments = load_table_with_segments(directory, name)
+    first = meta["columns"][0]
+    delta_rows = sum(len(segment[first]) for segment, _ in segments)
+    return len(segments) > MAX_SEGMENTS or delta_rows > SEGMENT_COMPACT_FRACTION * len(columns[first])
+
+
+def append_ratings(new_ratings, directory):
+    """
+    Aggiunge nuovi rating alla tabella colonnare esistente.
+
+    I nuovi rating vengono salvati come segmento, ordinati per utente, senza
+    leggere né riscrivere la tabella: `load_ratings` li fonde al caricamento.
+    Quando le righe dei segmenti superano SEGMENT_COMPACT_FRACTION della
+    tabella, tutto viene fuso e riscritto, per un costo ammortizzato
+    proporzionale ai nuovi rating.
+
+    Args:
+        new_ratings (DataFrame): Rating da aggiungere.
+        directory (str): Cartella del formato colonnare.
+    """
+    movies, _ = load_table(directory, "movies")
+    columns = _rating_columns(new_ratings, movies["movieId"])
+    append_segment(directory, "ratings", columns, {"aux": ["movieRow", "users", "offsets"]})
+    if _should_compact(directory, "ratings"):
+        logger.info("Fusione dei segmenti della tabella dei rating...")
+        save_table(directory, "ratings", load_ratings(directory, mmap_mode=None)[0],
+                   {"aux": ["movieRow", "users", "offsets"]})
+
+
+def append_tags(new_tags, directory):
+    """
+    Aggiunge nuovi tag alla tabella colonnare esistente, come segmento.
+
+    I codici dei tag proseguono le categorie della tabella e dei segmenti
+    precedenti; il segmento registra solo le categorie nuove.
+
+    Args:
+        new_tags (DataFrame): Tag da aggiungere.
+        directory (str): Cartella del formato colonnare.
+    """
+    _, meta, segments = load_table_with_segments(directory, "tags")
+    categories = list(meta["categories"]["tag"])
+    for _, segment_meta in segments:
+        categories += segment_meta["categories"]["tag"]
+    codes = {tag: code for code, tag in enumerate(categories)}
+    tag_codes = np.array([codes.setdefault(tag, len(codes)) for tag in new_tags["tag"].astype(str)], dtype=np.int32)
+    append_segment(directory, "tags", {
+        "userId": _downcast_int(new_tags["userId"]),
+        "movieId": _downcast_int(new_tags["movieId"]),
+        "tag": tag_codes,
+        "timestamp": _downcast_int(new_tags["timestamp"]),
+    }, {"categories": {"tag": list(codes)[len(categories):]}})
+    if _should_compact(directory, "tags"):
+        tags = load_frame(directory, "tags", mmap_mode=None)
+        tags["tag"] = tags["tag"].astype(str)
+        save_tags(tags, directory)
+
+
+def refresh_movie_rows(directory):
+    """
+    Ricalcola le posizioni nel catalogo dei rating (tabella e segmenti) dopo una modifica dei film.
+
+    Viene scritta una nuova revisione in cui solo la colonna delle posizioni
+    è nuova: le altre colonne sono collegamenti fisici a quelle della
+    revisione corrente, senza copiarle.
+
+    Args:
+        directory (str): Cartella del formato colonnare.
+    """
+    movies, _ = load_table(directory, "movies")
+    catalog = pd.Index(np.asarray(movies["movieId"]))
+    table_dir = _table_dir(directory, "ratings")
+    meta = load_meta(directory, "ratings")
+    revision_dir, _ = _new_revision(directory, "ratings")
+    for part in [""] + meta.get("segments", []):
+        source, target = os.path.join(table_dir, part), os.path.join(revision_dir, part)
+        os.makedirs(target, exist_ok=True)
+        for entry in os.listdir(source):
+            if entry.endswith(".npy") and entry != "movieRow.npy":
+                os.link(os.path.join(source, entry), os.path.join(target, entry))
+        movie_ids = np.load(os.path.join(source, "movieId.npy"), mmap_mode="r")
+        _save_column(target, "movieRow", catalog.get_indexer(movie_ids).astype(np.int32))
+        if part:
+            shutil.copyfile(os.path.join(source, META_FILE), os.path.join(target, META_FILE))
+    _write_meta(revision_dir, meta.pop("columns"), meta)
+    _publish(directory, "ratings", revision_dir)
+
+
+def load_ratings(directory, mmap_mode="r"):
+    """
+    Carica la tabella dei rating fondendo i segmenti accodati da `append_ratings`.
+
+    Senza segmenti le colonne sono mappate in memoria senza copie; altrimenti
+    i segmenti vengono fusi per utente (i rating accodati seguono quelli già
+    presenti dello stesso utente) e gli offset ricalcolati.
+
+    Args:
+        directory (str): Cartella del formato colonnare.
+        mmap_mode (str): Modalità di np.load.
+
+    Returns:
+        tuple: (colonne come dict nome -> ndarray, metadati).
+    """
+    columns, meta, segments = load_table_with_segments(directory, "ratings", mmap_mode)
+    if not segments:
+        return columns, meta
+    merged = {column: np.concatenate([columns[column]] + [segment[column] for segment, _ in segments])
+              for column in RATING_COLUMNS}
+    # Concatenazione di sequenze già ordinate: l'ordinamento stabile le fonde in tempo quasi lineare
+    order = np.argsort(merged["userId"], kind="stable")
+    merged = {column: values[order] for column, values in merged.items()}
+    user_ids, counts = np.unique(merged["userId"], return_counts=True)
+    merged["users"] = _downcast_int(user_ids)
+    merged["offsets"] = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+    return merged, meta
+
+
+def _load_merged(directory, name, mmap_mode):
+    """Carica una tabella con i segmenti accodati: righe concatenate e categorie estese."""
+    if name == "ratings":
+        return load_ratings(directory, mmap_mode)
+    columns, meta, segments = load_table_with_segments(directory, name, mmap_mode)
+    if not segments:
+        return columns, meta
+    meta = dict(meta, categories={column: list(values) for column, values in meta.get("categories", {}).items()})
+    for _, segment_meta in segments:
+        for column, values in segment_meta.get("categories", {}).items():
+            meta["categories"][column] += values
+    columns = {column: np.concatenate([values] + [segment[column] for segment, _ in segments])
+               for column, values in columns.items()}
+    return columns, meta
+
+
+def load_frame(directory, name, mmap_mode="r"):
+    """
+    Carica una tabella colonnare come DataFrame senza copiare le colonne numeriche.
+
+    Le colonne categoriche vengono restituite come `pd.Categorical`, le bitmask
+    dei generi come liste e gli array ausiliari (offset, utenti) sono esclusi.
+    Gli eventuali segmenti accodati vengono fusi.
+
+    Args:
+        directory (str): Cartella del formato colonnare.
+        name (str): Nome della tabella ('movies', 'ratings', 'links', 'tags').
+        mmap_mode (str): Modalità di np.load.
+
+    Returns:
+        DataFrame: La tabella.
+    """
+    columns, meta = _load_merged(directory, name, mmap_mode)
+    data = {}
+    for column, values in columns.items():
+        if column in meta.get("aux", []):
+            continue
+        if column in meta.get("categories", {}):
+            data[column] = pd.Categorical.from_codes(values, categories=meta["categories"][column])
+        elif column == "genres" and "genres" in meta:
+            data[column] = decode_genres(values, meta["genres"])
+        else:
+            data[column] = values
+    return pd.DataFrame(data, copy=False)
@@ -0,0 +1,188 @@
+import logging
+import os
+import re
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from neighbors import NeighborIndex, normalize_rows
+from scoring import split_genres
+
+logger = logging.getLogger(__name__)
+
+CONTENT_INDEX_PATH = os.getenv("CONTENT_INDEX_PATH", "data/processed/content_index/")
+CONTENT_TABLE = "content"
+CONTENT_NEIGHBORS = 50  # Vicini salvati per film
+TEXT_WEIGHT = 0.5  # Peso dell'abstract rispetto alle entità (regista, cast, generi)
+MIN_DOCUMENT_FREQUENCY = 2  # Le parole presenti in un solo abstract non avvicinano nessun film
+MAX_DOCUMENT_RATIO = 0.5  # Le parole presenti in più di metà degli abstract vengono ignorate
+
+# Campi con le entità del film: colonna -> prefisso della feature
+ENTITY_FIELDS = {"director": "director", "starring": "actor", "genre": "genre"}
+
+TOKEN_PATTERN = re.compile(r"[^\W\d_]{3,}")
+STOPWORDS = frozenset("""
+    the and for with that this from was were are his her its their they them who whom which
+    into about after before while when where than then also has have had not but all one two
+    film movie directed stars starring written produced released american based story
+""".split())
+
+
+def tokenize(text):
+    """
+    Divide un testo in parole minuscole, escludendo numeri, parole brevi e stopword.
+
+    Args:
+        text (str): Testo (valori non stringa producono una lista vuota).
+
+    Returns:
+        list: Le parole.
+    """
+    if not isinstance(text, str):
+        return []
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def split_entities(value):
+    """
+    Normalizza un campo di entità (stringa separata da '|' o lista) in una lista di nomi.
+
+    Gli URI di DBpedia vengono ridotti all'ultima parte del percorso.
+    """
+    if isinstance(value, str):
+        value = value.split('|')
+    elif not isinstance(value, list):
+        return []
+    names = (str(item).rsplit("/", 1)[-1].replace("_", " ").strip().lower() for item in value)
+    return [name for name in names if name]
+
+
+def tfidf_matrix(documents, min_df=1, max_df_ratio=1.0):
+    """
+    Costruisce la matrice TF-IDF sparsa (documenti x termini) da liste di termini.
+
+    Usa il tf sublineare (1 + log tf) e l'idf smussato log((1 + n) / (1 + df)) + 1;
+    le righe sono normalizzate a norma L2 unitaria.
+
+    Args:
+        documents (list): Termini di ogni documento.
+        min_df (int): Numero minimo di documenti che contengono un termine.
+        max_df_ratio (float): Frazione massima di documenti che contengono un termine.
+
+    Returns:
+        tuple: (csr_matrix float32, vocabolario dei termini in ordine di colonna).
+    """
+    vocabulary = {}
+    indptr, indices = [0], []
+    for terms in documents:
+        indices.extend(vocabulary.setdefault(term, len(vocabulary)) for term in terms)
+        indptr.append(len(indices))
+    counts = sparse.csr_matrix((np.ones(len(indices), dtype=np.float32), np.asarray(indices, dtype=np.int64),
+                                np.asarray(indptr, dtype=np.int64)), shape=(len(documents), len(vocabulary)))
+    counts.sum_duplicates()
+
+    n_documents = counts.shape[0]
+    document_frequency = np.bincount(counts.indices, minlength=counts.shape[1])
+    keep = (document_frequency >= min_df) & (document_frequency <= max(max_df_ratio * n_documents, min_df))
+    columns = np.flatnonzero(keep)
+    counts = counts[:, columns]
+    counts.data = 1.0 + np.log(counts.data)
+    idf = np.log((1.0 + n_documents) / (1.0 + document_frequency[columns])) + 1.0
+    terms = np.array(list(vocabulary), dtype=object)[columns] if len(vocabulary) else np.array([], dtype=object)
+    return normalize_rows(counts @ sparse.diags(idf.astype(np.float32))), list(terms)
+
+
+def movie_entities(movies):
+    """
+    Raccoglie le entità di ogni film: regista, attori e generi DBpedia, più i generi MovieLens.
+
+    Args:
+        movies (DataFrame): DataFrame dei film.
+
+    Returns:
+        list: Entità di ogni film, come stringhe 'prefisso:nome'.
+    """
+    entities = [[f"genre:{genre.lower()}" for genre in split_genres(genres) if genre != "(no genres listed)"]
+                for genres in movies["genres"]]
+    for column, prefix in ENTITY_FIELDS.items():
+        if column in movies.columns:
+            for values, names in zip(entities, movies[column]):
+                values.extend(f"{prefix}:{name}" for name in split_entities(names))
+    return entities
+
+
+def content_features(movies, text_weight=TEXT_WEIGHT):
+    """
+    Costruisce i vettori di contenuto dei film: TF-IDF dell'abstract affiancato alle entità pesate per IDF.
+
+    Le due parti sono normalizzate separatamente e pesate con `text_weight`;
+    i film senza abstract sono descritti solo dalle entità.
+
+    Args:
+        movies (DataFrame): DataFrame dei film (colonne opzionali 'abstract', 'director', 'starring', 'genre').
+        text_weight (float): Peso dell'abstract (le entità pesano 1 - text_weight).
+
+    Returns:
+        csr_matrix: Matrice film x feature.
+    """
+    abstracts = movies["abstract"] if "abstract" in movies.columns else [None] * len(movies)
+    text, vocabulary = tfidf_matrix([tokenize(a) for a in abstracts], MIN_DOCUMENT_FREQUENCY, MAX_DOCUMENT_RATIO)
+    entities, names = tfidf_matrix(movie_entities(movies))
+    logger.info(f"Feature di contenuto: {len(vocabulary)} parole degli abstract, {len(names)} entità.")
+    return sparse.hstack([text * np.float32(text_weight), entities * np.float32(1.0 - text_weight)],
+                         format="csr", dtype=np.float32)
+
+
+def build_content_index(movies, n_neighbors=CONTENT_NEIGHBORS, text_weight=TEXT_WEIGHT, n_workers=None):
+    """
+    Precalcola i film più simili per contenuto di ogni film del catalogo.
+
+    Args:
+        movies (DataFrame): DataFrame dei film.
+        n_neighbors (int): Vicini per film.
+        text_weight (float): Peso dell'abstract rispetto alle entità.
+        n_workers (int): Numero di processi (default: numero di CPU).
+
+    Returns:
+        NeighborIndex: L'indice dei vicini.
+    """
+    features = content_features(movies, text_weight)
+    return NeighborIndex.from_matrix(movies["movieId"].to_numpy(), features, n_neighbors, n_workers=n_workers)
+
+
+def load_content_index(directory=CONTENT_INDEX_PATH):
+    """Carica l'indice di contenuto salvato, mappato in memoria."""
+    return NeighborIndex.load(directory, CONTENT_TABLE)
+
+
+def similar_movies(movie_id, index, movies=None, n=10):
+    """
+    Film più simili per contenuto a un film ("more like this").
+
+    Args:
+        movie_id (int): ID del film.
+        index (NeighborIndex): Indice di contenuto.
+        movies (DataFrame): DataFrame dei film, per aggiungere i titoli.
+        n (int): Numero di film.
+
+    Returns:
+        DataFrame: Colonne 'movieId', 'similarity' ed eventualmente 'title'.
+    """
+    movie_ids, similarities = index.similar(movie_id, n)
+    result = pd.DataFrame({"movieId": movie_ids, "similarity": similarities})
+    if movies is not None:
+        titles = movies.set_index("movieId")["title"]
+        result.insert(1, "title", titles.reindex(movie_ids).to_numpy())
+    return result
+
+
+if __name__ == "__main__":
+    from recommender import load_raw_data
+
+    logging.basicConfig(level=logging.INFO)
+    movies, _ = load_raw_data()
+    index = build_content_index(movies)
+    index.save(CONTENT_INDEX_PATH, CONTENT_TABLE)
+    logger.info(f"Indice di contenuto salvato in {CONTENT_INDEX_PATH} ({len(index)} film).")
+    print(similar_movies(movies["movieId"].iloc[0], index, movies))
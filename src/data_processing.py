@@ -1,19 +1,25 @@
 import pandas as pd
 import os
 import logging
-from dotenv import load_dotenv
+import sys
+import columnar
+import fingerprints
+import recommendation_cache
+import streaming
+import tag_index
 
-# Configurazione del logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Carica variabili d'ambiente
-load_dotenv()
-
-# Percorsi dei dati (configurabili tramite variabili d'ambiente)
+# Percorsi dei dati (configurabili tramite variabili d'ambiente o il file .env letto dalla CLI)
 DATA_PATH = os.getenv("DATA_PATH", "data/")
 RAW_DATA_PATH = os.getenv("RAW_DATA_PATH", os.path.join(DATA_PATH, "raw/"))
 PROCESSED_DATA_PATH = os.getenv("PROCESSED_DATA_PATH", os.path.join(DATA_PATH, "processed/"))
+COLUMNAR_DATA_PATH = os.getenv("COLUMNAR_DATA_PATH", os.path.join(PROCESSED_DATA_PATH, "columnar/"))
+FINGERPRINTS_PATH = os.path.join(PROCESSED_DATA_PATH, "fingerprints.json")
+TAG_INDEX_PATH = os.getenv("TAG_INDEX_PATH", os.path.join(PROCESSED_DATA_PATH, "tag_index/"))
+RESULT_CACHE_PATH = recommendation_cache.RESULT_CACHE_PATH  # Cache condivisa dei risultati da invalidare
+
+RAW_FILES = ("movies.csv", "ratings.csv", "links.csv", "tags.csv")
 
 def ensure_directory_exists(directory):
     """
@@ -26,19 +32,53 @@ def ensure_directory_exists(directory):
         os.makedirs(directory)
         logger.info(f"Creata la directory: {directory}")
 
-def load_raw_data():
+def fingerprint_raw_files():
+    """
+    Prende le impronte dei file raw prima di leggerli.
+
+    Le letture successive si fermano alla dimensione registrata, per cui le
+    righe accodate durante l'elaborazione restano per l'esecuzione successiva.
+
+    Returns:
+        dict: Impronte per nome di file.
+    """
+    return {name: fingerprints.fingerprint_file(os.path.join(RAW_DATA_PATH, name)) for name in RAW_FILES}
+
+def read_raw_csv(name, state=None, **read_csv_kwargs):
+    """
+    Legge un file raw fino alla dimensione registrata nella sua impronta.
+
+    Args:
+        name (str): Nome del file raw.
+        state (dict): Impronte prese con `fingerprint_raw_files` (default: tutto il file).
+        **read_csv_kwargs: Argomenti aggiuntivi per `pd.read_csv`.
+
+    Returns:
+        DataFrame: Il contenuto del file.
+    """
+    end = state[name]["size"] if state else None
+    with fingerprints.open_rows(os.path.join(RAW_DATA_PATH, name), 0, end) as f:
+        return pd.read_csv(f, **read_csv_kwargs)
+
+def load_raw_data(state=None, include_ratings=True):
     """
     Carica i file CSV raw dai percorsi specificati.
     
+    Args:
+        state (dict): Impronte dei file raw: ogni file viene letto fino alla dimensione registrata.
+        include_ratings (bool): Se False i rating non vengono letti (saranno elaborati in streaming).
+
     Returns:
-        tuple: Quattro DataFrame (movies, ratings, links, tags).
+        tuple: Quattro DataFrame (movies, ratings, links, tags); ratings è None se non letto.
     """
     try:
         logger.info("Caricamento dei dati raw dai file CSV...")
-        movies = pd.read_csv(os.path.join(RAW_DATA_PATH, "movies.csv"))
-        ratings = pd.read_csv(os.path.join(RAW_DATA_PATH, "ratings.csv"))
-        links = pd.read_csv(os.path.join(RAW_DATA_PATH, "links.csv"))
-        tags = pd.read_csv(os.path.join(RAW_DATA_PATH, "tags.csv"))
+        movies = read_raw_csv("movies.csv", state)
+        ratings = None
+        if include_ratings:
+            ratings = read_raw_csv("ratings.csv", state, dtype=columnar.RATINGS_DTYPES)
+        links = read_raw_csv("links.csv", state)
+        tags = read_raw_csv("tags.csv", state, dtype=columnar.TAGS_DTYPES)
         logger.info("Dati raw caricati con successo.")
         return movies, ratings, links, tags
     except FileNotFoundError as e:
@@ -70,43 +110,229 @@ def process_movies_data(movies):
         logger.error(f"Errore imprevisto durante l'elaborazione dei dati dei film: {e}")
         raise
 
-def save_processed_data(movies, ratings, links, tags):
+def stream_processed_ratings(scorer, end=None):
+    """
+    Elabora 'ratings.csv' a blocchi di memoria limitata (STREAMING_MEMORY_BUDGET).
+
+    In un'unica lettura ogni blocco viene accodato al CSV processato e alla
+    tabella colonnare e aggiunto alle statistiche aggregate. I rating devono
+    essere ordinati per utente, come nel `ratings.csv` di MovieLens.
+
+    Args:
+        scorer (GenreScorer): Motore dei generi del catalogo.
+        end (int): Byte del file da elaborare (default: tutto il file).
+
+    Returns:
+        RatingsAggregate: Le statistiche dei rating.
     """
-    Salva i dati processati nella cartella 'processed'.
+    processed_path = os.path.join(PROCESSED_DATA_PATH, "ratings_processed.csv")
+    aggregate = streaming.RatingsAggregate(scorer)
+
+    def chunks():
+        reader = streaming.read_rating_chunks(os.path.join(RAW_DATA_PATH, "ratings.csv"), len(scorer.genres),
+                                              streaming.STREAMING_MEMORY_BUDGET, end)
+        for i, chunk in enumerate(reader):
+            chunk.to_csv(processed_path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+            aggregate.update(chunk)
+            yield chunk
+
+    columnar.save_ratings_blocks(chunks(), scorer.movie_ids, COLUMNAR_DATA_PATH)
+    return aggregate.finalize()
+
+def save_processed_data(movies, ratings, links, tags, ratings_size=None):
+    """
+    Salva i dati processati nella cartella 'processed', in CSV e in formato colonnare, e l'indice dei tag.
+
+    Insieme ai rating vengono salvate le statistiche aggregate (profili dei
+    generi degli utenti e statistiche dei film). Gli errori vengono propagati,
+    così le impronte dei file raw non vengono salvate per dati non scritti.
     
     Args:
         movies (DataFrame): DataFrame dei film processati.
-        ratings (DataFrame): DataFrame dei ratings.
+        ratings (DataFrame): DataFrame dei ratings; se None, 'ratings.csv' viene elaborato in streaming.
         links (DataFrame): DataFrame dei links.
         tags (DataFrame): DataFrame dei tags.
+        ratings_size (int): Byte di 'ratings.csv' da elaborare in streaming (default: tutto il file).
     """
     try:
         ensure_directory_exists(PROCESSED_DATA_PATH)
         logger.info("Salvataggio dei dati processati...")
         movies.to_csv(os.path.join(PROCESSED_DATA_PATH, "movies_processed.csv"), index=False)
-        ratings.to_csv(os.path.join(PROCESSED_DATA_PATH, "ratings_processed.csv"), index=False)
         links.to_csv(os.path.join(PROCESSED_DATA_PATH, "links_processed.csv"), index=False)
         tags.to_csv(os.path.join(PROCESSED_DATA_PATH, "tags_processed.csv"), index=False)
+        logger.info(f"Salvataggio dei dati in formato colonnare in '{COLUMNAR_DATA_PATH}'...")
+        columnar.save_movies(movies, COLUMNAR_DATA_PATH)
+        columnar.save_links(links, COLUMNAR_DATA_PATH)
+        columnar.save_tags(tags, COLUMNAR_DATA_PATH)
+        scorer = columnar.load_genre_scorer(COLUMNAR_DATA_PATH)
+        if ratings is None:
+            stats = stream_processed_ratings(scorer, ratings_size)
+        else:
+            ratings.to_csv(os.path.join(PROCESSED_DATA_PATH, "ratings_processed.csv"), index=False)
+            columnar.save_ratings(ratings, movies["movieId"], COLUMNAR_DATA_PATH)
+            stats = streaming.aggregate_ratings(ratings, scorer)
+        stats.save(COLUMNAR_DATA_PATH)
+        tag_index.TagIndex.from_frame(tags).save(TAG_INDEX_PATH)
         logger.info("Dati processati salvati con successo.")
     except Exception as e:
         logger.error(f"Errore durante il salvataggio dei dati processati: {e}")
         raise
 
-def run_data_processing():
+def update_ratings_stats(changes, state, new_ratings=None, stats=None):
+    """
+    Aggiorna le statistiche aggregate dei rating dopo un'elaborazione incrementale.
+
+    I rating accodati vengono aggiunti alle statistiche salvate; se sono
+    cambiati i film o i rating già elaborati, le statistiche vengono
+    ricalcolate leggendo 'ratings.csv' in streaming.
+
+    Args:
+        changes (dict): Tipo di modifica di ogni file raw.
+        state (dict): Impronte dei file raw prese prima della lettura.
+        new_ratings (DataFrame): Rating accodati (se presenti).
+        stats (RatingsAggregate): Statistiche già ricalcolate con i rating rielaborati (se presenti).
+    """
+    if stats is not None:
+        stats.save(COLUMNAR_DATA_PATH)
+        return
+    scorer = columnar.load_genre_scorer(COLUMNAR_DATA_PATH)
+    rebuild = (changes["movies.csv"] != fingerprints.UNCHANGED
+               or changes["ratings.csv"] not in (fingerprints.UNCHANGED, fingerprints.APPENDED)
+               or not columnar.has_table(COLUMNAR_DATA_PATH, streaming.USER_PROFILES_TABLE))
+    if rebuild:
+        stats = streaming.stream_ratings(os.path.join(RAW_DATA_PATH, "ratings.csv"), scorer,
+                                         streaming.STREAMING_MEMORY_BUDGET, state["ratings.csv"]["size"])
+    elif new_ratings is not None:
+        stats = streaming.RatingsAggregate.load(COLUMNAR_DATA_PATH, scorer)
+        stats.update(new_ratings)
+        stats.finalize()
+    else:
+        return
+    stats.save(COLUMNAR_DATA_PATH)
+
+def save_fingerprints(state):
+    """
+    Salva le impronte dei file raw elaborati, da chiamare dopo aver scritto tutti i dati processati.
+
+    Args:
+        state (dict): Impronte prese con `fingerprint_raw_files` prima della lettura:
+            la dimensione registrata è il byte fino a cui i file sono stati elaborati.
+    """
+    fingerprints.save_state(FINGERPRINTS_PATH, state)
+
+def append_processed_rows(new_rows, name):
+    """
+    Accoda nuove righe al CSV processato e alla tabella colonnare corrispondenti
+    e invalida nella cache condivisa dei risultati gli utenti delle righe.
+    
+    Args:
+        new_rows (DataFrame): Righe da aggiungere.
+        name (str): Nome della tabella ('ratings' o 'tags').
+    """
+    new_rows.to_csv(os.path.join(PROCESSED_DATA_PATH, f"{name}_processed.csv"), mode="a", header=False, index=False)
+    if name == "ratings":
+        columnar.append_ratings(new_rows, COLUMNAR_DATA_PATH)
+    else:
+        columnar.append_tags(new_rows, COLUMNAR_DATA_PATH)
+        tag_index.update_tag_index(new_rows, TAG_INDEX_PATH)
+    recommendation_cache.invalidate_shared_users(new_rows["userId"], RESULT_CACHE_PATH)
+
+def run_incremental_processing():
+    """
+    Elabora solo ciò che è cambiato nei file raw dall'ultima esecuzione.
+
+    I nuovi rating e tag accodati a 'ratings.csv' e 'tags.csv' vengono letti
+    a partire dall'ultimo byte elaborato e accodati ai dati processati; i film
+    e i link vengono rielaborati solo se il rispettivo file è cambiato.
+    Qualsiasi altra modifica comporta la rielaborazione del singolo file.
+    Ogni file viene letto fino alla dimensione registrata prima della lettura
+    e le nuove impronte vengono salvate solo dopo aver scritto tutti i dati.
+    
+    Returns:
+        dict: Tipo di modifica rilevato per ogni file raw.
+    """
+    state = fingerprints.load_state(FINGERPRINTS_PATH)
+    current = fingerprint_raw_files()
+    changes = {name: fingerprints.detect_change(os.path.join(RAW_DATA_PATH, name), state.get(name), current[name])
+               for name in RAW_FILES}
+    logger.info(f"Modifiche rilevate nei file raw: {changes}")
+
+    if changes["movies.csv"] != fingerprints.UNCHANGED:
+        movies = process_movies_data(read_raw_csv("movies.csv", current))
+        movies.to_csv(os.path.join(PROCESSED_DATA_PATH, "movies_processed.csv"), index=False)
+        columnar.save_movies(movies, COLUMNAR_DATA_PATH)
+        if changes["ratings.csv"] in (fingerprints.UNCHANGED, fingerprints.APPENDED):
+            columnar.refresh_movie_rows(COLUMNAR_DATA_PATH)
+
+    if changes["links.csv"] != fingerprints.UNCHANGED:
+        links = read_raw_csv("links.csv", current)
+        links.to_csv(os.path.join(PROCESSED_DATA_PATH, "links_processed.csv"), index=False)
+        columnar.save_links(links, COLUMNAR_DATA_PATH)
+
+    dtypes = {"ratings": columnar.RATINGS_DTYPES, "tags": columnar.TAGS_DTYPES}
+    new_ratings = stats = None
+    for name in ("ratings", "tags"):
+        raw_path = os.path.join(RAW_DATA_PATH, f"{name}.csv")
+        change = changes[f"{name}.csv"]
+        if change == fingerprints.APPENDED:
+            new_rows = fingerprints.read_appended_rows(raw_path, state[f"{name}.csv"]["size"],
+                                                       current[f"{name}.csv"]["size"], dtype=dtypes[name])
+            logger.info(f"Elaborazione di {len(new_rows)} nuove righe di '{name}.csv'...")
+            append_processed_rows(new_rows, name)
+            if name == "ratings":
+                new_ratings = new_rows
+        elif name == "ratings" and change != fingerprints.UNCHANGED:
+            # Come nell'elaborazione completa: oltre il budget di memoria i rating vengono letti a blocchi
+            scorer = columnar.load_genre_scorer(COLUMNAR_DATA_PATH)
+            size = current["ratings.csv"]["size"]
+            if size > streaming.STREAMING_MEMORY_BUDGET:
+                stats = stream_processed_ratings(scorer, size)
+            else:
+                frame = read_raw_csv("ratings.csv", current, dtype=dtypes[name])
+                frame.to_csv(os.path.join(PROCESSED_DATA_PATH, "ratings_processed.csv"), index=False)
+                columnar.save_ratings(frame, scorer.movie_ids, COLUMNAR_DATA_PATH)
+                stats = streaming.aggregate_ratings(frame, scorer)
+        elif change != fingerprints.UNCHANGED:
+            frame = read_raw_csv(f"{name}.csv", current, dtype=dtypes[name])
+            frame.to_csv(os.path.join(PROCESSED_DATA_PATH, f"{name}_processed.csv"), index=False)
+            columnar.save_tags(frame, COLUMNAR_DATA_PATH)
+            tag_index.TagIndex.from_frame(frame).save(TAG_INDEX_PATH)
+
+    update_ratings_stats(changes, current, new_ratings, stats)
+    save_fingerprints(current)
+    return changes
+
+def run_data_processing(incremental=False):
     """
     Funzione principale per caricare, processare e salvare i dati.
+
+    Args:
+        incremental (bool): Se True elabora solo le modifiche rispetto all'ultima
+            esecuzione (se esiste uno stato precedente con dati processati).
     """
     try:
         logger.info("Avvio del processo di elaborazione dei dati...")
-        movies, ratings, links, tags = load_raw_data()
+        if incremental and os.path.exists(FINGERPRINTS_PATH) and columnar.has_table(COLUMNAR_DATA_PATH, "ratings"):
+            run_incremental_processing()
+            logger.info("Elaborazione incrementale completata con successo.")
+            return
+
+        state = fingerprint_raw_files()
+        # Oltre il budget di memoria i rating vengono elaborati a blocchi invece che caricati interi
+        ratings_size = state["ratings.csv"]["size"]
+        movies, ratings, links, tags = load_raw_data(
+            state, include_ratings=ratings_size <= streaming.STREAMING_MEMORY_BUDGET)
 
         movies = process_movies_data(movies)
 
-        save_processed_data(movies, ratings, links, tags)
+        save_processed_data(movies, ratings, links, tags, ratings_size)
+        save_fingerprints(state)
         logger.info("Processo di elaborazione completato con successo.")
     except Exception as e:
         logger.error(f"Errore durante il processo di elaborazione dei dati: {e}")
         raise
 
 if __name__ == "__main__":
-    run_data_processing()
+    # Stessa esecuzione di `filminsight process`, che configura logging e variabili d'ambiente
+    from cli import main
+    sys.exit(main(["process"] + sys.argv[1:]))
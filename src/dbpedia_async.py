@@ -0,0 +1,297 @@
+import asyncio
+import email.utils
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import instrumentation
+
+logger = logging.getLogger(__name__)
+
+
+def parse_retry_after(value):
+    """
+    Interpreta l'header HTTP Retry-After.
+
+    Args:
+        value (str): Valore dell'header (secondi o data HTTP).
+
+    Returns:
+        float: Secondi di attesa, oppure None se l'header è assente o non valido.
+    """
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(retry_at.timestamp() - time.time(), 0.0)
+
+
+class TokenBucket:
+    """
+    Limitatore di frequenza a token bucket.
+
+    I token si ricaricano a `rate` al secondo fino a `capacity`; ogni richiesta
+    ne consuma uno. `pause` sospende l'emissione di token (ad esempio per
+    rispettare un Retry-After del server).
+    """
+
+    def __init__(self, rate, capacity=None):
+        """
+        Args:
+            rate (float): Richieste al secondo consentite a regime.
+            capacity (float): Raffica massima (default: `rate`, almeno 1).
+        """
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        """Attende finché un token è disponibile e lo consuma."""
+        while True:
+            now = time.monotonic()
+            if now < self._paused_until:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+            self._refill(now)
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds):
+        """
+        Sospende l'emissione di token per il tempo indicato.
+
+        Args:
+            seconds (float): Durata della pausa in secondi.
+        """
+        now = time.monotonic()
+        self._paused_until = max(self._paused_until, now + seconds)
+        self._tokens = 0.0
+        self._updated = now
+
+
+class AdaptiveConcurrency:
+    """
+    Limite adattivo delle richieste in corso (AIMD).
+
+    Il limite cresce di circa una unità per ogni finestra di richieste
+    riuscite entro la latenza obiettivo, cala del 10% se la latenza supera
+    l'obiettivo e si dimezza a ogni errore 429 o di rete.
+    """
+
+    def __init__(self, initial=4, minimum=1, maximum=32, target_latency=2.0):
+        """
+        Args:
+            initial (int): Limite iniziale.
+            minimum (int): Limite minimo.
+            maximum (int): Limite massimo.
+            target_latency (float): Latenza (secondi) oltre la quale il limite viene ridotto.
+        """
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+        self._in_flight = 0
+        self._condition = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._in_flight < int(self.limit))
+            self._in_flight += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        async with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    async def _set_limit(self, limit):
+        async with self._condition:
+            self.limit = min(max(limit, self.minimum), self.maximum)
+            self._condition.notify_all()
+
+    async def record_success(self, latency):
+        """Aggiorna il limite dopo una richiesta riuscita."""
+        if latency <= self.target_latency:
+            await self._set_limit(self.limit + 1.0 / self.limit)
+        else:
+            await self._set_limit(self.limit * 0.9)
+
+    async def record_throttle(self):
+        """Dimezza il limite dopo un 429 o un errore del server."""
+        await self._set_limit(self.limit / 2)
+
+
+class SparqlClient:
+    """
+    Client HTTP per un endpoint SPARQL con connessioni persistenti (keep-alive).
+
+    Le connessioni sono condivise tramite un pool di `requests.Session`, per
+    cui le richieste successive riutilizzano le stesse connessioni TCP.
+    """
+
+    def __init__(self, endpoint, pool_size=16, timeout=60.0):
+        """
+        Args:
+            endpoint (str): URL dell'endpoint SPARQL.
+            pool_size (int): Numero massimo di connessioni aperte.
+            timeout (float): Timeout di ogni richiesta in secondi.
+        """
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"Accept": "application/sparql-results+json"})
+
+    def post(self, query):
+        """
+        Esegue una query SPARQL.
+
+        Args:
+            query (str): Testo della query.
+
+        Returns:
+            tuple: (codice HTTP, header della risposta, binding se la risposta è 200 altrimenti None).
+        """
+        response = self.session.post(self.endpoint, data={"query": query}, timeout=self.timeout)
+        bindings = None
+        if response.status_code == 200:
+            bindings = response.json().get("results", {}).get("bindings", [])
+        return response.status_code, response.headers, bindings
+
+    def close(self):
+        self.session.close()
+
+
+class PipelineStats:
+    """Contatori di una esecuzione della pipeline."""
+
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0
+        self.errors = 0
+        self.completed_batches = 0
+        self.failed_batches = 0
+        self.cache_hits = 0
+        self.keys = 0
+        self.latencies = []
+
+    def add(self, other):
+        """Somma i contatori di un'altra esecuzione (es. quella delle ricerche di ripiego)."""
+        for name in ("requests", "retries", "throttled", "errors", "completed_batches", "failed_batches"):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        self.latencies.extend(other.latencies)
+
+    def as_dict(self):
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "errors": self.errors,
+            "completed_batches": self.completed_batches,
+            "failed_batches": self.failed_batches,
+            "cache_hits": self.cache_hits,
+            "keys": self.keys,
+        }
+
+
+async def run_pipeline(batches, build_query, on_result, endpoint, rate=5.0, initial_concurrency=4,
+                       max_concurrency=16, target_latency=2.0, max_retries=5, timeout=60.0):
+    """
+    Esegue le query dei batch in modo asincrono, con limite di frequenza e concorrenza adattiva.
+
+    Ogni batch viene passato a `on_result` appena la sua query termina, così i
+    risultati confluiscono in cache man mano. Sui 429 la pipeline rispetta il
+    Retry-After del server (sospendendo il token bucket per tutti i batch) e
+    riduce la concorrenza; errori di rete e 5xx vengono ritentati con backoff
+    esponenziale. I batch che falliscono definitivamente non vengono passati a `on_result`.
+
+    Args:
+        batches (list): Batch di elementi da interrogare.
+        build_query (callable): Funzione batch -> query SPARQL.
+        on_result (callable): Funzione (batch, binding) chiamata per ogni batch riuscito.
+        endpoint (str): URL dell'endpoint SPARQL.
+        rate (float): Richieste al secondo consentite.
+        initial_concurrency (int): Richieste contemporanee iniziali.
+        max_concurrency (int): Richieste contemporanee massime.
+        target_latency (float): Latenza obiettivo in secondi.
+        max_retries (int): Tentativi aggiuntivi per batch.
+        timeout (float): Timeout di ogni richiesta in secondi.
+
+    Returns:
+        PipelineStats: Statistiche dell'esecuzione.
+    """
+    loop = asyncio.get_running_loop()
+    stats = PipelineStats()
+    bucket = TokenBucket(rate)
+    limiter = AdaptiveConcurrency(initial_concurrency, maximum=max_concurrency, target_latency=target_latency)
+    client = SparqlClient(endpoint, pool_size=max_concurrency, timeout=timeout)
+    executor = ThreadPoolExecutor(max_workers=max_concurrency)
+
+    async def run_batch(batch):
+        query = build_query(batch)
+        for attempt in range(max_retries + 1):
+            async with limiter:
+                await bucket.acquire()
+                started = time.monotonic()
+                stats.requests += 1
+                try:
+                    status, headers, bindings = await loop.run_in_executor(executor, client.post, query)
+                except (requests.RequestException, ValueError) as e:
+                    logger.warning(f"Errore di rete durante la query batch: {e}")
+                    status, headers, bindings = None, {}, None
+                latency = time.monotonic() - started
+            instrumentation.observe("dbpedia_request_seconds", latency, status=str(status or "error"))
+
+            if status == 200:
+                stats.latencies.append(latency)
+                await limiter.record_success(latency)
+                on_result(batch, bindings)
+                stats.completed_batches += 1
+                return
+            if status is not None and status != 429 and status < 500:
+                logger.error(f"Query batch rifiutata dall'endpoint (HTTP {status}).")
+                break
+
+            backoff = min(2 ** attempt, 30) * (0.5 + random.random())
+            if status == 429:
+                stats.throttled += 1
+                delay = parse_retry_after(headers.get("Retry-After"))
+                delay = backoff if delay is None else delay
+                bucket.pause(delay)
+                logger.warning(f"Troppe richieste (429), pausa di {delay:.1f} secondi...")
+            else:
+                stats.errors += 1
+                delay = backoff
+            await limiter.record_throttle()
+            if attempt < max_retries:
+                stats.retries += 1
+                await asyncio.sleep(delay)
+        stats.failed_batches += 1
+
+    try:
+        await asyncio.gather(*(run_batch(batch) for batch in batches))
+    finally:
+        executor.shutdown(wait=False)
+        client.close()
+    return stats
@@ -0,0 +1,258 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Valore restituito da `get` quando la chiave non è in cache (o è scaduta)
+MISSING = object()
+
+
+class CacheBackend:
+    """
+    Interfaccia comune delle cache dei risultati DBpedia.
+
+    Ogni voce ha una scadenza opzionale; le voci negative (valore None)
+    registrano i titoli per cui DBpedia non ha restituito risultati, così da
+    non interrogarli di nuovo fino alla scadenza.
+    """
+
+    def get(self, key):
+        """
+        Restituisce il valore associato alla chiave.
+
+        Args:
+            key (str): Chiave della voce.
+
+        Returns:
+            Il valore, None per una voce negativa, MISSING se la voce non esiste o è scaduta.
+        """
+        raise NotImplementedError
+
+    def set(self, key, value, ttl=None):
+        """
+        Scrive una voce (non ancora confermata fino a `commit`).
+
+        Args:
+            key (str): Chiave della voce.
+            value: Valore serializzabile in JSON (None per una voce negativa).
+            ttl (float): Durata in secondi (None = nessuna scadenza).
+        """
+        raise NotImplementedError
+
+    def set_many(self, items, ttl=None):
+        """
+        Scrive più voci con la stessa scadenza.
+
+        Args:
+            items (iterable): Coppie (chiave, valore).
+            ttl (float): Durata in secondi (None = nessuna scadenza).
+        """
+        for key, value in items:
+            self.set(key, value, ttl)
+
+    def commit(self):
+        """Rende persistenti le scritture effettuate."""
+        raise NotImplementedError
+
+    def close(self):
+        """Conferma le scritture e rilascia le risorse."""
+        self.commit()
+
+    def __contains__(self, key):
+        return self.get(key) is not MISSING
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class SQLiteCache(CacheBackend):
+    """
+    Cache su SQLite: ricerche O(1) per chiave senza caricare il file in memoria.
+
+    Il database usa il journal WAL, per cui più processi possono leggere e
+    scrivere la stessa cache senza corromperla, e ogni `commit` è atomico: in
+    caso di interruzione si perdono al più le scritture non confermate.
+    """
+
+    def __init__(self, path, timeout=30.0):
+        """
+        Apre (o crea) la cache.
+
+        Args:
+            path (str): Percorso del database.
+            timeout (float): Secondi di attesa se il database è bloccato da un altro processo.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT,"
+            " expires_at REAL)"
+        )
+        self._conn.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or (row[1] is not None and row[1] < time.time()):
+            return MISSING
+        return None if row[0] is None else json.loads(row[0])
+
+    def set(self, key, value, ttl=None):
+        self.set_many([(key, value)], ttl)
+
+    def set_many(self, items, ttl=None):
+        expires_at = None if ttl is None else time.time() + ttl
+        rows = [(key, None if value is None else json.dumps(value), expires_at) for key, value in items]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO entries (key, value, expires_at) VALUES (?, ?, ?)", rows
+            )
+
+    def commit(self):
+        with self._lock:
+            self._conn.commit()
+
+    def close(self):
+        self.commit()
+        with self._lock:
+            self._conn.close()
+
+    def purge_expired(self):
+        """
+        Elimina le voci scadute.
+
+        Returns:
+            int: Numero di voci eliminate.
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM entries WHERE expires_at IS NOT NULL AND expires_at < ?", (time.time(),)
+            )
+            self._conn.commit()
+        return cursor.rowcount
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+
+class JsonCache(CacheBackend):
+    """
+    Cache compatibile con il vecchio file JSON (un dizionario titolo -> risultato).
+
+    L'intero file viene caricato in memoria e riscritto a ogni `commit`: è
+    adatto solo a cache piccole o alla migrazione verso `SQLiteCache`.
+    Le voci del vecchio formato non hanno scadenza.
+    """
+
+    def __init__(self, path):
+        """
+        Carica la cache dal file JSON, se esiste.
+
+        Args:
+            path (str): Percorso del file JSON.
+        """
+        self.path = path
+        self._entries = {}
+        self._dirty = False
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    content = f.read().strip()
+                self._entries = json.loads(content) if content else {}
+                logger.info(f"Cache caricata: {len(self._entries)} voci")
+            except json.JSONDecodeError as e:
+                logger.error(f"Errore nel caricamento della cache: {e}. Il file potrebbe essere danneggiato.")
+
+    def get(self, key):
+        if key not in self._entries:
+            return MISSING
+        entry = self._entries[key]
+        if isinstance(entry, dict) and "__expires_at__" in entry:
+            if entry["__expires_at__"] is not None and entry["__expires_at__"] < time.time():
+                return MISSING
+            return entry["value"]
+        return entry
+
+    def set(self, key, value, ttl=None):
+        if ttl is None and value is not None:
+            self._entries[key] = value
+        else:
+            self._entries[key] = {"value": value, "__expires_at__": None if ttl is None else time.time() + ttl}
+        self._dirty = True
+
+    def commit(self):
+        if not self._dirty:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+    def items(self):
+        """Restituisce le voci non scadute come coppie (chiave, valore)."""
+        for key in list(self._entries):
+            value = self.get(key)
+            if value is not MISSING:
+                yield key, value
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def open_cache(path, legacy_json_path=None, legacy_keys=None):
+    """
+    Apre la cache adatta al percorso indicato.
+
+    I percorsi '.json' usano il vecchio formato; qualsiasi altro percorso usa
+    SQLite. Una nuova cache SQLite importa le voci del vecchio file JSON, se
+    presente. Le vecchie voci sono per titolo, mentre i film con imdbId sono
+    cercati per `imdb:<id>`: con `legacy_keys` i risultati trovati vengono
+    importati anche sotto la chiave attuale del film. Le voci negative restano
+    solo sotto il titolo, perché la ricerca per ID può riuscire dove quella per
+    titolo non è riuscita.
+
+    Args:
+        path (str): Percorso della cache.
+        legacy_json_path (str): Vecchio file JSON da importare alla prima apertura.
+        legacy_keys (dict): Titolo -> chiave attuale del film (vedi `dbpedia_queries.movie_cache_keys`).
+
+    Returns:
+        CacheBackend: La cache aperta.
+    """
+    if path.endswith(".json"):
+        return JsonCache(path)
+    is_new = not os.path.exists(path)
+    cache = SQLiteCache(path)
+    if is_new and legacy_json_path and os.path.exists(legacy_json_path):
+        legacy = JsonCache(legacy_json_path)
+        cache.set_many(legacy.items())
+        rekeyed = [(legacy_keys[title], value) for title, value in legacy.items()
+                   if value is not None and legacy_keys and legacy_keys.get(title, title) != title]
+        cache.set_many(rekeyed)
+        cache.commit()
+        if rekeyed:
+            logger.info(f"{len(rekeyed)} voci della vecchia cache importate anche per imdbId.")
+        logger.info(f"Importate {len(legacy)} voci dalla vecchia cache '{legacy_json_path}'.")
+    return cache
@@ -1,26 +1,30 @@
 import os
+import sys
 import time
-import json
 import requests
 import logging
+import numpy as np
 import pandas as pd
-from dotenv import load_dotenv
-from SPARQLWrapper import SPARQLWrapper, JSON
-from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import re
 import random  # Per il ritardo casuale in caso di errore 429
+from dbpedia_async import run_pipeline
+from dbpedia_cache import MISSING, open_cache
+import instrumentation
 
-# Configurazione del logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Carica variabili d'ambiente
-load_dotenv()
-
-# Configurazione variabili
+# Configurazione variabili (da variabili d'ambiente o dal file .env letto dalla CLI)
 DBPEDIA_ENDPOINT = os.getenv("DBPEDIA_ENDPOINT", "http://dbpedia.org/sparql")
-CACHE_PATH = os.getenv("CACHE_PATH", "data/dbpedia/query_results.json")
-BATCH_SIZE = 10  # Limite di titoli per batch ridotto per evitare URI troppo lunghi
-MAX_THREADS = 5  # Numero massimo di thread per le query parallele
+CACHE_PATH = os.getenv("CACHE_PATH", "data/dbpedia/query_results.sqlite3")
+LEGACY_CACHE_PATH = "data/dbpedia/query_results.json"  # Vecchia cache JSON, importata alla prima apertura
+CACHE_TTL = float(os.getenv("DBPEDIA_CACHE_TTL", 0)) or None  # Secondi; 0 = nessuna scadenza
+NEGATIVE_CACHE_TTL = float(os.getenv("DBPEDIA_NEGATIVE_CACHE_TTL", 7 * 24 * 3600))  # Titoli non trovati
+MAX_QUERY_BYTES = int(os.getenv("DBPEDIA_MAX_QUERY_BYTES", 8192))  # Dimensione massima del corpo di una query
+MAX_BATCH_ITEMS = 200  # Numero massimo di film per query, indipendentemente dalla dimensione
+MAX_THREADS = 5  # Richieste contemporanee iniziali (la concorrenza si adatta durante l'esecuzione)
+MAX_CONCURRENCY = int(os.getenv("DBPEDIA_MAX_CONCURRENCY", 16))  # Richieste contemporanee massime
+RATE_LIMIT = float(os.getenv("DBPEDIA_RATE_LIMIT", 5))  # Richieste al secondo verso l'endpoint
 
 def ensure_directory_exists(directory):
     if not os.path.exists(directory):
@@ -37,27 +41,234 @@ def chunk_list(lst, chunk_size):
     for i in range(0, len(lst), chunk_size):
         yield lst[i:i + chunk_size]
 
+def clean_title(title):
+    """Rimuove l'anno tra parentesi nel titolo, se presente."""
+    return re.sub(r"\(\d{4}\)$", "", title).strip()
+
+def dbpedia_label(title):
+    """Converte un titolo MovieLens nell'etichetta DBpedia (senza anno, articolo in testa)."""
+    label = clean_title(title)
+    match = re.match(r"^(.*), (The|A|An)$", label)
+    return f"{match.group(2)} {match.group(1)}" if match else label
+
+def imdb_key(imdb_id):
+    """Chiave di cache di un film identificato dal suo imdbId."""
+    return f"imdb:{int(imdb_id):07d}"
+
+def uri_key(uri):
+    """Chiave di cache di un film già risolto nella sua entità DBpedia."""
+    return f"dbr:{uri}"
+
+def escape_iri(uri):
+    """Codifica i caratteri non ammessi in un IRI SPARQL (<...>)."""
+    return re.sub(r'[<>"{}|^`\\\s]', lambda match: f"%{ord(match.group()):02X}", uri)
+
+def value_term(key):
+    """
+    Termine del blocco VALUES con cui una chiave di cache compare nella query.
+
+    Args:
+        key (str): Chiave 'dbr:<uri>', 'imdb:<id>' oppure titolo MovieLens.
+
+    Returns:
+        str: L'IRI, l'imdbId o l'etichetta come letterale SPARQL.
+    """
+    if key.startswith("dbr:"):
+        return f"<{escape_iri(key[len('dbr:'):])}>"
+    if key.startswith("imdb:"):
+        return f'"{key[len("imdb:"):]}"'
+    return f'"{escape_title(dbpedia_label(key))}"@en'
+
+def film_match_rank(key, film_uri):
+    """
+    Quanto un'entità trovata per etichetta corrisponde al titolo MovieLens.
+
+    Più film condividono la stessa etichetta senza anno (es. i remake); la
+    disambiguazione dell'URI ("Heat_(1995_film)") li distingue.
+
+    Args:
+        key (str): Titolo MovieLens, con l'anno tra parentesi.
+        film_uri (str): URI dell'entità (o None).
+
+    Returns:
+        int: 2 se la disambiguazione contiene l'anno del titolo, 1 se l'URI non ha
+        disambiguazione o è solo "(film)", 0 altrimenti.
+    """
+    year = re.search(r"\((\d{4})\)$", key.strip())
+    disambiguation = re.search(r"_\(([^()]*)\)$", (film_uri or "").rsplit("/", 1)[-1])
+    if disambiguation is None or disambiguation.group(1) == "film":
+        return 1
+    return 2 if year and year.group(1) in disambiguation.group(1) else 0
+
+RESULT_FIELDS = """(SAMPLE(?label) AS ?title) (SAMPLE(?abstract) AS ?abstract)
+           (GROUP_CONCAT(DISTINCT ?director; separator="|") AS ?director)
+           (GROUP_CONCAT(DISTINCT ?starring; separator="|") AS ?starring)
+           (GROUP_CONCAT(DISTINCT ?genre; separator="|") AS ?genre)"""
+
+OPTIONAL_PATTERNS = """OPTIONAL { ?film dbo:abstract ?abstract . FILTER (lang(?abstract) = 'en') }
+        OPTIONAL { ?film dbo:director ?director }
+        OPTIONAL { ?film dbo:starring ?starring }
+        OPTIONAL { ?film dbo:genre ?genre }"""
+
+def build_title_query(labels):
+    """
+    Query per etichetta: un blocco VALUES con tutte le etichette del batch.
+
+    I risultati sono raggruppati per film, non per etichetta: i film con la
+    stessa etichetta (es. i remake) restano righe distinte, e `parse_bindings`
+    sceglie quella del titolo cercato.
+
+    Args:
+        labels (list): Etichette DBpedia da cercare.
+
+    Returns:
+        str: La query SPARQL.
+    """
+    values = " ".join(f'"{escape_title(label)}"@en' for label in labels)
+    return f"""
+    SELECT ?label ?film {RESULT_FIELDS} WHERE {{
+        VALUES ?label {{ {values} }}
+        ?film a dbo:Film ;
+              rdfs:label ?label .
+        {OPTIONAL_PATTERNS}
+    }}
+    GROUP BY ?label ?film
+    """
+
+def build_id_query(imdb_ids):
+    """
+    Query per imdbId: un blocco VALUES con gli ID del batch (già ricavati da links.csv).
+
+    Args:
+        imdb_ids (list): imdbId a 7 cifre (stringhe).
+
+    Returns:
+        str: La query SPARQL.
+    """
+    values = " ".join(value_term(f"imdb:{imdb_id}") for imdb_id in imdb_ids)
+    return f"""
+    SELECT ?imdbId {RESULT_FIELDS} WHERE {{
+        VALUES ?imdbId {{ {values} }}
+        ?film a dbo:Film ;
+              dbo:imdbId ?imdbId .
+        OPTIONAL {{ ?film rdfs:label ?label . FILTER (lang(?label) = 'en') }}
+        {OPTIONAL_PATTERNS}
+    }}
+    GROUP BY ?imdbId
+    """
+
+def build_uri_query(uris):
+    """
+    Query per entità: un blocco VALUES con gli URI del batch (già risolti offline).
+
+    Args:
+        uris (list): URI delle entità DBpedia.
+
+    Returns:
+        str: La query SPARQL.
+    """
+    values = " ".join(value_term(uri_key(uri)) for uri in uris)
+    return f"""
+    SELECT ?film {RESULT_FIELDS} WHERE {{
+        VALUES ?film {{ {values} }}
+        OPTIONAL {{ ?film rdfs:label ?label . FILTER (lang(?label) = 'en') }}
+        {OPTIONAL_PATTERNS}
+    }}
+    GROUP BY ?film
+    """
+
+def build_batch_query(keys):
+    """
+    Costruisce la query di un batch omogeneo di chiavi di cache.
+
+    Args:
+        keys (list): Chiavi 'dbr:<uri>', 'imdb:<id>' oppure titoli MovieLens.
+
+    Returns:
+        str: La query SPARQL.
+    """
+    if keys and keys[0].startswith("dbr:"):
+        return build_uri_query([key[len("dbr:"):] for key in keys])
+    if keys and keys[0].startswith("imdb:"):
+        return build_id_query([key[len("imdb:"):] for key in keys])
+    return build_title_query(sorted({dbpedia_label(key) for key in keys}))
+
+def pack_batches(keys, max_bytes=MAX_QUERY_BYTES, max_items=MAX_BATCH_ITEMS):
+    """
+    Raggruppa le chiavi in batch la cui query non supera `max_bytes`.
+
+    Ogni chiave occupa la dimensione del suo termine nel blocco VALUES (vedi
+    `value_term`), con escape e separatore.
+
+    Args:
+        keys (list): Chiavi dello stesso tipo.
+        max_bytes (int): Dimensione massima della query in byte.
+        max_items (int): Numero massimo di chiavi per batch.
+
+    Returns:
+        list: I batch di chiavi.
+    """
+    if not keys:
+        return []
+    base = len(build_batch_query(keys[:1]).encode("utf-8")) - len(value_term(keys[0]).encode("utf-8"))
+    batches, current, size = [], [], base
+    for key in keys:
+        item_size = len(value_term(key).encode("utf-8")) + 1
+        if current and (size + item_size > max_bytes or len(current) >= max_items):
+            batches.append(current)
+            current, size = [], base
+        current.append(key)
+        size += item_size
+    if current:
+        batches.append(current)
+    return batches
+
+def parse_bindings(batch, bindings):
+    """
+    Associa i binding SPARQL alle chiavi del batch.
+
+    Args:
+        batch (list): Chiavi interrogate.
+        bindings (list): Binding restituiti dall'endpoint.
+
+    Returns:
+        dict: Risultati per chiave (solo le chiavi trovate).
+    """
+    by_label = {}
+    for key in batch:
+        by_label.setdefault(dbpedia_label(key), []).append(key)
+    by_title = not batch or not batch[0].startswith(("dbr:", "imdb:"))
+
+    results, ranks = {}, {}
+    for binding in bindings:
+        value = {field: binding.get(field, {}).get("value") or None
+                 for field in ("abstract", "director", "starring", "genre")}
+        film = binding.get("film", {}).get("value")
+        if by_title:
+            # Una riga per film: a ogni titolo va il film con la disambiguazione del suo anno
+            for key in by_label.get(binding.get("label", binding.get("title", {})).get("value"), []):
+                rank = film_match_rank(key, film)
+                if rank > ranks.get(key, -1):
+                    results[key], ranks[key] = value, rank
+        elif "imdbId" in binding:
+            results[f"imdb:{binding['imdbId']['value']}"] = value
+        elif film:
+            results[uri_key(film)] = value
+    return results
+
 def query_dbpedia_batch(movie_titles):
+    # Importato al primo uso: solo la vecchia interrogazione sincrona usa SPARQLWrapper
+    from SPARQLWrapper import SPARQLWrapper, JSON
+
     sparql = SPARQLWrapper(DBPEDIA_ENDPOINT)
     
+    if isinstance(movie_titles, str):
+        movie_titles = [movie_titles]
     if len(movie_titles) == 0:
         logger.warning("Nessun titolo nel batch. Saltando la query.")
         return []
     
-    titles_filter = " ".join([f'FILTER (rdfs:label = "{escape_title(title)}"@en)' for title in movie_titles])
-    
-    query = f"""
-    SELECT ?title ?abstract ?director ?starring ?genre WHERE {{
-        ?film a dbo:Film ;
-              rdfs:label ?title ;
-              dbo:abstract ?abstract ;
-              dbo:director ?director ;
-              dbo:starring ?starring ;
-              dbo:genre ?genre .
-        FILTER (lang(?abstract) = 'en') 
-        {titles_filter}
-    }}
-    """
+    query = build_title_query(movie_titles)
     
     sparql.setMethod('POST')
     sparql.setQuery(query)
@@ -66,7 +277,7 @@ def query_dbpedia_batch(movie_titles):
     retries = 0
     while retries < 5:  # Prova fino a 5 volte
         try:
-            logger.info(f"Eseguendo query batch per {len(movie_titles)} film...")
+            logger.debug(f"Eseguendo query batch per {len(movie_titles)} film...")
             results = sparql.query().convert()
             return results.get("results", {}).get("bindings", [])
         except requests.exceptions.RequestException as e:
@@ -85,91 +296,255 @@ def query_dbpedia_batch(movie_titles):
     logger.error("Troppi tentativi, la query non è riuscita dopo 5 tentativi.")
     return []
 
-def load_cache():
-    if os.path.exists(CACHE_PATH):
-        try:
-            with open(CACHE_PATH, "r") as f:
-                content = f.read().strip()
-                if not content:
-                    logger.warning(f"Il file di cache '{CACHE_PATH}' è vuoto.")
-                    return {}
-                cache = json.loads(content)
-                logger.info(f"Cache caricata: {len(cache)} voci")
-                return cache
-        except json.JSONDecodeError as e:
-            logger.error(f"Errore nel caricamento della cache: {e}. Il file potrebbe essere danneggiato.")
-            return {}
-        except Exception as e:
-            logger.error(f"Errore sconosciuto nel caricamento della cache: {e}")
-            return {}
-    logger.info("Cache non trovata. Creazione di una nuova.")
-    return {}
+def empty_result():
+    return {"abstract": None, "director": None, "starring": None, "genre": None}
 
-def save_cache(cache):
-    ensure_directory_exists(os.path.dirname(CACHE_PATH))
-    try:
-        with open(CACHE_PATH, "w") as f:
-            json.dump(cache, f, indent=4)
-        logger.info("Cache salvata con successo.")
-    except IOError as e:
-        logger.error(f"Errore nel salvataggio della cache: {e}")
+def store_batch_results(cache, batch, bindings):
+    """
+    Scrive in cache i risultati di un batch, registrando come negative le chiavi senza risultati.
 
-def enrich_movies(movies):
-    cache = load_cache()
-    enriched_data = []
+    Le chiavi per imdbId senza risultati non vengono registrate: molti film
+    di DBpedia non hanno `dbo:imdbId`, per cui vanno prima cercati per
+    titolo (vedi `imdb_fallback_keys`).
 
-    movie_titles = movies["title"].tolist()
-    
-    all_results = []
-    with ThreadPoolExecutor(max_workers=MAX_THREADS) as executor:
-        futures = [executor.submit(query_dbpedia_batch, batch) for batch in chunk_list(movie_titles, BATCH_SIZE)]
-        for future in futures:
-            all_results.extend(future.result())
-
-    results_map = {result['title']['value']: {
-                    "abstract": result.get("abstract", {}).get("value"),
-                    "director": result.get("director", {}).get("value"),
-                    "starring": result.get("starring", {}).get("value"),
-                    "genre": result.get("genre", {}).get("value"),
-                    } for result in all_results}
-
-    for title in movie_titles:
-        if title in cache:
-            logger.info(f"Cache trovata per '{title}'.")
-            enriched_data.append(cache[title])
-        elif title in results_map:
-            enriched_data.append(results_map[title])
-            cache[title] = results_map[title]
+    Args:
+        cache (CacheBackend): Cache dei risultati.
+        batch (list): Chiavi interrogate.
+        bindings (list): Binding SPARQL restituiti per il batch.
+
+    Returns:
+        dict: Risultati del batch per chiave.
+    """
+    results = parse_bindings(batch, bindings)
+    cache.set_many(results.items(), ttl=CACHE_TTL)
+    cache.set_many(((key, None) for key in batch if key not in results and not key.startswith("imdb:")),
+                   ttl=NEGATIVE_CACHE_TTL)
+    cache.commit()
+    return results
+
+def imdb_fallback_keys(movies, keys, missed, resolver=None):
+    """
+    Chiavi di ripiego dei film cercati per imdbId senza risultati: l'entità
+    DBpedia se nota o risolta offline, altrimenti il titolo.
+
+    Args:
+        movies (DataFrame): DataFrame dei film.
+        keys (list): Chiavi di cache dei film (`movie_cache_keys`).
+        missed (set): Chiavi per imdbId senza risultati.
+        resolver (EntityResolver): Risolutore offline titolo -> entità, opzionale.
+
+    Returns:
+        dict: Chiave per imdbId -> chiave di ripiego.
+    """
+    positions = {}
+    for position, key in enumerate(keys):
+        if key in missed:
+            positions.setdefault(key, position)
+    titles = movies["title"].iloc[list(positions.values())]
+    uris = pd.Series([None] * len(titles), dtype=object)
+    if "dbpediaUri" in movies.columns:
+        uris[:] = movies["dbpediaUri"].iloc[list(positions.values())].to_numpy()
+    unresolved = uris.isna().to_numpy()
+    if resolver is not None and unresolved.any():
+        from entity_resolver import resolve_titles
+
+        uris[unresolved] = resolve_titles(titles[unresolved], resolver)["uri"].to_numpy()
+    return {key: uri_key(uri) if pd.notna(uri) else title for key, title, uri in zip(positions, titles, uris)}
+
+def movie_cache_keys(movies):
+    """
+    Calcola la chiave di cache di ogni film: l'imdbId se noto (corrispondenza esatta),
+    altrimenti l'entità DBpedia se risolta offline, altrimenti il titolo.
+
+    Args:
+        movies (DataFrame): DataFrame dei film (colonne 'title' ed eventualmente 'dbpediaUri' e 'imdbId').
+
+    Returns:
+        list: Le chiavi, nell'ordine dei film.
+    """
+    missing = pd.Series([None] * len(movies), index=movies.index)
+    uris = movies["dbpediaUri"] if "dbpediaUri" in movies.columns else missing
+    imdb_ids = movies["imdbId"] if "imdbId" in movies.columns else missing
+    return [imdb_key(imdb_id) if pd.notna(imdb_id) else uri_key(uri) if pd.notna(uri) else title
+            for title, uri, imdb_id in zip(movies["title"], uris, imdb_ids)]
+
+def plan_enrichment(keys, cache):
+    """
+    Pianifica l'arricchimento: rimuove i duplicati e le chiavi già in cache.
+
+    Args:
+        keys (list): Chiavi di cache dei film.
+        cache (CacheBackend): Cache dei risultati.
+
+    Returns:
+        tuple: (risultati già in cache per chiave, None per le voci negative; batch da interrogare).
+    """
+    cached, pending = {}, []
+    for key in dict.fromkeys(keys):
+        value = cache.get(key)
+        if value is MISSING:
+            pending.append(key)
         else:
-            enriched_data.append({"abstract": None, "director": None, "starring": None, "genre": None})
-    
-    save_cache(cache)
+            cached[key] = value
+    uri_keys = [key for key in pending if key.startswith("dbr:")]
+    id_keys = [key for key in pending if key.startswith("imdb:")]
+    title_keys = [key for key in pending if not key.startswith(("dbr:", "imdb:"))]
+    return cached, pack_batches(uri_keys) + pack_batches(id_keys) + pack_batches(title_keys)
+
+async def enrich_movies_async(movies, cache, endpoint=DBPEDIA_ENDPOINT, resolver=None, **pipeline_options):
+    """
+    Arricchisce i film con le informazioni di DBpedia tramite la pipeline asincrona.
+
+    Prima viene pianificato il lavoro: i film duplicati e quelli già in cache
+    (anche come voci negative) non vengono interrogati. I rimanenti sono
+    cercati per imdbId; con un risolutore offline i film senza imdbId
+    vengono prima associati alle entità DBpedia, le cui informazioni si
+    leggono per URI, e solo quelli non risolti sono cercati per titolo. I
+    film con imdbId che DBpedia non conosce per ID vengono poi cercati per
+    entità o per titolo, e l'esito è registrato anche sotto l'imdbId. Le
+    query sono raggruppate in batch la cui dimensione dipende dalla
+    lunghezza della query. I risultati di ogni batch
+    vengono scritti e confermati in cache appena il batch termina.
+
+    Args:
+        movies (DataFrame): DataFrame dei film con le colonne 'title' ed eventualmente 'imdbId'.
+        cache (CacheBackend): Cache dei risultati.
+        endpoint (str): URL dell'endpoint SPARQL.
+        resolver (EntityResolver): Risolutore offline titolo -> entità; se presente (e se
+            'dbpediaUri' non è già nei film) i titoli dei film senza imdbId vengono risolti
+            prima delle query.
+        **pipeline_options: Parametri di `run_pipeline` (rate, max_concurrency, ...) che
+            sostituiscono quelli della configurazione.
+
+    Returns:
+        tuple: (DataFrame arricchito, PipelineStats dell'esecuzione).
+    """
+    if resolver is not None and "dbpediaUri" not in movies.columns:
+        from entity_resolver import resolve_titles
 
+        # Solo i film senza imdbId: l'ID è una corrispondenza esatta, il risolutore una stima
+        residue = movies["imdbId"].isna().to_numpy() if "imdbId" in movies.columns else np.ones(len(movies), bool)
+        matches = resolve_titles(movies.loc[residue, "title"], resolver)
+        movies["dbpediaUri"] = None
+        movies.loc[residue, "dbpediaUri"] = matches["uri"].to_numpy()
+        resolved = int(matches["uri"].notna().sum())
+        instrumentation.increment("entity_resolver_titles_total", resolved, result="resolved")
+        instrumentation.increment("entity_resolver_titles_total", len(matches) - resolved, result="unresolved")
+    keys = movie_cache_keys(movies)
+    results, batches = plan_enrichment(keys, cache)
+    cache_hits = len(results)
+    instrumentation.increment("dbpedia_cache_requests_total", cache_hits, result="hit")
+    instrumentation.increment("dbpedia_cache_requests_total", len(keys) - cache_hits, result="miss")
+    logger.info(f"{len(results)} film già in cache, {sum(len(b) for b in batches)} da interrogare "
+                f"in {len(batches)} batch.")
+
+    answered = set()
+
+    def on_result(batch, bindings):
+        results.update(store_batch_results(cache, batch, bindings))
+        answered.update(batch)
+
+    options = {"rate": RATE_LIMIT, "initial_concurrency": MAX_THREADS, "max_concurrency": MAX_CONCURRENCY}
+    options.update(pipeline_options)
+    stats = await run_pipeline(batches, build_batch_query, on_result, endpoint=endpoint, **options)
+    stats.keys = cache_hits + sum(len(batch) for batch in batches)
+    stats.cache_hits = cache_hits
+
+    # Film senza `dbo:imdbId` su DBpedia: ricerca di ripiego per entità o per titolo
+    missed = {key for key in answered if key.startswith("imdb:") and key not in results}
+    if missed:
+        fallbacks = imdb_fallback_keys(movies, keys, missed, resolver)
+        fallback_cached, fallback_batches = plan_enrichment(list(fallbacks.values()), cache)
+        results.update(fallback_cached)
+        logger.info(f"{len(missed)} film non trovati per imdbId: {sum(len(b) for b in fallback_batches)} "
+                    f"ricerche di ripiego in {len(fallback_batches)} batch.")
+        stats.add(await run_pipeline(fallback_batches, build_batch_query, on_result, endpoint=endpoint, **options))
+        stats.keys += sum(len(batch) for batch in fallback_batches)
+        # L'esito del ripiego vale anche per l'imdbId; la voce negativa solo se anche il ripiego fallisce
+        resolved = {key: results.get(fallback) for key, fallback in fallbacks.items()
+                    if fallback in results or fallback in answered}
+        cache.set_many(((key, value) for key, value in resolved.items() if value), ttl=CACHE_TTL)
+        cache.set_many(((key, None) for key, value in resolved.items() if not value), ttl=NEGATIVE_CACHE_TTL)
+        cache.commit()
+        results.update(resolved)
+
+    enriched_data = [results.get(key) or empty_result() for key in keys]
     movies["abstract"] = [d["abstract"] for d in enriched_data]
     movies["director"] = [d["director"] for d in enriched_data]
     movies["starring"] = [d["starring"] for d in enriched_data]
     movies["genre"] = [d["genre"] for d in enriched_data]
 
-    return movies
+    return movies, stats
 
-if __name__ == "__main__":
+def enrich_movies(movies, cache=None, endpoint=DBPEDIA_ENDPOINT, resolver=None):
+    """
+    Arricchisce i film con le informazioni di DBpedia.
+
+    Versione sincrona di `enrich_movies_async`; in un event loop già attivo
+    (es. Jupyter) usare direttamente `enrich_movies_async`.
+
+    Args:
+        movies (DataFrame): DataFrame dei film con la colonna 'title'.
+        cache (CacheBackend): Cache dei risultati (default: quella in CACHE_PATH).
+        endpoint (str): URL dell'endpoint SPARQL.
+        resolver (EntityResolver): Risolutore offline titolo -> entità DBpedia.
+
+    Returns:
+        DataFrame: I film con le colonne 'abstract', 'director', 'starring' e 'genre'.
+    """
+    own_cache = cache is None
+    if own_cache:
+        cache = open_cache(CACHE_PATH, legacy_json_path=LEGACY_CACHE_PATH,
+                           legacy_keys=dict(zip(movies["title"], movie_cache_keys(movies))))
     try:
-        logger.info("Caricamento dei dati da 'movies.csv'...")
-        movies_csv_path = os.getenv("MOVIES_CSV_PATH", "data/raw/movies.csv")
-        movies = pd.read_csv(movies_csv_path)
+        movies, stats = asyncio.run(enrich_movies_async(movies, cache, endpoint, resolver))
+        logger.info(f"Arricchimento completato: {stats.as_dict()}")
+    finally:
+        if own_cache:
+            cache.close()
+    return movies
+
+def run_enrichment(movies_csv_path, links_csv_path, output_path, limit=None, labels_path=None):
+    """
+    Arricchisce il catalogo MovieLens con DBpedia e salva il risultato.
+
+    Args:
+        movies_csv_path (str): CSV dei film.
+        links_csv_path (str): CSV dei link (imdbId); None per cercare solo per titolo.
+        output_path (str): CSV di destinazione.
+        limit (int): Numero massimo di film da arricchire.
+        labels_path (str): Dump delle etichette dei film DBpedia per risolvere i titoli offline
+            (vedi `entity_resolver.load_entity_resolver`); None per non usarlo.
 
-        links_csv_path = os.getenv("MOVIES_CSV_PATH", "data/raw/links.csv")
+    Returns:
+        DataFrame: I film arricchiti.
+    """
+    logger.info(f"Caricamento dei dati da '{movies_csv_path}'...")
+    movies = pd.read_csv(movies_csv_path, nrows=limit)
+    if links_csv_path:
         links = pd.read_csv(links_csv_path)
         movies = pd.merge(movies, links, on='movieId', how='left')
 
-        movies["genre"] = movies["genres"].apply(lambda x: x.split('|') if isinstance(x, str) else [])
-        movies["formatted_title"] = movies["title"].apply(escape_title)
+    movies["genre"] = movies["genres"].apply(lambda x: x.split('|') if isinstance(x, str) else [])
+    movies["formatted_title"] = movies["title"].apply(escape_title)
+
+    resolver = None
+    if labels_path:
+        from entity_resolver import load_entity_resolver
 
-        logger.info("Arricchimento dei dati con DBpedia...")
-        enriched_movies = enrich_movies(movies)
+        resolver = load_entity_resolver(labels_path=labels_path)
+        if resolver is None:
+            logger.warning(f"Dump delle etichette '{labels_path}' non trovato: i titoli saranno cercati in rete.")
 
-        output_path = "data/processed/movies_enriched.csv"
-        enriched_movies.to_csv(output_path, index=False)
-        logger.info(f"Dati arricchiti salvati in '{output_path}'.")
-    except Exception as e:
-        logger.error(f"Errore nel processo di arricchimento: {e}")
+    logger.info("Arricchimento dei dati con DBpedia...")
+    enriched_movies = enrich_movies(movies, resolver=resolver)
+
+    ensure_directory_exists(os.path.dirname(output_path) or ".")
+    enriched_movies.to_csv(output_path, index=False)
+    logger.info(f"Dati arricchiti salvati in '{output_path}'.")
+    return enriched_movies
+
+if __name__ == "__main__":
+    # Stessa esecuzione di `filminsight enrich`, che configura logging e variabili d'ambiente
+    from cli import main
+    sys.exit(main(["enrich"] + sys.argv[1:]))
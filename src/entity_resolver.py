@@ -0,0 +1,533 @@
+import bisect
+import bz2
+import gzip
+import logging
+import os
+import re
+import sys
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import columnar
+from fingerprints import fingerprint_file
+
+logger = logging.getLogger(__name__)
+
+ENTITY_RESOLVER_PATH = os.getenv("ENTITY_RESOLVER_PATH", "data/processed/entity_resolver/")
+ENTITY_RESOLVER_TABLE = "film_labels"
+LABELS_DUMP_PATH = os.getenv("DBPEDIA_LABELS_PATH", "data/dbpedia/film_labels.nt")
+# Predicati delle etichette accettati nei dump N-Triples
+LABEL_PREDICATES = {"http://www.w3.org/2000/01/rdf-schema#label", "http://xmlns.com/foaf/0.1/name"}
+
+NGRAM_SIZE = 3
+NORMALIZATION_VERSION = 2  # Da incrementare quando cambia `parse_title`: gli indici salvati vanno ricostruiti
+MIN_CONFIDENCE = float(os.getenv("ENTITY_RESOLVER_MIN_CONFIDENCE", 0.8))  # Sotto questa soglia si usa la rete
+MIN_SIMILARITY = 0.5  # Similarità (Dice sui trigrammi) minima di un candidato approssimato
+# Fattore di confidenza per l'anno: uguale, sconosciuto o di un anno diverso (uscite a cavallo d'anno), diverso
+YEAR_MATCH, YEAR_UNKNOWN, YEAR_MISMATCH = 1.0, 0.9, 0.5
+# Fattore per i candidati approssimati con numeri diversi ("Toy Story 2" / "Toy Story") o che aggiungono o
+# tolgono parole intere ("Dorado" / "El Dorado"): sono titoli diversi, non errori di battitura
+WORD_MISMATCH = 0.5
+AMBIGUITY_MARGIN = 0.02  # Due entità diverse entro questo margine rendono il risultato ambiguo
+AMBIGUITY_PENALTY = 0.8
+RESOLVE_CHUNK_SIZE = 512  # Titoli per task del pool di processi
+
+# Articoli che MovieLens sposta in coda ("Matrix, The", "Dolce Vita, La"), riportati in testa come in DBpedia.
+# Le parole iniziali non vengono mai rimosse: "El Dorado" e "Dorado", "Die Hard" e "Hard" sono film diversi.
+ARTICLES = ("the", "a", "an", "les", "la", "le", "l'", "il", "lo", "der", "die", "das", "el", "los", "las",
+            "det", "den")
+_TRAILING_ARTICLE = re.compile(r"^(.*\S),\s*(" + "|".join(re.escape(a) for a in ARTICLES) + r")$")
+_YEAR = re.compile(r"\((\d{4})(?:\s*[-–]\s*\d{0,4})?\)\s*$")
+_PARENTHETICAL = re.compile(r"\(([^()]*)\)")
+_FILM_DISAMBIGUATION = re.compile(r"^(?:.*?\b(\d{4})\b)?.*\bfilm$")
+_NUMBER = re.compile(r"^(?:\d+|[ivx]{2,})$")  # Numeri dei seguiti, anche romani
+_AKA = re.compile(r"^(?:a\.k\.a\.|aka)\s+")
+_NON_WORD = re.compile(r"[\W_]+")
+_LITERAL = re.compile(r'^<([^>]*)>\s+<([^>]*)>\s+"((?:[^"\\]|\\.)*)"(?:@([\w-]+))?')
+_ESCAPE = re.compile(r"\\(u[0-9A-Fa-f]{4}|U[0-9A-Fa-f]{8}|.)")
+_ESCAPES = {"t": "\t", "n": "\n", "r": "\r", "b": "\b", "f": "\f", '"': '"', "'": "'", "\\": "\\"}
+
+
+def _normalize_name(name):
+    """Forma di confronto di un nome: minuscolo, senza accenti né punteggiatura, articolo finale in testa."""
+    name = unicodedata.normalize("NFKD", name)
+    name = "".join(c for c in name if not unicodedata.combining(c)).lower().strip()
+    match = _TRAILING_ARTICLE.match(name)
+    if match:
+        rest, article = match.groups()
+        name = f"{article}{rest}" if article.endswith("'") else f"{article} {rest}"
+    name = name.replace("&", " and ")
+    return " ".join(_NON_WORD.sub(" ", name).split())
+
+
+def parse_title(title):
+    """
+    Scompone un titolo MovieLens o un'etichetta DBpedia nelle forme da confrontare e nell'anno.
+
+    Gestisce l'anno finale ("Heat (1995)"), le disambiguazioni di DBpedia
+    ("Heat (1995 film)", "Heat (film)"), gli articoli in coda ("Matrix, The")
+    e i titoli alternativi tra parentesi ("Seven (a.k.a. Se7en)"), che
+    diventano forme aggiuntive.
+
+    Args:
+        title (str): Il titolo.
+
+    Returns:
+        tuple: (forme normalizzate distinte, la principale per prima; anno o None).
+    """
+    text = str(title).strip()
+    year = None
+    match = _YEAR.search(text)
+    if match:
+        year = int(match.group(1))
+        text = text[:match.start()]
+
+    alternatives = []
+    for content in _PARENTHETICAL.findall(text):
+        content = content.strip()
+        film = _FILM_DISAMBIGUATION.match(content.lower())
+        if film:
+            year = year or (int(film.group(1)) if film.group(1) else None)
+        elif content:
+            alternatives.append(_AKA.sub("", content))
+    text = _PARENTHETICAL.sub(" ", text)
+
+    names = [_normalize_name(name) for name in [text] + alternatives]
+    return list(dict.fromkeys(name for name in names if name)), year
+
+
+def _different_title(name, other):
+    """Vero se due forme differiscono per i numeri o solo per parole intere aggiunte o tolte."""
+    words, other_words = set(name.split()), set(other.split())
+    numbers = {word for word in words if _NUMBER.match(word)}
+    other_numbers = {word for word in other_words if _NUMBER.match(word)}
+    return numbers != other_numbers or (words != other_words and (words < other_words or other_words < words))
+
+
+def _uri_name(uri):
+    """Nome leggibile dell'ultima parte di un URI DBpedia ("Heat_(1995_film)" -> "Heat (1995 film)")."""
+    return uri.rstrip("/").rsplit("/", 1)[-1].replace("_", " ")
+
+
+def ngram_codes(name, n=NGRAM_SIZE):
+    """
+    Codici interi distinti degli n-grammi di un nome normalizzato, con uno spazio ai bordi.
+
+    Ogni carattere occupa 21 bit (il massimo di Unicode), per cui il codice
+    identifica l'n-gramma senza collisioni e senza un vocabolario.
+
+    Args:
+        name (str): Il nome normalizzato.
+        n (int): Lunghezza degli n-grammi (al massimo 3).
+
+    Returns:
+        ndarray: Codici int64 ordinati.
+    """
+    codes = np.frombuffer(f" {name} ".encode("utf-32-le"), dtype=np.uint32).astype(np.int64)
+    if len(codes) < n:
+        return np.array([], dtype=np.int64)
+    grams = np.zeros(len(codes) - n + 1, dtype=np.int64)
+    for i in range(n):
+        grams = (grams << 21) | codes[i:len(codes) - n + 1 + i]
+    return np.unique(grams)
+
+
+def _unescape(literal):
+    def replace(match):
+        code = match.group(1)
+        return chr(int(code[1:], 16)) if code[0] in "uU" and len(code) > 1 else _ESCAPES.get(code, code)
+    return _ESCAPE.sub(replace, literal)
+
+
+def _open_text(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rt", encoding="utf-8")
+    return open(path, encoding="utf-8")
+
+
+def read_label_dump(path, language="en"):
+    """
+    Legge le etichette dei film da un dump di DBpedia.
+
+    Sono accettati i dump N-Triples (es. `labels_lang=en.ttl` filtrato sui
+    film, anche compressi .gz/.bz2), di cui si leggono le triple
+    rdfs:label/foaf:name nella lingua indicata, e i file TSV/CSV con le
+    colonne 'uri' e 'label'.
+
+    Args:
+        path (str): Il file del dump.
+        language (str): Lingua delle etichette N-Triples (None = tutte).
+
+    Returns:
+        DataFrame: Colonne 'uri' e 'label'.
+    """
+    if path.endswith((".csv", ".tsv", ".csv.gz", ".tsv.gz")):
+        separator = "\t" if ".tsv" in path else ","
+        labels = pd.read_csv(path, sep=separator, usecols=["uri", "label"], dtype=str)
+        return labels.dropna().reset_index(drop=True)
+
+    uris, labels = [], []
+    with _open_text(path) as dump:
+        for line in dump:
+            match = _LITERAL.match(line)
+            if not match or match.group(2) not in LABEL_PREDICATES:
+                continue
+            if language and match.group(4) and match.group(4) != language:
+                continue
+            uris.append(match.group(1))
+            labels.append(_unescape(match.group(3)))
+    return pd.DataFrame({"uri": uris, "label": labels})
+
+
+def dump_source(path):
+    """Percorso assoluto e impronta (dimensione, mtime, hash di testa e coda) di un dump delle etichette."""
+    return {"path": os.path.abspath(path), **fingerprint_file(path)}
+
+
+class EntityResolver:
+    """
+    Risolutore offline titolo -> entità DBpedia, su un dump delle etichette dei film.
+
+    Ogni etichetta è ridotta a una forma normalizzata (vedi `parse_title`)
+    con l'anno ricavato dall'etichetta o dall'URI. Le etichette sono
+    ordinate per forma normalizzata, per cui la corrispondenza esatta è una
+    ricerca binaria; quella approssimata usa l'indice invertito dei
+    trigrammi (posting list CSR) e la similarità di Dice. Tutti gli array
+    sono numerici o buffer di byte e vengono mappati in memoria al caricamento.
+
+    Attributes:
+        names (StringColumn): Forme normalizzate, in ordine.
+        uris (StringColumn): URI delle entità, nell'ordine delle forme.
+        labels (StringColumn): Etichette originali, nell'ordine delle forme.
+        years (ndarray): Anno di ogni etichetta (0 se sconosciuto).
+        gram_counts (ndarray): Numero di trigrammi distinti di ogni forma.
+        gram_keys (ndarray): Codici dei trigrammi (vedi `ngram_codes`), ordinati.
+        gram_indptr (ndarray): Inizio della posting list di ogni trigramma in `gram_rows`.
+        gram_rows (ndarray): Forme che contengono ogni trigramma.
+        source (dict): Percorso e impronta del dump da cui è stato costruito (None se costruito in memoria).
+    """
+
+    def __init__(self, names, uris, labels, years, gram_counts, gram_keys, gram_indptr, gram_rows, source=None):
+        self.names = names
+        self.uris = uris
+        self.labels = labels
+        self.years = years
+        self.gram_counts = gram_counts
+        self.gram_keys = gram_keys
+        self.gram_indptr = gram_indptr
+        self.gram_rows = gram_rows
+        self.source = source
+
+    def __len__(self):
+        return len(self.years)
+
+    @classmethod
+    def from_labels(cls, uris, labels):
+        """
+        Costruisce il risolutore da coppie (URI, etichetta).
+
+        Args:
+            uris (iterable): URI delle entità (anche ripetuti, con più etichette).
+            labels (iterable): Etichette; se vuote si usa il nome dell'URI.
+
+        Returns:
+            EntityResolver: Il risolutore.
+        """
+        rows = {}
+        for uri, label in zip(uris, labels):
+            label = label if isinstance(label, str) and label.strip() else _uri_name(uri)
+            names, year = parse_title(label)
+            year = year or parse_title(_uri_name(uri))[1]
+            if names:
+                rows.setdefault((names[0], uri), (label, year or 0))
+        entries = sorted(rows.items())
+        names = [name for (name, _), _ in entries]
+
+        # Trigrammi di tutte le forme in un passaggio vettoriale: codici dei caratteri, forma per forma
+        padded = [f" {name} " for name in names]
+        lengths = np.array([len(p) for p in padded], dtype=np.int64)
+        codes = np.frombuffer("".join(padded).encode("utf-32-le"), dtype=np.uint32).astype(np.int64)
+        owners = np.repeat(np.arange(len(names), dtype=np.int32), lengths)
+        n = NGRAM_SIZE
+        grams = np.zeros(max(len(codes) - n + 1, 0), dtype=np.int64)
+        for i in range(n):
+            grams = (grams << 21) | codes[i:len(codes) - n + 1 + i]
+        within = owners[:len(grams)] == owners[n - 1:]
+        grams, owners = grams[within], owners[:len(grams)][within]
+        order = np.lexsort((owners, grams))
+        grams, owners = grams[order], owners[order]
+        distinct = np.ones(len(grams), dtype=bool)
+        distinct[1:] = (grams[1:] != grams[:-1]) | (owners[1:] != owners[:-1])
+        grams, owners = grams[distinct], owners[distinct]
+
+        gram_keys, starts = np.unique(grams, return_index=True)
+        gram_indptr = np.append(starts, len(grams)).astype(np.int64)
+        gram_counts = np.bincount(owners, minlength=len(names)).astype(np.int32)
+        logger.info(f"Risolutore delle entità: {len(names)} etichette, {len(gram_keys)} trigrammi.")
+        name_offsets, name_data = columnar.encode_strings(names)
+        uri_offsets, uri_data = columnar.encode_strings([uri for (_, uri), _ in entries])
+        label_offsets, label_data = columnar.encode_strings([label for _, (label, _) in entries])
+        return cls(columnar.StringColumn(name_offsets, name_data), columnar.StringColumn(uri_offsets, uri_data),
+                   columnar.StringColumn(label_offsets, label_data),
+                   np.array([year for _, (_, year) in entries], dtype=np.int16),
+                   gram_counts, gram_keys, gram_indptr, owners)
+
+    @classmethod
+    def from_dump(cls, path, language="en"):
+        """Costruisce il risolutore da un dump delle etichette (vedi `read_label_dump`)."""
+        labels = read_label_dump(path, language)
+        resolver = cls.from_labels(labels["uri"], labels["label"])
+        resolver.source = dump_source(path)
+        return resolver
+
+    def save(self, directory=ENTITY_RESOLVER_PATH, name=ENTITY_RESOLVER_TABLE):
+        """
+        Salva il risolutore come tabella colonnare.
+
+        Args:
+            directory (str): Cartella del risolutore.
+            name (str): Nome della tabella.
+        """
+        columnar.save_table(directory, name, {
+            "name_offsets": self.names.offsets, "name_data": self.names.data,
+            "uri_offsets": self.uris.offsets, "uri_data": self.uris.data,
+            "label_offsets": self.labels.offsets, "label_data": self.labels.data,
+            "years": self.years, "gram_counts": self.gram_counts,
+            "gram_keys": self.gram_keys, "gram_indptr": self.gram_indptr, "gram_rows": self.gram_rows,
+        }, {"ngram_size": NGRAM_SIZE, "normalization": NORMALIZATION_VERSION, "source": self.source})
+
+    @classmethod
+    def load(cls, directory=ENTITY_RESOLVER_PATH, name=ENTITY_RESOLVER_TABLE, mmap_mode="r"):
+        """
+        Carica il risolutore mappando i file in memoria.
+
+        Args:
+            directory (str): Cartella del risolutore.
+            name (str): Nome della tabella.
+            mmap_mode (str): Modalità di np.load.
+
+        Returns:
+            EntityResolver: Il risolutore.
+
+        Raises:
+            ValueError: Se l'indice è stato costruito con n-grammi o una normalizzazione diversi.
+        """
+        columns, meta = columnar.load_table(directory, name, mmap_mode=mmap_mode)
+        if meta.get("ngram_size") != NGRAM_SIZE:
+            raise ValueError(f"Risolutore costruito con n-grammi di {meta.get('ngram_size')} caratteri, "
+                             f"attesi {NGRAM_SIZE}: ricostruirlo dal dump.")
+        if meta.get("normalization") != NORMALIZATION_VERSION:
+            raise ValueError(f"Risolutore costruito con la normalizzazione {meta.get('normalization')}, "
+                             f"attesa {NORMALIZATION_VERSION}: ricostruirlo dal dump.")
+        return cls(columnar.StringColumn(columns["name_offsets"], columns["name_data"]),
+                   columnar.StringColumn(columns["uri_offsets"], columns["uri_data"]),
+                   columnar.StringColumn(columns["label_offsets"], columns["label_data"]),
+                   columns["years"], columns["gram_counts"], columns["gram_keys"], columns["gram_indptr"],
+                   columns["gram_rows"], meta.get("source"))
+
+    def exact_rows(self, name):
+        """Righe delle etichette con la forma normalizzata indicata (ricerca binaria)."""
+        start = bisect.bisect_left(self.names, name)
+        stop = start
+        while stop < len(self.names) and self.names[stop] == name:
+            stop += 1
+        return np.arange(start, stop)
+
+    def similar_rows(self, name, min_similarity=MIN_SIMILARITY):
+        """
+        Etichette simili a una forma normalizzata, tramite l'indice dei trigrammi.
+
+        Args:
+            name (str): La forma normalizzata.
+            min_similarity (float): Similarità di Dice minima.
+
+        Returns:
+            tuple: (righe, similarità) dei candidati.
+        """
+        grams = ngram_codes(name)
+        positions = np.searchsorted(self.gram_keys, grams)
+        found = positions < len(self.gram_keys)
+        found[found] = self.gram_keys[positions[found]] == grams[found]
+        positions = positions[found]
+        if not len(positions):
+            return np.array([], dtype=np.int64), np.array([], dtype=np.float64)
+        postings = np.concatenate([self.gram_rows[self.gram_indptr[p]:self.gram_indptr[p + 1]] for p in positions])
+        rows, shared = np.unique(postings, return_counts=True)
+        similarity = 2.0 * shared / (len(grams) + self.gram_counts[rows])
+        keep = similarity >= min_similarity
+        return rows[keep], similarity[keep]
+
+    def resolve(self, title):
+        """
+        Trova l'entità DBpedia più probabile di un titolo.
+
+        La confidenza è la similarità del nome (1 per la corrispondenza
+        esatta, ridotta se i titoli differiscono per numeri o parole intere)
+        per un fattore che dipende dall'accordo sull'anno; se un'altra
+        entità ottiene quasi la stessa confidenza il risultato è
+        ambiguo e la confidenza viene ridotta. Le forme alternative del
+        titolo vengono usate solo se quella principale non ha una
+        corrispondenza esatta.
+
+        Args:
+            title (str): Titolo MovieLens (o qualsiasi titolo con l'anno opzionale tra parentesi).
+
+        Returns:
+            tuple: (URI, etichetta, confidenza, metodo 'exact' o 'ngram'); (None, None, 0.0, None)
+            se non c'è alcun candidato.
+        """
+        names, year = parse_title(title)
+        method = "exact"
+        # Le forme alternative servono solo se quella principale non ha una corrispondenza esatta
+        rows = next((rows for rows in map(self.exact_rows, names) if len(rows)), [])
+        similarity = np.ones(len(rows))
+        if not len(rows):
+            method = "ngram"
+            candidates = [self.similar_rows(name) for name in names]
+            if not any(len(r) for r, _ in candidates):
+                return None, None, 0.0, None
+            rows = np.concatenate([r for r, _ in candidates])
+            similarity = np.concatenate([s for _, s in candidates])
+            # Titoli quasi uguali con numeri o parole diversi sono altri film (seguiti, omonimi più lunghi)
+            queried = [name for name, (r, _) in zip(names, candidates) for _ in range(len(r))]
+            similarity = similarity * np.array([WORD_MISMATCH if _different_title(name, self.names[row]) else 1.0
+                                                for row, name in zip(rows, queried)])
+
+        years = np.asarray(self.years[rows], dtype=np.int64)
+        if year is None:
+            factor = np.full(len(rows), YEAR_UNKNOWN)
+        else:
+            factor = np.where(years == year, YEAR_MATCH,
+                              np.where((years == 0) | (np.abs(years - year) == 1), YEAR_UNKNOWN, YEAR_MISMATCH))
+        confidence = similarity * factor
+        order = np.argsort(-confidence, kind="stable")
+        best = rows[order[0]]
+        uri, best_confidence = self.uris[best], float(confidence[order[0]])
+        for position in order[1:]:
+            if confidence[position] < best_confidence - AMBIGUITY_MARGIN:
+                break
+            if self.uris[rows[position]] != uri:
+                best_confidence *= AMBIGUITY_PENALTY
+                break
+        return uri, self.labels[best], round(best_confidence, 4), method
+
+
+_worker_resolver = None
+
+def _init_resolver_worker(resolver):
+    """Memorizza il risolutore nel processo worker (una volta per processo)."""
+    global _worker_resolver
+    _worker_resolver = resolver
+
+def _resolve_chunk(titles):
+    """Risolve un blocco di titoli nel processo worker."""
+    return [_worker_resolver.resolve(title) for title in titles]
+
+
+def resolve_titles(titles, resolver, min_confidence=MIN_CONFIDENCE, n_workers=None,
+                   chunk_size=RESOLVE_CHUNK_SIZE):
+    """
+    Risolve molti titoli offline, a blocchi su un pool di processi.
+
+    Args:
+        titles (iterable): I titoli (i duplicati sono risolti una volta).
+        resolver (EntityResolver): Il risolutore.
+        min_confidence (float): Confidenza minima perché un titolo sia considerato risolto.
+        n_workers (int): Numero di processi (default: numero di CPU; 1 = nessun pool).
+        chunk_size (int): Titoli per task.
+
+    Returns:
+        DataFrame: Colonne 'title', 'uri', 'label', 'confidence' e 'method', una riga per
+        titolo in ingresso; 'uri' e 'label' sono vuoti (e 'method' è 'unresolved') se la
+        confidenza è sotto la soglia, che resta riportata.
+    """
+    titles = [str(title) for title in titles]
+    distinct = list(dict.fromkeys(titles))
+    chunks = [distinct[start:start + chunk_size] for start in range(0, len(distinct), chunk_size)]
+
+    n_workers = n_workers or os.cpu_count() or 1
+    if n_workers == 1 or len(chunks) <= 1:
+        _init_resolver_worker(resolver)
+        results = [_resolve_chunk(chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(n_workers, len(chunks)),
+                                 initializer=_init_resolver_worker, initargs=(resolver,)) as executor:
+            results = list(executor.map(_resolve_chunk, chunks))
+
+    matches = dict(zip(distinct, (match for chunk in results for match in chunk)))
+    rows = []
+    for title in titles:
+        uri, label, confidence, method = matches[title]
+        if confidence < min_confidence:
+            uri, label, method = None, None, "unresolved"
+        rows.append((title, uri, label, confidence, method))
+    resolved = pd.DataFrame(rows, columns=["title", "uri", "label", "confidence", "method"])
+    logger.info(f"Risolti offline {resolved['uri'].notna().sum()} titoli su {len(resolved)}.")
+    return resolved
+
+
+def resolve_movies(movies, resolver, min_confidence=MIN_CONFIDENCE, n_workers=None):
+    """
+    Risolve i titoli del catalogo e aggiunge le colonne del risultato.
+
+    Args:
+        movies (DataFrame): DataFrame dei film con la colonna 'title'.
+        resolver (EntityResolver): Il risolutore.
+        min_confidence (float): Confidenza minima perché un titolo sia considerato risolto.
+        n_workers (int): Numero di processi.
+
+    Returns:
+        DataFrame: I film con le colonne 'dbpediaUri', 'dbpediaLabel', 'resolverConfidence'
+        e 'resolverMethod'.
+    """
+    resolved = resolve_titles(movies["title"], resolver, min_confidence, n_workers)
+    movies["dbpediaUri"] = resolved["uri"].to_numpy()
+    movies["dbpediaLabel"] = resolved["label"].to_numpy()
+    movies["resolverConfidence"] = resolved["confidence"].to_numpy()
+    movies["resolverMethod"] = resolved["method"].to_numpy()
+    return movies
+
+
+def load_entity_resolver(directory=ENTITY_RESOLVER_PATH, labels_path=LABELS_DUMP_PATH):
+    """
+    Carica il risolutore salvato o lo (ri)costruisce dal dump e lo salva.
+
+    L'indice salvato viene ricostruito se manca, se è stato costruito con una
+    normalizzazione diversa o se il dump indicato non è quello da cui è stato
+    costruito (percorso o impronta diversi, es. un dump più recente). Senza il
+    dump si usa l'indice salvato, se compatibile.
+
+    Args:
+        directory (str): Cartella del risolutore.
+        labels_path (str): Dump delle etichette.
+
+    Returns:
+        EntityResolver: Il risolutore, o None se non c'è né un indice utilizzabile né il dump.
+    """
+    has_dump = bool(labels_path) and os.path.exists(labels_path)
+    if columnar.has_table(directory, ENTITY_RESOLVER_TABLE):
+        try:
+            resolver = EntityResolver.load(directory, ENTITY_RESOLVER_TABLE)
+        except ValueError as e:
+            logger.warning(f"Risolutore salvato non utilizzabile: {e}")
+        else:
+            if not has_dump or resolver.source == dump_source(labels_path):
+                return resolver
+            logger.info(f"Il risolutore salvato non corrisponde a '{labels_path}': verrà ricostruito.")
+    if not has_dump:
+        return None
+    logger.info(f"Costruzione del risolutore delle entità da '{labels_path}'...")
+    resolver = EntityResolver.from_dump(labels_path)
+    resolver.save(directory, ENTITY_RESOLVER_TABLE)
+    return resolver
+
+
+if __name__ == "__main__":
+    # Stessa esecuzione di `filminsight resolve`, che configura logging e variabili d'ambiente
+    from cli import main
+    sys.exit(main(["resolve"] + sys.argv[1:]))
@@ -1,28 +1,235 @@
+import logging
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from recommender import recommend_for_users
+from scoring import GenreScorer
+
+logger = logging.getLogger(__name__)
+
+RELEVANCE_THRESHOLD = 4.0  # Rating minimo perché un film del test sia considerato rilevante
+METRICS = ["precision", "recall", "map", "ndcg", "hit_rate"]
+
+
 def precision_at_k(recommendations, relevant_items, k):
     """Calcola la Precision@K."""
     if k == 0:
         return 0
-    recommended_k = recommendations[:k]
-    relevant_and_recommended = set(recommended_k).intersection(set(relevant_items))
-    return len(relevant_and_recommended) / k
+    return len(set(recommendations[:k]).intersection(relevant_items)) / k
 
 def recall_at_k(recommendations, relevant_items, k):
     """Calcola la Recall@K."""
     if not relevant_items:  # Se non ci sono articoli rilevanti
         return 0
-    recommended_k = recommendations[:k]
-    relevant_and_recommended = set(recommended_k).intersection(set(relevant_items))
-    return len(relevant_and_recommended) / len(relevant_items)
+    return len(set(recommendations[:k]).intersection(relevant_items)) / len(relevant_items)
 
 def mean_average_precision(recommendations, relevant_items, k):
     """
-    Calcola la Mean Average Precision (MAP) @K.
+    Calcola la Average Precision @K di un utente (la media sugli utenti è la MAP@K).
+
+    La precisione viene accumulata solo nelle posizioni dei film rilevanti e
+    normalizzata per min(numero di film rilevanti, K), in un'unica passata O(K).
     """
     if not relevant_items:  # Se non ci sono articoli rilevanti
         return 0
-    
-    avg_precision = 0
-    for i in range(1, k + 1):
-        avg_precision += precision_at_k(recommendations, relevant_items, i)
-    
-    return avg_precision / k
+
+    relevant = set(relevant_items)
+    hits, avg_precision = 0, 0
+    for i, item in enumerate(recommendations[:k], start=1):
+        if item in relevant:
+            hits += 1
+            avg_precision += hits / i
+
+    return avg_precision / min(len(relevant), k)
+
+def relevance_matrix(user_codes, item_codes, n_users, n_items):
+    """
+    Costruisce la matrice sparsa di rilevanza utenti x film.
+
+    Args:
+        user_codes (ndarray): Riga (utente) di ogni coppia rilevante.
+        item_codes (ndarray): Colonna (film) di ogni coppia rilevante; i valori negativi vengono ignorati.
+        n_users (int): Numero di utenti.
+        n_items (int): Numero di film.
+
+    Returns:
+        csr_matrix: Matrice booleana con indici ordinati e senza duplicati.
+    """
+    user_codes, item_codes = np.asarray(user_codes), np.asarray(item_codes)
+    valid = (user_codes >= 0) & (item_codes >= 0)
+    matrix = sparse.csr_matrix((np.ones(valid.sum(), dtype=bool), (user_codes[valid], item_codes[valid])),
+                               shape=(n_users, n_items))
+    matrix.sum_duplicates()
+    matrix.sort_indices()
+    return matrix
+
+def hit_matrix(recommendations, relevance):
+    """
+    Indica quali raccomandazioni sono rilevanti.
+
+    Le coppie (utente, film) vengono codificate come interi e cercate con una
+    ricerca binaria tra le coppie rilevanti, senza cicli per utente.
+
+    Args:
+        recommendations (ndarray): Film raccomandati (utenti x K, -1 per le posizioni vuote).
+        relevance (csr_matrix): Matrice di rilevanza utenti x film.
+
+    Returns:
+        ndarray: Matrice booleana utenti x K.
+    """
+    recommendations = np.asarray(recommendations, dtype=np.int64)
+    n_items = relevance.shape[1]
+    relevance = relevance.tocsr()
+    relevance.sort_indices()
+    rows = np.repeat(np.arange(relevance.shape[0], dtype=np.int64), np.diff(relevance.indptr))
+    relevant_keys = rows * n_items + relevance.indices
+    keys = np.arange(len(recommendations), dtype=np.int64)[:, None] * n_items + recommendations
+    if not len(relevant_keys):
+        return np.zeros(recommendations.shape, dtype=bool)
+    positions = np.minimum(np.searchsorted(relevant_keys, keys), len(relevant_keys) - 1)
+    return (relevant_keys[positions] == keys) & (recommendations >= 0)
+
+def evaluate_at_k(recommendations, relevance, k):
+    """
+    Calcola le metriche @K di tutti gli utenti in modo vettoriale.
+
+    Args:
+        recommendations (ndarray): Film raccomandati in ordine di punteggio (utenti x almeno K, -1 per le posizioni vuote).
+        relevance (csr_matrix): Matrice di rilevanza utenti x film.
+        k (int): Numero di raccomandazioni considerate.
+
+    Returns:
+        DataFrame: Una riga per utente con 'precision', 'recall', 'map' (AP dell'utente),
+        'ndcg', 'hit_rate' e 'relevant' (numero di film rilevanti).
+    """
+    hits = hit_matrix(np.asarray(recommendations)[:, :k], relevance).astype(np.float64)
+    n_relevant = np.diff(relevance.tocsr().indptr)
+    ranks = np.arange(1, hits.shape[1] + 1)
+    n_hits = hits.sum(axis=1)
+    capped = np.minimum(n_relevant, k)
+
+    discounts = 1.0 / np.log2(ranks + 1)
+    ideal = np.concatenate(([0.0], np.cumsum(1.0 / np.log2(np.arange(1, k + 1) + 1))))[capped]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        metrics = {
+            "precision": n_hits / k if k else np.zeros(len(hits)),
+            "recall": np.where(n_relevant > 0, n_hits / n_relevant, 0.0),
+            "map": np.where(capped > 0, (hits * np.cumsum(hits, axis=1) / ranks).sum(axis=1) / capped, 0.0),
+            "ndcg": np.where(capped > 0, (hits * discounts).sum(axis=1) / ideal, 0.0),
+            "hit_rate": (n_hits > 0).astype(np.float64),
+        }
+    return pd.DataFrame(dict(metrics, relevant=n_relevant))
+
+def summarize(per_user):
+    """
+    Media delle metriche sugli utenti con almeno un film rilevante.
+
+    Args:
+        per_user (DataFrame): Risultato di `evaluate_at_k`.
+
+    Returns:
+        dict: Media di ogni metrica e numero di utenti valutati.
+    """
+    evaluated = per_user[per_user["relevant"] > 0]
+    summary = {metric: float(evaluated[metric].mean()) if len(evaluated) else 0.0 for metric in METRICS}
+    summary["users"] = len(evaluated)
+    return summary
+
+def temporal_split(ratings, test_fraction=0.2, cutoff=None):
+    """
+    Divide i rating in train e test in base al timestamp.
+
+    Con `cutoff` la divisione è globale (test = rating successivi al cutoff);
+    altrimenti per ogni utente finisce nel test l'ultima frazione dei suoi
+    rating in ordine di tempo, lasciando almeno un rating nel train.
+
+    Args:
+        ratings (DataFrame): DataFrame dei rating con le colonne 'userId' e 'timestamp'.
+        test_fraction (float): Frazione dei rating di ogni utente destinata al test.
+        cutoff (int): Timestamp di separazione globale.
+
+    Returns:
+        tuple: (train, test), DataFrame con le colonne originali.
+    """
+    timestamps = ratings["timestamp"].to_numpy()
+    if cutoff is not None:
+        is_test = timestamps >= cutoff
+    else:
+        users = ratings["userId"].to_numpy()
+        order = np.lexsort((timestamps, users))
+        sorted_users = users[order]
+        starts = np.flatnonzero(np.r_[True, sorted_users[1:] != sorted_users[:-1]])
+        counts = np.diff(np.r_[starts, len(order)])
+        # Posizione di ogni rating nella storia dell'utente e numero di rating di test dell'utente
+        position = np.arange(len(order)) - np.repeat(starts, counts)
+        n_test = np.minimum(np.floor(counts * test_fraction).astype(np.int64), counts - 1)
+        is_test = np.empty(len(order), dtype=bool)
+        is_test[order] = position >= np.repeat(counts - n_test, counts)
+    return ratings[~is_test], ratings[is_test]
+
+def recommendation_array(recommendations, user_ids, scorer, k):
+    """
+    Converte l'output di `recommend_for_users` in una matrice utenti x K di righe del catalogo.
+
+    Args:
+        recommendations (DataFrame): Colonne 'userId' e 'movieId', ordinate per utente e punteggio.
+        user_ids (ndarray): Utenti, nell'ordine delle righe del risultato.
+        scorer (GenreScorer): Motore dei generi del catalogo.
+        k (int): Numero di colonne.
+
+    Returns:
+        ndarray: Righe del catalogo raccomandate (-1 per le posizioni vuote).
+    """
+    result = np.full((len(user_ids), k), -1, dtype=np.int64)
+    codes = pd.Index(user_ids).get_indexer(recommendations["userId"].to_numpy())
+    if not len(codes):
+        return result
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    rank = np.arange(len(codes)) - np.repeat(starts, np.diff(np.r_[starts, len(codes)]))
+    keep = rank < k
+    result[codes[keep], rank[keep]] = scorer.rows(recommendations["movieId"].to_numpy())[keep]
+    return result
+
+def evaluate_recommender(train, test, movies, k=10, relevance_threshold=RELEVANCE_THRESHOLD,
+                         scorer=None, n_workers=None):
+    """
+    Valutazione offline del recommender su una divisione train/test.
+
+    Le raccomandazioni di tutti gli utenti del test vengono calcolate dal
+    train con `recommend_for_users` (a blocchi, su un pool di processi); i film
+    del test con rating >= `relevance_threshold` sono quelli rilevanti.
+
+    Args:
+        train (DataFrame): Rating usati per le raccomandazioni.
+        test (DataFrame): Rating usati come verità di riferimento.
+        movies (DataFrame): DataFrame dei film.
+        k (int): Numero di raccomandazioni per utente.
+        relevance_threshold (float): Rating minimo di un film rilevante.
+        scorer (GenreScorer): Motore dei generi già costruito su `movies`.
+        n_workers (int): Numero di processi (default: numero di CPU).
+
+    Returns:
+        tuple: (metriche per utente con la colonna 'userId', medie delle metriche).
+    """
+    if scorer is None:
+        scorer = GenreScorer.from_movies(movies)
+    user_ids = np.unique(test["userId"].to_numpy())
+    logger.info(f"Valutazione di {len(user_ids)} utenti @ {k}...")
+    recommendations = recommend_for_users(user_ids, train, movies, top_k=k, scorer=scorer, n_workers=n_workers)
+
+    relevant = test[test["rating"] >= relevance_threshold]
+    relevance = relevance_matrix(pd.Index(user_ids).get_indexer(relevant["userId"].to_numpy()),
+                                 scorer.rows(relevant["movieId"].to_numpy()), len(user_ids), len(scorer))
+    per_user = evaluate_at_k(recommendation_array(recommendations, user_ids, scorer, k), relevance, k)
+    per_user.insert(0, "userId", user_ids)
+    return per_user, summarize(per_user)
+
+if __name__ == "__main__":
+    # Stessa esecuzione di `filminsight evaluate`
+    import sys
+
+    from cli import main
+
+    sys.exit(main(["evaluate"] + sys.argv[1:]))
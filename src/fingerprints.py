@@ -0,0 +1,186 @@
+import hashlib
+import io
+import json
+import logging
+import os
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+BLOCK_SIZE = 64 * 1024  # Byte confrontati in testa e in coda a ogni file
+
+UNCHANGED = "unchanged"
+APPENDED = "appended"
+MODIFIED = "modified"
+NEW = "new"
+
+
+def _hash_range(path, start, end):
+    """Calcola lo SHA-1 dei byte [start, end) di un file."""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            chunk = f.read(min(remaining, BLOCK_SIZE))
+            if not chunk:
+                break
+            digest.update(chunk)
+            remaining -= len(chunk)
+    return digest.hexdigest()
+
+
+def fingerprint_file(path):
+    """
+    Calcola l'impronta di un file: dimensione, mtime e hash del primo e dell'ultimo blocco.
+
+    Args:
+        path (str): Percorso del file.
+
+    Returns:
+        dict: L'impronta del file.
+    """
+    stat = os.stat(path)
+    size = stat.st_size
+    with open(path, "rb") as f:
+        f.seek(max(size - 1, 0))
+        last_byte = f.read(1)
+    return {
+        "size": size,
+        "mtime": stat.st_mtime,
+        "head_hash": _hash_range(path, 0, min(BLOCK_SIZE, size)),
+        "tail_hash": _hash_range(path, max(size - BLOCK_SIZE, 0), size),
+        "ends_with_newline": last_byte == b"\n",
+    }
+
+
+def detect_change(path, previous, current=None):
+    """
+    Confronta un file con la sua impronta precedente.
+
+    Un file è considerato "appended" quando è cresciuto e i byte già
+    elaborati (primo e ultimo blocco) sono identici: in quel caso solo la
+    coda a partire da `previous["size"]` è nuova.
+
+    Args:
+        path (str): Percorso del file.
+        previous (dict): Impronta salvata all'elaborazione precedente (o None).
+        current (dict): Impronta presa prima di leggere il file (default: stato attuale del file).
+
+    Returns:
+        str: Uno tra UNCHANGED, APPENDED, MODIFIED e NEW.
+    """
+    if not previous:
+        return NEW
+    size, mtime = (current["size"], current["mtime"]) if current else (os.path.getsize(path), os.path.getmtime(path))
+    old_size = previous["size"]
+    if size == old_size and mtime == previous["mtime"]:
+        return UNCHANGED
+    if size < old_size:
+        return MODIFIED
+
+    same_head = _hash_range(path, 0, min(BLOCK_SIZE, old_size)) == previous["head_hash"]
+    same_tail = _hash_range(path, max(old_size - BLOCK_SIZE, 0), old_size) == previous["tail_hash"]
+    if not (same_head and same_tail):
+        return MODIFIED
+    if size == old_size:
+        return UNCHANGED
+    # Se l'ultima riga non era terminata, la coda la modifica invece di aggiungerne una nuova
+    return APPENDED if previous["ends_with_newline"] else MODIFIED
+
+
+class _RangeFile(io.RawIOBase):
+    """File in sola lettura con l'intestazione di un CSV seguita dai soli byte [start, end)."""
+
+    def __init__(self, path, start, end):
+        self._file = open(path, "rb")
+        self._prefix = self._file.readline() if start > 0 else b""
+        self._file.seek(start)
+        self._remaining = max(end - start, 0)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self._prefix:
+            n = min(len(buffer), len(self._prefix))
+            buffer[:n] = self._prefix[:n]
+            self._prefix = self._prefix[n:]
+            return n
+        n = self._file.readinto(memoryview(buffer)[:min(len(buffer), self._remaining)])
+        self._remaining -= n
+        return n
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+def open_rows(path, start=0, end=None):
+    """
+    Apre un CSV limitato ai byte [start, end), preceduto dall'intestazione se start > 0.
+
+    Permette di leggere esattamente i byte descritti da un'impronta, anche se
+    il file continua a crescere durante la lettura.
+
+    Args:
+        path (str): Percorso del CSV.
+        start (int): Primo byte da leggere (inizio di una riga).
+        end (int): Byte successivo all'ultimo da leggere (default: fine del file).
+
+    Returns:
+        BufferedReader: Il file aperto, da passare a `pd.read_csv`.
+    """
+    return io.BufferedReader(_RangeFile(path, start, os.path.getsize(path) if end is None else end))
+
+
+def read_appended_rows(path, offset, end=None, **read_csv_kwargs):
+    """
+    Legge solo le righe di un CSV aggiunte dopo `offset` byte.
+
+    Args:
+        path (str): Percorso del CSV.
+        offset (int): Byte già elaborati (fine dell'ultima riga elaborata).
+        end (int): Byte successivo all'ultimo da leggere (default: fine del file).
+        **read_csv_kwargs: Argomenti aggiuntivi per `pd.read_csv`.
+
+    Returns:
+        DataFrame: Le nuove righe, con le colonne dell'intestazione del file.
+    """
+    with open_rows(path, offset, end) as f:
+        return pd.read_csv(f, **read_csv_kwargs)
+
+
+def load_state(path):
+    """
+    Carica le impronte salvate all'elaborazione precedente.
+
+    Args:
+        path (str): Percorso del file di stato.
+
+    Returns:
+        dict: Impronte per nome di file (vuoto se lo stato non esiste o è illeggibile).
+    """
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (json.JSONDecodeError, OSError) as e:
+        logger.warning(f"Stato delle impronte illeggibile ({e}): verrà eseguita un'elaborazione completa.")
+        return {}
+
+
+def save_state(path, state):
+    """
+    Salva le impronte in modo atomico.
+
+    Args:
+        path (str): Percorso del file di stato.
+        state (dict): Impronte per nome di file.
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=4)
+    os.replace(tmp_path, path)
@@ -0,0 +1,230 @@
+"""
+Strumentazione leggera dei percorsi critici: contatori, istogrammi di latenza e span temporizzati.
+
+È disattivata per default: finché `enable()` non viene chiamata (o la
+variabile d'ambiente FILMINSIGHT_METRICS non vale 1) ogni funzione ritorna
+subito e `span` restituisce un contesto vuoto condiviso. Le metriche sono per
+processo e si esportano come dizionario (`snapshot`) o nel formato testuale di
+Prometheus (`prometheus_text`).
+
+Esempio:
+    instrumentation.enable()
+    with instrumentation.span("recommend_stage_seconds", stage="score"):
+        ...
+    instrumentation.increment("result_cache_requests_total", result="hit")
+    print(instrumentation.prometheus_text())
+"""
+import bisect
+import contextlib
+import math
+import os
+import threading
+import time
+
+METRIC_PREFIX = "filminsight_"
+# Limiti superiori (secondi) dei bucket degli istogrammi di latenza
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0)
+
+_enabled = os.getenv("FILMINSIGHT_METRICS", "") == "1"
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_null_span = contextlib.nullcontext()
+
+
+def enable():
+    """Attiva la raccolta delle metriche."""
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    """Disattiva la raccolta delle metriche (quelle già raccolte restano disponibili)."""
+    global _enabled
+    _enabled = False
+
+
+def enabled():
+    """Indica se la raccolta delle metriche è attiva."""
+    return _enabled
+
+
+def reset():
+    """Azzera tutte le metriche raccolte."""
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+def _key(name, labels):
+    # Valori delle etichette come stringhe: serie con valori di tipo diverso restano ordinabili nell'export
+    return name, tuple(sorted((label, str(value)) for label, value in labels.items()))
+
+
+def increment(name, value=1, **labels):
+    """
+    Incrementa un contatore.
+
+    Args:
+        name (str): Nome del contatore (es. 'result_cache_requests_total').
+        value (float): Incremento.
+        **labels: Etichette della serie (es. result='hit').
+    """
+    if not _enabled:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name, value, buckets=LATENCY_BUCKETS, **labels):
+    """
+    Registra un valore in un istogramma a bucket fissi.
+
+    Args:
+        name (str): Nome dell'istogramma (es. 'recommend_seconds').
+        value (float): Valore osservato.
+        buckets (tuple): Limiti superiori dei bucket, usati alla creazione dell'istogramma.
+        **labels: Etichette della serie.
+    """
+    if not _enabled:
+        return
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = {"buckets": tuple(buckets), "counts": [0] * (len(buckets) + 1),
+                                            "sum": 0.0, "count": 0}
+        histogram["counts"][bisect.bisect_left(histogram["buckets"], value)] += 1
+        histogram["sum"] += value
+        histogram["count"] += 1
+
+
+class _Span:
+    __slots__ = ("name", "labels", "started")
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        observe(self.name, time.perf_counter() - self.started, **self.labels)
+        return False
+
+
+def span(name, **labels):
+    """
+    Misura la durata di un blocco e la registra nell'istogramma `name` (in secondi).
+
+    Args:
+        name (str): Nome dell'istogramma (es. 'recommend_stage_seconds').
+        **labels: Etichette della serie (es. stage='score').
+
+    Returns:
+        Un context manager (vuoto se la strumentazione è disattivata).
+    """
+    if not _enabled:
+        return _null_span
+    return _Span(name, labels)
+
+
+def _quantile(histogram, q):
+    """Stima un quantile dall'istogramma (limite superiore del bucket che lo contiene)."""
+    if not histogram["count"]:
+        return 0.0
+    target = q * histogram["count"]
+    cumulative = 0
+    for bound, count in zip(histogram["buckets"] + (math.inf,), histogram["counts"]):
+        cumulative += count
+        if cumulative >= target:
+            return bound
+    return math.inf
+
+
+def _series_name(name, labels):
+    if not labels:
+        return name
+    return name + "{" + ",".join(f"{label}={value}" for label, value in labels) + "}"
+
+
+def snapshot():
+    """
+    Fotografia delle metriche raccolte.
+
+    Returns:
+        dict: 'counters' (serie -> valore) e 'histograms' (serie -> count, sum, mean,
+        p50, p99 stimati e conteggi per bucket).
+    """
+    with _lock:
+        counters = {_series_name(*key): value for key, value in _counters.items()}
+        histograms = {}
+        for key, histogram in _histograms.items():
+            histograms[_series_name(*key)] = {
+                "count": histogram["count"],
+                "sum": histogram["sum"],
+                "mean": histogram["sum"] / histogram["count"] if histogram["count"] else 0.0,
+                "p50": _quantile(histogram, 0.5),
+                "p99": _quantile(histogram, 0.99),
+                "buckets": dict(zip([str(b) for b in histogram["buckets"]] + ["+Inf"], histogram["counts"])),
+            }
+    return {"counters": counters, "histograms": histograms}
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{label}="{value}"' for (label, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def prometheus_text(gauges=None):
+    """
+    Esporta le metriche nel formato testuale di Prometheus (versione 0.0.4).
+
+    Args:
+        gauges (dict): Valori istantanei aggiuntivi (nome -> valore), es. quelli del servizio.
+
+    Returns:
+        str: Il testo dell'esposizione.
+    """
+    lines = []
+    with _lock:
+        counters = sorted(_counters.items())
+        histograms = sorted((key, dict(h, counts=list(h["counts"]))) for key, h in _histograms.items())
+
+    for name, value in sorted((gauges or {}).items()):
+        lines.append(f"# TYPE {METRIC_PREFIX}{name} gauge")
+        lines.append(f"{METRIC_PREFIX}{name} {_format_value(value)}")
+
+    previous = None
+    for (name, labels), value in counters:
+        if name != previous:
+            lines.append(f"# TYPE {METRIC_PREFIX}{name} counter")
+            previous = name
+        lines.append(f"{METRIC_PREFIX}{name}{_format_labels(labels)} {_format_value(value)}")
+
+    previous = None
+    for (name, labels), histogram in histograms:
+        if name != previous:
+            lines.append(f"# TYPE {METRIC_PREFIX}{name} histogram")
+            previous = name
+        cumulative = 0
+        for bound, count in zip(histogram["buckets"] + (math.inf,), histogram["counts"]):
+            cumulative += count
+            le = _format_labels(labels, [("le", _format_value(bound))])
+            lines.append(f"{METRIC_PREFIX}{name}_bucket{le} {cumulative}")
+        lines.append(f"{METRIC_PREFIX}{name}_sum{_format_labels(labels)} {_format_value(histogram['sum'])}")
+        lines.append(f"{METRIC_PREFIX}{name}_count{_format_labels(labels)} {histogram['count']}")
+    return "\n".join(lines) + "\n"
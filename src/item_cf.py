@@ -0,0 +1,99 @@
+import logging
+import os
+
+import numpy as np
+from scipy import sparse
+
+from neighbors import NeighborIndex
+
+logger = logging.getLogger(__name__)
+
+ITEM_CF_PATH = os.getenv("ITEM_CF_PATH", "data/processed/item_cf/")
+ITEM_CF_TABLE = "item_cf"
+CF_NEIGHBORS = 50  # Vicini salvati per film
+SIMILARITIES = ("cosine", "adjusted_cosine")
+
+
+def rating_matrix(ratings):
+    """
+    Costruisce la matrice sparsa film x utenti dei rating.
+
+    Le righe sono i film valutati almeno una volta, in ordine di ID; se un
+    utente ha valutato più volte lo stesso film vale l'ultimo rating letto.
+
+    Args:
+        ratings (DataFrame): Colonne 'userId', 'movieId' e 'rating'.
+
+    Returns:
+        tuple: (csr_matrix float32 film x utenti, ID dei film, ID degli utenti).
+    """
+    movie_ids, item_codes = np.unique(ratings["movieId"].to_numpy(), return_inverse=True)
+    user_ids, user_codes = np.unique(ratings["userId"].to_numpy(), return_inverse=True)
+    values = ratings["rating"].to_numpy().astype(np.float32)
+    # Tiene l'ultimo rating di ogni coppia (film, utente) invece di sommarli
+    keys = item_codes.astype(np.int64) * len(user_ids) + user_codes
+    _, last = np.unique(keys[::-1], return_index=True)
+    last = len(keys) - 1 - last
+    matrix = sparse.csr_matrix((values[last], (item_codes[last], user_codes[last])),
+                               shape=(len(movie_ids), len(user_ids)), dtype=np.float32)
+    return matrix, movie_ids, user_ids
+
+
+def center_by_user(matrix):
+    """
+    Sottrae a ogni rating la media dei rating dell'utente (similarità coseno aggiustata).
+
+    Args:
+        matrix (csr_matrix): Matrice film x utenti.
+
+    Returns:
+        csr_matrix: La matrice centrata, con la stessa struttura di non zeri.
+    """
+    matrix = matrix.tocsr(copy=True)
+    counts = np.bincount(matrix.indices, minlength=matrix.shape[1])
+    sums = np.bincount(matrix.indices, weights=matrix.data, minlength=matrix.shape[1])
+    means = sums / np.maximum(counts, 1)
+    matrix.data = (matrix.data - means[matrix.indices]).astype(np.float32)
+    return matrix
+
+
+def build_item_cf(ratings, n_neighbors=CF_NEIGHBORS, similarity="adjusted_cosine", min_similarity=0.0,
+                  n_workers=None):
+    """
+    Precalcola i film più simili di ogni film in base ai rating degli utenti (item-item CF).
+
+    I vicini sono calcolati da `neighbors.top_neighbors` a blocchi di film su
+    un pool di processi, con memoria limitata dalla dimensione del blocco;
+    vengono conservati solo i vicini con similarità maggiore di `min_similarity`.
+
+    Args:
+        ratings (DataFrame): Colonne 'userId', 'movieId' e 'rating'.
+        n_neighbors (int): Vicini per film.
+        similarity (str): 'cosine' oppure 'adjusted_cosine' (rating centrati sulla media dell'utente).
+        min_similarity (float): Similarità minima (esclusa) di un vicino.
+        n_workers (int): Numero di processi (default: numero di CPU).
+
+    Returns:
+        NeighborIndex: L'indice dei vicini.
+    """
+    if similarity not in SIMILARITIES:
+        raise ValueError(f"Similarità sconosciuta: {similarity}")
+    matrix, movie_ids, user_ids = rating_matrix(ratings)
+    if similarity == "adjusted_cosine":
+        matrix = center_by_user(matrix)
+    logger.info(f"Item-item CF ({similarity}) su {len(movie_ids)} film e {len(user_ids)} utenti...")
+    return NeighborIndex.from_matrix(movie_ids, matrix, n_neighbors, min_similarity, n_workers)
+
+
+def load_item_cf(directory=ITEM_CF_PATH):
+    """Carica i vicini dell'item-item CF salvati, mappati in memoria."""
+    return NeighborIndex.load(directory, ITEM_CF_TABLE)
+
+
+if __name__ == "__main__":
+    from recommender import load_raw_data
+
+    _, ratings = load_raw_data()
+    index = build_item_cf(ratings)
+    index.save(ITEM_CF_PATH, ITEM_CF_TABLE)
+    logger.info(f"Vicini dell'item-item CF salvati in {ITEM_CF_PATH} ({len(index)} film).")
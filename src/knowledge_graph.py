@@ -0,0 +1,395 @@
+import bisect
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+import columnar
+from scoring import split_genres
+
+logger = logging.getLogger(__name__)
+
+KNOWLEDGE_GRAPH_PATH = os.getenv("KNOWLEDGE_GRAPH_PATH", "data/processed/knowledge_graph/")
+KNOWLEDGE_GRAPH_TABLE = "knowledge_graph"
+MOVIELENS_GENRE_PREFIX = "movielens:genre:"  # URI dei generi MovieLens, che non hanno un'entità DBpedia
+
+# Colonna dei film -> relazione del grafo
+RELATION_COLUMNS = {"genres": "movielens_genre", "director": "director", "starring": "actor", "genre": "genre"}
+# Peso degli archi per relazione: i generi collegano molti più film di un regista o di un attore
+RELATION_WEIGHTS = {"movielens_genre": 0.25, "director": 1.0, "actor": 1.0, "genre": 0.5}
+
+DAMPING = 0.85  # Probabilità di proseguire la passeggiata a ogni passo (1 - probabilità di ritorno)
+PPR_ITERATIONS = 10  # Iterazioni massime della propagazione (ognuna film -> entità -> film)
+PPR_TOLERANCE = 1e-4  # Variazione L1 massima dei punteggi per fermarsi prima
+PPR_BLOCK_SIZE = 64  # Utenti per blocco: limita le matrici dense (nodi x utenti) in memoria
+
+
+def split_uris(value):
+    """
+    Divide un campo di entità (stringa separata da '|' o lista) negli URI che contiene.
+
+    Args:
+        value (str | list): Il valore della colonna (altri tipi producono una lista vuota).
+
+    Returns:
+        list: Gli URI, senza spazi iniziali e finali.
+    """
+    if isinstance(value, str):
+        value = value.split('|')
+    elif not isinstance(value, list):
+        return []
+    uris = (str(item).strip() for item in value)
+    return [uri for uri in uris if uri]
+
+
+class KnowledgeGraph:
+    """
+    Grafo bipartito film <-> entità (registi, attori, generi DBpedia e MovieLens).
+
+    Gli URI delle entità sono internati in ID interi in ordine lessicografico
+    e conservati come un unico buffer di byte UTF-8 con gli offset; gli archi
+    sono due matrici di adiacenza CSR (film -> entità con la relazione di
+    ogni arco, entità -> film). Tutti gli array sono numerici e vengono
+    mappati in memoria al caricamento.
+
+    Attributes:
+        movie_ids (ndarray): ID dei film, nell'ordine delle righe.
+        movie_indptr (ndarray): Inizio degli archi di ogni film in `movie_entities`.
+        movie_entities (ndarray): Entità collegate, film per film.
+        movie_relations (ndarray): Relazione di ogni arco (indice in `relations`).
+        entity_indptr (ndarray): Inizio dei film di ogni entità in `entity_movies`.
+        entity_movies (ndarray): Righe dei film collegati, entità per entità.
+        relations (list): Nomi delle relazioni.
+    """
+
+    def __init__(self, movie_ids, movie_indptr, movie_entities, movie_relations, entity_indptr, entity_movies,
+                 entity_offsets, entity_data, relations):
+        self.movie_ids = np.asarray(movie_ids)
+        self.movie_indptr = movie_indptr
+        self.movie_entities = movie_entities
+        self.movie_relations = movie_relations
+        self.entity_indptr = entity_indptr
+        self.entity_movies = entity_movies
+        self.entity_offsets = entity_offsets
+        self.entity_data = entity_data
+        self.relations = list(relations)
+        self.uris = columnar.StringColumn(entity_offsets, entity_data)
+        self._positions = pd.Index(self.movie_ids)
+        self._transitions = {}
+
+    def __len__(self):
+        return len(self.movie_ids)
+
+    @property
+    def n_entities(self):
+        return len(self.entity_indptr) - 1
+
+    @property
+    def n_edges(self):
+        return len(self.movie_entities)
+
+    @classmethod
+    def from_movies(cls, movies, relation_columns=RELATION_COLUMNS):
+        """
+        Costruisce il grafo dalle colonne di entità dei film arricchiti.
+
+        Args:
+            movies (DataFrame): DataFrame dei film (le colonne assenti vengono ignorate).
+            relation_columns (dict): Colonna -> relazione.
+
+        Returns:
+            KnowledgeGraph: Il grafo.
+        """
+        movie_ids = movies["movieId"].to_numpy()
+        relations, rows, uris, codes = [], [], [], []
+        for column, relation in relation_columns.items():
+            if column not in movies.columns:
+                continue
+            if column == "genres":
+                values = [[f"{MOVIELENS_GENRE_PREFIX}{genre}" for genre in split_genres(genres)
+                           if genre != "(no genres listed)"] for genres in movies[column]]
+            else:
+                values = [split_uris(value) for value in movies[column]]
+            counts = np.fromiter((len(v) for v in values), dtype=np.int64, count=len(values))
+            rows.append(np.repeat(np.arange(len(values)), counts))
+            uris.extend(uri for v in values for uri in v)
+            codes.append(np.full(counts.sum(), len(relations), dtype=np.int8))
+            relations.append(relation)
+
+        rows = np.concatenate(rows) if rows else np.array([], dtype=np.int64)
+        codes = np.concatenate(codes) if codes else np.array([], dtype=np.int8)
+        entities, names = pd.factorize(pd.Series(uris, dtype=object), sort=True)
+        # Un solo arco per coppia (film, entità): la prima relazione elencata
+        keys = rows.astype(np.int64) * max(len(names), 1) + entities
+        _, first = np.unique(keys, return_index=True)
+        rows, entities, codes = rows[first], entities[first].astype(np.int32), codes[first]
+
+        movie_indptr = np.searchsorted(rows, np.arange(len(movie_ids) + 1)).astype(np.int64)
+        order = np.lexsort((rows, entities))
+        entity_indptr = np.searchsorted(entities[order], np.arange(len(names) + 1)).astype(np.int64)
+        entity_offsets, entity_data = columnar.encode_strings(names)
+        logger.info(f"Grafo di conoscenza: {len(movie_ids)} film, {len(names)} entità, {len(rows)} archi.")
+        return cls(movie_ids, movie_indptr, entities, codes, entity_indptr, rows[order].astype(np.int32),
+                   entity_offsets, entity_data, relations)
+
+    def save(self, directory=KNOWLEDGE_GRAPH_PATH, name=KNOWLEDGE_GRAPH_TABLE):
+        """
+        Salva il grafo come tabella colonnare (relazioni nei metadati).
+
+        Args:
+            directory (str): Cartella del grafo.
+            name (str): Nome della tabella.
+        """
+        columnar.save_table(directory, name, {
+            "movieId": np.asarray(self.movie_ids, dtype=np.int32),
+            "movie_indptr": self.movie_indptr, "movie_entities": self.movie_entities,
+            "movie_relations": self.movie_relations,
+            "entity_indptr": self.entity_indptr, "entity_movies": self.entity_movies,
+            "entity_offsets": self.entity_offsets, "entity_data": self.entity_data,
+        }, {"relations": self.relations})
+
+    @classmethod
+    def load(cls, directory=KNOWLEDGE_GRAPH_PATH, name=KNOWLEDGE_GRAPH_TABLE, mmap_mode="r"):
+        """
+        Carica il grafo mappando i file in memoria.
+
+        Args:
+            directory (str): Cartella del grafo.
+            name (str): Nome della tabella.
+            mmap_mode (str): Modalità di np.load.
+
+        Returns:
+            KnowledgeGraph: Il grafo.
+        """
+        columns, meta = columnar.load_table(directory, name, mmap_mode=mmap_mode)
+        return cls(columns["movieId"], columns["movie_indptr"], columns["movie_entities"],
+                   columns["movie_relations"], columns["entity_indptr"], columns["entity_movies"],
+                   columns["entity_offsets"], columns["entity_data"], meta["relations"])
+
+    def entity_id(self, uri):
+        """Restituisce l'ID di un'entità (ricerca binaria sugli URI ordinati), -1 se assente."""
+        position = bisect.bisect_left(self.uris, uri)
+        return position if position < len(self.uris) and self.uris[position] == uri else -1
+
+    def movie_entities_of(self, movie_id):
+        """
+        Entità collegate a un film.
+
+        Args:
+            movie_id (int): ID del film.
+
+        Returns:
+            list: Coppie (relazione, URI); vuota se il film non è noto.
+        """
+        position = self._positions.get_indexer([movie_id])[0]
+        if position < 0:
+            return []
+        edges = slice(self.movie_indptr[position], self.movie_indptr[position + 1])
+        return [(self.relations[relation], self.uris[entity])
+                for relation, entity in zip(self.movie_relations[edges], self.movie_entities[edges])]
+
+    def entity_movies_of(self, uri):
+        """Restituisce gli ID dei film collegati a un'entità (vuoto se l'entità non è nota)."""
+        entity = self.entity_id(uri)
+        if entity < 0:
+            return self.movie_ids[:0]
+        return self.movie_ids[self.entity_movies[self.entity_indptr[entity]:self.entity_indptr[entity + 1]]]
+
+    def transitions(self, relation_weights=RELATION_WEIGHTS):
+        """
+        Matrici di transizione della passeggiata casuale pesata per relazione.
+
+        Le entità collegate a un solo film vengono escluse: riporterebbero la
+        passeggiata al film da cui è partita senza collegarlo ad altri, e
+        sono spesso la maggior parte degli attori.
+
+        Args:
+            relation_weights (dict): Peso degli archi per relazione.
+
+        Returns:
+            tuple: (entità x film: probabilità film -> entità, film x entità: probabilità entità -> film).
+        """
+        key = tuple(sorted(relation_weights.items()))
+        if key not in self._transitions:
+            weights = np.array([relation_weights.get(r, 1.0) for r in self.relations] or [1.0],
+                               dtype=np.float32)[np.asarray(self.movie_relations)]
+            adjacency = sparse.csr_matrix((weights, np.asarray(self.movie_entities), np.asarray(self.movie_indptr)),
+                                          shape=(len(self), self.n_entities))
+            adjacency = adjacency[:, np.flatnonzero(np.diff(self.entity_indptr) > 1)]
+            movie_degree = np.asarray(adjacency.sum(axis=1)).ravel()
+            entity_degree = np.asarray(adjacency.sum(axis=0)).ravel()
+            movie_to_entity = (sparse.diags(1.0 / np.maximum(movie_degree, 1e-12)) @ adjacency).T.tocsr()
+            entity_to_movie = (adjacency @ sparse.diags(1.0 / np.maximum(entity_degree, 1e-12))).tocsr()
+            self._transitions[key] = (movie_to_entity.astype(np.float32), entity_to_movie.astype(np.float32))
+        return self._transitions[key]
+
+    def personalized_pagerank(self, seeds, damping=DAMPING, iterations=PPR_ITERATIONS, tolerance=PPR_TOLERANCE,
+                              relation_weights=RELATION_WEIGHTS):
+        """
+        PageRank personalizzato di più utenti insieme, con iterazioni su matrici sparse.
+
+        A ogni passo la passeggiata torna ai film di partenza con probabilità
+        1 - damping, altrimenti segue un arco verso un'entità e da questa un
+        arco verso un film. Le colonne sono utenti indipendenti, per cui ogni
+        iterazione è un prodotto matrice sparsa x matrice densa.
+
+        Args:
+            seeds (ndarray): Pesi dei film di partenza (film x utenti), normalizzati a somma 1 per colonna.
+            damping (float): Probabilità di proseguire la passeggiata.
+            iterations (int): Iterazioni massime.
+            tolerance (float): Variazione L1 massima (per utente) per fermarsi prima.
+            relation_weights (dict): Peso degli archi per relazione.
+
+        Returns:
+            ndarray: Punteggi dei film (film x utenti).
+        """
+        movie_to_entity, entity_to_movie = self.transitions(relation_weights)
+        seeds = np.asarray(seeds, dtype=np.float32)
+        restart = np.float32(1.0 - damping) * seeds
+        # Due passi (film -> entità -> film) per iterazione: i film ricevono punteggio solo a passi pari
+        step = np.float32(damping * damping)
+        scores = seeds
+        for _ in range(iterations):
+            updated = restart + step * (entity_to_movie @ (movie_to_entity @ scores))
+            change = np.abs(updated - scores).sum(axis=0).max(initial=0.0)
+            scores = updated
+            if change < tolerance:
+                break
+        return scores
+
+    def seed_matrix(self, user_codes, movie_ids, weights, n_users):
+        """
+        Matrice dei film di partenza (film x utenti) dai rating, normalizzata a somma 1 per utente.
+
+        Args:
+            user_codes (ndarray): Colonna dell'utente di ogni rating.
+            movie_ids (ndarray): ID del film di ogni rating (i film non nel grafo vengono ignorati).
+            weights (ndarray): Peso di ogni rating (es. il rating stesso).
+            n_users (int): Numero di utenti.
+
+        Returns:
+            ndarray: La matrice densa float32.
+        """
+        rows = self._positions.get_indexer(np.asarray(movie_ids))
+        known = rows >= 0
+        seeds = np.zeros((len(self), n_users), dtype=np.float32)
+        np.add.at(seeds, (rows[known], np.asarray(user_codes)[known]), np.asarray(weights, dtype=np.float32)[known])
+        totals = seeds.sum(axis=0)
+        return seeds / np.where(totals > 0, totals, 1.0)
+
+    def neighbor_scores(self, movie_ids, weights):
+        """
+        Punteggi PageRank personalizzato a partire da più film, pesati per film.
+
+        Ha la stessa interfaccia di `NeighborIndex.neighbor_scores`, per cui il
+        grafo si combina con il punteggio dei generi allo stesso modo dei vicini.
+
+        Args:
+            movie_ids (array-like): ID dei film di partenza (es. quelli valutati dall'utente).
+            weights (array-like): Peso di ogni film di partenza (es. il rating).
+
+        Returns:
+            tuple: (ID dei film raggiunti, punteggi), esclusi i film di partenza.
+        """
+        movie_ids = np.asarray(movie_ids)
+        seeds = self.seed_matrix(np.zeros(len(movie_ids), dtype=np.int64), movie_ids, weights, 1)
+        scores = self.personalized_pagerank(seeds)[:, 0]
+        reached = np.flatnonzero((scores > 0) & (seeds[:, 0] == 0))
+        return self.movie_ids[reached], scores[reached].astype(np.float64)
+
+
+_worker_graph = None
+
+def _init_graph_worker(graph):
+    """Memorizza il grafo nel processo worker (una volta per processo)."""
+    global _worker_graph
+    _worker_graph = graph
+
+def _rank_graph_block(task):
+    """Calcola il PageRank personalizzato e i top-k di un blocco di utenti nel processo worker."""
+    start, n_users, user_codes, movie_ids, weights, top_k = task
+    seeds = _worker_graph.seed_matrix(user_codes, movie_ids, weights, n_users)
+    scores = _worker_graph.personalized_pagerank(seeds)
+    scores[seeds > 0] = 0.0  # Esclude i film già valutati
+    k = min(top_k, scores.shape[0])
+    if k == 0:
+        return start + np.array([], dtype=np.int64), np.array([], dtype=np.int64), np.array([], dtype=np.float32)
+    top = np.argpartition(-scores, k - 1, axis=0)[:k]
+    top_scores = np.take_along_axis(scores, top, axis=0)
+    order = np.lexsort((top, -top_scores), axis=0)
+    top = np.take_along_axis(top, order, axis=0)
+    top_scores = np.take_along_axis(top_scores, order, axis=0)
+    users = np.broadcast_to(np.arange(n_users), top.shape)
+    keep = (top_scores > 0).T.ravel()
+    return start + users.T.ravel()[keep], top.T.ravel()[keep], top_scores.T.ravel()[keep]
+
+
+def recommend_from_graph(graph, user_ids, ratings, top_k=10, block_size=PPR_BLOCK_SIZE, n_workers=None):
+    """
+    Raccomandazioni "knowledge-based" di molti utenti con il PageRank personalizzato.
+
+    Ogni utente parte dai film che ha valutato, pesati per rating; i blocchi
+    di utenti sono propagati insieme e distribuiti su un pool di processi.
+
+    Args:
+        graph (KnowledgeGraph): Il grafo.
+        user_ids (iterable): ID degli utenti.
+        ratings (DataFrame): Colonne 'userId', 'movieId' e 'rating'.
+        top_k (int): Raccomandazioni per utente.
+        block_size (int): Utenti per blocco.
+        n_workers (int): Numero di processi (default: numero di CPU; 1 = nessun pool).
+
+    Returns:
+        DataFrame: Colonne 'userId', 'movieId' e 'score', ordinate per utente e punteggio
+        decrescente. I film non raggiungibili dai film valutati non compaiono.
+    """
+    user_ids = pd.unique(np.asarray(user_ids))
+    user_codes = pd.Index(user_ids).get_indexer(ratings["userId"].to_numpy())
+    selected = np.flatnonzero(user_codes >= 0)
+    order = selected[np.argsort(user_codes[selected], kind="stable")]
+    user_codes = user_codes[order]
+    movie_ids = ratings["movieId"].to_numpy()[order]
+    weights = ratings["rating"].to_numpy()[order]
+    offsets = np.searchsorted(user_codes, np.arange(0, len(user_ids) + block_size, block_size))
+
+    tasks = []
+    for block, start in enumerate(range(0, len(user_ids), block_size)):
+        lo, hi = offsets[block], offsets[block + 1]
+        n_users = min(block_size, len(user_ids) - start)
+        tasks.append((start, n_users, user_codes[lo:hi] - start, movie_ids[lo:hi], weights[lo:hi], top_k))
+
+    n_workers = n_workers or os.cpu_count() or 1
+    if n_workers == 1 or len(tasks) <= 1:
+        _init_graph_worker(graph)
+        results = [_rank_graph_block(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(n_workers, len(tasks)),
+                                 initializer=_init_graph_worker, initargs=(graph,)) as executor:
+            results = list(executor.map(_rank_graph_block, tasks))
+
+    if not results:
+        return pd.DataFrame(columns=["userId", "movieId", "score"])
+    return pd.DataFrame({
+        "userId": user_ids[np.concatenate([r[0] for r in results])],
+        "movieId": graph.movie_ids[np.concatenate([r[1] for r in results])],
+        "score": np.concatenate([r[2] for r in results]).astype(np.float64),
+    })
+
+
+def load_knowledge_graph(directory=KNOWLEDGE_GRAPH_PATH):
+    """Carica il grafo di conoscenza salvato, mappato in memoria."""
+    return KnowledgeGraph.load(directory, KNOWLEDGE_GRAPH_TABLE)
+
+
+if __name__ == "__main__":
+    from recommender import load_raw_data
+
+    logging.basicConfig(level=logging.INFO)
+    movies, ratings = load_raw_data()
+    graph = KnowledgeGraph.from_movies(movies)
+    graph.save(KNOWLEDGE_GRAPH_PATH, KNOWLEDGE_GRAPH_TABLE)
+    logger.info(f"Grafo di conoscenza salvato in {KNOWLEDGE_GRAPH_PATH}.")
+    print(recommend_from_graph(graph, ratings["userId"].unique()[:5], ratings, top_k=5, n_workers=1))
@@ -1,7 +1,386 @@
-import random
+import heapq
 
-class EpsilonGreedyMAB:
-    def __init__(self, epsilon=0.1, decay="none", min_epsilon=0.01, seed=None):
+import numpy as np
+
+
+class MaxSegmentTree:
+    """
+    Albero di segmenti per il massimo di un vettore di valori.
+
+    Ogni nodo conserva la posizione della foglia con il valore massimo del
+    proprio intervallo (a parità di valore, la posizione minore). L'argmax è
+    O(1), l'aggiornamento di m foglie è O(m log n) con operazioni vettoriali
+    per livello e i primi k elementi si estraggono in O(k log n).
+    """
+
+    def __init__(self, capacity=1):
+        """
+        Args:
+            capacity (int): Numero iniziale di foglie (cresce automaticamente).
+        """
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        """Alloca l'albero con foglie a -inf (posizioni non usate)."""
+        self.size = 1
+        while self.size < max(capacity, 1):
+            self.size *= 2
+        self.leaves = np.full(self.size, -np.inf)
+        self.best = np.concatenate((np.zeros(self.size, dtype=np.int64), np.arange(self.size, dtype=np.int64)))
+
+    def _combine(self, nodes):
+        """Ricalcola i nodi indicati dai rispettivi figli."""
+        left, right = self.best[2 * nodes], self.best[2 * nodes + 1]
+        self.best[nodes] = np.where(self.leaves[left] >= self.leaves[right], left, right)
+
+    def _rebuild(self):
+        level = self.size // 2
+        while level >= 1:
+            self._combine(np.arange(level, 2 * level))
+            level //= 2
+
+    def grow(self, capacity):
+        """Aumenta il numero di foglie mantenendo i valori."""
+        if capacity <= self.size:
+            return
+        leaves = self.leaves
+        self._allocate(capacity)
+        self.leaves[:len(leaves)] = leaves
+        self._rebuild()
+
+    def update(self, positions, values):
+        """
+        Assegna nuovi valori alle foglie indicate.
+
+        Args:
+            positions (ndarray): Posizioni delle foglie.
+            values (ndarray): Nuovi valori.
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        if not len(positions):
+            return
+        self.leaves[positions] = values
+        nodes = np.unique((positions + self.size) // 2)
+        while nodes[0] >= 1:
+            self._combine(nodes)
+            nodes = np.unique(nodes // 2)
+
+    def argmax(self):
+        """Restituisce la posizione del valore massimo."""
+        return int(self.best[1])
+
+    def top_k(self, k):
+        """
+        Restituisce le posizioni dei k valori maggiori, in ordine decrescente.
+
+        Le foglie a -inf (posizioni non usate) non vengono restituite.
+
+        Args:
+            k (int): Numero di posizioni.
+
+        Returns:
+            ndarray: Le posizioni.
+        """
+        result = []
+        heap = [(-self.leaves[self.best[1]], self.best[1], 1)]
+        while heap and len(result) < k:
+            value, position, node = heapq.heappop(heap)
+            if value == np.inf:
+                break
+            if node >= self.size:
+                result.append(position)
+                continue
+            for child in (2 * node, 2 * node + 1):
+                best = self.best[child]
+                heapq.heappush(heap, (-self.leaves[best], best, child))
+        return np.array(result, dtype=np.int64)
+
+
+class ArmStore:
+    """
+    Statistiche delle azioni (braccia) di un bandit in array NumPy.
+
+    Ogni azione è associata a un indice intero; conteggi e valori medi sono
+    vettori indicizzati da questo indice, e un `MaxSegmentTree` mantiene il
+    massimo dei valori. Lo stesso store può essere condiviso da politiche
+    diverse (Epsilon-Greedy, UCB1, Thompson sampling).
+    """
+
+    def __init__(self, capacity=16):
+        """
+        Args:
+            capacity (int): Numero iniziale di azioni (cresce automaticamente).
+        """
+        self.arms = []
+        self._index = {}
+        self.counts = np.zeros(capacity, dtype=np.int64)
+        self.values = np.zeros(capacity)
+        self.tree = MaxSegmentTree(capacity)
+
+    def __len__(self):
+        return len(self.arms)
+
+    def _reserve(self, n_arms):
+        capacity = len(self.counts)
+        if n_arms <= capacity:
+            return
+        while capacity < n_arms:
+            capacity *= 2
+        self.counts = np.concatenate((self.counts, np.zeros(capacity - len(self.counts), dtype=np.int64)))
+        self.values = np.concatenate((self.values, np.zeros(capacity - len(self.values))))
+        self.tree.grow(capacity)
+
+    def indices(self, actions, register=False):
+        """
+        Restituisce gli indici delle azioni.
+
+        Args:
+            actions (iterable): Le azioni.
+            register (bool): Se aggiungere le azioni non ancora note (con valore 0).
+
+        Returns:
+            ndarray: Gli indici (-1 per le azioni non note se `register` è False).
+        """
+        actions = list(actions)
+        if register:
+            new_arms = [action for action in dict.fromkeys(actions) if action not in self._index]
+            if new_arms:
+                start = len(self.arms)
+                self._reserve(start + len(new_arms))
+                self._index.update(zip(new_arms, range(start, start + len(new_arms))))
+                self.arms.extend(new_arms)
+                self.tree.update(np.arange(start, len(self.arms)), 0.0)
+        return np.array([self._index.get(action, -1) for action in actions], dtype=np.int64)
+
+    def update(self, indices, rewards):
+        """
+        Aggiorna conteggi e valori medi con un blocco di ricompense.
+
+        Il risultato coincide con l'aggiornamento incrementale della media
+        eseguito una ricompensa alla volta.
+
+        Args:
+            indices (ndarray): Indici delle azioni (anche ripetuti).
+            rewards (ndarray): Ricompense ricevute.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        rewards = np.asarray(rewards, dtype=np.float64)
+        arms, codes = np.unique(indices, return_inverse=True)
+        added = np.bincount(codes, minlength=len(arms))
+        reward_sums = np.bincount(codes, weights=rewards, minlength=len(arms))
+        counts = self.counts[arms] + added
+        self.values[arms] = (self.values[arms] * self.counts[arms] + reward_sums) / counts
+        self.counts[arms] = counts
+        self.tree.update(arms, self.values[arms])
+
+
+class ArrayBandit:
+    """
+    Base dei bandit su `ArmStore`, con un generatore casuale per istanza.
+
+    Le sottoclassi definiscono `scores`, il punteggio con cui ogni politica
+    sceglie le azioni.
+    """
+
+    def __init__(self, store=None, seed=None):
+        """
+        Args:
+            store (ArmStore): Statistiche condivise (default: uno store nuovo).
+            seed (int): Seed opzionale del generatore casuale dell'istanza.
+        """
+        self.store = store if store is not None else ArmStore()
+        self.rng = np.random.default_rng(seed)
+
+    def scores(self, indices):
+        """
+        Punteggi delle azioni indicate secondo la politica.
+
+        Args:
+            indices (ndarray): Indici delle azioni (-1 per un'azione non nota, trattata come mai scelta).
+
+        Returns:
+            ndarray: I punteggi.
+        """
+        raise NotImplementedError
+
+    def _candidates(self, actions):
+        """Indici delle azioni candidate (tutte quelle note se `actions` è None)."""
+        if actions is None:
+            indices = np.arange(len(self.store))
+        else:
+            indices = self.store.indices(actions)
+        if not len(indices):
+            raise ValueError("La lista delle azioni non può essere vuota.")
+        return indices
+
+    def select_action(self, actions=None):
+        """
+        Seleziona un'azione.
+
+        Args:
+            actions (list): Azioni disponibili (default: tutte le azioni note).
+
+        Returns:
+            L'azione scelta.
+
+        Raises:
+            ValueError: Se la lista delle azioni è vuota.
+        """
+        indices = self._candidates(actions)
+        position = int(np.argmax(self.scores(indices)))
+        return self._action(actions, indices, position)
+
+    def select_many(self, k, actions=None):
+        """
+        Seleziona fino a k azioni distinte, in ordine di punteggio decrescente.
+
+        Args:
+            k (int): Numero di azioni.
+            actions (list): Azioni disponibili (default: tutte le azioni note).
+
+        Returns:
+            list: Le azioni scelte.
+        """
+        indices = self._candidates(actions)
+        positions = top_positions(self.scores(indices), k)
+        return [self._action(actions, indices, p) for p in positions]
+
+    def _action(self, actions, indices, position):
+        """Azione alla posizione indicata tra i candidati."""
+        return actions[position] if actions is not None else self.store.arms[indices[position]]
+
+    def update(self, action, reward):
+        """
+        Aggiorna i valori stimati per un'azione in base alla ricompensa ricevuta.
+
+        Args:
+            action: L'azione eseguita.
+            reward (float): La ricompensa ricevuta per l'azione.
+        """
+        self.update_many([action], [reward])
+
+    def update_many(self, actions, rewards):
+        """
+        Aggiorna i valori stimati con un blocco di (azione, ricompensa).
+
+        Args:
+            actions (list): Le azioni eseguite (anche ripetute).
+            rewards (array-like): Le ricompense ricevute.
+        """
+        self.store.update(self.store.indices(actions, register=True), rewards)
+
+    def get_action_values(self):
+        """
+        Restituisce i valori stimati delle azioni.
+
+        Returns:
+            dict: Un dizionario con le azioni come chiavi e i valori stimati come valori.
+        """
+        return dict(zip(self.store.arms, self.store.values[:len(self.store)].tolist()))
+
+    def get_action_counts(self):
+        """
+        Restituisce quante volte ogni azione è stata scelta.
+
+        Returns:
+            dict: Un dizionario con le azioni come chiavi e i conteggi come valori.
+        """
+        return dict(zip(self.store.arms, self.store.counts[:len(self.store)].tolist()))
+
+    def display_state(self):
+        """
+        Mostra lo stato corrente delle azioni, i loro valori stimati e i conteggi.
+        """
+        print("\nStato corrente:")
+        print("Azioni e valori stimati:")
+        for action, value, count in zip(self.store.arms, self.store.values, self.store.counts):
+            print(f"  Azione: {action}, Valore stimato: {value:.4f}, Conteggio: {count}")
+
+
+def top_positions(scores, k):
+    """
+    Posizioni dei k punteggi maggiori in ordine decrescente (a parità, la posizione minore).
+
+    Args:
+        scores (ndarray): I punteggi.
+        k (int): Numero di posizioni.
+
+    Returns:
+        ndarray: Le posizioni.
+    """
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.array([], dtype=np.int64)
+    if k < len(scores):
+        threshold = np.partition(scores, len(scores) - k)[len(scores) - k]
+        candidates = np.flatnonzero(scores >= threshold)
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(-scores[candidates], kind="stable")][:k]
+
+
+def decay_epsilon(epsilon, n_updates, decay, min_epsilon):
+    """
+    Applica il decadimento di epsilon dopo `n_updates` ricompense (anche per array di bandit).
+
+    Args:
+        epsilon (float o ndarray): Valori attuali di epsilon.
+        n_updates (int o ndarray): Numero di ricompense ricevute.
+        decay (str): Tipo di decadimento ("none", "linear", "exponential").
+        min_epsilon (float): Valore sotto il quale epsilon smette di decadere.
+
+    Returns:
+        Il nuovo epsilon, con la stessa forma di `epsilon`.
+    """
+    epsilon = np.asarray(epsilon, dtype=np.float64)
+    active = epsilon > min_epsilon
+    if decay == "exponential":
+        # Moltiplica per 0.99 finché epsilon supera il minimo, al più una volta per ricompensa
+        with np.errstate(divide="ignore", invalid="ignore"):
+            steps = np.ceil(np.log(min_epsilon / epsilon) / np.log(0.99))
+        steps = np.where(active, np.minimum(n_updates, np.maximum(steps, 1)), 0)
+        epsilon = epsilon * 0.99 ** steps
+    elif decay == "linear":
+        epsilon = np.where(active, np.maximum(epsilon - 0.001 * np.asarray(n_updates), min_epsilon), epsilon)
+    return epsilon if epsilon.ndim else float(epsilon)
+
+
+def ucb1_scores(values, counts, total, exploration=2.0):
+    """
+    Punteggi UCB1: valore medio più sqrt(exploration * ln(totale) / n); le azioni mai scelte valgono +inf.
+
+    Args:
+        values (ndarray): Valori medi.
+        counts (ndarray): Numero di scelte di ogni azione.
+        total (int o ndarray): Numero totale di scelte (per bandit, con broadcasting).
+        exploration (float): Peso del bonus di esplorazione.
+
+    Returns:
+        ndarray: I punteggi.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        bonus = np.sqrt(exploration * np.log(np.maximum(total, 1)) / counts)
+    return np.where(counts > 0, values + bonus, np.inf)
+
+
+def thompson_scores(values, counts, sigma, rng):
+    """
+    Estrazioni di Thompson sampling dalla posteriore gaussiana N(media, sigma² / (n + 1)).
+
+    Args:
+        values (ndarray): Valori medi.
+        counts (ndarray): Numero di scelte di ogni azione.
+        sigma (float): Deviazione standard assunta delle ricompense.
+        rng (Generator): Generatore casuale.
+
+    Returns:
+        ndarray: Le estrazioni.
+    """
+    return values + sigma / np.sqrt(counts + 1) * rng.standard_normal(np.shape(values))
+
+
+class EpsilonGreedyMAB(ArrayBandit):
+    def __init__(self, epsilon=0.1, decay="none", min_epsilon=0.01, seed=None, store=None):
         """
         Inizializza l'algoritmo Epsilon-Greedy.
 
@@ -9,23 +388,26 @@ class EpsilonGreedyMAB:
             epsilon (float): Probabilità di esplorazione (valore iniziale).
             decay (str): Tipo di decadimento per epsilon ("none", "linear", "exponential").
             min_epsilon (float): Il valore minimo che epsilon può raggiungere durante la decadenza.
-            seed (int): Seed opzionale per rendere il comportamento riproducibile.
+            seed (int): Seed opzionale per rendere il comportamento riproducibile (solo per questa istanza).
+            store (ArmStore): Statistiche condivise con altre politiche.
         """
+        super().__init__(store, seed)
         self.epsilon = epsilon
         self.min_epsilon = min_epsilon
         self.decay = decay
-        self.action_counts = {}  # Conta il numero di volte che un'azione è stata scelta
-        self.action_values = {}  # Valori medi stimati per ogni azione
 
-        if seed is not None:
-            random.seed(seed)  # Imposta il seed per numeri casuali
+    def scores(self, indices):
+        return np.where(indices >= 0, self.store.values[indices], 0.0)
 
-    def select_action(self, actions):
+    def select_action(self, actions=None):
         """
         Seleziona un'azione utilizzando l'algoritmo Epsilon-Greedy.
 
+        Senza una lista di azioni lo sfruttamento usa il massimo mantenuto
+        dall'albero di segmenti (O(1)); con una lista valuta solo quelle azioni.
+
         Args:
-            actions (list): Lista delle azioni disponibili.
+            actions (list): Lista delle azioni disponibili (default: tutte le azioni note).
 
         Returns:
             L'azione scelta.
@@ -33,41 +415,73 @@ class EpsilonGreedyMAB:
         Raises:
             ValueError: Se la lista delle azioni è vuota.
         """
-        if not actions:  # Controlla se la lista delle azioni è vuota
+        if (actions is not None and not len(actions)) or (actions is None and not len(self.store)):
             raise ValueError("La lista delle azioni non può essere vuota.")
 
         # Esplorazione o sfruttamento
-        if random.random() < self.epsilon:
-            return random.choice(actions)  # Esplorazione (scelta casuale)
-        else:
-            # Sfruttamento: seleziona l'azione con il valore medio più alto
-            return max(actions, key=lambda action: self.action_values.get(action, 0))
+        if self.rng.random() < self.epsilon:
+            if actions is None:
+                return self.store.arms[self.rng.integers(len(self.store))]
+            return actions[self.rng.integers(len(actions))]  # Esplorazione (scelta casuale)
+        if actions is None:
+            return self.store.arms[self.store.tree.argmax()]
+        # Sfruttamento: l'azione con il valore medio più alto (a parità, la prima della lista)
+        return super().select_action(actions)
 
-    def update(self, action, reward):
+    def select_many(self, k, actions=None):
         """
-        Aggiorna i valori stimati per un'azione in base alla ricompensa ricevuta.
+        Seleziona fino a k azioni distinte: ogni posizione è esplorativa con probabilità epsilon.
+
+        Le posizioni di sfruttamento seguono l'ordine dei valori stimati
+        (dall'albero di segmenti se non viene passata una lista di azioni);
+        quelle esplorative ricevono azioni casuali non già scelte.
 
         Args:
-            action: L'azione eseguita.
-            reward (float): La ricompensa ricevuta per l'azione.
+            k (int): Numero di azioni.
+            actions (list): Azioni disponibili (default: tutte le azioni note).
+
+        Returns:
+            list: Le azioni scelte.
         """
-        if action not in self.action_counts:
-            self.action_counts[action] = 0
-            self.action_values[action] = 0
+        pool = self.store.arms if actions is None else list(actions)
+        k = min(k, len(pool))
+        explore = self.rng.random(k) < self.epsilon
+        n_greedy = k - int(explore.sum())
+        if actions is None:
+            greedy = self.store.tree.top_k(n_greedy)
+        else:
+            greedy = top_positions(self.scores(self.store.indices(pool)), n_greedy)
+        random_picks = self._sample_excluding(len(pool), k - n_greedy, greedy)
+        positions = np.empty(k, dtype=np.int64)
+        positions[~explore] = greedy
+        positions[explore] = random_picks
+        return [pool[p] for p in positions]
 
-        # Aggiorna il conteggio delle volte che l'azione è stata scelta
-        self.action_counts[action] += 1
+    def _sample_excluding(self, n, size, excluded):
+        """Estrae `size` posizioni distinte in [0, n) escludendo `excluded`."""
+        if size > (n - len(excluded)) // 2:
+            return self.rng.choice(np.setdiff1d(np.arange(n), excluded), size, replace=False)
+        # Pochi elementi da estrarre: campionamento con rifiuto, senza materializzare [0, n)
+        chosen, picks = set(excluded.tolist()), []
+        while len(picks) < size:
+            position = int(self.rng.integers(n))
+            if position not in chosen:
+                chosen.add(position)
+                picks.append(position)
+        return np.array(picks, dtype=np.int64)
 
-        # Aggiorna il valore medio stimato dell'azione
-        n = self.action_counts[action]
-        self.action_values[action] += (reward - self.action_values[action]) / n
+    def update_many(self, actions, rewards):
+        """
+        Aggiorna i valori stimati con un blocco di (azione, ricompensa) e fa decadere epsilon.
 
-        # Aggiorna epsilon in base al tipo di decadimento scelto
-        if self.decay == "exponential" and self.epsilon > self.min_epsilon:
-            self.epsilon *= 0.99  # Decadimento esponenziale
-        elif self.decay == "linear" and self.epsilon > self.min_epsilon:
-            self.epsilon -= 0.001  # Decadimento lineare
-            self.epsilon = max(self.epsilon, self.min_epsilon)
+        Args:
+            actions (list): Le azioni eseguite (anche ripetute).
+            rewards (array-like): Le ricompense ricevute.
+        """
+        super().update_many(actions, rewards)
+
+        # Aggiorna epsilon in base al tipo di decadimento scelto, una volta per ricompensa
+        self.epsilon = decay_epsilon(self.epsilon, len(rewards), self.decay, self.min_epsilon)
 
     def get_epsilon(self):
         """
@@ -78,22 +492,52 @@ class EpsilonGreedyMAB:
         """
         return self.epsilon
 
-    def get_action_values(self):
-        """
-        Restituisce i valori stimati delle azioni.
+    def display_state(self):
+        print(f"Epsilon: {self.epsilon:.4f}")
+        super().display_state()
 
-        Returns:
-            dict: Un dizionario con le azioni come chiavi e i valori stimati come valori.
+
+class UCB1MAB(ArrayBandit):
+    """
+    Upper Confidence Bound (UCB1): valore medio più un bonus di esplorazione
+    che decresce con il numero di scelte dell'azione. Le azioni mai scelte hanno priorità.
+    """
+
+    def __init__(self, exploration=2.0, seed=None, store=None):
         """
-        return self.action_values
+        Args:
+            exploration (float): Peso del bonus di esplorazione (2 nella formulazione classica).
+            seed (int): Seed opzionale del generatore casuale dell'istanza.
+            store (ArmStore): Statistiche condivise con altre politiche.
+        """
+        super().__init__(store, seed)
+        self.exploration = exploration
 
-    def display_state(self):
+    def scores(self, indices):
+        counts = np.where(indices >= 0, self.store.counts[indices], 0)
+        values = np.where(indices >= 0, self.store.values[indices], 0.0)
+        total = int(self.store.counts[:len(self.store)].sum())
+        return ucb1_scores(values, counts, total, self.exploration)
+
+
+class ThompsonSamplingMAB(ArrayBandit):
+    """
+    Thompson sampling con ricompense gaussiane: per ogni azione si estrae un
+    valore dalla distribuzione a posteriori della media, N(media, sigma² / (n + 1)),
+    e si sceglie l'azione con l'estrazione maggiore.
+    """
+
+    def __init__(self, sigma=1.0, seed=None, store=None):
         """
-        Mostra lo stato corrente delle azioni, i loro valori stimati e i conteggi.
+        Args:
+            sigma (float): Deviazione standard assunta delle ricompense.
+            seed (int): Seed opzionale del generatore casuale dell'istanza.
+            store (ArmStore): Statistiche condivise con altre politiche.
         """
-        print("\nStato corrente:")
-        print(f"Epsilon: {self.epsilon:.4f}")
-        print("Azioni e valori stimati:")
-        for action, value in self.action_values.items():
-            count = self.action_counts.get(action, 0)
-            print(f"  Azione: {action}, Valore stimato: {value:.4f}, Conteggio: {count}")
+        super().__init__(store, seed)
+        self.sigma = sigma
+
+    def scores(self, indices):
+        counts = np.where(indices >= 0, self.store.counts[indices], 0)
+        values = np.where(indices >= 0, self.store.values[indices], 0.0)
+        return thompson_scores(values, counts, self.sigma, self.rng)
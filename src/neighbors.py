@@ -0,0 +1,255 @@
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import columnar
+
+logger = logging.getLogger(__name__)
+
+NEIGHBOR_BLOCK_BYTES = 64 * 1024 * 1024  # Memoria massima dei blocchi di similarità, sommata su tutti i worker
+# Byte per cella del blocco nel picco di `_neighbors_block`: il blocco denso float32 (4) insieme al prodotto
+# sparso da cui nasce (dati float32 + indici int32, 8) e poi all'indice int64 di argpartition (8)
+NEIGHBOR_CELL_BYTES = 12
+
+
+def normalize_rows(matrix):
+    """
+    Normalizza le righe di una matrice sparsa a norma L2 unitaria (le righe nulle restano nulle).
+
+    Args:
+        matrix (spmatrix): Matrice righe x feature.
+
+    Returns:
+        csr_matrix: La matrice normalizzata, in float32.
+    """
+    # Importato al primo uso: le ricerche sugli indici salvati non richiedono scipy
+    from scipy import sparse
+
+    matrix = sparse.csr_matrix(matrix, dtype=np.float32)
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sparse.diags(1.0 / norms).dot(matrix).tocsr().astype(np.float32)
+
+
+_worker_matrix = None
+_worker_transposed = None
+
+def _init_worker(matrix):
+    """Memorizza la matrice normalizzata nel processo worker (una volta per processo)."""
+    global _worker_matrix, _worker_transposed
+    _worker_matrix = matrix
+    _worker_transposed = matrix.T.tocsr()
+
+def _neighbors_block(task):
+    """Calcola i vicini di un blocco di righe nel processo worker."""
+    start, stop, n_neighbors, min_similarity = task
+    similarities = (_worker_matrix[start:stop] @ _worker_transposed).toarray()
+    # Negate sul posto: argpartition ordina per similarità decrescente senza una copia del blocco
+    np.negative(similarities, out=similarities)
+    similarities[np.arange(stop - start), np.arange(start, stop)] = np.inf  # Esclude la riga stessa
+
+    k = min(n_neighbors, similarities.shape[1] - 1)
+    if k <= 0:
+        empty = np.full((stop - start, n_neighbors), -1, dtype=np.int32)
+        return start, empty, np.zeros(empty.shape, dtype=np.float32)
+    top = np.argpartition(similarities, k - 1, axis=1)[:, :k]
+    top_values = -np.take_along_axis(similarities, top, axis=1)
+    order = np.lexsort((top, -top_values), axis=1)
+    top = np.take_along_axis(top, order, axis=1)
+    top_values = np.take_along_axis(top_values, order, axis=1)
+
+    neighbors = np.full((stop - start, n_neighbors), -1, dtype=np.int32)
+    values = np.zeros((stop - start, n_neighbors), dtype=np.float32)
+    keep = top_values > min_similarity
+    neighbors[:, :k] = np.where(keep, top, -1)
+    values[:, :k] = np.where(keep, top_values, 0.0)
+    return start, neighbors, values
+
+def top_neighbors(matrix, n_neighbors, min_similarity=0.0, n_workers=None, block_bytes=NEIGHBOR_BLOCK_BYTES):
+    """
+    Calcola i vicini più simili (coseno) di ogni riga, a blocchi su un pool di processi.
+
+    Ogni blocco di righe viene moltiplicato per la trasposta della matrice e
+    ridotto subito ai primi `n_neighbors`, per cui la memoria dipende dalla
+    dimensione del blocco e non dal quadrato del numero di righe. I blocchi
+    sono dimensionati sul costo reale per cella (`NEIGHBOR_CELL_BYTES`) in
+    modo che i blocchi in lavorazione contemporanea su tutti i worker non
+    superino `block_bytes`.
+
+    Args:
+        matrix (spmatrix): Matrice righe x feature (viene normalizzata per righe).
+        n_neighbors (int): Numero di vicini per riga.
+        min_similarity (float): Similarità minima (esclusa) di un vicino.
+        n_workers (int): Numero di processi (default: numero di CPU; 1 = nessun pool).
+        block_bytes (int): Memoria massima dei blocchi di similarità, su tutti i worker.
+
+    Returns:
+        tuple: (vicini come righe int32, similarità float32), entrambi righe x n_neighbors,
+        ordinati per similarità decrescente e completati con -1 / 0.
+    """
+    matrix = normalize_rows(matrix)
+    n_rows = matrix.shape[0]
+    n_workers = n_workers or os.cpu_count() or 1
+    row_bytes = NEIGHBOR_CELL_BYTES * max(n_rows, 1)
+    # Il budget è diviso tra i worker; i blocchi non superano comunque la quota di righe di un worker
+    block_size = max(int(block_bytes) // (row_bytes * n_workers), 1)
+    block_size = min(block_size, max(-(-n_rows // n_workers), 1))
+    tasks = [(start, min(start + block_size, n_rows), n_neighbors, min_similarity)
+             for start in range(0, n_rows, block_size)]
+    logger.info(f"Calcolo dei vicini di {n_rows} righe in {len(tasks)} blocchi...")
+
+    if n_workers == 1 or len(tasks) <= 1:
+        _init_worker(matrix)
+        results = [_neighbors_block(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(n_workers, len(tasks)),
+                                 initializer=_init_worker, initargs=(matrix,)) as executor:
+            results = list(executor.map(_neighbors_block, tasks))
+
+    neighbors = np.full((n_rows, n_neighbors), -1, dtype=np.int32)
+    similarities = np.zeros((n_rows, n_neighbors), dtype=np.float32)
+    for start, block_neighbors, block_values in results:
+        neighbors[start:start + len(block_neighbors)] = block_neighbors
+        similarities[start:start + len(block_values)] = block_values
+    return neighbors, similarities
+
+
+class NeighborIndex:
+    """
+    Liste dei vicini più simili di ogni film, salvate come tabella colonnare.
+
+    Le liste hanno larghezza fissa (righe x N, -1 per le posizioni vuote),
+    per cui i vicini di un film sono una singola riga dell'array mappato in
+    memoria e la ricerca costa una lettura di poche decine di valori.
+
+    Attributes:
+        movie_ids (ndarray): ID dei film, nell'ordine delle righe.
+        neighbors (ndarray): Righe dei vicini (righe x N).
+        similarities (ndarray): Similarità dei vicini (righe x N).
+    """
+
+    def __init__(self, movie_ids, neighbors, similarities):
+        self.movie_ids = np.asarray(movie_ids)
+        self.neighbors = neighbors
+        self.similarities = similarities
+        self._positions = pd.Index(self.movie_ids)
+
+    def __len__(self):
+        return len(self.movie_ids)
+
+    @classmethod
+    def from_matrix(cls, movie_ids, matrix, n_neighbors, min_similarity=0.0, n_workers=None):
+        """
+        Costruisce l'indice dalla matrice film x feature.
+
+        Args:
+            movie_ids (array-like): ID dei film, uno per riga della matrice.
+            matrix (spmatrix): Matrice film x feature.
+            n_neighbors (int): Numero di vicini per film.
+            min_similarity (float): Similarità minima (esclusa) di un vicino.
+            n_workers (int): Numero di processi.
+
+        Returns:
+            NeighborIndex: L'indice.
+        """
+        neighbors, similarities = top_neighbors(matrix, n_neighbors, min_similarity, n_workers)
+        return cls(movie_ids, neighbors, similarities)
+
+    def save(self, directory, name):
+        """
+        Salva l'indice come tabella colonnare.
+
+        Args:
+            directory (str): Cartella del formato colonnare.
+            name (str): Nome della tabella.
+        """
+        columnar.save_table(directory, name, {
+            "movieId": np.asarray(self.movie_ids, dtype=np.int32),
+            "neighbors": self.neighbors,
+            "similarities": self.similarities,
+        })
+
+    @classmethod
+    def load(cls, directory, name, mmap_mode="r"):
+        """
+        Carica l'indice mappando i file in memoria.
+
+        Args:
+            directory (str): Cartella del formato colonnare.
+            name (str): Nome della tabella.
+            mmap_mode (str): Modalità di np.load.
+
+        Returns:
+            NeighborIndex: L'indice.
+        """
+        columns, _ = columnar.load_table(directory, name, mmap_mode=mmap_mode)
+        return cls(columns["movieId"], columns["neighbors"], columns["similarities"])
+
+    def similar(self, movie_id, n=10):
+        """
+        Restituisce i film più simili a un film.
+
+        Args:
+            movie_id (int): ID del film.
+            n (int): Numero massimo di film.
+
+        Returns:
+            tuple: (ID dei film simili, similarità), in ordine decrescente; vuoti se il film non è noto.
+        """
+        position = self._positions.get_indexer([movie_id])[0]
+        if position < 0:
+            return np.array([], dtype=self.movie_ids.dtype), np.array([], dtype=np.float32)
+        neighbors = self.neighbors[position, :n]
+        valid = neighbors >= 0
+        return self.movie_ids[neighbors[valid]], np.asarray(self.similarities[position, :n])[valid]
+
+    def neighbor_scores(self, movie_ids, weights):
+        """
+        Somma le similarità dei vicini di più film, pesate per film.
+
+        Il costo dipende solo dal numero di film indicati per N (una riga per
+        film), non dalla dimensione del catalogo.
+
+        Args:
+            movie_ids (array-like): ID dei film di partenza (es. quelli valutati dall'utente).
+            weights (array-like): Peso di ogni film di partenza (es. il rating).
+
+        Returns:
+            tuple: (ID dei film vicini distinti, punteggi).
+        """
+        positions = self._positions.get_indexer(np.asarray(movie_ids))
+        known = positions >= 0
+        neighbors = self.neighbors[positions[known]]
+        values = self.similarities[positions[known]] * np.asarray(weights, dtype=np.float64)[known][:, None]
+        valid = neighbors >= 0
+        rows, codes = np.unique(neighbors[valid], return_inverse=True)
+        scores = np.bincount(codes, weights=values[valid], minlength=len(rows))
+        return self.movie_ids[rows], scores
+
+
+def combine_scores(scores, rows, extra, weight):
+    """
+    Somma ai punteggi dei film un secondo punteggio definito solo su alcuni di essi.
+
+    Entrambi i punteggi vengono normalizzati in [0, 1] (divisi per il
+    massimo), per cui `weight` è il peso relativo del secondo rispetto al primo.
+
+    Args:
+        scores (ndarray): Punteggi dei film (tutto il catalogo o i soli candidati).
+        rows (ndarray): Posizioni in `scores` dei film con il secondo punteggio (-1 se assenti).
+        extra (ndarray): Secondo punteggio di ogni film.
+        weight (float): Peso del secondo punteggio.
+
+    Returns:
+        ndarray: I punteggi combinati.
+    """
+    scale = scores.max() if len(scores) and scores.max() > 0 else 1.0
+    combined = scores / scale
+    valid = rows >= 0
+    extra = np.asarray(extra, dtype=np.float64)[valid]
+    if len(extra) and extra.max() > 0:
+        np.add.at(combined, rows[valid], weight * extra / extra.max())
+    return combined
@@ -0,0 +1,246 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+from dbpedia_cache import MISSING, SQLiteCache
+import instrumentation
+
+logger = logging.getLogger(__name__)
+
+RESULT_CACHE_PATH = os.getenv("RESULT_CACHE_PATH", "data/cache/recommendations.sqlite3")
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", 10000))  # Voci in memoria
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", 300)) or None  # Secondi; 0 = nessuna scadenza
+RESULT_COLUMNS = ["title", "score"]
+
+
+def options_key(**options):
+    """
+    Impronta delle opzioni di punteggio di `recommend_movies`, da includere nella chiave della cache.
+
+    I pesi contano per valore; le sorgenti (indici, stato dei bandit) per
+    tipo e, se la espongono, per `data_version`, così un indice ricostruito
+    non restituisce i risultati calcolati sul precedente.
+
+    Args:
+        **options: Opzioni di punteggio (None per le sorgenti assenti).
+
+    Returns:
+        str: L'impronta.
+    """
+    parts = []
+    for name, value in sorted(options.items()):
+        if value is not None and not isinstance(value, (int, float, str)):
+            value = f"{type(value).__name__}@{getattr(value, 'data_version', None)}"
+        parts.append(f"{name}={value}")
+    return hashlib.sha1(";".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+def invalidate_shared_users(user_ids, path=RESULT_CACHE_PATH):
+    """
+    Invalida gli utenti nella cache condivisa su disco, se esiste (da chiamare dopo l'ingestione di rating o tag).
+
+    Args:
+        user_ids (array-like): ID degli utenti con dati nuovi.
+        path (str): Percorso del database della cache condivisa.
+    """
+    if not os.path.exists(path):
+        return
+    cache = RecommendationCache.shared(path)
+    try:
+        cache.invalidate_users(user_ids)
+    finally:
+        cache.close()
+
+
+class RecommendationCache:
+    """
+    Cache dei risultati di `recommend_movies`, LRU in memoria con TTL e backend condiviso opzionale.
+
+    La chiave è (versione dei dati, opzioni di punteggio, utente, versione
+    dei rating dell'utente, top_k): cambiare la versione dei dati o le
+    opzioni (nuovo indice, pesi diversi, vedi `options_key`) o invalidare un
+    utente rende irraggiungibili le voci precedenti senza doverle cercare, e
+    le voci orfane escono per LRU o per scadenza. L'ingestione di rating, tag
+    e feedback invalida gli utenti coinvolti.
+
+    Con un backend (`SQLiteCache`, condivisibile tra processi) anche le
+    versioni degli utenti sono lette dal backend, per cui un'invalidazione è
+    vista subito da tutti i processi; le voci trovate nel backend vengono
+    copiate in memoria. I DataFrame restituiti sono condivisi con la cache e
+    non vanno modificati.
+    """
+
+    def __init__(self, max_entries=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL, data_version="0", backend=None,
+                 clock=time.monotonic):
+        """
+        Inizializza la cache.
+
+        Args:
+            max_entries (int): Numero massimo di voci in memoria.
+            ttl (float): Durata delle voci in secondi (None = nessuna scadenza).
+            data_version (str): Versione dei dati e del modello usati per le raccomandazioni.
+            backend (CacheBackend): Backend condiviso (es. `SQLiteCache`), opzionale.
+            clock (callable): Orologio monotono (sostituibile nei test).
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.data_version = str(data_version)
+        self.backend = backend
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._user_versions = {}
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "backend_hits": 0, "evictions": 0,
+                         "expirations": 0, "invalidations": 0}
+
+    @classmethod
+    def shared(cls, path=RESULT_CACHE_PATH, **kwargs):
+        """
+        Crea una cache con backend SQLite su disco, condiviso tra processi.
+
+        Args:
+            path (str): Percorso del database.
+            **kwargs: Altri argomenti di `RecommendationCache`.
+
+        Returns:
+            RecommendationCache: La cache.
+        """
+        return cls(backend=SQLiteCache(path), **kwargs)
+
+    def __len__(self):
+        """Numero di voci in memoria (anche scadute, finché non vengono lette o rimosse)."""
+        return len(self._entries)
+
+    def user_version(self, user_id):
+        """Versione corrente dei rating di un utente (0 se mai invalidato)."""
+        if self.backend is not None:
+            version = self.backend.get(f"user-version:{user_id}")
+            return 0 if version is MISSING or version is None else version
+        return self._user_versions.get(user_id, 0)
+
+    def _key(self, user_id, top_k, ratings_version, options):
+        if ratings_version is None:
+            ratings_version = self.user_version(user_id)
+        return f"{self.data_version}:{options}:{user_id}:{ratings_version}:{top_k}"
+
+    def get(self, user_id, top_k, ratings_version=None, options=""):
+        """
+        Restituisce le raccomandazioni in cache.
+
+        Args:
+            user_id (int): ID dell'utente.
+            top_k (int): Numero di raccomandazioni.
+            ratings_version: Versione dei rating dell'utente (default: quella registrata dalla cache).
+            options (str): Impronta delle opzioni di punteggio (`options_key`).
+
+        Returns:
+            DataFrame: Le raccomandazioni, oppure MISSING se assenti o scadute.
+        """
+        key = self._key(user_id, top_k, ratings_version, options)
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, result = entry
+                if expires_at is None or expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.counters["hits"] += 1
+                    instrumentation.increment("result_cache_requests_total", result="hit")
+                    return result
+                del self._entries[key]
+                self.counters["expirations"] += 1
+
+        if self.backend is not None:
+            records = self.backend.get(key)
+            if records is not MISSING and records is not None:
+                result = pd.DataFrame(records, columns=RESULT_COLUMNS)
+                self._store(key, result, now)
+                with self._lock:
+                    self.counters["hits"] += 1
+                    self.counters["backend_hits"] += 1
+                instrumentation.increment("result_cache_requests_total", result="backend_hit")
+                return result
+
+        with self._lock:
+            self.counters["misses"] += 1
+        instrumentation.increment("result_cache_requests_total", result="miss")
+        return MISSING
+
+    def _store(self, key, result, now):
+        expires_at = None if self.ttl is None else now + self.ttl
+        with self._lock:
+            self._entries[key] = (expires_at, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.counters["evictions"] += 1
+
+    def put(self, user_id, top_k, result, ratings_version=None, options=""):
+        """
+        Memorizza le raccomandazioni di un utente.
+
+        Args:
+            user_id (int): ID dell'utente.
+            top_k (int): Numero di raccomandazioni.
+            result (DataFrame): Raccomandazioni con le colonne 'title' e 'score' (anche vuoto).
+            ratings_version: Versione dei rating dell'utente (default: quella registrata dalla cache).
+            options (str): Impronta delle opzioni di punteggio (`options_key`).
+        """
+        key = self._key(user_id, top_k, ratings_version, options)
+        if result.empty:
+            result = pd.DataFrame(columns=RESULT_COLUMNS)
+        self._store(key, result, self.clock())
+        if self.backend is not None:
+            records = [[title, float(score)] for title, score in zip(result["title"], result["score"])]
+            self.backend.set(key, records, self.ttl)
+            self.backend.commit()
+
+    def invalidate_user(self, user_id):
+        """
+        Invalida le raccomandazioni di un utente (da chiamare quando cambiano i suoi rating o feedback).
+
+        Args:
+            user_id (int): ID dell'utente.
+        """
+        self.invalidate_users([user_id])
+
+    def invalidate_users(self, user_ids):
+        """Invalida le raccomandazioni di più utenti, con un solo commit sul backend."""
+        for user_id in {int(user_id) for user_id in user_ids}:
+            version = self.user_version(user_id) + 1
+            with self._lock:
+                self._user_versions[user_id] = version
+                self.counters["invalidations"] += 1
+            if self.backend is not None:
+                self.backend.set(f"user-version:{user_id}", version)
+        if self.backend is not None:
+            self.backend.commit()
+
+    def set_data_version(self, data_version):
+        """
+        Cambia la versione dei dati (es. dopo la ricostruzione degli indici) e svuota la memoria.
+
+        Args:
+            data_version (str): Nuova versione.
+        """
+        with self._lock:
+            self.data_version = str(data_version)
+            self._entries.clear()
+
+    def stats(self):
+        """Contatori della cache, con il numero di voci in memoria e il tasso di hit."""
+        with self._lock:
+            stats = dict(self.counters, entries=len(self._entries))
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    def close(self):
+        """Chiude il backend, se presente."""
+        if self.backend is not None:
+            self.backend.close()
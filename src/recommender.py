@@ -1,148 +1,315 @@
+import logging
+import os
+import numpy as np
 import pandas as pd
-from dbpedia_queries import query_dbpedia_batch
-from concurrent.futures import ThreadPoolExecutor
-import re
+from concurrent.futures import ProcessPoolExecutor
 import time
-from mab import EpsilonGreedyMAB  # Importa la classe EpsilonGreedyMAB
+import columnar
+from scoring import GenreScorer, positions_in
+from recommender_index import RecommenderIndex
+from bandit_state import blend_scores
+from neighbors import combine_scores
+from dbpedia_cache import MISSING
+from recommendation_cache import options_key
+import instrumentation
+
+logger = logging.getLogger(__name__)
 
 PROCESSED_DATA_PATH = "data/processed/"
+BATCH_BLOCK_SIZE = 256  # Utenti per blocco: limita la matrice densa utenti x film in memoria
+BANDIT_PSEUDO_COUNT = 5.0  # Peso del punteggio dei generi, in numero di feedback, nello stato dei bandit
+CONTENT_WEIGHT = 0.5  # Peso della similarità di contenuto rispetto al punteggio dei generi
+TAG_WEIGHT = 0.5  # Peso del profilo dei tag rispetto al punteggio dei generi
+CF_WEIGHT = 1.0  # Peso dell'item-item CF rispetto al punteggio dei generi
+GRAPH_WEIGHT = 0.5  # Peso del PageRank personalizzato sul grafo di conoscenza rispetto ai generi
 
-def load_raw_data():
-    """Carica i dati raw e gestisce i generi."""
-    print("Caricamento dei dati raw...")
-    movies = pd.read_csv(PROCESSED_DATA_PATH + "movies_enriched.csv")  # Carica il file raw
-    ratings = pd.read_csv(PROCESSED_DATA_PATH + "ratings_processed.csv")
-    
-    # Converte la colonna dei generi da stringa a lista
-    movies["genres"] = movies["genres"].apply(lambda x: x.split('|') if isinstance(x, str) else [])
+def load_raw_data(data_path=PROCESSED_DATA_PATH):
+    """
+    Carica i dati raw e gestisce i generi.
+
+    Se esiste il formato colonnare, titoli e generi dei film arrivano dalla
+    tabella 'movies' (generi come bitmask) e i rating sono mappati in memoria:
+    da 'movies_enriched.csv' vengono lette solo le colonne dell'arricchimento.
+
+    Args:
+        data_path (str): Cartella dei dati processati (con l'eventuale sottocartella 'columnar/').
+    """
+    logger.info("Caricamento dei dati raw...")
+    enriched_path = os.path.join(data_path, "movies_enriched.csv")
+    columnar_path = os.path.join(data_path, "columnar")
+    if columnar.has_table(columnar_path, "movies"):
+        movies = columnar.load_frame(columnar_path, "movies")
+        movies["title"] = movies["title"].astype(object)
+        header = pd.read_csv(enriched_path, nrows=0).columns if os.path.exists(enriched_path) else []
+        extra = [c for c in header if c not in movies.columns]
+        if extra:
+            enrichment = pd.read_csv(enriched_path, usecols=["movieId"] + extra)
+            movies = movies.merge(enrichment, on="movieId", how="left")
+    else:
+        movies = pd.read_csv(enriched_path)  # Carica il file raw
+        # Converte la colonna dei generi da stringa a lista
+        movies["genres"] = movies["genres"].apply(lambda x: x.split('|') if isinstance(x, str) else [])
+
+    if columnar.has_table(columnar_path, "ratings"):
+        # Rating mappati in memoria dal formato colonnare: nessun parsing del CSV
+        ratings = columnar.load_frame(columnar_path, "ratings")
+    else:
+        ratings = pd.read_csv(os.path.join(data_path, "ratings_processed.csv"), dtype=columnar.RATINGS_DTYPES)
     
-    print("Dati caricati con successo.")
+    logger.info("Dati caricati con successo.")
     return movies, ratings
 
-def clean_title(title):
-    """Rimuove l'anno tra parentesi nel titolo, se presente."""
-    return re.sub(r"\(\d{4}\)$", "", title).strip()
+def query_dbpedia_with_fallback(title, resolver=None):
+    """
+    Prova prima con il titolo completo, poi con il titolo pulito senza anno.
 
-def query_dbpedia_with_fallback(title):
-    """Prova prima con il titolo completo, poi con il titolo pulito senza anno."""
-    print(f"Provo a cercare DBpedia per il titolo: {title}")
+    Con un risolutore offline (EntityResolver) il titolo risolto con
+    confidenza sufficiente viene cercato una sola volta con l'etichetta
+    DBpedia esatta; solo i titoli non risolti seguono i tentativi per titolo.
+    """
+    # Importato al primo uso: SPARQLWrapper e requests non servono per raccomandare
+    from dbpedia_queries import query_dbpedia_batch, clean_title
+
+    if resolver is not None:
+        from entity_resolver import MIN_CONFIDENCE
+
+        _, label, confidence, _ = resolver.resolve(title)
+        if confidence >= MIN_CONFIDENCE:
+            instrumentation.increment("entity_resolver_titles_total", result="resolved")
+            return query_dbpedia_batch(label)
+        instrumentation.increment("entity_resolver_titles_total", result="unresolved")
+
+    logger.debug(f"Provo a cercare DBpedia per il titolo: {title}")
     
     # Prima prova con il titolo completo (con anno)
     dbpedia_info = query_dbpedia_batch(title)
     
     if not dbpedia_info:
-        print(f"Nessun risultato per il titolo completo: {title}. Provo senza l'anno...")
+        logger.debug(f"Nessun risultato per il titolo completo: {title}. Provo senza l'anno...")
+        instrumentation.increment("dbpedia_fallback_queries_total")
         cleaned_title = clean_title(title)
         dbpedia_info = query_dbpedia_batch(cleaned_title)
         
         if not dbpedia_info:
-            print(f"Nessun risultato trovato per il titolo pulito: {cleaned_title}")
+            logger.debug(f"Nessun risultato trovato per il titolo pulito: {cleaned_title}")
+            instrumentation.increment("dbpedia_unresolved_titles_total")
     
     return dbpedia_info
 
-def fetch_dbpedia_info_for_movie(movie_title, dbpedia_cache):
+def fetch_dbpedia_info_for_movie(movie_title, dbpedia_cache, resolver=None):
     """Esegui la query DBpedia per un film e gestisci la cache."""
     if movie_title not in dbpedia_cache:
-        print(f"Titolo '{movie_title}' non trovato nella cache. Eseguo query DBpedia...")
-        dbpedia_info = query_dbpedia_with_fallback(movie_title)
+        instrumentation.increment("dbpedia_cache_requests_total", result="miss")
+        with instrumentation.span("dbpedia_query_seconds"):
+            dbpedia_info = query_dbpedia_with_fallback(movie_title, resolver)
         dbpedia_cache[movie_title] = dbpedia_info
-        print(f"Cache aggiornata con il titolo '{movie_title}'")
         time.sleep(1)  # Pausa di 1 secondo tra le richieste per evitare errori HTTP 429
     else:
+        instrumentation.increment("dbpedia_cache_requests_total", result="hit")
         dbpedia_info = dbpedia_cache[movie_title]
-        print(f"Titolo '{movie_title}' trovato nella cache.")
     return dbpedia_info
 
-def recommend_movies(user_id, ratings, movies, top_k=5):
+def recommend_movies(user_id, ratings, movies, top_k=5, scorer=None, index=None, state=None,
+                     pseudo_count=BANDIT_PSEUDO_COUNT, content=None, content_weight=CONTENT_WEIGHT,
+                     tags=None, tag_weight=TAG_WEIGHT, cf=None, cf_weight=CF_WEIGHT, graph=None,
+                     graph_weight=GRAPH_WEIGHT, cache=None):
     """
-    Raccomanda film basati sui generi e altre informazioni (regista, attori) valutati dall'utente.
+    Raccomanda film basati sui generi e sul contenuto (abstract, regista, attori) dei film valutati dall'utente.
     
     Args:
         user_id (int): ID dell'utente.
         ratings (DataFrame): DataFrame dei rating.
         movies (DataFrame): DataFrame dei film.
         top_k (int): Numero di raccomandazioni da restituire.
+        scorer (GenreScorer): Motore dei generi già costruito su `movies`; se assente
+            viene costruito a ogni chiamata.
+        index (RecommenderIndex): Indice persistente dei rating; se presente i rating
+            dell'utente vengono letti dall'indice invece che da `ratings`.
+        state (BanditStateStore): Statistiche dei feedback; se presente il punteggio dei
+            generi fa da prior e viene combinato con le ricompense osservate per l'utente.
+        pseudo_count (float): Peso del prior in numero di feedback.
+        content (NeighborIndex): Indice dei vicini per contenuto; se presente i vicini dei
+            film valutati, pesati per rating, si sommano al punteggio dei generi.
+        content_weight (float): Peso della similarità di contenuto.
+        tags (TagIndex): Indice dei tag; se presente i film delle posting list dei tag
+            dell'utente si sommano al punteggio dei generi.
+        tag_weight (float): Peso del profilo dei tag.
+        cf (NeighborIndex): Vicini dell'item-item CF; se presente i vicini dei film
+            valutati, pesati per rating, si sommano al punteggio dei generi.
+        cf_weight (float): Peso dell'item-item CF.
+        graph (KnowledgeGraph): Grafo film <-> entità DBpedia; se presente il PageRank
+            personalizzato dai film valutati, pesati per rating, si somma al punteggio dei generi.
+        graph_weight (float): Peso del PageRank personalizzato.
+        cache (RecommendationCache): Cache dei risultati; le chiamate ripetute con gli stessi
+            rating e le stesse opzioni restituiscono il DataFrame memorizzato (da non modificare).
+            Usata solo con un `index` di versione nota (`data_version`, es. da `from_columnar`):
+            senza, i dati passati come DataFrame non entrano nella chiave e la cache viene ignorata.
     
     Returns:
         DataFrame: Film raccomandati.
     """
-    print(f"\nAvvio del processo di raccomandazione per l'utente {user_id}...")
+    if cache is not None and getattr(index, "data_version", None) is None:
+        instrumentation.increment("result_cache_requests_total", result="bypass")
+        cache = None
+    if cache is not None:
+        options = options_key(scorer=scorer, index=index, state=state, pseudo_count=pseudo_count, content=content,
+                              content_weight=content_weight, tags=tags, tag_weight=tag_weight, cf=cf,
+                              cf_weight=cf_weight, graph=graph, graph_weight=graph_weight)
+        cached = cache.get(user_id, top_k, options=options)
+        if cached is not MISSING:
+            return cached
 
-    # Filtra i rating dell'utente e uniscili con i film per ottenere i titoli
-    user_ratings = ratings[ratings["userId"] == user_id]
-    user_ratings = user_ratings.merge(movies[['movieId', 'title', 'genres']], on='movieId', how='left')
-    print(f"Numero di film valutati dall'utente {user_id}: {len(user_ratings)}")
-    
-    # Debug: verifica i generi valutati dall'utente
-    print("Generi dei film valutati dall'utente:")
-    print(user_ratings[['title', 'genres']].head())
-
-    # Pondera i generi in base ai rating
-    genre_weights = {}
-    for _, row in user_ratings.iterrows():
-        if isinstance(row["genres"], list):  # Assicurati che "genres" sia una lista
-            for genre in row["genres"]:
-                genre_weights[genre] = genre_weights.get(genre, 0) + row["rating"]
-    
-    print(f"Pesi dei generi calcolati: {genre_weights}")
-
-    # Cache dei risultati DBpedia per evitare chiamate ripetute
-    dbpedia_cache = {}
-
-    # Assicurati che le colonne 'directors' e 'actors' siano inizializzate
-    if "directors" not in movies.columns:
-        movies["directors"] = [[] for _ in range(len(movies))]
-        print("Colonna 'directors' non trovata. Aggiunta colonna vuota.")
-    if "actors" not in movies.columns:
-        movies["actors"] = [[] for _ in range(len(movies))]
-        print("Colonna 'actors' non trovata. Aggiunta colonna vuota.")
-
-    # Filtra i film già valutati
-    rated_movie_ids = set(user_ratings["movieId"])
-    recommendations = movies[~movies["movieId"].isin(rated_movie_ids)]
-    print(f"Numero di film candidati per la raccomandazione: {len(recommendations)}")
-
-    # Filtra i film in base ai generi preferiti
-    if genre_weights:
-        recommendations = recommendations[recommendations["genres"].apply(
-            lambda x: any(genre in x for genre in genre_weights.keys())
-            if isinstance(x, list) else False
-        )]
-        print(f"Numero di film dopo il filtro per i generi: {len(recommendations)}")
+    instrumentation.increment("recommend_requests_total")
+    with instrumentation.span("recommend_seconds"):
+        if index is not None:
+            scorer = index.scorer
+        elif scorer is None:
+            scorer = GenreScorer.from_movies(movies)
+        result = _recommend(user_id, ratings, top_k, scorer, index, state, pseudo_count,
+                            ((content, content_weight), (cf, cf_weight), (graph, graph_weight)), tags, tag_weight)
+    if cache is not None:
+        cache.put(user_id, top_k, result, options=options)
+    return result
+
+def _recommend(user_id, ratings, top_k, scorer, index, state, pseudo_count, neighbor_indexes, tags, tag_weight):
+    """Calcola le raccomandazioni di `recommend_movies`, misurando ogni fase."""
+    with instrumentation.span("recommend_stage_seconds", stage="filter"):
+        if index is not None:
+            # Accesso in O(rating dell'utente) senza scorrere il DataFrame
+            rated_rows, rated_ratings = index.user_rows(user_id)
+        else:
+            # Filtra i rating dell'utente e individua le posizioni dei film nel catalogo
+            user_ratings = ratings[ratings["userId"] == user_id]
+            rated_rows = scorer.rows(user_ratings["movieId"].to_numpy())
+            rated_ratings = user_ratings["rating"].to_numpy()
+
+        # Pondera i generi in base ai rating
+        weights, present = scorer.genre_weights(rated_rows, rated_ratings)
+        if not present.any():
+            # Nessun genere valutato: impossibile procedere con il filtro per i generi
+            instrumentation.increment("recommend_empty_profiles_total")
+            return pd.DataFrame()
+
+        # Film candidati: unione dei bitset dei generi preferiti meno i film già valutati
+        candidates = scorer.candidate_rows(present, rated_rows)
+
+    with instrumentation.span("recommend_stage_seconds", stage="score"):
+        # Punteggio dei soli candidati, dalle combinazioni di generi del catalogo.
+        # Il valore stimato dall'Epsilon-Greedy dopo un solo aggiornamento coincide con la
+        # ricompensa (media per i titoli duplicati): la selezione lo calcola direttamente.
+        scores = scorer.scores(weights, candidates)
+        # Vicini per contenuto e per rating dei film valutati (una riga di ogni indice per film)
+        # e film raggiunti sul grafo di conoscenza
+        known = rated_rows >= 0
+        for neighbors, weight in neighbor_indexes:
+            if neighbors is not None:
+                neighbor_ids, neighbor_scores = neighbors.neighbor_scores(scorer.movie_ids[rated_rows[known]],
+                                                                          rated_ratings[known])
+                scores = combine_scores(scores, positions_in(candidates, scorer.rows(neighbor_ids)),
+                                        neighbor_scores, weight)
+        if tags is not None:
+            # Solo i film nelle posting list dei tag dell'utente, senza scorrere il catalogo
+            tagged_ids, tag_scores = tags.user_scores(user_id)
+            scores = combine_scores(scores, positions_in(candidates, scorer.rows(tagged_ids)), tag_scores,
+                                    tag_weight)
+
+    if state is not None:
+        with instrumentation.span("recommend_stage_seconds", stage="bandit"):
+            # Il punteggio dei generi fa da prior per le ricompense osservate dall'utente
+            feedback_ids, counts, sums = state.user_stats(user_id)
+            if len(feedback_ids):
+                scores = blend_scores(scores, positions_in(candidates, scorer.rows(feedback_ids)), counts, sums,
+                                      pseudo_count)
+
+    with instrumentation.span("recommend_stage_seconds", stage="top_k"):
+        rows, scores = scorer.top_k_rows(candidates, scores, top_k)
+        return pd.DataFrame({"title": scorer.titles[rows], "score": scores})
+
+_worker_scorer = None
+
+def _init_batch_worker(scorer):
+    """Memorizza il motore dei generi nel processo worker (una volta per processo)."""
+    global _worker_scorer
+    _worker_scorer = scorer
+
+def _rank_block(task):
+    """Calcola le raccomandazioni di un blocco di utenti nel processo worker."""
+    start, n_users, user_codes, rated_rows, rated_ratings, top_k = task
+    users, rows, scores = _worker_scorer.rank_block(user_codes, rated_rows, rated_ratings, n_users, top_k)
+    return start + users, rows, scores
+
+def recommend_for_users(user_ids, ratings, movies, top_k=5, scorer=None, index=None,
+                        block_size=BATCH_BLOCK_SIZE, n_workers=None):
+    """
+    Raccomanda film a molti utenti in un'unica passata.
+
+    I rating vengono filtrati una sola volta e raggruppati per utente; ogni
+    blocco di utenti è valutato con un prodotto matrice utenti x generi per
+    generi x film e i blocchi sono distribuiti su un pool di processi. Per
+    ogni utente il risultato coincide con quello di `recommend_movies`.
+
+    Args:
+        user_ids (iterable): ID degli utenti.
+        ratings (DataFrame): DataFrame dei rating.
+        movies (DataFrame): DataFrame dei film.
+        top_k (int): Numero di raccomandazioni per utente.
+        scorer (GenreScorer): Motore dei generi già costruito su `movies`.
+        index (RecommenderIndex): Indice persistente dei rating; se presente `ratings`
+            e `movies` non vengono letti.
+        block_size (int): Numero di utenti per blocco.
+        n_workers (int): Numero di processi (default: numero di CPU; 1 = nessun pool).
+
+    Returns:
+        DataFrame: Colonne 'userId', 'movieId', 'title' e 'score', ordinate per
+        utente e punteggio decrescente. Gli utenti senza generi valutati non compaiono.
+    """
+    user_ids = pd.unique(np.asarray(user_ids))
+    if index is not None:
+        scorer = index.scorer
+        user_codes, rated_rows, rated_ratings = index.gather(user_ids)
     else:
-        print("I pesi dei generi sono vuoti. Impossibile procedere con il filtro per i generi.")
-        return pd.DataFrame()  # Restituisci un DataFrame vuoto
-
-    # Calcola un punteggio complessivo basato sui generi
-    recommendations["score"] = recommendations["genres"].apply(
-        lambda x: sum([genre_weights.get(genre, 0) for genre in x]) if isinstance(x, list) else 0
-    )
-
-    # Inizializza l'algoritmo Epsilon-Greedy MAB
-    mab = EpsilonGreedyMAB(epsilon=0.1, decay=True)
-
-    # Seleziona i film da raccomandare utilizzando l'algoritmo Epsilon-Greedy
-    recommended_titles = []
-    for _, movie in recommendations.iterrows():
-        # Utilizza il punteggio del film come ricompensa per l'algoritmo
-        reward = movie['score']
-        mab.update(movie['title'], reward)
-        recommended_titles.append(movie['title'])
-
-    # Seleziona i top K film in base ai valori dell'algoritmo Epsilon-Greedy
-    selected_movies = mab.get_action_values()
-    top_movies = sorted(selected_movies.items(), key=lambda x: x[1], reverse=True)[:top_k]
-
-    print(f"Top {top_k} film consigliati per l'utente {user_id}:")
-    for movie, score in top_movies:
-        print(f"Film: {movie}, Punteggio: {score:.2f}")
-    
-    return pd.DataFrame(top_movies, columns=["title", "score"])
+        if scorer is None:
+            scorer = GenreScorer.from_movies(movies)
+        # Un solo filtro sull'intero DataFrame, poi rating ordinati per utente (layout CSR)
+        user_codes = pd.Index(user_ids).get_indexer(ratings["userId"].to_numpy())
+        selected = np.flatnonzero(user_codes >= 0)
+        order = selected[np.argsort(user_codes[selected], kind="stable")]
+        user_codes = user_codes[order]
+        rated_rows = scorer.rows(ratings["movieId"].to_numpy()[order])
+        rated_ratings = ratings["rating"].to_numpy()[order]
+    offsets = np.searchsorted(user_codes, np.arange(0, len(user_ids) + block_size, block_size))
+
+    tasks = []
+    for block, start in enumerate(range(0, len(user_ids), block_size)):
+        lo, hi = offsets[block], offsets[block + 1]
+        n_users = min(block_size, len(user_ids) - start)
+        tasks.append((start, n_users, user_codes[lo:hi] - start, rated_rows[lo:hi], rated_ratings[lo:hi], top_k))
+
+    n_workers = n_workers or os.cpu_count() or 1
+    if n_workers == 1 or len(tasks) <= 1:
+        _init_batch_worker(scorer)
+        results = [_rank_block(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(n_workers, len(tasks)),
+                                 initializer=_init_batch_worker, initargs=(scorer,)) as executor:
+            results = list(executor.map(_rank_block, tasks))
+
+    if not results:
+        return pd.DataFrame(columns=["userId", "movieId", "title", "score"])
+    users = np.concatenate([r[0] for r in results])
+    rows = np.concatenate([r[1] for r in results])
+    return pd.DataFrame({
+        "userId": user_ids[users],
+        "movieId": scorer.movie_ids[rows],
+        "title": scorer.titles[rows],
+        "score": np.concatenate([r[2] for r in results]),
+    })
 
 if __name__ == "__main__":
     movies, ratings = load_raw_data()  # Usa i dati raw
+    index = RecommenderIndex.from_frames(movies, ratings)  # Costruito una sola volta
     user_id = 1  # ID dell'utente per il quale fare la raccomandazione
-    recommendations = recommend_movies(user_id, ratings, movies)
+    recommendations = recommend_movies(user_id, ratings, movies, index=index)
     
     if recommendations.empty:
         print("Nessuna raccomandazione trovata.")
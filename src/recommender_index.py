@@ -0,0 +1,173 @@
+import numpy as np
+import pandas as pd
+
+import columnar
+from scoring import GenreScorer
+
+
+class RecommenderIndex:
+    """
+    Indice in memoria dei dati di raccomandazione.
+
+    I rating sono ordinati per utente in array in stile CSR (offset, movieId,
+    rating): i rating di un utente occupano l'intervallo
+    `offsets[i]:offsets[i + 1]`, per cui ogni ricerca costa quanto i rating
+    dell'utente e non richiede di scorrere l'intero DataFrame. Le posizioni
+    dei film nel catalogo sono precalcolate tramite la mappa movieId -> riga
+    del motore dei generi.
+    """
+
+    def __init__(self, scorer, user_ids, offsets, movie_ids, ratings, rows=None, data_version=None):
+        """
+        Inizializza l'indice a partire da array già ordinati per utente.
+
+        Args:
+            scorer (GenreScorer): Motore dei generi del catalogo.
+            user_ids (ndarray): ID utente distinti, in ordine crescente.
+            offsets (ndarray): Offset di inizio dei rating di ogni utente (len = utenti + 1).
+            movie_ids (ndarray): movieId dei rating, raggruppati per utente.
+            ratings (ndarray): Rating corrispondenti.
+            rows (ndarray): Posizioni dei film nel catalogo; se assenti vengono calcolate.
+            data_version (str): Versione dei dati da cui è costruito l'indice, usata nelle
+                chiavi della cache dei risultati (None se non nota).
+        """
+        self.scorer = scorer
+        self.user_ids = np.asarray(user_ids)
+        self.offsets = np.asarray(offsets)
+        self.movie_ids = np.asarray(movie_ids)
+        self.ratings = np.asarray(ratings)
+        self.rows = scorer.rows(self.movie_ids) if rows is None else np.asarray(rows)
+        self.data_version = data_version
+
+    @classmethod
+    def from_frames(cls, movies, ratings, scorer=None):
+        """
+        Costruisce l'indice dai DataFrame restituiti da `load_raw_data`.
+
+        Args:
+            movies (DataFrame): DataFrame dei film.
+            ratings (DataFrame): DataFrame dei rating.
+            scorer (GenreScorer): Motore dei generi già costruito su `movies`.
+
+        Returns:
+            RecommenderIndex: L'indice costruito.
+        """
+        if scorer is None:
+            scorer = GenreScorer.from_movies(movies)
+        user_column = ratings["userId"].to_numpy()
+        order = np.argsort(user_column, kind="stable")
+        user_ids, counts = np.unique(user_column[order], return_counts=True)
+        offsets = np.concatenate(([0], np.cumsum(counts)))
+        return cls(scorer, user_ids, offsets,
+                   ratings["movieId"].to_numpy()[order], ratings["rating"].to_numpy()[order])
+
+    @classmethod
+    def from_columnar(cls, directory, mmap_mode="r"):
+        """
+        Costruisce l'indice dal formato colonnare mappando i file in memoria.
+
+        Gli array dei rating sono già ordinati per utente su disco: non viene
+        letto alcun CSV né ricalcolato alcun ordinamento, e più processi
+        condividono le stesse pagine.
+
+        Args:
+            directory (str): Cartella del formato colonnare.
+            mmap_mode (str): Modalità di np.load (None per caricare in memoria).
+
+        Returns:
+            RecommenderIndex: L'indice costruito.
+        """
+        scorer = columnar.load_genre_scorer(directory, mmap_mode)
+        ratings, meta = columnar.load_ratings(directory, mmap_mode)
+        # Revisioni delle tabelle: cambiano a ogni salvataggio, segmento accodato o aggiornamento del catalogo
+        data_version = f"{columnar.load_meta(directory, 'movies').get('revision', 0)}.{meta.get('revision', 0)}"
+        return cls(scorer, ratings["users"], ratings["offsets"], ratings["movieId"],
+                   ratings["rating"], rows=ratings["movieRow"], data_version=data_version)
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    def __contains__(self, user_id):
+        return self._position(user_id) >= 0
+
+    def _position(self, user_id):
+        """Restituisce la posizione dell'utente nell'indice (-1 se assente)."""
+        pos = np.searchsorted(self.user_ids, user_id)
+        if pos < len(self.user_ids) and self.user_ids[pos] == user_id:
+            return pos
+        return -1
+
+    def _slice(self, user_id):
+        pos = self._position(user_id)
+        if pos < 0:
+            return slice(0, 0)
+        return slice(self.offsets[pos], self.offsets[pos + 1])
+
+    def user_ratings(self, user_id):
+        """
+        Restituisce i rating di un utente.
+
+        Args:
+            user_id (int): ID dell'utente.
+
+        Returns:
+            tuple: (movieId, rating) dell'utente; array vuoti se l'utente non esiste.
+        """
+        span = self._slice(user_id)
+        return self.movie_ids[span], self.ratings[span]
+
+    def user_rows(self, user_id):
+        """
+        Restituisce le posizioni nel catalogo dei film valutati da un utente.
+
+        Args:
+            user_id (int): ID dell'utente.
+
+        Returns:
+            tuple: (posizioni nel catalogo, rating); -1 per i film non in catalogo.
+        """
+        span = self._slice(user_id)
+        return self.rows[span], self.ratings[span]
+
+    def gather(self, user_ids):
+        """
+        Raccoglie i rating di più utenti in un unico blocco contiguo.
+
+        Args:
+            user_ids (ndarray): ID degli utenti (distinti).
+
+        Returns:
+            tuple: (indice dell'utente in `user_ids`, posizioni nel catalogo, rating).
+        """
+        user_ids = np.asarray(user_ids)
+        if not len(self.user_ids):
+            empty = np.array([], dtype=np.int64)
+            return empty, empty, self.ratings[:0]
+        pos = np.searchsorted(self.user_ids, user_ids)
+        clipped = np.minimum(pos, len(self.user_ids) - 1)
+        found = (pos < len(self.user_ids)) & (self.user_ids[clipped] == user_ids)
+        starts = np.where(found, self.offsets[clipped], 0)
+        lengths = np.where(found, self.offsets[clipped + 1] - self.offsets[clipped], 0)
+
+        codes = np.repeat(np.arange(len(user_ids)), lengths)
+        block_starts = np.cumsum(lengths) - lengths
+        positions = np.arange(lengths.sum()) + np.repeat(starts - block_starts, lengths)
+        return codes, self.rows[positions], self.ratings[positions]
+
+    def recommend(self, user_id, top_k=5):
+        """
+        Raccomanda film a un utente senza accedere ai DataFrame.
+
+        Args:
+            user_id (int): ID dell'utente.
+            top_k (int): Numero di raccomandazioni da restituire.
+
+        Returns:
+            DataFrame: Colonne 'title' e 'score' (vuoto se l'utente non ha generi valutati).
+        """
+        rows, ratings = self.user_rows(user_id)
+        ranked = self.scorer.rank(rows, ratings, top_k)
+        if ranked is None:
+            return pd.DataFrame()
+        rows, scores = ranked
+        return pd.DataFrame({"title": self.scorer.titles[rows], "score": scores})
@@ -0,0 +1,396 @@
+import numpy as np
+import pandas as pd
+
+
+def split_genres(genres):
+    """
+    Normalizza il campo dei generi di un film in una lista.
+
+    Args:
+        genres: Lista di generi, stringa separata da '|' oppure valore mancante.
+
+    Returns:
+        list: Lista dei generi (vuota se il valore non è valido).
+    """
+    if isinstance(genres, list):
+        return genres
+    if isinstance(genres, str):
+        return genres.split('|')
+    return []
+
+
+def genre_matrix(masks, n_genres):
+    """
+    Espande le bitmask dei generi in una matrice multi-hot film x generi.
+
+    Args:
+        masks (ndarray): Bitmask dei generi di ogni film.
+        n_genres (int): Numero di generi del vocabolario.
+
+    Returns:
+        ndarray: Matrice float64 con 1 dove il film appartiene al genere.
+    """
+    masks = np.asarray(masks).astype(np.uint64)
+    shifts = np.arange(n_genres, dtype=np.uint64)
+    return ((masks[:, None] >> shifts) & np.uint64(1)).astype(np.float64)
+
+
+def genre_bitsets(matrix):
+    """
+    Costruisce le posting list dei generi come bitset: riga j = film del genere j, un bit per film.
+
+    Args:
+        matrix (ndarray): Matrice film x generi.
+
+    Returns:
+        ndarray: Matrice uint8 generi x ceil(film / 8) (bit più significativo = film di posizione minore).
+    """
+    return np.packbits(np.asarray(matrix).T > 0, axis=1)
+
+
+def positions_in(rows, targets):
+    """
+    Posizioni di righe del catalogo all'interno di un sottoinsieme ordinato di righe.
+
+    Args:
+        rows (ndarray): Righe del sottoinsieme, ordinate e distinte.
+        targets (ndarray): Righe da cercare (-1 ignorate).
+
+    Returns:
+        ndarray: Posizione di ogni riga in `rows` (-1 se assente).
+    """
+    targets = np.asarray(targets)
+    if not len(rows):
+        return np.full(len(targets), -1)
+    positions = np.minimum(np.searchsorted(rows, targets), len(rows) - 1)
+    return np.where((targets >= 0) & (rows[positions] == targets), positions, -1)
+
+
+class GenreScorer:
+    """
+    Motore di punteggio vettoriale basato sui generi.
+
+    I generi di ogni film vengono codificati una sola volta in una matrice
+    multi-hot (film x generi). Il profilo di un utente diventa un vettore di
+    pesi sui generi e i punteggi di tutti i film si ottengono con un unico
+    prodotto matrice-vettore.
+
+    Per le richieste singole i candidati si ottengono dall'OR dei bitset dei
+    generi dell'utente meno i film già valutati, e i punteggi dei soli
+    candidati dalle combinazioni distinte di generi (al più poche migliaia anche
+    per cataloghi di decine di migliaia di film): il costo dipende dal numero
+    di candidati e da k, non da un prodotto sull'intero catalogo.
+    """
+
+    def __init__(self, movie_ids, titles, matrix, genres):
+        """
+        Inizializza il motore a partire dalla matrice dei generi già codificata.
+
+        Args:
+            movie_ids (array-like): ID dei film, nell'ordine del catalogo.
+            titles (array-like): Titoli dei film.
+            matrix (ndarray): Matrice film x generi (occorrenze di ogni genere).
+            genres (list): Nomi dei generi, nell'ordine delle colonne di `matrix`.
+        """
+        self.movie_ids = np.asarray(movie_ids)
+        self.titles = np.asarray(titles, dtype=object)
+        self._positions = pd.Index(self.movie_ids)
+        self.matrix = np.asarray(matrix, dtype=np.float64)
+        self.genres = list(genres)
+        self.bitsets = genre_bitsets(self.matrix)
+        # Combinazioni distinte di generi: il punteggio di un film è quello della sua combinazione
+        self.profiles, self.profile_codes = np.unique(self.matrix, axis=0, return_inverse=True)
+        self.profile_codes = self.profile_codes.reshape(-1).astype(np.int32)
+
+        # I titoli duplicati vengono aggregati in un'unica voce (media dei punteggi)
+        self.title_codes, _ = pd.factorize(self.titles, use_na_sentinel=False)
+        duplicated = np.flatnonzero(np.bincount(self.title_codes)[self.title_codes] > 1)
+        duplicated = duplicated[np.argsort(self.title_codes[duplicated], kind="stable")]
+        boundaries = np.flatnonzero(np.diff(self.title_codes[duplicated])) + 1
+        self._duplicate_groups = np.split(duplicated, boundaries) if len(duplicated) else []
+
+    @classmethod
+    def from_genre_lists(cls, movie_ids, titles, genre_lists):
+        """
+        Costruisce il motore codificando i generi di ogni film.
+
+        Args:
+            movie_ids (array-like): ID dei film, nell'ordine del catalogo.
+            titles (array-like): Titoli dei film.
+            genre_lists (iterable): Generi di ogni film (liste o stringhe '|').
+
+        Returns:
+            GenreScorer: Il motore di punteggio.
+        """
+        exploded = pd.Series([split_genres(g) for g in genre_lists], dtype=object).explode().dropna()
+        genre_codes, genres = pd.factorize(exploded, sort=True)
+
+        # Conta le occorrenze (non solo la presenza) per replicare la somma sulla lista dei generi
+        matrix = np.zeros((len(np.asarray(movie_ids)), len(genres)), dtype=np.float64)
+        np.add.at(matrix, (exploded.index.to_numpy(), genre_codes), 1.0)
+        return cls(movie_ids, titles, matrix, genres)
+
+    @classmethod
+    def from_bitmasks(cls, movie_ids, titles, masks, genres):
+        """
+        Costruisce il motore dalle bitmask dei generi del formato colonnare.
+
+        Args:
+            movie_ids (array-like): ID dei film, nell'ordine del catalogo.
+            titles (array-like): Titoli dei film.
+            masks (ndarray): Bitmask dei generi di ogni film.
+            genres (list): Vocabolario dei generi (bit i -> genres[i]).
+
+        Returns:
+            GenreScorer: Il motore di punteggio.
+        """
+        return cls(movie_ids, titles, genre_matrix(masks, len(genres)), genres)
+
+    @classmethod
+    def from_movies(cls, movies):
+        """
+        Costruisce il motore da un DataFrame dei film.
+
+        Args:
+            movies (DataFrame): DataFrame con le colonne 'movieId', 'title' e 'genres'.
+
+        Returns:
+            GenreScorer: Il motore di punteggio.
+        """
+        return cls.from_genre_lists(movies["movieId"].to_numpy(), movies["title"].to_numpy(), movies["genres"])
+
+    def __len__(self):
+        return len(self.movie_ids)
+
+    def rows(self, movie_ids):
+        """
+        Converte gli ID dei film nelle rispettive posizioni nel catalogo.
+
+        Args:
+            movie_ids (array-like): ID dei film.
+
+        Returns:
+            ndarray: Posizioni nel catalogo (-1 per i film sconosciuti).
+        """
+        return self._positions.get_indexer(np.asarray(movie_ids))
+
+    def genre_weights(self, rows, ratings):
+        """
+        Calcola il vettore dei pesi dei generi di un utente con un'unica aggregazione.
+
+        Args:
+            rows (ndarray): Posizioni nel catalogo dei film valutati (-1 ignorati).
+            ratings (ndarray): Rating corrispondenti.
+
+        Returns:
+            tuple: (pesi per genere, maschera booleana dei generi presenti).
+        """
+        rows = np.asarray(rows)
+        valid = rows >= 0
+        rated = self.matrix[rows[valid]]
+        weights = np.asarray(ratings, dtype=np.float64)[valid] @ rated
+        present = rated.any(axis=0)
+        return weights, present
+
+    def scores(self, weights, rows=None):
+        """
+        Calcola il punteggio dei film del catalogo.
+
+        Args:
+            weights (ndarray): Pesi per genere dell'utente.
+            rows (ndarray): Posizioni dei film da valutare (default: tutto il catalogo).
+
+        Returns:
+            ndarray: Punteggio di ogni film richiesto.
+        """
+        profile_scores = self.profiles @ weights
+        codes = self.profile_codes if rows is None else self.profile_codes[rows]
+        return profile_scores[codes]
+
+    def candidate_bits(self, present, rated_rows):
+        """
+        Bitset dei film candidati: unione dei bitset dei generi presenti meno i film già valutati.
+
+        Args:
+            present (ndarray): Maschera booleana dei generi presenti nel profilo.
+            rated_rows (ndarray): Posizioni dei film già valutati (-1 ignorati).
+
+        Returns:
+            ndarray: Bitset uint8 dei candidati.
+        """
+        bits = np.bitwise_or.reduce(self.bitsets[np.asarray(present, dtype=bool)], axis=0)
+        rated_rows = np.asarray(rated_rows, dtype=np.int64)
+        rated_rows = rated_rows[rated_rows >= 0]
+        np.bitwise_and.at(bits, rated_rows >> 3, ~(np.uint8(0x80) >> (rated_rows & 7).astype(np.uint8)))
+        return bits
+
+    def candidate_rows(self, present, rated_rows):
+        """
+        Individua le posizioni dei film candidati: non ancora valutati e con almeno un genere preferito.
+
+        Args:
+            present (ndarray): Maschera booleana dei generi presenti nel profilo.
+            rated_rows (ndarray): Posizioni dei film già valutati (-1 ignorati).
+
+        Returns:
+            ndarray: Posizioni ordinate dei candidati.
+        """
+        return np.flatnonzero(np.unpackbits(self.candidate_bits(present, rated_rows), count=len(self)))
+
+    def candidate_mask(self, present, rated_rows):
+        """
+        Individua i film candidati: non ancora valutati e con almeno un genere preferito.
+
+        Args:
+            present (ndarray): Maschera booleana dei generi presenti nel profilo.
+            rated_rows (ndarray): Posizioni dei film già valutati (-1 ignorati).
+
+        Returns:
+            ndarray: Maschera booleana dei film candidati.
+        """
+        return np.unpackbits(self.candidate_bits(present, rated_rows), count=len(self)).astype(bool)
+
+    def top_k(self, scores, mask, top_k):
+        """
+        Seleziona i migliori film candidati.
+
+        Args:
+            scores (ndarray): Punteggio di ogni film.
+            mask (ndarray): Maschera booleana dei film candidati.
+            top_k (int): Numero di film da restituire.
+
+        Returns:
+            tuple: (posizioni nel catalogo, punteggi) ordinati per punteggio decrescente.
+        """
+        rows = np.flatnonzero(mask)
+        return self.top_k_rows(rows, scores[rows], top_k)
+
+    def top_k_rows(self, rows, values, top_k):
+        """
+        Seleziona i migliori tra i film candidati indicati per posizione.
+
+        I titoli duplicati sono aggregati con la media dei punteggi e, a parità
+        di punteggio, prevale l'ordine del catalogo. Solo i candidati oltre la
+        soglia del k-esimo punteggio (argpartition) vengono ordinati.
+
+        Args:
+            rows (ndarray): Posizioni ordinate dei candidati.
+            values (ndarray): Punteggio di ogni candidato.
+            top_k (int): Numero di film da restituire.
+
+        Returns:
+            tuple: (posizioni nel catalogo, punteggi) ordinati per punteggio decrescente.
+        """
+        rows, values = np.asarray(rows), np.asarray(values)
+
+        if self._duplicate_groups and len(rows):
+            _, first, inverse = np.unique(self.title_codes[rows], return_index=True, return_inverse=True)
+            means = np.bincount(inverse, weights=values) / np.bincount(inverse)
+            order = np.argsort(first)
+            rows, values = rows[first[order]], means[order]
+
+        if 0 < top_k < len(values):
+            # Soglia del k-esimo punteggio; i pari merito restano per l'ordinamento stabile
+            threshold = values[np.argpartition(-values, top_k - 1)[top_k - 1]]
+            keep = np.flatnonzero(values >= threshold)
+            rows, values = rows[keep], values[keep]
+
+        order = np.argsort(-values, kind="stable")[:top_k]
+        return rows[order], values[order]
+
+    def rank(self, rated_rows, rated_ratings, top_k):
+        """
+        Calcola le raccomandazioni di un utente a partire dai suoi rating.
+
+        Args:
+            rated_rows (ndarray): Posizioni nel catalogo dei film valutati.
+            rated_ratings (ndarray): Rating corrispondenti.
+            top_k (int): Numero di film da restituire.
+
+        Returns:
+            tuple: (posizioni, punteggi) oppure None se il profilo dei generi è vuoto.
+        """
+        weights, present = self.genre_weights(rated_rows, rated_ratings)
+        if not present.any():
+            return None
+        rows = self.candidate_rows(present, rated_rows)
+        return self.top_k_rows(rows, self.scores(weights, rows), top_k)
+
+    def user_genre_profiles(self, user_codes, rated_rows, rated_ratings, n_users):
+        """
+        Aggrega i rating di più utenti in profili utenti x generi.
+
+        Args:
+            user_codes (ndarray): Indice dell'utente (0..n_users-1) di ogni rating.
+            rated_rows (ndarray): Posizioni nel catalogo dei film valutati (tutte valide).
+            rated_ratings (ndarray): Rating corrispondenti.
+            n_users (int): Numero di utenti.
+
+        Returns:
+            tuple: (pesi per genere, occorrenze di ogni genere) come matrici utenti x generi.
+        """
+        rated_genres = self.matrix[rated_rows]
+        values = np.asarray(rated_ratings, dtype=np.float64)
+        weights = np.zeros((n_users, len(self.genres)))
+        counts = np.zeros((n_users, len(self.genres)))
+        for j in range(len(self.genres)):
+            weights[:, j] = np.bincount(user_codes, weights=values * rated_genres[:, j], minlength=n_users)
+            counts[:, j] = np.bincount(user_codes, weights=rated_genres[:, j], minlength=n_users)
+        return weights, counts
+
+    def rank_block(self, user_codes, rated_rows, rated_ratings, n_users, top_k):
+        """
+        Calcola le raccomandazioni di un blocco di utenti in un'unica passata.
+
+        Costruisce la matrice utenti x generi dei pesi, la moltiplica per la
+        matrice dei generi dei film, esclude i film già valutati e seleziona i
+        migliori k per riga con argpartition. Il risultato coincide con quello
+        di `rank` applicato a ogni utente.
+
+        Args:
+            user_codes (ndarray): Indice dell'utente (0..n_users-1) di ogni rating.
+            rated_rows (ndarray): Posizioni nel catalogo dei film valutati (-1 ignorati).
+            rated_ratings (ndarray): Rating corrispondenti.
+            n_users (int): Numero di utenti del blocco.
+            top_k (int): Numero di film da restituire per utente.
+
+        Returns:
+            tuple: (indici utente, posizioni, punteggi) ordinati per utente e punteggio decrescente.
+        """
+        rated_rows = np.asarray(rated_rows)
+        valid = rated_rows >= 0
+        codes, rows = np.asarray(user_codes)[valid], rated_rows[valid]
+        weights, counts = self.user_genre_profiles(codes, rows, np.asarray(rated_ratings)[valid], n_users)
+
+        scores = weights @ self.matrix.T
+        mask = (counts > 0).astype(np.float64) @ self.matrix.T > 0
+        mask[codes, rows] = False
+        scores[~mask] = -np.inf
+
+        # Media dei titoli duplicati, assegnata al primo candidato del gruppo
+        for group in self._duplicate_groups:
+            group_mask = mask[:, group]
+            counts = group_mask.sum(axis=1)
+            users = np.flatnonzero(counts)
+            if not len(users):
+                continue
+            means = np.where(group_mask, scores[:, group], 0.0).sum(axis=1)[users] / counts[users]
+            first = group[group_mask[users].argmax(axis=1)]
+            scores[np.ix_(users, group)] = -np.inf
+            scores[users, first] = means
+
+        k = min(top_k, scores.shape[1])
+        if k <= 0:
+            empty = np.array([], dtype=np.int64)
+            return empty, empty, np.array([], dtype=np.float64)
+
+        # Soglia del k-esimo punteggio per riga; i pari merito sono ordinati per posizione
+        part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        threshold = np.take_along_axis(scores, part, axis=1).min(axis=1)
+        users, rows = np.nonzero((scores >= threshold[:, None]) & np.isfinite(scores))
+        values = scores[users, rows]
+        order = np.lexsort((rows, -values, users))
+        users, rows, values = users[order], rows[order], values[order]
+        rank = np.arange(len(users)) - np.searchsorted(users, users)
+        keep = rank < k
+        return users[keep], rows[keep], values[keep]
@@ -0,0 +1,471 @@
+"""
+Servizio HTTP di raccomandazione, a lunga esecuzione.
+
+I dati vengono caricati una sola volta all'avvio; le richieste concorrenti
+vengono raccolte in micro-batch valutati insieme da `recommend_for_users` in
+un pool di worker, fuori dall'event loop.
+
+Endpoint:
+    GET /recommend?user_id=1&top_k=5  Raccomandazioni di un utente (JSON).
+    GET /ready                        200 quando i dati sono caricati, altrimenti 503.
+    GET /metrics                      Richieste, batch, latenze p50/p95/p99 e throughput (JSON).
+    GET /metrics?format=prometheus    Le stesse metriche e quelle di `instrumentation`, in formato Prometheus.
+
+Con `--metrics` (o FILMINSIGHT_METRICS=1) si attiva anche la strumentazione
+dei moduli: le metriche sono per processo, quindi /metrics riporta quelle
+del processo del servizio (istogrammi delle richieste e dei micro-batch).
+
+Le raccomandazioni sono quelle per generi di `recommend_for_users`: lo stato
+dei bandit, i vicini per contenuto e item-item CF, i tag, il grafo di
+conoscenza e la cache dei risultati di `recommend_movies` non sono usati dal
+servizio, che li ignora.
+
+Se il caricamento dei dati fallisce l'errore viene registrato nel log e il
+servizio termina con codice di uscita 1, invece di restare non pronto.
+
+Esempio:
+    python src/service.py --port 8000 --workers 4
+"""
+import argparse
+import asyncio
+import collections
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+import columnar
+import instrumentation
+from recommender import PROCESSED_DATA_PATH, load_raw_data, recommend_for_users
+from recommender_index import RecommenderIndex
+
+logger = logging.getLogger(__name__)
+
+SERVICE_HOST = os.getenv("SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = int(os.getenv("SERVICE_PORT", 8000))
+SERVICE_WORKERS = int(os.getenv("SERVICE_WORKERS", 0)) or os.cpu_count() or 1
+MAX_BATCH_SIZE = 64  # Richieste massime per micro-batch
+MAX_BATCH_WAIT = 0.0  # Secondi di attesa per riempire un micro-batch (0: i batch si formano mentre i worker sono occupati)
+MAX_TOP_K = 100
+DEFAULT_TOP_K = 5
+LATENCY_WINDOW = 10000  # Latenze recenti conservate per i percentili
+THROUGHPUT_WINDOW = 60.0  # Secondi considerati per il throughput
+MAX_HEADER_LINES = 100
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+HTTP_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+def load_index(data_path=PROCESSED_DATA_PATH):
+    """
+    Carica l'indice di raccomandazione: dal formato colonnare (mappato in memoria) se presente, altrimenti dai CSV.
+
+    Args:
+        data_path (str): Cartella dei dati processati.
+
+    Returns:
+        RecommenderIndex: L'indice.
+    """
+    columnar_path = os.path.join(data_path, "columnar")
+    if columnar.has_table(columnar_path, "movies") and columnar.has_table(columnar_path, "ratings"):
+        return RecommenderIndex.from_columnar(columnar_path)
+    movies, ratings = load_raw_data(data_path)
+    return RecommenderIndex.from_frames(movies, ratings)
+
+
+_service_index = None
+
+def _init_service_worker(data_path):
+    """Carica l'indice nel processo worker (una volta per processo)."""
+    global _service_index
+    _service_index = load_index(data_path)
+
+def _worker_ready():
+    """Indica che il worker ha caricato l'indice (usata per il riscaldamento del pool)."""
+    return len(_service_index)
+
+def score_batch(user_ids, top_k, index=None):
+    """
+    Calcola le raccomandazioni di un micro-batch di utenti.
+
+    Args:
+        user_ids (list): ID degli utenti (anche ripetuti).
+        top_k (int): Numero di raccomandazioni per utente.
+        index (RecommenderIndex): Indice (default: quello caricato nel processo worker).
+
+    Returns:
+        list: Per ogni utente, la lista delle raccomandazioni come dict 'movieId', 'title', 'score'.
+    """
+    index = _service_index if index is None else index
+    frame = recommend_for_users(user_ids, None, None, top_k=top_k, index=index, n_workers=1)
+    results = collections.defaultdict(list)
+    for user_id, movie_id, title, score in zip(frame["userId"].to_numpy().tolist(), frame["movieId"].to_numpy().tolist(),
+                                               frame["title"], frame["score"].to_numpy().tolist()):
+        results[user_id].append({"movieId": movie_id, "title": title, "score": score})
+    return [results.get(user_id, []) for user_id in user_ids]
+
+
+class ServiceMetrics:
+    """Contatori, latenze recenti e throughput del servizio."""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.started = time.monotonic()
+        self.requests = 0
+        self.errors = 0
+        self.batches = 0
+        self.batched_requests = 0
+        self.latencies = collections.deque(maxlen=window)
+        # Richieste completate per secondo, solo negli ultimi THROUGHPUT_WINDOW secondi: [secondo, conteggio]
+        self.completions = collections.deque()
+
+    def observe(self, latency):
+        """Registra una richiesta di raccomandazione completata."""
+        self.latencies.append(latency)
+        second = int(time.monotonic())
+        if self.completions and self.completions[-1][0] == second:
+            self.completions[-1][1] += 1
+        else:
+            self.completions.append([second, 1])
+        while self.completions[0][0] < second - THROUGHPUT_WINDOW:
+            self.completions.popleft()
+
+    def observe_batch(self, size):
+        """Registra un micro-batch valutato."""
+        self.batches += 1
+        self.batched_requests += size
+
+    def as_dict(self):
+        now = time.monotonic()
+        latencies = np.asarray(self.latencies) * 1000
+        recent = sum(count for second, count in self.completions if second >= now - THROUGHPUT_WINDOW)
+        window = min(THROUGHPUT_WINDOW, now - self.started) or 1.0
+        percentiles = np.percentile(latencies, [50, 95, 99]) if len(latencies) else [0.0, 0.0, 0.0]
+        return {
+            "uptime_s": round(now - self.started, 3),
+            "requests": self.requests,
+            "errors": self.errors,
+            "batches": self.batches,
+            "mean_batch_size": round(self.batched_requests / self.batches, 3) if self.batches else 0.0,
+            "latency_p50_ms": round(float(percentiles[0]), 3),
+            "latency_p95_ms": round(float(percentiles[1]), 3),
+            "latency_p99_ms": round(float(percentiles[2]), 3),
+            "throughput_rps": round(recent / window, 3),
+        }
+
+
+class MicroBatcher:
+    """
+    Raccoglie le richieste concorrenti in micro-batch.
+
+    Un batch parte quando un worker è libero: prende le richieste in coda
+    (fino a `max_batch_size`), attendendo al più `max_wait` secondi per
+    riempirsi. Finché tutti i worker sono occupati le richieste si accumulano,
+    per cui sotto carico i batch crescono da soli e la coda resta breve.
+    """
+
+    def __init__(self, score, max_batch_size=MAX_BATCH_SIZE, max_wait=MAX_BATCH_WAIT, concurrency=1,
+                 metrics=None):
+        """
+        Args:
+            score (callable): Coroutine (user_ids, top_k) -> lista dei risultati, uno per utente.
+            max_batch_size (int): Richieste massime per batch.
+            max_wait (float): Secondi di attesa per riempire un batch.
+            concurrency (int): Batch valutati contemporaneamente (di norma il numero di worker).
+            metrics (ServiceMetrics): Metriche in cui registrare i batch.
+        """
+        self.score = score
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.metrics = metrics
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(concurrency)
+        self._task = None
+        self._pending = set()
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        await asyncio.gather(*self._pending, return_exceptions=True)
+
+    async def submit(self, user_id, top_k):
+        """
+        Accoda una richiesta e ne attende il risultato.
+
+        Args:
+            user_id (int): ID dell'utente.
+            top_k (int): Numero di raccomandazioni.
+
+        Returns:
+            list: Le raccomandazioni dell'utente.
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((user_id, top_k, future))
+        return await future
+
+    def _drain(self, batch):
+        while len(batch) < self.max_batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+
+    async def _run(self):
+        while True:
+            await self._slots.acquire()
+            batch = [await self._queue.get()]
+            self._drain(batch)
+            if len(batch) < self.max_batch_size and self.max_wait > 0:
+                await asyncio.sleep(self.max_wait)
+                self._drain(batch)
+            task = asyncio.get_running_loop().create_task(self._dispatch(batch))
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+
+    async def _dispatch(self, batch):
+        try:
+            # Un solo passaggio per batch con il top_k massimo, poi ogni risultato viene troncato
+            top_k = max(request[1] for request in batch)
+            with instrumentation.span("service_batch_seconds"):
+                results = await self.score([request[0] for request in batch], top_k)
+            if self.metrics is not None:
+                self.metrics.observe_batch(len(batch))
+            instrumentation.observe("service_batch_size", len(batch), buckets=BATCH_SIZE_BUCKETS)
+            for (_, request_top_k, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result[:request_top_k])
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self._slots.release()
+
+
+class RecommendationService:
+    """
+    Servizio asyncio che espone le raccomandazioni via HTTP/1.1 (connessioni persistenti).
+
+    Con un `index` già costruito la valutazione avviene in un pool di thread
+    nello stesso processo; altrimenti ogni processo del pool carica l'indice
+    da `data_path` all'avvio (dal formato colonnare le pagine sono condivise).
+    """
+
+    def __init__(self, index=None, data_path=PROCESSED_DATA_PATH, n_workers=SERVICE_WORKERS,
+                 max_batch_size=MAX_BATCH_SIZE, max_wait=MAX_BATCH_WAIT):
+        self.index = index
+        self.data_path = data_path
+        self.n_workers = n_workers
+        self.metrics = ServiceMetrics()
+        self.batcher = MicroBatcher(self._score, max_batch_size, max_wait, n_workers, self.metrics)
+        self.ready = False
+        self.server = None
+        self._executor = None
+        self._loading = None
+
+    @property
+    def port(self):
+        """Porta su cui il server è in ascolto."""
+        return self.server.sockets[0].getsockname()[1]
+
+    async def start(self, host=SERVICE_HOST, port=SERVICE_PORT):
+        """
+        Avvia il server e il caricamento dei dati; /ready risponde 503 finché il caricamento non termina.
+
+        Args:
+            host (str): Indirizzo di ascolto.
+            port (int): Porta (0 = porta libera qualsiasi).
+        """
+        self.server = await asyncio.start_server(self._handle, host, port)
+        self._loading = asyncio.get_running_loop().create_task(self._load())
+        self._loading.add_done_callback(self._loaded)
+        logger.info(f"Servizio di raccomandazione in ascolto su {host}:{self.port}")
+
+    async def wait_ready(self):
+        """Attende la fine del caricamento (propagando un eventuale errore)."""
+        await self._loading
+
+    def _loaded(self, task):
+        """Registra nel log l'errore del caricamento, anche se nessuno attende il task."""
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Caricamento dei dati da '{self.data_path}' fallito: {task.exception()!r}")
+
+    async def _load(self):
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        if self.index is not None:
+            self._executor = ThreadPoolExecutor(max_workers=self.n_workers)
+        else:
+            self._executor = ProcessPoolExecutor(max_workers=self.n_workers, initializer=_init_service_worker,
+                                                 initargs=(self.data_path,))
+            # Riscalda il pool: ogni worker carica l'indice prima di dichiarare il servizio pronto
+            await asyncio.gather(*(loop.run_in_executor(self._executor, _worker_ready)
+                                   for _ in range(self.n_workers)))
+        self.batcher.start()
+        self.ready = True
+        logger.info(f"Servizio pronto in {time.monotonic() - started:.1f} secondi.")
+
+    async def _score(self, user_ids, top_k):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, score_batch, user_ids, top_k, self.index)
+
+    async def close(self):
+        """Ferma il server, il micro-batching e il pool di worker."""
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        if self._loading is not None and not self._loading.done():
+            self._loading.cancel()
+        await self.batcher.close()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def serve_forever(self, host=SERVICE_HOST, port=SERVICE_PORT):
+        """Avvia il servizio e resta in esecuzione fino all'interruzione o a un errore di caricamento, che propaga."""
+        await self.start(host, port)
+        serving = asyncio.get_running_loop().create_task(self.server.serve_forever())
+        try:
+            await self.wait_ready()
+            await serving
+        finally:
+            serving.cancel()
+            await self.close()
+
+    async def recommend(self, user_id, top_k=DEFAULT_TOP_K):
+        """
+        Raccomandazioni di un utente attraverso il micro-batching.
+
+        Args:
+            user_id (int): ID dell'utente.
+            top_k (int): Numero di raccomandazioni.
+
+        Returns:
+            list: Le raccomandazioni (vuota per un utente sconosciuto o senza generi).
+        """
+        started = time.monotonic()
+        self.metrics.requests += 1
+        try:
+            result = await self.batcher.submit(user_id, top_k)
+        except Exception:
+            self.metrics.errors += 1
+            instrumentation.increment("service_errors_total")
+            raise
+        self.metrics.observe(time.monotonic() - started)
+        instrumentation.observe("service_request_seconds", time.monotonic() - started)
+        return result
+
+    async def _route(self, method, target):
+        """Restituisce (stato HTTP, corpo) della richiesta: un oggetto JSON o il testo per Prometheus."""
+        url = urlsplit(target)
+        if url.path not in ("/recommend", "/ready", "/metrics"):
+            return 404, {"error": f"Percorso sconosciuto: {url.path}"}
+        if method != "GET":
+            return 405, {"error": f"Metodo non consentito: {method}"}
+        if url.path == "/ready":
+            return (200 if self.ready else 503), {"ready": self.ready}
+        if url.path == "/metrics":
+            metrics = dict(self.metrics.as_dict(), ready=self.ready)
+            if parse_qs(url.query).get("format") == ["prometheus"]:
+                return 200, instrumentation.prometheus_text({f"service_{name}": float(value)
+                                                              for name, value in metrics.items()})
+            if instrumentation.enabled():
+                metrics["instrumentation"] = instrumentation.snapshot()
+            return 200, metrics
+
+        if not self.ready:
+            return 503, {"error": "Servizio non ancora pronto"}
+        params = parse_qs(url.query)
+        try:
+            user_id = int(params["user_id"][0])
+            top_k = int(params.get("top_k", [DEFAULT_TOP_K])[0])
+        except (KeyError, ValueError):
+            return 400, {"error": "Parametri richiesti: user_id (intero) e top_k opzionale (intero)"}
+        if not 1 <= top_k <= MAX_TOP_K:
+            return 400, {"error": f"top_k deve essere compreso tra 1 e {MAX_TOP_K}"}
+        try:
+            recommendations = await self.recommend(user_id, top_k)
+        except Exception as e:
+            logger.error(f"Errore durante la raccomandazione per l'utente {user_id}: {e}")
+            return 500, {"error": "Errore interno"}
+        return 200, {"userId": user_id, "topK": top_k, "recommendations": recommendations}
+
+    async def _handle(self, reader, writer):
+        """Gestisce una connessione HTTP/1.1, con keep-alive."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                parts = request_line.decode("latin-1").split()
+                headers = {}
+                for _ in range(MAX_HEADER_LINES):
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                if len(parts) != 3:
+                    status, payload = 400, {"error": "Richiesta non valida"}
+                    keep_alive = False
+                else:
+                    method, target, version = parts
+                    if int(headers.get("content-length", 0) or 0):
+                        await reader.readexactly(int(headers["content-length"]))
+                    status, payload = await self._route(method, target)
+                    connection = headers.get("connection", "").lower()
+                    keep_alive = connection != "close" and (version == "HTTP/1.1" or connection == "keep-alive")
+
+                if isinstance(payload, str):
+                    body, content_type = payload.encode("utf-8"), "text/plain; version=0.0.4"
+                else:
+                    body, content_type = json.dumps(payload, ensure_ascii=False).encode("utf-8"), "application/json"
+                writer.write(
+                    f"HTTP/1.1 {status} {HTTP_REASONS[status]}\r\n"
+                    f"Content-Type: {content_type}; charset=utf-8\r\n"
+                    f"Content-Length: {len(body)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + body
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servizio HTTP di raccomandazione.")
+    parser.add_argument("--host", default=SERVICE_HOST, help="Indirizzo di ascolto.")
+    parser.add_argument("--port", type=int, default=SERVICE_PORT, help="Porta di ascolto.")
+    parser.add_argument("--data-path", default=PROCESSED_DATA_PATH, help="Cartella dei dati processati.")
+    parser.add_argument("--workers", type=int, default=SERVICE_WORKERS, help="Processi di valutazione.")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH_SIZE, help="Richieste massime per micro-batch.")
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_BATCH_WAIT * 1000,
+                        help="Attesa massima per riempire un micro-batch, in millisecondi.")
+    parser.add_argument("--metrics", action="store_true",
+                        help="Attiva la strumentazione (istogrammi e contatori esportati da /metrics).")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    if args.metrics:
+        instrumentation.enable()
+    service = RecommendationService(data_path=args.data_path, n_workers=args.workers,
+                                    max_batch_size=args.max_batch, max_wait=args.max_wait_ms / 1000)
+    try:
+        asyncio.run(service.serve_forever(args.host, args.port))
+    except KeyboardInterrupt:
+        logger.info("Servizio interrotto.")
+    except Exception:
+        # L'errore di caricamento è già nel log
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
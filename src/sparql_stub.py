@@ -0,0 +1,165 @@
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+LITERAL_PATTERN = re.compile(r'"((?:[^"\\]|\\.)*)"')
+IRI_PATTERN = re.compile(r"<([^<>\s]+)>")
+
+
+def query_literals(query):
+    """
+    Estrae i letterali stringa e gli IRI da una query SPARQL (titoli, ID, URI delle entità, ...).
+
+    Args:
+        query (str): Testo della query.
+
+    Returns:
+        set: I letterali, con gli escape rimossi, e gli IRI.
+    """
+    literals = {re.sub(r"\\(.)", r"\1", literal) for literal in LITERAL_PATTERN.findall(query)}
+    return literals | set(IRI_PATTERN.findall(query))
+
+
+class StubSparqlServer:
+    """
+    Endpoint SPARQL locale per test e benchmark dell'arricchimento.
+
+    Risponde a ogni query con i binding delle fixture le cui chiavi compaiono
+    come letterali nella query. Latenza, risposte 429 (con Retry-After) ed
+    errori 500 possono essere iniettati in modo deterministico (le prime N
+    richieste) o casuale (con una probabilità e un seed). Le connessioni
+    sono HTTP/1.1 persistenti.
+
+    Esempio:
+        with StubSparqlServer({"Heat": [binding]}) as server:
+            enrich_movies(movies, endpoint=server.url)
+    """
+
+    def __init__(self, fixtures=None, throttle_first=0, retry_after=0, latency=0.0, latency_jitter=0.0,
+                 throttle_rate=0.0, error_rate=0.0, seed=None):
+        """
+        Args:
+            fixtures (dict): Chiave (letterale cercato) -> lista di binding SPARQL.
+            throttle_first (int): Numero di richieste iniziali a cui rispondere 429.
+            retry_after (float): Valore dell'header Retry-After dei 429.
+            latency (float): Latenza aggiunta a ogni risposta, in secondi.
+            latency_jitter (float): Variazione casuale massima della latenza, in secondi.
+            throttle_rate (float): Probabilità di rispondere 429 a una richiesta.
+            error_rate (float): Probabilità di rispondere 500 a una richiesta.
+            seed (int): Seed del generatore casuale delle iniezioni.
+        """
+        self.fixtures = fixtures or {}
+        self.throttle_first = throttle_first
+        self.retry_after = retry_after
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.requests = 0
+        self.throttled = 0
+        self.errors = 0
+        self.queries = []
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @classmethod
+    def from_fixture_file(cls, path, **kwargs):
+        """
+        Crea il server caricando le fixture da un file JSON (chiave -> lista di binding).
+
+        Args:
+            path (str): Percorso del file JSON.
+            **kwargs: Parametri di iniezione (vedi `__init__`).
+
+        Returns:
+            StubSparqlServer: Il server (non ancora avviato).
+        """
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f), **kwargs)
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/sparql"
+
+    def respond(self, query):
+        """
+        Calcola la risposta a una query.
+
+        Args:
+            query (str): Testo della query.
+
+        Returns:
+            tuple: (codice HTTP, header aggiuntivi, corpo JSON o None).
+        """
+        with self._lock:
+            self.requests += 1
+            self.queries.append(query)
+            draw = self._random.random()
+            delay = self.latency + self._random.uniform(0, self.latency_jitter)
+            throttled = self.requests <= self.throttle_first or draw < self.throttle_rate
+            failed = not throttled and draw < self.throttle_rate + self.error_rate
+            self.throttled += throttled
+            self.errors += failed
+        if delay:
+            time.sleep(delay)
+        if throttled:
+            return 429, {"Retry-After": str(self.retry_after)}, None
+        if failed:
+            return 500, {}, None
+        bindings = []
+        for literal in query_literals(query):
+            bindings.extend(self.fixtures.get(literal, []))
+        return 200, {}, {"head": {"vars": []}, "results": {"bindings": bindings}}
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _handle(self, query):
+                status, headers, body = stub.respond(query or "")
+                payload = json.dumps(body).encode("utf-8") if body is not None else b""
+                self.send_response(status)
+                self.send_header("Content-Type", "application/sparql-results+json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                self._handle(parse_qs(urlparse(self.path).query).get("query", [""])[0])
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                form = parse_qs(self.rfile.read(length).decode("utf-8"))
+                self._handle(form.get("query", [""])[0])
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
@@ -0,0 +1,259 @@
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+import columnar
+import fingerprints
+
+logger = logging.getLogger(__name__)
+
+# Memoria massima (in byte) dedicata a un blocco di rating durante lo streaming
+STREAMING_MEMORY_BUDGET = int(os.getenv("STREAMING_MEMORY_BUDGET", 64 * 1024 * 1024))
+
+USER_PROFILES_TABLE = "user_profiles"
+MOVIE_STATS_TABLE = "movie_stats"
+
+
+def _grow(array, capacity):
+    """Restituisce una copia dell'array con `capacity` righe, completata con zeri."""
+    grown = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+class RatingsAggregate:
+    """
+    Statistiche aggregate dei rating: profili dei generi per utente e statistiche per film.
+
+    Attributes:
+        user_ids (ndarray): ID utente in ordine crescente.
+        genre_weights (ndarray): Somma dei rating per genere (utenti x generi).
+        genre_counts (ndarray): Occorrenze di ogni genere tra i film valutati (utenti x generi).
+        user_counts (ndarray): Numero di rating di ogni utente.
+        movie_counts (ndarray): Numero di rating di ogni film del catalogo.
+        movie_rating_sums (ndarray): Somma dei rating di ogni film del catalogo.
+    """
+
+    def __init__(self, scorer):
+        """
+        Inizializza un aggregato vuoto.
+
+        Args:
+            scorer (GenreScorer): Motore dei generi del catalogo.
+        """
+        self.scorer = scorer
+        self._rows = {}  # userId -> riga degli array per utente
+        self._user_ids = np.array([], dtype=np.int64)
+        self._genre_weights = np.zeros((0, len(scorer.genres)))
+        self._genre_counts = np.zeros((0, len(scorer.genres)))
+        self._user_counts = np.zeros(0, dtype=np.int64)
+        self.movie_counts = np.zeros(len(scorer), dtype=np.int64)
+        self.movie_rating_sums = np.zeros(len(scorer))
+
+    @property
+    def user_ids(self):
+        return self._user_ids[:len(self._rows)]
+
+    @property
+    def genre_weights(self):
+        return self._genre_weights[:len(self._rows)]
+
+    @property
+    def genre_counts(self):
+        return self._genre_counts[:len(self._rows)]
+
+    @property
+    def user_counts(self):
+        return self._user_counts[:len(self._rows)]
+
+    def _user_positions(self, user_ids):
+        """
+        Restituisce le righe degli utenti, assegnando ai nuovi utenti le righe successive.
+
+        Gli array per utente crescono per raddoppi, per cui il costo di un blocco
+        dipende dai suoi utenti e non da quelli già aggregati.
+        """
+        positions = np.fromiter((self._rows.setdefault(user, len(self._rows)) for user in user_ids.tolist()),
+                                dtype=np.int64, count=len(user_ids))
+        if len(self._rows) > len(self._user_ids):
+            capacity = max(len(self._rows), 2 * len(self._user_ids))
+            self._user_ids = _grow(self._user_ids, capacity)
+            self._genre_weights = _grow(self._genre_weights, capacity)
+            self._genre_counts = _grow(self._genre_counts, capacity)
+            self._user_counts = _grow(self._user_counts, capacity)
+        self._user_ids[positions] = user_ids
+        return positions
+
+    def update(self, ratings):
+        """
+        Aggiunge un blocco di rating all'aggregato.
+
+        Args:
+            ratings (DataFrame): Blocco con le colonne 'userId', 'movieId' e 'rating'.
+        """
+        chunk_users, user_codes = np.unique(ratings["userId"].to_numpy(), return_inverse=True)
+        positions = self._user_positions(chunk_users)
+        self.user_counts[positions] += np.bincount(user_codes, minlength=len(chunk_users))
+
+        rows = self.scorer.rows(ratings["movieId"].to_numpy())
+        values = ratings["rating"].to_numpy()
+        valid = rows >= 0
+        weights, counts = self.scorer.user_genre_profiles(
+            user_codes[valid], rows[valid], values[valid], len(chunk_users))
+        self.genre_weights[positions] += weights
+        self.genre_counts[positions] += counts
+
+        self.movie_counts += np.bincount(rows[valid], minlength=len(self.scorer))
+        self.movie_rating_sums += np.bincount(rows[valid], weights=values[valid].astype(np.float64),
+                                              minlength=len(self.scorer))
+
+    def finalize(self):
+        """
+        Ordina gli utenti per ID, in modo che il risultato non dipenda dall'ordine dei blocchi.
+
+        Returns:
+            RatingsAggregate: L'aggregato stesso.
+        """
+        n_users = len(self._rows)
+        order = np.argsort(self.user_ids, kind="stable")
+        for name in ("_user_ids", "_genre_weights", "_genre_counts", "_user_counts"):
+            setattr(self, name, getattr(self, name)[:n_users][order])
+        self._rows = dict(zip(self._user_ids.tolist(), range(n_users)))
+        return self
+
+    def save(self, directory):
+        """
+        Salva l'aggregato nel formato colonnare: profili degli utenti e statistiche dei film.
+
+        Args:
+            directory (str): Cartella del formato colonnare.
+        """
+        columnar.save_table(directory, USER_PROFILES_TABLE, {
+            "userId": self.user_ids,
+            "genreWeights": self.genre_weights,
+            "genreCounts": self.genre_counts,
+            "ratingCount": self.user_counts,
+        }, {"genres": self.scorer.genres})
+        columnar.save_table(directory, MOVIE_STATS_TABLE, {
+            "movieId": self.scorer.movie_ids,
+            "ratingCount": self.movie_counts,
+            "ratingSum": self.movie_rating_sums,
+        })
+
+    @classmethod
+    def load(cls, directory, scorer):
+        """
+        Carica un aggregato salvato con `save`, per aggiornarlo con nuovi rating.
+
+        Args:
+            directory (str): Cartella del formato colonnare.
+            scorer (GenreScorer): Motore dei generi del catalogo corrente.
+
+        Returns:
+            RatingsAggregate: L'aggregato.
+
+        Raises:
+            ValueError: Se l'aggregato è stato calcolato su un catalogo diverso.
+        """
+        users, meta = columnar.load_table(directory, USER_PROFILES_TABLE, mmap_mode=None)
+        movies, _ = columnar.load_table(directory, MOVIE_STATS_TABLE, mmap_mode=None)
+        if meta["genres"] != scorer.genres or not np.array_equal(movies["movieId"], scorer.movie_ids):
+            raise ValueError("Statistiche dei rating calcolate su un catalogo diverso")
+        aggregate = cls(scorer)
+        aggregate._rows = dict(zip(users["userId"].tolist(), range(len(users["userId"]))))
+        aggregate._user_ids = users["userId"].astype(np.int64)
+        aggregate._genre_weights = users["genreWeights"]
+        aggregate._genre_counts = users["genreCounts"]
+        aggregate._user_counts = users["ratingCount"]
+        aggregate.movie_counts = movies["ratingCount"]
+        aggregate.movie_rating_sums = movies["ratingSum"]
+        return aggregate
+
+    def movie_means(self):
+        """
+        Restituisce il rating medio di ogni film del catalogo.
+
+        Returns:
+            ndarray: Media dei rating (NaN per i film senza rating).
+        """
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return self.movie_rating_sums / self.movie_counts
+
+
+def chunk_rows_for_budget(memory_budget, n_genres):
+    """
+    Calcola quante righe leggere per blocco senza superare il budget di memoria.
+
+    Oltre alle colonne del CSV, ogni riga occupa temporaneamente una riga della
+    matrice dei generi (float64) e il relativo prodotto per il rating.
+
+    Args:
+        memory_budget (int): Memoria massima per blocco, in byte.
+        n_genres (int): Numero di generi del catalogo.
+
+    Returns:
+        int: Numero di righe per blocco (almeno 1).
+    """
+    bytes_per_row = 128 + 16 * n_genres
+    return max(int(memory_budget) // bytes_per_row, 1)
+
+
+def aggregate_ratings(ratings, scorer):
+    """
+    Calcola le statistiche aggregate da un DataFrame dei rating già in memoria.
+
+    Args:
+        ratings (DataFrame): DataFrame dei rating.
+        scorer (GenreScorer): Motore dei generi del catalogo.
+
+    Returns:
+        RatingsAggregate: Le statistiche aggregate.
+    """
+    aggregate = RatingsAggregate(scorer)
+    aggregate.update(ratings)
+    return aggregate.finalize()
+
+
+def read_rating_chunks(path, n_genres, memory_budget=STREAMING_MEMORY_BUDGET, end=None):
+    """
+    Legge il CSV dei rating a blocchi con tipi compatti.
+
+    Args:
+        path (str): Percorso del CSV dei rating.
+        n_genres (int): Numero di generi del catalogo (per dimensionare i blocchi).
+        memory_budget (int): Memoria massima per blocco, in byte.
+        end (int): Byte del file da leggere (default: tutto il file).
+
+    Yields:
+        DataFrame: Blocchi con le colonne 'userId', 'movieId', 'rating' e 'timestamp'.
+    """
+    chunk_rows = chunk_rows_for_budget(memory_budget, n_genres)
+    logger.info(f"Lettura in streaming di '{path}' a blocchi di {chunk_rows} righe...")
+    with fingerprints.open_rows(path, 0, end) as f, \
+            pd.read_csv(f, dtype=columnar.RATINGS_DTYPES, chunksize=chunk_rows) as reader:
+        yield from reader
+
+
+def stream_ratings(path, scorer, memory_budget=STREAMING_MEMORY_BUDGET, end=None):
+    """
+    Calcola le statistiche aggregate leggendo il CSV dei rating a blocchi.
+
+    Il file viene letto con tipi compatti in blocchi di dimensione limitata,
+    per cui la memoria di picco dipende dal budget e dal numero di utenti,
+    non dal numero di rating. Il risultato coincide con quello di `aggregate_ratings`.
+
+    Args:
+        path (str): Percorso del CSV dei rating.
+        scorer (GenreScorer): Motore dei generi del catalogo.
+        memory_budget (int): Memoria massima per blocco, in byte.
+        end (int): Byte del file da leggere (default: tutto il file).
+
+    Returns:
+        RatingsAggregate: Le statistiche aggregate.
+    """
+    aggregate = RatingsAggregate(scorer)
+    for chunk in read_rating_chunks(path, len(scorer.genres), memory_budget, end):
+        aggregate.update(chunk)
+    return aggregate.finalize()
@@ -0,0 +1,357 @@
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+import columnar
+
+logger = logging.getLogger(__name__)
+
+TAG_INDEX_PATH = os.getenv("TAG_INDEX_PATH", "data/processed/tag_index/")
+TAG_TABLE = "tags"
+PROFILE_TAGS = 20  # Tag del profilo usati per i candidati di un utente
+MAX_TAG_SEGMENTS = int(os.getenv("MAX_TAG_SEGMENTS", 8))  # Segmenti accodati prima di riscrivere l'indice
+KEY_SHIFT = np.uint64(32)
+
+
+def normalize_tags(tags):
+    """
+    Normalizza i tag: Unicode NFKC, minuscolo, punteggiatura rimossa e spazi compattati.
+
+    Args:
+        tags (array-like): Tag originali.
+
+    Returns:
+        Series: I tag normalizzati (stringa vuota per i tag non validi).
+    """
+    tags = pd.Series(tags, dtype="string").fillna("")
+    return (tags.str.normalize("NFKC").str.lower()
+            .str.replace(r"[^\w\s'-]+", " ", regex=True)
+            .str.replace(r"\s+", " ", regex=True)
+            .str.strip(" '-")
+            .astype(object))
+
+
+def normalize_tag(tag):
+    """Normalizza un singolo tag (vedi `normalize_tags`)."""
+    return normalize_tags([tag]).iloc[0]
+
+
+def _keys(high, low):
+    """Codifica le coppie (high, low) come chiavi uint64 ordinabili."""
+    return (np.asarray(high, dtype=np.uint64) << KEY_SHIFT) | np.asarray(low, dtype=np.uint64)
+
+
+def _merge(keys, counts, new_keys, new_counts):
+    """
+    Fonde conteggi ordinati per chiave con nuovi conteggi (anche ripetuti).
+
+    Viene ordinato solo il delta: i conteggi delle chiavi già presenti sono
+    aggiornati e le nuove chiavi inserite nelle posizioni trovate con una
+    ricerca binaria, senza riordinare le chiavi esistenti.
+    """
+    new_keys, codes = np.unique(np.asarray(new_keys, dtype=np.uint64), return_inverse=True)
+    new_counts = np.bincount(codes.reshape(-1), weights=new_counts, minlength=len(new_keys)).astype(np.int64)
+    positions = np.searchsorted(keys, new_keys)
+    found = positions < len(keys)
+    found[found] = keys[positions[found]] == new_keys[found]
+    counts = np.array(counts, dtype=np.int64)
+    counts[positions[found]] += new_counts[found]
+    missing = ~found
+    return (np.insert(keys, positions[missing], new_keys[missing]),
+            np.insert(counts, positions[missing], new_counts[missing]))
+
+
+class TagIndex:
+    """
+    Indice invertito tag -> film e profili dei tag degli utenti.
+
+    Le coppie (tag, film) e (utente, tag) sono chiavi uint64 ordinate con il
+    numero di applicazioni del tag; le posting list di un tag sono quindi un
+    intervallo contiguo (delimitato da `indptr`, come una matrice CSR) e il
+    profilo di un utente si trova con una ricerca binaria. I nuovi tag
+    vengono fusi con `add` senza ricostruire l'indice dai dati originali;
+    su disco vengono accodati come segmenti (`update_tag_index`), fusi al caricamento.
+
+    I pesi sono calcolati al momento della lettura: (1 + log n) * idf, con n
+    il numero di applicazioni e idf = log(1 + film con tag / film del tag).
+    """
+
+    def __init__(self, vocabulary=None, movie_keys=None, movie_counts=None, user_keys=None, user_counts=None):
+        """
+        Inizializza l'indice (vuoto se non vengono passati i dati).
+
+        Args:
+            vocabulary (list): Tag normalizzati, nell'ordine dei codici.
+            movie_keys (ndarray): Chiavi ordinate (tag << 32 | film).
+            movie_counts (ndarray): Applicazioni di ogni coppia (tag, film).
+            user_keys (ndarray): Chiavi ordinate (utente << 32 | tag).
+            user_counts (ndarray): Applicazioni di ogni coppia (utente, tag).
+        """
+        self.vocabulary = list(vocabulary or [])
+        self._codes = {tag: code for code, tag in enumerate(self.vocabulary)}
+        empty_keys, empty_counts = np.array([], dtype=np.uint64), np.array([], dtype=np.int64)
+        self.movie_keys = empty_keys if movie_keys is None else np.asarray(movie_keys)
+        self.movie_counts = empty_counts if movie_counts is None else np.asarray(movie_counts)
+        self.user_keys = empty_keys if user_keys is None else np.asarray(user_keys)
+        self.user_counts = empty_counts if user_counts is None else np.asarray(user_counts)
+        self._refresh()
+
+    def _refresh(self):
+        """Ricalcola i delimitatori delle posting list e l'idf dei tag."""
+        tag_codes = (self.movie_keys >> KEY_SHIFT).astype(np.int64)
+        self.indptr = np.searchsorted(tag_codes, np.arange(len(self.vocabulary) + 1))
+        self.movie_ids = (self.movie_keys & np.uint64(0xFFFFFFFF)).astype(np.int64)
+        n_movies = len(pd.unique(self.movie_ids))
+        document_frequency = np.maximum(np.diff(self.indptr), 1)
+        self.idf = np.log1p(n_movies / document_frequency)
+
+    def __len__(self):
+        """Numero di tag distinti."""
+        return len(self.vocabulary)
+
+    @classmethod
+    def from_frame(cls, tags):
+        """
+        Costruisce l'indice da un DataFrame di tag.
+
+        Args:
+            tags (DataFrame): Colonne 'userId', 'movieId' e 'tag'.
+
+        Returns:
+            TagIndex: L'indice.
+        """
+        index = cls()
+        index.add(tags)
+        return index
+
+    def add(self, tags):
+        """
+        Aggiunge nuovi tag all'indice e ai profili degli utenti.
+
+        Args:
+            tags (DataFrame): Colonne 'userId', 'movieId' e 'tag'.
+
+        Returns:
+            int: Numero di tag validi aggiunti.
+        """
+        normalized = normalize_tags(tags["tag"].to_numpy())
+        valid = (normalized != "").to_numpy()
+        if not valid.any():
+            return 0
+        codes = np.array([self._codes.setdefault(tag, len(self._codes)) for tag in normalized[valid]], dtype=np.int64)
+        self.vocabulary = list(self._codes)
+        ones = np.ones(len(codes), dtype=np.int64)
+        self.movie_keys, self.movie_counts = _merge(self.movie_keys, self.movie_counts,
+                                                    _keys(codes, tags["movieId"].to_numpy()[valid]), ones)
+        self.user_keys, self.user_counts = _merge(self.user_keys, self.user_counts,
+                                                  _keys(tags["userId"].to_numpy()[valid], codes), ones)
+        self._refresh()
+        return len(codes)
+
+    def _posting(self, code):
+        start, stop = self.indptr[code], self.indptr[code + 1]
+        weights = (1.0 + np.log(self.movie_counts[start:stop])) * self.idf[code]
+        return self.movie_ids[start:stop], weights
+
+    def postings(self, tag):
+        """
+        Posting list di un tag.
+
+        Args:
+            tag (str): Tag (viene normalizzato).
+
+        Returns:
+            tuple: (ID dei film ordinati, pesi); vuoti se il tag non è noto.
+        """
+        code = self._codes.get(normalize_tag(tag))
+        if code is None:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.float64)
+        return self._posting(code)
+
+    def candidates(self, tags, mode="any", tag_weights=None):
+        """
+        Film candidati per un insieme di tag, dalle sole posting list.
+
+        Con mode='any' (unione) il punteggio è la somma dei pesi dei tag
+        presenti; con mode='all' (intersezione) restano solo i film con tutti
+        i tag, intersecando le liste dalla più corta.
+
+        Args:
+            tags (list): Tag richiesti.
+            mode (str): 'any' oppure 'all'.
+            tag_weights (array-like): Peso di ogni tag (default: 1).
+
+        Returns:
+            tuple: (ID dei film ordinati, punteggi).
+        """
+        if mode not in ("any", "all"):
+            raise ValueError(f"Modalità sconosciuta: {mode}")
+        tag_weights = np.ones(len(tags)) if tag_weights is None else np.asarray(tag_weights, dtype=np.float64)
+        lists = []
+        for tag, weight in zip(tags, tag_weights):
+            movie_ids, weights = self.postings(tag)
+            if mode == "all" and not len(movie_ids):
+                return np.array([], dtype=np.int64), np.array([], dtype=np.float64)
+            lists.append((movie_ids, weights * weight))
+        if not lists:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.float64)
+
+        if mode == "all":
+            lists.sort(key=lambda posting: len(posting[0]))
+            movie_ids, scores = lists[0]
+            for other_ids, other_weights in lists[1:]:
+                movie_ids, mine, theirs = np.intersect1d(movie_ids, other_ids, assume_unique=True, return_indices=True)
+                scores = scores[mine] + other_weights[theirs]
+                if not len(movie_ids):
+                    break
+            return movie_ids, scores
+
+        movie_ids, codes = np.unique(np.concatenate([ids for ids, _ in lists]), return_inverse=True)
+        scores = np.bincount(codes, weights=np.concatenate([w for _, w in lists]), minlength=len(movie_ids))
+        return movie_ids, scores
+
+    def user_profile(self, user_id, n=None):
+        """
+        Profilo dei tag di un utente, in ordine di peso decrescente.
+
+        Args:
+            user_id (int): ID dell'utente.
+            n (int): Numero massimo di tag (default: tutti).
+
+        Returns:
+            tuple: (tag, pesi).
+        """
+        start, stop = np.searchsorted(self.user_keys, _keys([user_id, user_id + 1], [0, 0]))
+        codes = (self.user_keys[start:stop] & np.uint64(0xFFFFFFFF)).astype(np.int64)
+        weights = (1.0 + np.log(self.user_counts[start:stop])) * self.idf[codes]
+        order = np.argsort(-weights, kind="stable")[:n]
+        return [self.vocabulary[code] for code in codes[order]], weights[order]
+
+    def user_scores(self, user_id, n_tags=PROFILE_TAGS):
+        """
+        Punteggi dei film per il profilo dei tag di un utente (unione delle posting list dei suoi tag).
+
+        Args:
+            user_id (int): ID dell'utente.
+            n_tags (int): Tag del profilo considerati.
+
+        Returns:
+            tuple: (ID dei film candidati, punteggi).
+        """
+        tags, weights = self.user_profile(user_id, n_tags)
+        return self.candidates(tags, "any", weights)
+
+    def recommend(self, user_id, top_k=10, n_tags=PROFILE_TAGS, exclude=None):
+        """
+        Raccomanda film dal profilo dei tag di un utente, valutando solo i candidati.
+
+        Args:
+            user_id (int): ID dell'utente.
+            top_k (int): Numero di film.
+            n_tags (int): Tag del profilo considerati.
+            exclude (array-like): ID dei film da escludere (es. già visti).
+
+        Returns:
+            DataFrame: Colonne 'movieId' e 'score', in ordine di punteggio decrescente.
+        """
+        movie_ids, scores = self.user_scores(user_id, n_tags)
+        if exclude is not None:
+            keep = ~np.isin(movie_ids, np.asarray(exclude))
+            movie_ids, scores = movie_ids[keep], scores[keep]
+        k = min(top_k, len(scores))
+        if k <= 0:
+            return pd.DataFrame({"movieId": movie_ids[:0], "score": scores[:0]})
+        top = np.argpartition(-scores, k - 1)[:k]
+        movie_ids, scores = movie_ids[top], scores[top]
+        order = np.lexsort((movie_ids, -scores))
+        return pd.DataFrame({"movieId": movie_ids[order], "score": scores[order]})
+
+    def _columns(self):
+        return {"movie_keys": self.movie_keys, "movie_counts": self.movie_counts,
+                "user_keys": self.user_keys, "user_counts": self.user_counts}
+
+    def save(self, directory=TAG_INDEX_PATH, name=TAG_TABLE):
+        """
+        Salva l'indice come tabella colonnare (vocabolario nei metadati), sostituendo gli eventuali segmenti.
+
+        Args:
+            directory (str): Cartella dell'indice.
+            name (str): Nome della tabella.
+        """
+        columnar.save_table(directory, name, self._columns(), {"vocabulary": self.vocabulary})
+
+    @classmethod
+    def load(cls, directory=TAG_INDEX_PATH, name=TAG_TABLE):
+        """
+        Carica l'indice salvato, fondendo i segmenti accodati.
+
+        Args:
+            directory (str): Cartella dell'indice.
+            name (str): Nome della tabella.
+
+        Returns:
+            TagIndex: L'indice.
+        """
+        columns, meta, segments = columnar.load_table_with_segments(directory, name, mmap_mode=None)
+        vocabulary = meta["vocabulary"] + [tag for _, segment_meta in segments for tag in segment_meta["vocabulary"]]
+        movie_keys, movie_counts = columns["movie_keys"], columns["movie_counts"]
+        user_keys, user_counts = columns["user_keys"], columns["user_counts"]
+        for delta, _ in segments:
+            movie_keys, movie_counts = _merge(movie_keys, movie_counts, delta["movie_keys"], delta["movie_counts"])
+            user_keys, user_counts = _merge(user_keys, user_counts, delta["user_keys"], delta["user_counts"])
+        return cls(vocabulary, movie_keys, movie_counts, user_keys, user_counts)
+
+
+def load_vocabulary(directory=TAG_INDEX_PATH, name=TAG_TABLE):
+    """Carica il solo vocabolario dell'indice salvato (segmenti compresi), nell'ordine dei codici."""
+    _, meta, segments = columnar.load_table_with_segments(directory, name)
+    vocabulary = list(meta["vocabulary"])
+    for _, segment_meta in segments:
+        vocabulary += segment_meta["vocabulary"]
+    return vocabulary
+
+
+def update_tag_index(new_tags, directory=TAG_INDEX_PATH):
+    """
+    Aggiunge nuovi tag all'indice salvato (creandolo se non esiste).
+
+    I conteggi dei nuovi tag vengono accodati come segmento, senza leggere
+    né riscrivere l'indice: il costo dipende dai nuovi tag e dal vocabolario.
+    Oltre MAX_TAG_SEGMENTS segmenti l'indice viene fuso e riscritto.
+
+    Args:
+        new_tags (DataFrame): Tag da aggiungere.
+        directory (str): Cartella dell'indice.
+
+    Returns:
+        int: Numero di tag validi aggiunti.
+    """
+    if not columnar.has_table(directory, TAG_TABLE):
+        index = TagIndex.from_frame(new_tags)
+        index.save(directory)
+        logger.info(f"Indice dei tag creato: {len(index)} tag distinti.")
+        return int(index.movie_counts.sum())
+
+    vocabulary = load_vocabulary(directory)
+    delta = TagIndex(vocabulary)
+    added = delta.add(new_tags)
+    if not added:
+        return 0
+    n_segments = columnar.append_segment(directory, TAG_TABLE, delta._columns(),
+                                         {"vocabulary": delta.vocabulary[len(vocabulary):]})
+    if n_segments > MAX_TAG_SEGMENTS:
+        TagIndex.load(directory).save(directory)
+        logger.info("Segmenti dell'indice dei tag fusi nell'indice principale.")
+    logger.info(f"Indice dei tag aggiornato: {added} tag aggiunti, {len(delta)} tag distinti.")
+    return added
+
+
+if __name__ == "__main__":
+    tags = pd.read_csv("data/processed/tags_processed.csv", dtype=columnar.TAGS_DTYPES)
+    index = TagIndex.from_frame(tags)
+    index.save()
+    user_id = tags["userId"].iloc[0]
+    print(f"Profilo dei tag dell'utente {user_id}: {index.user_profile(user_id, 5)[0]}")
+    print(index.recommend(user_id, exclude=tags.loc[tags["userId"] == user_id, "movieId"]))
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# I moduli in src/ si importano a vicenda senza prefisso di package
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
@@ -0,0 +1,109 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from bandit_state import BanditStateStore, append_feedback, blend_scores
+from recommender import recommend_movies
+
+
+class TestBanditStateStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.tmp.name, "state")
+        self.log = os.path.join(self.tmp.name, "feedback.csv")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_snapshot_and_reload(self):
+        store = BanditStateStore(self.directory)
+        store.record([1, 1, 2, 1], [10, 20, 10, 10], [1.0, 0.0, 1.0, 0.5])
+        store.snapshot()
+        store.record([1], [30], [1.0])
+
+        movie_ids, counts, sums = store.user_stats(1)
+        np.testing.assert_array_equal(movie_ids, [10, 20, 30])
+        np.testing.assert_array_equal(counts, [2, 1, 1])
+        np.testing.assert_array_equal(sums, [1.5, 0.0, 1.0])
+
+        reloaded = BanditStateStore(self.directory)
+        self.assertEqual(reloaded.generation, 1)
+        self.assertEqual(len(reloaded), 3)
+        store.snapshot()
+        self.assertEqual(os.listdir(self.directory).count("snapshot-000001"), 0)
+        self.assertEqual(len(BanditStateStore(self.directory)), 4)
+
+    def test_consume_log_is_incremental(self):
+        append_feedback(self.log, [1, 2], [10, 10], [1.0, 0.0])
+        store = BanditStateStore(self.directory)
+        self.assertEqual(store.consume_log(self.log), 2)
+        self.assertEqual(store.consume_log(self.log), 0)
+        store.snapshot()
+
+        append_feedback(self.log, [1], [10], [0.0])
+        with open(self.log, "a") as f:
+            f.write("3,10,1.0")  # riga non ancora terminata
+        reloaded = BanditStateStore(self.directory)
+        self.assertEqual(reloaded.consume_log(self.log), 1)
+        with open(self.log, "a") as f:
+            f.write(",123\n")
+        self.assertEqual(reloaded.consume_log(self.log), 1)
+        _, counts, sums = reloaded.user_stats(1)
+        np.testing.assert_array_equal(counts, [2])
+        np.testing.assert_array_equal(sums, [1.0])
+        self.assertEqual(len(reloaded.user_stats(3)[0]), 1)
+
+    def test_rotated_or_truncated_log_is_read_from_start(self):
+        append_feedback(self.log, [1, 2, 3], [10, 10, 10], [1.0, 0.0, 1.0])
+        store = BanditStateStore(self.directory)
+        self.assertEqual(store.consume_log(self.log), 3)
+        store.snapshot()
+
+        # Rotazione: il nuovo log è più corto della posizione già applicata
+        os.replace(self.log, self.log + ".1")
+        append_feedback(self.log, [4], [10], [1.0])
+        reloaded = BanditStateStore(self.directory)
+        self.assertEqual(reloaded.consume_log(self.log), 1)
+
+        # Riscrittura con un file di nuovo più lungo della posizione applicata
+        os.remove(self.log)
+        append_feedback(self.log, [5, 6, 7, 8], [20, 20, 20, 20], [1.0, 1.0, 1.0, 1.0])
+        self.assertEqual(reloaded.consume_log(self.log), 4)
+        self.assertEqual([len(reloaded.user_stats(user)[0]) for user in range(1, 9)], [1] * 8)
+
+    def test_arm_store(self):
+        store = BanditStateStore(self.directory)
+        store.record([1, 1, 1], [10, 20, 20], [0.2, 1.0, 0.0])
+        arms = store.arm_store(1)
+        self.assertEqual(arms.arms, [10, 20])
+        self.assertEqual(arms.arms[arms.tree.argmax()], 20)
+
+
+class TestBlending(unittest.TestCase):
+    def test_blend_without_feedback_keeps_order(self):
+        prior = np.array([2.0, 4.0, 1.0])
+        blended = blend_scores(prior, np.array([], dtype=np.int64), np.array([]), np.array([]))
+        np.testing.assert_array_equal(blended, [0.5, 1.0, 0.25])
+        blended = blend_scores(prior, np.array([1]), np.array([5]), np.array([0.0]), pseudo_count=5)
+        self.assertAlmostEqual(blended[1], 0.5)
+
+    def test_feedback_changes_recommendations(self):
+        movies = pd.DataFrame({
+            "movieId": [1, 2, 3, 4],
+            "title": ["A", "B", "C", "D"],
+            "genres": [["Crime"], ["Crime", "Drama"], ["Crime"], ["Drama"]],
+        })
+        ratings = pd.DataFrame({"userId": [1, 1], "movieId": [1, 4], "rating": [5.0, 3.0]})
+        with tempfile.TemporaryDirectory() as directory:
+            store = BanditStateStore(directory)
+            self.assertEqual(list(recommend_movies(1, ratings, movies, top_k=1, state=store)["title"]), ["B"])
+            store.record([1] * 4, [2] * 4, [0.0] * 4)
+            store.record([1] * 4, [3] * 4, [1.0] * 4)
+            self.assertEqual(list(recommend_movies(1, ratings, movies, top_k=2, state=store)["title"]), ["C", "B"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import pandas as pd
+
+from cli import build_parser, main, split_passthrough
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestCli(unittest.TestCase):
+    def test_split_passthrough(self):
+        self.assertEqual(split_passthrough(["recommend", "1", "--top-k", "3"]), (["recommend", "1", "--top-k", "3"], []))
+        self.assertEqual(split_passthrough(["--log-level", "DEBUG", "bench", "service", "--help"]),
+                         (["--log-level", "DEBUG", "bench", "service"], ["--help"]))
+        self.assertEqual(split_passthrough(["serve", "--port", "0"]), (["serve"], ["--port", "0"]))
+
+    def test_parser(self):
+        args = build_parser().parse_args(["evaluate", "--k", "5"])
+        self.assertEqual((args.command, args.k, args.test_fraction), ("evaluate", 5, 0.2))
+        with contextlib.redirect_stderr(io.StringIO()), self.assertRaises(SystemExit):
+            build_parser().parse_args(["unknown"])
+
+    def test_package_import_is_lazy(self):
+        code = ("import sys, src; heavy = {'pandas', 'numpy', 'requests', 'SPARQLWrapper', 'dotenv'}; "
+                "assert not heavy & set(sys.modules), heavy & set(sys.modules); "
+                "import logging; assert not logging.getLogger().handlers; "
+                "assert callable(src.recommend_movies)")
+        subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True)
+
+    def test_recommend(self):
+        with tempfile.TemporaryDirectory() as directory:
+            pd.DataFrame({
+                "movieId": [1, 2, 3],
+                "title": ["Heat (1995)", "Casino (1995)", "Babe (1995)"],
+                "genres": ["Crime", "Crime", "Comedy"],
+            }).to_csv(os.path.join(directory, "movies_enriched.csv"), index=False)
+            pd.DataFrame({"userId": [1], "movieId": [1], "rating": [5.0], "timestamp": [0]}).to_csv(
+                os.path.join(directory, "ratings_processed.csv"), index=False)
+
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                main(["--log-level", "WARNING", "recommend", "1", "--top-k", "1", "--json", "--data-path", directory])
+            self.assertEqual(json.loads(output.getvalue())["recommendations"], [{"title": "Casino (1995)",
+                                                                                 "score": 5.0}])
+
+
+if __name__ == "__main__":
+    unittest.main()
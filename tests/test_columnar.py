@@ -0,0 +1,145 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+import columnar
+from recommender import load_raw_data
+from recommender_index import RecommenderIndex
+
+
+class TestColumnar(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.movies = pd.DataFrame({
+            "movieId": [1, 2, 3],
+            "title": ["A", "B", "C"],
+            "genres": [["Comedy", "Drama"], ["Action"], ["(no genres listed)"]],
+        })
+        self.ratings = pd.DataFrame({
+            "userId": [2, 1, 2],
+            "movieId": [3, 1, 7],
+            "rating": [3.5, 4.0, 5.0],
+            "timestamp": [30, 10, 20],
+        })
+        links = pd.DataFrame({"movieId": [1, 2, 3], "imdbId": [114709, 113497, 1], "tmdbId": [862.0, None, 5.0]})
+        tags = pd.DataFrame({"userId": [2], "movieId": [1], "tag": ["funny"], "timestamp": [40]})
+        columnar.save_columnar(self.movies, self.ratings, links, tags, self.directory)
+
+    def test_genre_bitmasks_round_trip(self):
+        masks, vocabulary = columnar.encode_genres(self.movies["genres"])
+        self.assertEqual(columnar.decode_genres(masks, vocabulary), list(self.movies["genres"]))
+
+    def test_ratings_are_compact_and_grouped_by_user(self):
+        ratings = columnar.load_frame(self.directory, "ratings")
+        self.assertEqual(ratings["userId"].dtype, np.int32)
+        self.assertEqual(ratings["rating"].dtype, np.float32)
+        self.assertEqual(list(ratings["userId"]), [1, 2, 2])
+        self.assertEqual(list(ratings["timestamp"]), [10, 30, 20])
+
+    def test_ratings_saved_from_blocks(self):
+        # I rating dell'utente 2 proseguono nel blocco successivo
+        blocks = [self.ratings.iloc[[1]], self.ratings.iloc[[0]], self.ratings.iloc[[2]]]
+        streamed = tempfile.mkdtemp()
+        self.assertEqual(columnar.save_ratings_blocks(iter(blocks), self.movies["movieId"], streamed), 3)
+        expected, expected_meta = columnar.load_table(self.directory, "ratings")
+        columns, meta = columnar.load_table(streamed, "ratings")
+        self.assertEqual(meta, expected_meta)
+        for column, values in expected.items():
+            np.testing.assert_array_equal(columns[column], values)
+            self.assertEqual(columns[column].dtype, values.dtype)
+        with self.assertRaises(ValueError):
+            columnar.save_ratings_blocks(iter(blocks[::-1]), self.movies["movieId"], streamed)
+
+    def test_load_raw_data_reads_movies_from_columnar(self):
+        data_path = tempfile.mkdtemp()
+        columnar.save_columnar(self.movies, self.ratings, pd.DataFrame(columns=["movieId", "imdbId", "tmdbId"]),
+                               pd.DataFrame(columns=["userId", "movieId", "tag", "timestamp"]),
+                               os.path.join(data_path, "columnar"))
+        # Il CSV arricchito fornisce solo le colonne aggiuntive: titoli e generi vengono dal formato colonnare
+        pd.DataFrame({"movieId": [3, 1], "title": ["stale", "stale"], "genres": ["Horror", "Horror"],
+                      "abstract": ["Third.", "First."]}).to_csv(os.path.join(data_path, "movies_enriched.csv"),
+                                                                 index=False)
+        movies, ratings = load_raw_data(data_path)
+        self.assertEqual(list(movies["title"]), ["A", "B", "C"])
+        self.assertEqual(list(movies["genres"]), [["Comedy", "Drama"], ["Action"], ["(no genres listed)"]])
+        self.assertEqual(list(movies["abstract"].fillna("")), ["First.", "", "Third."])
+        self.assertEqual(len(ratings), 3)
+
+    def test_appended_rows_are_segments(self):
+        new_ratings = pd.DataFrame({"userId": [3, 1], "movieId": [2, 3], "rating": [2.0, 1.5], "timestamp": [50, 60]})
+        new_tags = pd.DataFrame({"userId": [1, 3], "movieId": [2, 3], "tag": ["dark", "funny"], "timestamp": [70, 80]})
+        data_version = RecommenderIndex.from_columnar(self.directory).data_version
+        with mock.patch.object(columnar, "SEGMENT_COMPACT_FRACTION", 10):
+            columnar.append_ratings(new_ratings, self.directory)
+            columnar.append_tags(new_tags, self.directory)
+        # La tabella originale resta intatta: le righe nuove sono segmenti fusi al caricamento
+        self.assertEqual(len(columnar.load_table(self.directory, "ratings")[0]["userId"]), 3)
+        self.assertEqual(columnar.load_meta(self.directory, "tags")["segments"], ["delta-000001"])
+        ratings = columnar.load_frame(self.directory, "ratings")
+        self.assertEqual(list(ratings["userId"]), [1, 1, 2, 2, 3])
+        self.assertEqual(list(ratings["timestamp"]), [10, 60, 30, 20, 50])
+        tags = columnar.load_frame(self.directory, "tags")
+        self.assertEqual(list(tags["tag"]), ["funny", "dark", "funny"])
+
+        index = RecommenderIndex.from_columnar(self.directory)
+        self.assertNotEqual(index.data_version, data_version)
+        np.testing.assert_array_equal(index.user_rows(1)[0], [0, 2])
+        np.testing.assert_array_equal(index.user_rows(3)[1], [2.0])
+
+        # Oltre SEGMENT_COMPACT_FRACTION i segmenti vengono fusi nella tabella
+        columnar.append_ratings(new_ratings.iloc[:1], self.directory)
+        self.assertNotIn("segments", columnar.load_meta(self.directory, "ratings"))
+        self.assertEqual(list(columnar.load_frame(self.directory, "ratings")["userId"]), [1, 1, 2, 2, 3, 3])
+
+    def test_save_swaps_whole_revisions(self):
+        old_columns, old_meta = columnar.load_table(self.directory, "ratings")
+        with mock.patch.object(columnar, "SEGMENT_COMPACT_FRACTION", 10):
+            columnar.append_ratings(self.ratings.iloc[:1], self.directory)
+        columnar.save_ratings(self.ratings.iloc[1:], self.movies["movieId"], self.directory)
+        # Revisione nuova e completa; i file già mappati della precedente restano leggibili
+        table_dir = os.path.join(self.directory, "ratings")
+        self.assertEqual(sorted(os.listdir(table_dir)), ["CURRENT", "r-000003"])
+        columns, meta = columnar.load_table(self.directory, "ratings")
+        self.assertNotIn("segments", meta)
+        self.assertEqual(meta["revision"], old_meta["revision"] + 2)
+        self.assertEqual(list(columns["userId"]), [1, 2])
+        self.assertEqual(list(old_columns["userId"]), [1, 2, 2])
+
+        # Dopo una modifica dei film solo le posizioni sono riscritte: le altre colonne sono le stesse
+        inode = os.stat(os.path.join(table_dir, "r-000003", "rating.npy")).st_ino
+        columnar.refresh_movie_rows(self.directory)
+        self.assertEqual(sorted(os.listdir(table_dir)), ["CURRENT", "r-000004"])
+        self.assertEqual(os.stat(os.path.join(table_dir, "r-000004", "rating.npy")).st_ino, inode)
+        np.testing.assert_array_equal(columnar.load_table(self.directory, "ratings")[0]["rating"], columns["rating"])
+
+    def test_tables_without_revisions_are_read_and_replaced(self):
+        # Tabella salvata prima delle revisioni: file direttamente nella cartella della tabella
+        legacy = os.path.join(self.directory, "links")
+        revision_dir = os.path.join(legacy, open(os.path.join(legacy, "CURRENT")).read())
+        for entry in os.listdir(revision_dir):
+            os.replace(os.path.join(revision_dir, entry), os.path.join(legacy, entry))
+        os.rmdir(revision_dir)
+        os.remove(os.path.join(legacy, "CURRENT"))
+        self.assertEqual(list(columnar.load_frame(self.directory, "links")["tmdbId"]), [862, -1, 5])
+        columnar.save_links(pd.DataFrame({"movieId": [1], "imdbId": [114709], "tmdbId": [862.0]}), self.directory)
+        self.assertEqual(sorted(os.listdir(legacy)), ["CURRENT", "r-000002"])
+        self.assertEqual(list(columnar.load_frame(self.directory, "links")["movieId"]), [1])
+
+    def test_links_missing_ids(self):
+        links = columnar.load_frame(self.directory, "links")
+        self.assertEqual(list(links["tmdbId"]), [862, -1, 5])
+
+    def test_index_from_columnar(self):
+        index = RecommenderIndex.from_columnar(self.directory)
+        rows, ratings = index.user_rows(2)
+        np.testing.assert_array_equal(rows, [2, -1])
+        np.testing.assert_array_equal(ratings, [3.5, 5.0])
+        self.assertEqual(list(index.recommend(1)["title"]), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from content_index import build_content_index, similar_movies, tfidf_matrix, tokenize
+from neighbors import NeighborIndex, top_neighbors
+from recommender import recommend_movies
+
+
+class TestContentIndex(unittest.TestCase):
+    def setUp(self):
+        self.movies = pd.DataFrame({
+            "movieId": [1, 2, 3, 4, 5],
+            "title": ["Heat (1995)", "Casino (1995)", "Toy Story (1995)", "Se7en (1995)", "Babe (1995)"],
+            "genres": [["Action", "Crime"], ["Crime", "Drama"], ["Animation", "Comedy"],
+                       ["Crime", "Thriller"], ["Comedy"]],
+            "abstract": ["A crew of bank robbers plans a heist in Los Angeles.",
+                         "A mob casino in Las Vegas run by gangsters.",
+                         "Toys come to life when their owner leaves the room.",
+                         "Two detectives hunt a killer in a city of gangsters.",
+                         None],
+            "director": ["Michael_Mann", "Martin_Scorsese", "John_Lasseter", "David_Fincher", "Chris_Noonan"],
+            "starring": ["Robert_De_Niro|Al_Pacino", "Robert_De_Niro|Sharon_Stone", "Tom_Hanks",
+                         "Brad_Pitt|Morgan_Freeman", None],
+        })
+
+    def test_tokenize(self):
+        self.assertEqual(tokenize("The 1995 film stars Al Pacino."), ["pacino"])
+        self.assertEqual(tokenize(None), [])
+
+    def test_tfidf_drops_rare_terms(self):
+        matrix, terms = tfidf_matrix([["heist", "bank"], ["heist"], ["toys"]], min_df=2)
+        self.assertEqual(terms, ["heist"])
+        self.assertEqual(matrix.shape, (3, 1))
+        np.testing.assert_allclose(matrix.toarray().ravel(), [1.0, 1.0, 0.0])
+
+    def test_top_neighbors(self):
+        matrix = np.array([[1.0, 0.0], [1.0, 0.1], [0.0, 1.0]])
+        neighbors, similarities = top_neighbors(matrix, 2, n_workers=1, block_bytes=1)
+        self.assertEqual(neighbors[0].tolist(), [1, -1])  # Il film 2 è ortogonale
+        self.assertEqual(neighbors[2].tolist(), [1, -1])
+        self.assertEqual(similarities[0, 1], 0.0)
+
+        # Blocchi di una riga o un solo blocco, uno o più worker: stessi vicini
+        matrix = np.random.default_rng(0).random((30, 5))
+        expected = top_neighbors(matrix, 4, n_workers=1)
+        for n_workers, block_bytes in ((1, 1), (2, 1), (2, 10 ** 9)):
+            result = top_neighbors(matrix, 4, n_workers=n_workers, block_bytes=block_bytes)
+            np.testing.assert_array_equal(result[0], expected[0])
+            np.testing.assert_allclose(result[1], expected[1], rtol=1e-6)
+
+    def test_similar_movies_shares_cast(self):
+        index = build_content_index(self.movies, n_neighbors=3, n_workers=1)
+        result = similar_movies(1, index, self.movies, n=2)
+        self.assertEqual(list(result.columns), ["movieId", "title", "similarity"])
+        self.assertEqual(result["movieId"].iloc[0], 2)  # Stesso attore e stesso genere
+        self.assertTrue(similar_movies(42, index).empty)
+
+    def test_save_and_load(self):
+        index = build_content_index(self.movies, n_neighbors=3, n_workers=1)
+        with tempfile.TemporaryDirectory() as directory:
+            index.save(directory, "content")
+            loaded = NeighborIndex.load(directory, "content")
+            for movie_id in self.movies["movieId"]:
+                np.testing.assert_array_equal(loaded.similar(movie_id)[0], index.similar(movie_id)[0])
+
+    def test_recommend_movies_with_content(self):
+        ratings = pd.DataFrame({"userId": [1], "movieId": [1], "rating": [5.0]})
+        index = build_content_index(self.movies, n_neighbors=3, n_workers=1)
+        result = recommend_movies(1, ratings, self.movies, top_k=2, content=index)
+        self.assertEqual(list(result["title"]), ["Casino (1995)", "Se7en (1995)"])
+        self.assertGreater(result["score"].iloc[0], result["score"].iloc[1])
+        self.assertNotIn("directors", self.movies.columns)
+
+
+if __name__ == "__main__":
+    unittest.main()
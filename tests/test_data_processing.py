@@ -0,0 +1,167 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+import columnar
+import data_processing
+import fingerprints
+import streaming
+from recommendation_cache import RecommendationCache
+
+MOVIES = pd.DataFrame({"movieId": [1, 2, 3], "title": ["A (1995)", "B (1996)", "C (1997)"],
+                       "genres": ["Comedy|Drama", "Action", "(no genres listed)"]})
+RATINGS = pd.DataFrame({"userId": [1, 1, 2, 2, 2, 3], "movieId": [1, 2, 1, 3, 9, 2],
+                        "rating": [4.0, 3.5, 5.0, 1.0, 2.0, 0.5], "timestamp": [1, 2, 3, 4, 5, 6]})
+LINKS = pd.DataFrame({"movieId": [1, 2, 3], "imdbId": [114709, 113497, 113228], "tmdbId": [862, 8844, 15602]})
+TAGS = pd.DataFrame({"userId": [1], "movieId": [1], "tag": ["funny"], "timestamp": [7]})
+
+
+class TestDataProcessing(unittest.TestCase):
+    def _paths(self, directory):
+        processed = os.path.join(directory, "processed")
+        return {"RAW_DATA_PATH": os.path.join(directory, "raw"), "PROCESSED_DATA_PATH": processed,
+                "COLUMNAR_DATA_PATH": os.path.join(processed, "columnar"),
+                "FINGERPRINTS_PATH": os.path.join(processed, "fingerprints.json"),
+                "TAG_INDEX_PATH": os.path.join(processed, "tag_index"),
+                "RESULT_CACHE_PATH": os.path.join(directory, "results.sqlite3")}
+
+    def _write_raw(self, paths, ratings=RATINGS):
+        os.makedirs(paths["RAW_DATA_PATH"], exist_ok=True)
+        for name, frame in (("movies", MOVIES), ("ratings", ratings), ("links", LINKS), ("tags", TAGS)):
+            frame.to_csv(os.path.join(paths["RAW_DATA_PATH"], f"{name}.csv"), index=False)
+
+    def _process(self, memory_budget, ratings=RATINGS):
+        paths = self._paths(tempfile.mkdtemp())
+        self._write_raw(paths, ratings)
+        with mock.patch.multiple(data_processing, **paths), \
+                mock.patch.object(streaming, "STREAMING_MEMORY_BUDGET", memory_budget):
+            data_processing.run_data_processing()
+        return paths
+
+    def assertTablesEqual(self, first, second, name):
+        columns, meta = columnar.load_table(first, name)
+        expected, expected_meta = columnar.load_table(second, name)
+        # La revisione conta i salvataggi, più numerosi con l'elaborazione incrementale
+        meta.pop("revision")
+        expected_meta.pop("revision")
+        self.assertEqual(meta, expected_meta)
+        for column, values in expected.items():
+            np.testing.assert_array_equal(columns[column], values)
+
+    def test_streaming_matches_in_memory_processing(self):
+        in_memory = self._process(1 << 30)
+        # Un budget minimo forza la lettura in streaming a blocchi da una riga
+        streamed = self._process(1)
+        for name in ("ratings", streaming.USER_PROFILES_TABLE, streaming.MOVIE_STATS_TABLE):
+            self.assertTablesEqual(streamed["COLUMNAR_DATA_PATH"], in_memory["COLUMNAR_DATA_PATH"], name)
+        pd.testing.assert_frame_equal(
+            pd.read_csv(os.path.join(streamed["PROCESSED_DATA_PATH"], "ratings_processed.csv")),
+            pd.read_csv(os.path.join(in_memory["PROCESSED_DATA_PATH"], "ratings_processed.csv")))
+        profiles, meta = columnar.load_table(in_memory["COLUMNAR_DATA_PATH"], streaming.USER_PROFILES_TABLE)
+        np.testing.assert_array_equal(profiles["ratingCount"], [2, 3, 1])
+        np.testing.assert_array_equal(profiles["genreWeights"][0], [0.0, 3.5, 4.0, 4.0])
+        self.assertEqual(meta["genres"], ["(no genres listed)", "Action", "Comedy", "Drama"])
+
+    def test_unsorted_ratings_cannot_be_streamed(self):
+        with self.assertRaises(ValueError):
+            self._process(1, RATINGS.iloc[::-1])
+
+    def test_incremental_stats_match_full_processing(self):
+        paths = self._process(1 << 30, RATINGS.iloc[:4])
+        with open(os.path.join(paths["RAW_DATA_PATH"], "ratings.csv"), "a") as f:
+            RATINGS.iloc[4:].to_csv(f, header=False, index=False)
+        cache = RecommendationCache.shared(paths["RESULT_CACHE_PATH"])
+        with mock.patch.multiple(data_processing, **paths):
+            data_processing.run_data_processing(incremental=True)
+        # Solo gli utenti dei rating accodati vengono invalidati nella cache condivisa
+        self.assertEqual([cache.user_version(user_id) for user_id in (1, 2, 3)], [0, 1, 1])
+        cache.close()
+        full = self._process(1 << 30)
+        for name in ("ratings", streaming.USER_PROFILES_TABLE, streaming.MOVIE_STATS_TABLE):
+            self.assertTablesEqual(paths["COLUMNAR_DATA_PATH"], full["COLUMNAR_DATA_PATH"], name)
+
+    def test_appended_ratings_are_segments_with_refreshed_movie_rows(self):
+        paths = self._process(1 << 30, RATINGS.iloc[:4])
+        with open(os.path.join(paths["RAW_DATA_PATH"], "ratings.csv"), "a") as f:
+            RATINGS.iloc[4:].to_csv(f, header=False, index=False)
+        # Il film 9 entra in testa al catalogo insieme ai rating accodati: le posizioni già salvate cambiano
+        movies = pd.concat([pd.DataFrame({"movieId": [9], "title": ["D (1998)"], "genres": ["Action"]}), MOVIES])
+        movies.to_csv(os.path.join(paths["RAW_DATA_PATH"], "movies.csv"), index=False)
+        with mock.patch.multiple(data_processing, **paths), mock.patch.object(columnar, "SEGMENT_COMPACT_FRACTION", 10):
+            changes = data_processing.run_incremental_processing()
+        self.assertEqual(changes["ratings.csv"], fingerprints.APPENDED)
+        self.assertEqual(len(columnar.load_meta(paths["COLUMNAR_DATA_PATH"], "ratings")["segments"]), 1)
+
+        full = self._paths(tempfile.mkdtemp())
+        self._write_raw(full)
+        movies.to_csv(os.path.join(full["RAW_DATA_PATH"], "movies.csv"), index=False)
+        with mock.patch.multiple(data_processing, **full):
+            data_processing.run_data_processing()
+        columns, _ = columnar.load_ratings(paths["COLUMNAR_DATA_PATH"])
+        expected, _ = columnar.load_ratings(full["COLUMNAR_DATA_PATH"])
+        for column, values in expected.items():
+            np.testing.assert_array_equal(columns[column], values)
+        for name in (streaming.USER_PROFILES_TABLE, streaming.MOVIE_STATS_TABLE):
+            self.assertTablesEqual(paths["COLUMNAR_DATA_PATH"], full["COLUMNAR_DATA_PATH"], name)
+
+    def test_modified_ratings_are_streamed_incrementally(self):
+        paths = self._process(1 << 30)
+        modified = RATINGS.assign(rating=RATINGS["rating"][::-1].to_numpy())
+        modified.to_csv(os.path.join(paths["RAW_DATA_PATH"], "ratings.csv"), index=False)
+        read_raw_csv = data_processing.read_raw_csv
+        read = []
+
+        def record_reads(name, *args, **kwargs):
+            read.append(name)
+            return read_raw_csv(name, *args, **kwargs)
+
+        with mock.patch.multiple(data_processing, **paths), \
+                mock.patch.object(streaming, "STREAMING_MEMORY_BUDGET", 1), \
+                mock.patch.object(data_processing, "read_raw_csv", record_reads):
+            changes = data_processing.run_incremental_processing()
+        # Oltre il budget di memoria 'ratings.csv' non viene caricato intero
+        self.assertEqual(changes["ratings.csv"], fingerprints.MODIFIED)
+        self.assertNotIn("ratings.csv", read)
+        full = self._process(1 << 30, modified)
+        for name in ("ratings", streaming.USER_PROFILES_TABLE, streaming.MOVIE_STATS_TABLE):
+            self.assertTablesEqual(paths["COLUMNAR_DATA_PATH"], full["COLUMNAR_DATA_PATH"], name)
+        pd.testing.assert_frame_equal(
+            pd.read_csv(os.path.join(paths["PROCESSED_DATA_PATH"], "ratings_processed.csv")),
+            pd.read_csv(os.path.join(full["PROCESSED_DATA_PATH"], "ratings_processed.csv")))
+
+    def test_rows_appended_during_a_run_are_processed_next_time(self):
+        paths = self._paths(tempfile.mkdtemp())
+        self._write_raw(paths, RATINGS.iloc[:4])
+        ratings_path = os.path.join(paths["RAW_DATA_PATH"], "ratings.csv")
+        size = os.path.getsize(ratings_path)
+        process_movies = data_processing.process_movies_data
+
+        def append_while_processing(movies):
+            # Un altro processo accoda rating dopo che il file è già stato letto
+            with open(ratings_path, "a") as f:
+                RATINGS.iloc[4:].to_csv(f, header=False, index=False)
+            return process_movies(movies)
+
+        with mock.patch.multiple(data_processing, **paths):
+            with mock.patch.object(data_processing, "process_movies_data", append_while_processing):
+                data_processing.run_data_processing()
+            self.assertEqual(fingerprints.load_state(paths["FINGERPRINTS_PATH"])["ratings.csv"]["size"], size)
+            self.assertEqual(data_processing.run_incremental_processing()["ratings.csv"], fingerprints.APPENDED)
+        self.assertEqual(len(columnar.load_frame(paths["COLUMNAR_DATA_PATH"], "ratings")), len(RATINGS))
+
+    def test_failed_save_does_not_record_fingerprints(self):
+        paths = self._paths(tempfile.mkdtemp())
+        self._write_raw(paths)
+        with mock.patch.multiple(data_processing, **paths), \
+                mock.patch.object(columnar, "save_tags", side_effect=OSError("disco pieno")):
+            with self.assertRaises(OSError), self.assertLogs(data_processing.logger, "ERROR"):
+                data_processing.run_data_processing()
+        self.assertFalse(os.path.exists(paths["FINGERPRINTS_PATH"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
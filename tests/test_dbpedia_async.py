@@ -0,0 +1,67 @@
+import asyncio
+import time
+import unittest
+
+from dbpedia_async import AdaptiveConcurrency, TokenBucket, parse_retry_after, run_pipeline
+from sparql_stub import StubSparqlServer
+
+
+def build_query(batch):
+    return "SELECT * WHERE { VALUES ?key { " + " ".join(f'"{key}"' for key in batch) + " } }"
+
+
+class TestRateLimiting(unittest.TestCase):
+    def test_parse_retry_after(self):
+        self.assertEqual(parse_retry_after("3"), 3.0)
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after("soon"))
+        self.assertGreater(parse_retry_after("Wed, 21 Oct 2099 07:28:00 GMT"), 0)
+
+    def test_token_bucket_limits_rate(self):
+        async def acquire_all():
+            bucket = TokenBucket(rate=50, capacity=1)
+            started = time.monotonic()
+            for _ in range(6):
+                await bucket.acquire()
+            return time.monotonic() - started
+
+        self.assertGreaterEqual(asyncio.run(acquire_all()), 0.09)
+
+    def test_concurrency_halves_on_throttle(self):
+        async def throttle():
+            limiter = AdaptiveConcurrency(initial=8, minimum=2)
+            await limiter.record_throttle()
+            await limiter.record_throttle()
+            await limiter.record_throttle()
+            return limiter.limit
+
+        self.assertEqual(asyncio.run(throttle()), 2)
+
+
+class TestPipeline(unittest.TestCase):
+    def test_batches_are_retried_after_429(self):
+        fixtures = {str(i): [{"key": {"value": str(i)}}] for i in range(10)}
+        batches = [[str(i), str(i + 1)] for i in range(0, 10, 2)]
+        results = {}
+        with StubSparqlServer(fixtures, throttle_first=2, retry_after=0) as server:
+            stats = asyncio.run(run_pipeline(batches, build_query, lambda batch, b: results.update({tuple(batch): b}),
+                                             endpoint=server.url, rate=100))
+        self.assertEqual(stats.throttled, 2)
+        self.assertEqual(stats.completed_batches, 5)
+        self.assertEqual(stats.failed_batches, 0)
+        self.assertEqual(sorted(b["key"]["value"] for bindings in results.values() for b in bindings),
+                         sorted(fixtures))
+
+    def test_injected_errors_are_retried(self):
+        fixtures = {str(i): [{"key": {"value": str(i)}}] for i in range(20)}
+        batches = [[str(i)] for i in range(20)]
+        with StubSparqlServer(fixtures, error_rate=0.3, seed=1) as server:
+            stats = asyncio.run(run_pipeline(batches, build_query, lambda batch, b: None,
+                                             endpoint=server.url, rate=1000, max_retries=10))
+        self.assertGreater(server.errors, 0)
+        self.assertEqual(stats.errors, server.errors)
+        self.assertEqual(stats.completed_batches, 20)
+
+
+if __name__ == "__main__":
+    unittest.main()
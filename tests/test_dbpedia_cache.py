@@ -0,0 +1,146 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+import dbpedia_queries
+from dbpedia_cache import MISSING, JsonCache, SQLiteCache, open_cache
+from sparql_stub import StubSparqlServer
+
+
+class TestSQLiteCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "cache.sqlite3")
+
+    def test_entries_persist_after_commit(self):
+        with SQLiteCache(self.path) as cache:
+            cache.set("Heat (1995)", {"abstract": "A heist."})
+            cache.set("Unknown (2020)", None)
+        cache = SQLiteCache(self.path)
+        self.assertEqual(cache.get("Heat (1995)"), {"abstract": "A heist."})
+        self.assertIsNone(cache.get("Unknown (2020)"))
+        self.assertIs(cache.get("Missing"), MISSING)
+        self.assertEqual(len(cache), 2)
+
+    def test_expired_entries_are_missing(self):
+        cache = SQLiteCache(self.path)
+        cache.set("Old", {"abstract": None}, ttl=-1)
+        self.assertIs(cache.get("Old"), MISSING)
+        self.assertEqual(cache.purge_expired(), 1)
+
+    def test_legacy_json_is_imported(self):
+        legacy_path = os.path.join(self.directory, "query_results.json")
+        legacy = JsonCache(legacy_path)
+        legacy.set("Heat (1995)", {"abstract": "A heist."})
+        legacy.commit()
+        cache = open_cache(self.path, legacy_json_path=legacy_path)
+        self.assertEqual(cache.get("Heat (1995)"), {"abstract": "A heist."})
+
+    def test_legacy_json_is_rekeyed_by_imdb_id(self):
+        legacy_path = os.path.join(self.directory, "query_results.json")
+        legacy = JsonCache(legacy_path)
+        legacy.set("Heat (1995)", {"abstract": "A heist.", "director": None, "starring": None, "genre": None})
+        legacy.set("Unknown (2020)", None)
+        legacy.commit()
+        movies = pd.DataFrame({"title": ["Heat (1995)", "Unknown (2020)"], "imdbId": [113277, 1]})
+        with mock.patch.object(dbpedia_queries, "CACHE_PATH", self.path), \
+                mock.patch.object(dbpedia_queries, "LEGACY_CACHE_PATH", legacy_path), \
+                StubSparqlServer({}) as server:
+            enriched = dbpedia_queries.enrich_movies(movies, endpoint=server.url)
+            queries = server.queries
+        # Il film già in cache per titolo non viene interrogato; la voce negativa non vale per l'ID,
+        # che viene cercato e, senza risultati, ripiega sul titolo già in cache come negativo
+        self.assertEqual(enriched["abstract"].iloc[0], "A heist.")
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn("0113277", queries[0])
+        self.assertIn("0000001", queries[0])
+        with SQLiteCache(self.path) as cache:
+            self.assertIsNone(cache.get(dbpedia_queries.imdb_key(1)))
+
+
+class TestEnrichMovies(unittest.TestCase):
+    def setUp(self):
+        self.cache = SQLiteCache(os.path.join(tempfile.mkdtemp(), "cache.sqlite3"))
+
+    def test_results_and_misses_are_cached(self):
+        bindings = [{"label": {"value": "Heat"}, "abstract": {"value": "A heist."}}]
+        movies = pd.DataFrame({"title": ["Heat (1995)", "Unknown (2020)"]})
+        with StubSparqlServer({"Heat": bindings}) as server:
+            enriched = dbpedia_queries.enrich_movies(movies, cache=self.cache, endpoint=server.url)
+        self.assertEqual(enriched["abstract"].iloc[0], "A heist.")
+        self.assertTrue(pd.isna(enriched["abstract"].iloc[1]))
+        self.assertEqual(self.cache.get("Heat (1995)")["abstract"], "A heist.")
+        self.assertIsNone(self.cache.get("Unknown (2020)"))
+
+    def test_cached_and_duplicate_movies_are_not_queried(self):
+        self.cache.set(dbpedia_queries.imdb_key(113277), {"abstract": "A heist.", "director": None,
+                                                          "starring": None, "genre": None})
+        self.cache.set(dbpedia_queries.imdb_key(1), None)
+        movies = pd.DataFrame({
+            "title": ["Heat (1995)", "Matrix, The (1999)", "Matrix, The (1999)", "Unknown (2020)", "No id"],
+            "imdbId": [113277, 133093, 133093, 1, None],
+        })
+        bindings = [{"imdbId": {"value": "0133093"}, "director": {"value": "W1|W2"}}]
+        with StubSparqlServer({"0133093": bindings}) as server:
+            enriched = dbpedia_queries.enrich_movies(movies, cache=self.cache, endpoint=server.url)
+            queries = server.queries
+        self.assertEqual(len(queries), 2)  # un batch per ID, uno per titolo
+        self.assertIn('VALUES ?imdbId { "0133093" }', queries[0] + queries[1])
+        self.assertEqual(list(enriched["director"].iloc[1:3]), ["W1|W2", "W1|W2"])
+        self.assertEqual(enriched["abstract"].iloc[0], "A heist.")
+
+    def test_imdb_misses_fall_back_to_title(self):
+        # DBpedia non ha `dbo:imdbId` per questi film: il primo si trova per titolo, il secondo no
+        bindings = [{"label": {"value": "Heat"}, "abstract": {"value": "A heist."}}]
+        movies = pd.DataFrame({"title": ["Heat (1995)", "Unknown (2020)"], "imdbId": [113277, 1]})
+        with StubSparqlServer({"Heat": bindings}) as server:
+            enriched = dbpedia_queries.enrich_movies(movies, cache=self.cache, endpoint=server.url)
+            queries = server.queries
+        self.assertEqual(len(queries), 2)  # un batch per ID, uno di ripiego per titolo
+        self.assertIn('"Heat"', queries[1])
+        self.assertEqual(enriched["abstract"].iloc[0], "A heist.")
+        self.assertTrue(pd.isna(enriched["abstract"].iloc[1]))
+        self.assertEqual(self.cache.get(dbpedia_queries.imdb_key(113277))["abstract"], "A heist.")
+        self.assertIsNone(self.cache.get(dbpedia_queries.imdb_key(1)))
+        self.assertIsNone(self.cache.get("Unknown (2020)"))
+
+        # Alla seconda esecuzione entrambi i film sono in cache sotto l'imdbId
+        with StubSparqlServer({}) as server:
+            enriched = dbpedia_queries.enrich_movies(movies, cache=self.cache, endpoint=server.url)
+            self.assertEqual(server.queries, [])
+        self.assertEqual(enriched["abstract"].iloc[0], "A heist.")
+
+    def test_pack_batches_respects_query_size(self):
+        keys = [dbpedia_queries.imdb_key(i) for i in range(1000)]
+        batches = dbpedia_queries.pack_batches(keys, max_bytes=2048, max_items=500)
+        self.assertEqual(sum(len(b) for b in batches), 1000)
+        self.assertTrue(all(len(dbpedia_queries.build_batch_query(b).encode()) <= 2048 for b in batches))
+
+    def test_pack_batches_measures_rendered_terms(self):
+        keys = [dbpedia_queries.uri_key(f"http://dbpedia.org/resource/A_{i}_<{{|}}>_\"x\"") for i in range(300)]
+        keys += [f'Amélie "{i}", The (2001)' for i in range(300)]
+        for batch_keys in (keys[:300], keys[300:]):
+            batches = dbpedia_queries.pack_batches(batch_keys, max_bytes=2048, max_items=500)
+            sizes = [len(dbpedia_queries.build_batch_query(b).encode()) for b in batches]
+            self.assertTrue(all(size <= 2048 for size in sizes), sizes)
+            self.assertGreater(min(sizes[:-1]), 1500)  # Batch pieni, non sovrastimati
+
+    def test_remakes_are_not_merged(self):
+        dbr = "http://dbpedia.org/resource/"
+        bindings = [
+            {"label": {"value": "Heat"}, "film": {"value": dbr + "Heat_(1986_film)"}, "director": {"value": "Dick"}},
+            {"label": {"value": "Heat"}, "film": {"value": dbr + "Heat_(1995_film)"}, "director": {"value": "Mann"}},
+            {"label": {"value": "Heat"}, "film": {"value": dbr + "Heat_(film)"}, "director": {"value": "Other"}},
+        ]
+        results = dbpedia_queries.parse_bindings(["Heat (1995)", "Heat (1986)", "Heat"], bindings)
+        # Senza anno vale la voce senza anno nella disambiguazione
+        self.assertEqual({key: value["director"] for key, value in results.items()},
+                         {"Heat (1995)": "Mann", "Heat (1986)": "Dick", "Heat": "Other"})
+        self.assertIn("GROUP BY ?label ?film", dbpedia_queries.build_batch_query(["Heat (1995)"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,145 @@
+import gzip
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+import dbpedia_queries
+from dbpedia_cache import SQLiteCache
+from entity_resolver import (EntityResolver, load_entity_resolver, ngram_codes, parse_title, read_label_dump,
+                             resolve_movies, resolve_titles)
+from sparql_stub import StubSparqlServer
+
+DBR = "http://dbpedia.org/resource/"
+LABEL = "http://www.w3.org/2000/01/rdf-schema#label"
+
+
+class TestEntityResolver(unittest.TestCase):
+    def setUp(self):
+        self.resolver = EntityResolver.from_labels(
+            [DBR + "The_Matrix", DBR + "Heat_(1986_film)", DBR + "Heat_(1995_film)", DBR + "Seven_(1995_film)",
+             DBR + "La_Haine", DBR + "Toy_Story", DBR + "Othello_(1952_film)", DBR + "Othello_(1995_film)",
+             DBR + "Fast_&_Furious", DBR + "El_Dorado_(1966_film)", DBR + "Hard_(film)", DBR + "Die_Hard"],
+            ["The Matrix", "Heat", "Heat", "Seven", "La Haine", "", "Othello", "Othello", "Fast & Furious",
+             "El Dorado", "Hard", "Die Hard"])
+
+    def test_parse_title(self):
+        self.assertEqual(parse_title("Matrix, The (1999)"), (["the matrix"], 1999))
+        self.assertEqual(parse_title("Homme, L'"), (["l homme"], None))
+        # Le parole iniziali restano: solo l'articolo in coda di MovieLens viene riportato in testa
+        self.assertEqual(parse_title("Die Hard (1988)"), (["die hard"], 1988))
+        self.assertEqual(parse_title("Heat (1995 film)"), (["heat"], 1995))
+        self.assertEqual(parse_title("Seven (a.k.a. Se7en) (1995)"), (["seven", "se7en"], 1995))
+        self.assertEqual(parse_title("Cité des enfants perdus, La (City of Lost Children, The) (1995)"),
+                         (["la cite des enfants perdus", "the city of lost children"], 1995))
+        self.assertEqual(parse_title("Fast & Furious"), (["fast and furious"], None))
+        # ' ab ' ha due trigrammi distinti: ' ab' e 'ab '
+        self.assertEqual(len(ngram_codes("ab")), 2)
+
+    def test_read_label_dump(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "labels.nt.gz")
+            with gzip.open(path, "wt", encoding="utf-8") as dump:
+                dump.write(f'<{DBR}Am\\u00E9lie> <{LABEL}> "Am\\u00E9lie \\"Poulain\\""@en .\n')
+                dump.write(f'<{DBR}Heat_(1995_film)> <{LABEL}> "Heat (1995 film)"@en .\n')
+                dump.write(f'<{DBR}Heat_(1995_film)> <{LABEL}> "Heat (film, 1995)"@it .\n')
+                dump.write(f'<{DBR}Heat_(1995_film)> <http://dbpedia.org/ontology/runtime> "170"@en .\n')
+            labels = read_label_dump(path)
+            self.assertEqual(list(labels["label"]), ['Amélie "Poulain"', "Heat (1995 film)"])
+            self.assertEqual(labels["uri"].iloc[0], DBR + "Am\\u00E9lie")
+
+            path = os.path.join(directory, "labels.tsv")
+            pd.DataFrame({"uri": [DBR + "Heat"], "label": ["Heat"]}).to_csv(path, sep="\t", index=False)
+            self.assertEqual(read_label_dump(path).to_dict("records"), [{"uri": DBR + "Heat", "label": "Heat"}])
+
+    def test_exact_match_and_year(self):
+        self.assertEqual(self.resolver.resolve("Matrix, The (1999)")[::3], (DBR + "The_Matrix", "exact"))
+        self.assertEqual(self.resolver.resolve("Heat (1995)"), (DBR + "Heat_(1995_film)", "Heat", 1.0, "exact"))
+        self.assertEqual(self.resolver.resolve("Heat (1986)")[0], DBR + "Heat_(1986_film)")
+        # L'etichetta vuota usa il nome dell'URI; l'anno sconosciuto riduce la confidenza
+        self.assertEqual(self.resolver.resolve("Toy Story (1995)")[2:], (0.9, "exact"))
+        self.assertEqual(self.resolver.resolve("Hate (Haine, La) (1995)")[0], DBR + "La_Haine")
+        self.assertEqual(self.resolver.resolve("Fast & Furious (2009)")[0], DBR + "Fast_&_Furious")
+        self.assertEqual(self.resolver.resolve("Die Hard (1988)")[::3], (DBR + "Die_Hard", "exact"))
+        self.assertGreaterEqual(self.resolver.resolve("Die Hard (1988)")[2], 0.8)
+
+    def test_ngram_and_ambiguous_matches(self):
+        uri, label, confidence, method = self.resolver.resolve("Fast and the Furios (2009)")
+        self.assertEqual((uri, label, method), (DBR + "Fast_&_Furious", "Fast & Furious", "ngram"))
+        self.assertTrue(0.5 < confidence < 0.9)
+        self.assertEqual(self.resolver.resolve("Completely Different (2001)"), (None, None, 0.0, None))
+        # Un seguito non è il primo film, anche se i trigrammi sono quasi tutti in comune
+        self.assertLess(self.resolver.resolve("Toy Story 2 (1999)")[2], 0.8)
+        # Una parola in più o in meno è un altro titolo, non un errore di battitura
+        self.assertLess(self.resolver.resolve("Dorado (1966)")[2], 0.8)
+        # Senza anno i due Othello sono indistinguibili
+        self.assertLess(self.resolver.resolve("Othello")[2], 0.8)
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as directory:
+            self.resolver.save(directory)
+            loaded = EntityResolver.load(directory)
+            self.assertIsInstance(loaded.gram_rows, np.memmap)
+            for title in ["Heat (1995)", "Fast and Furios", "Seven (a.k.a. Se7en) (1995)"]:
+                self.assertEqual(loaded.resolve(title), self.resolver.resolve(title))
+
+    def test_saved_index_is_rebuilt_for_a_different_dump(self):
+        with tempfile.TemporaryDirectory() as directory:
+            dump = os.path.join(directory, "labels.tsv")
+            pd.DataFrame({"uri": [DBR + "Heat"], "label": ["Heat"]}).to_csv(dump, sep="\t", index=False)
+            index = os.path.join(directory, "index")
+            self.assertIsNone(load_entity_resolver(index, labels_path=os.path.join(directory, "missing.nt")))
+            self.assertEqual(len(load_entity_resolver(index, labels_path=dump)), 1)
+
+            pd.DataFrame({"uri": [DBR + "Heat", DBR + "Casino"], "label": ["Heat", "Casino"]}).to_csv(
+                dump, sep="\t", index=False)
+            self.assertEqual(load_entity_resolver(index, labels_path=dump).resolve("Casino (1995)")[0], DBR + "Casino")
+            # Senza il dump si usa l'ultimo indice salvato
+            self.assertEqual(len(load_entity_resolver(index, labels_path=None)), 2)
+
+    def test_resolve_titles_in_parallel(self):
+        titles = ["Heat (1995)", "Othello (1952)", "Unknown (2020)", "Heat (1995)", "Othello"]
+        serial = resolve_titles(titles, self.resolver, n_workers=1)
+        parallel = resolve_titles(titles, self.resolver, n_workers=2, chunk_size=1)
+        pd.testing.assert_frame_equal(serial, parallel)
+        self.assertEqual(list(serial["method"]), ["exact", "exact", "unresolved", "exact", "unresolved"])
+        self.assertEqual(serial["uri"].iloc[1], DBR + "Othello_(1952_film)")
+        self.assertTrue(serial["uri"].iloc[[2, 4]].isna().all())
+
+    def test_enrichment_queries_resolved_uris(self):
+        cache = SQLiteCache(os.path.join(tempfile.mkdtemp(), "cache.sqlite3"))
+        movies = pd.DataFrame({"movieId": [1, 2, 3], "title": ["Heat (1995)", "Casino (1995)", "Seven (1995)"],
+                               "imdbId": [None, None, 114369]})
+        fixtures = {DBR + "Heat_(1995_film)": [{"film": {"value": DBR + "Heat_(1995_film)"},
+                                                "director": {"value": DBR + "Michael_Mann"}}],
+                    "Casino": [{"label": {"value": "Casino"}, "abstract": {"value": "Las Vegas."}}],
+                    "0114369": [{"imdbId": {"value": "0114369"}, "abstract": {"value": "Sins."}}]}
+        with StubSparqlServer(fixtures) as server:
+            enriched = dbpedia_queries.enrich_movies(movies, cache=cache, endpoint=server.url,
+                                                     resolver=self.resolver)
+            queries = server.queries
+        # Un batch per gli imdbId, uno per gli URI risolti offline, uno per il titolo rimasto
+        self.assertEqual(len(queries), 3)
+        self.assertNotIn(f"<{DBR}Seven_(1995_film)>", "".join(queries))
+        self.assertEqual(enriched["abstract"].iloc[2], "Sins.")
+        self.assertIn(f"VALUES ?film {{ <{DBR}Heat_(1995_film)> }}", "".join(queries))
+        self.assertEqual(enriched["director"].iloc[0], DBR + "Michael_Mann")
+        self.assertTrue(pd.isna(enriched["director"].iloc[1]))
+        self.assertEqual(enriched["abstract"].iloc[1], "Las Vegas.")
+        self.assertEqual(cache.get(dbpedia_queries.uri_key(DBR + "Heat_(1995_film)"))["director"],
+                         DBR + "Michael_Mann")
+
+    def test_resolve_movies(self):
+        movies = resolve_movies(pd.DataFrame({"movieId": [1], "title": ["Seven (1995)"]}), self.resolver)
+        self.assertEqual(movies[["dbpediaUri", "resolverConfidence", "resolverMethod"]].iloc[0].tolist(),
+                         [DBR + "Seven_(1995_film)", 1.0, "exact"])
+        self.assertEqual(dbpedia_queries.movie_cache_keys(movies), [f"dbr:{DBR}Seven_(1995_film)"])
+        # L'imdbId, quando noto, prevale sulla risoluzione offline
+        movies["imdbId"] = [114369]
+        self.assertEqual(dbpedia_queries.movie_cache_keys(movies), ["imdb:0114369"])
+
+
+if __name__ == "__main__":
+    unittest.main()
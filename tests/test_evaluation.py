@@ -0,0 +1,71 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from evaluation import (evaluate_at_k, evaluate_recommender, mean_average_precision, precision_at_k,
+                        recall_at_k, relevance_matrix, summarize, temporal_split)
+
+
+class TestEvaluation(unittest.TestCase):
+    def test_average_precision(self):
+        # Rilevanti in posizione 1 e 3: (1/1 + 2/3) / min(3, 4)
+        self.assertAlmostEqual(mean_average_precision([1, 2, 3, 4], [1, 3, 9], 4), (1 + 2 / 3) / 3)
+        self.assertEqual(mean_average_precision([1, 2], [], 2), 0)
+
+    def test_vectorized_matches_per_user(self):
+        rng = np.random.default_rng(0)
+        n_users, n_items, k = 50, 30, 5
+        recommendations = np.array([rng.permutation(n_items)[:k] for _ in range(n_users)])
+        recommendations[3, 2:] = -1
+        relevant = [rng.choice(n_items, rng.integers(0, 6), replace=False) for _ in range(n_users)]
+        relevance = relevance_matrix(np.repeat(np.arange(n_users), [len(r) for r in relevant]),
+                                     np.concatenate(relevant), n_users, n_items)
+
+        per_user = evaluate_at_k(recommendations, relevance, k)
+        for user in range(n_users):
+            recs, items = [r for r in recommendations[user] if r >= 0], list(relevant[user])
+            row = per_user.iloc[user]
+            self.assertAlmostEqual(row["precision"], precision_at_k(recs, items, k))
+            self.assertAlmostEqual(row["recall"], recall_at_k(recs, items, k))
+            self.assertAlmostEqual(row["map"], mean_average_precision(recs, items, k))
+            self.assertEqual(row["hit_rate"], float(bool(set(recs) & set(items))))
+        self.assertEqual(summarize(per_user)["users"], sum(len(r) > 0 for r in relevant))
+
+    def test_ndcg(self):
+        relevance = relevance_matrix([0, 0], [1, 5], 1, 6)
+        per_user = evaluate_at_k(np.array([[5, 2, 1]]), relevance, 3)
+        ideal = 1 + 1 / np.log2(3)
+        self.assertAlmostEqual(per_user["ndcg"][0], (1 + 1 / np.log2(4)) / ideal)
+
+    def test_temporal_split(self):
+        ratings = pd.DataFrame({
+            "userId": [1, 1, 1, 1, 1, 2, 2],
+            "movieId": [1, 2, 3, 4, 5, 1, 2],
+            "rating": [4.0] * 7,
+            "timestamp": [50, 10, 40, 20, 30, 5, 1],
+        })
+        train, test = temporal_split(ratings, test_fraction=0.4)
+        self.assertEqual(sorted(test["movieId"][test["userId"] == 1]), [1, 3])
+        self.assertEqual(list(test["userId"]), [1, 1])
+        self.assertEqual(len(train) + len(test), len(ratings))
+        _, test = temporal_split(ratings, cutoff=40)
+        self.assertEqual(sorted(test["timestamp"]), [40, 50])
+
+    def test_evaluate_recommender(self):
+        movies = pd.DataFrame({
+            "movieId": [1, 2, 3, 4],
+            "title": ["A", "B", "C", "D"],
+            "genres": [["Crime"], ["Crime", "Drama"], ["Comedy"], ["Drama"]],
+        })
+        train = pd.DataFrame({"userId": [1, 2], "movieId": [1, 3], "rating": [5.0, 4.0], "timestamp": [1, 1]})
+        test = pd.DataFrame({"userId": [1, 2], "movieId": [2, 4], "rating": [5.0, 5.0], "timestamp": [2, 2]})
+        per_user, summary = evaluate_recommender(train, test, movies, k=2, n_workers=1)
+        self.assertEqual(list(per_user["userId"]), [1, 2])
+        self.assertEqual(list(per_user["hit_rate"]), [1.0, 0.0])
+        self.assertEqual(summary["users"], 2)
+        self.assertAlmostEqual(summary["hit_rate"], 0.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+import os
+import tempfile
+import unittest
+
+import fingerprints
+
+
+class TestFingerprints(unittest.TestCase):
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), "ratings.csv")
+        self._write("w", "userId,movieId,rating,timestamp\n1,1,4.0,10\n")
+        self.previous = fingerprints.fingerprint_file(self.path)
+
+    def _write(self, mode, text):
+        with open(self.path, mode) as f:
+            f.write(text)
+
+    def test_unchanged(self):
+        self.assertEqual(fingerprints.detect_change(self.path, self.previous), fingerprints.UNCHANGED)
+
+    def test_appended_rows_are_read_from_offset(self):
+        self._write("a", "2,5,3.5,20\n")
+        self.assertEqual(fingerprints.detect_change(self.path, self.previous), fingerprints.APPENDED)
+        new_rows = fingerprints.read_appended_rows(self.path, self.previous["size"])
+        self.assertEqual(new_rows.values.tolist(), [[2, 5, 3.5, 20]])
+
+    def test_reads_stop_at_the_fingerprinted_size(self):
+        self._write("a", "2,5,3.5,20\n")
+        current = fingerprints.fingerprint_file(self.path)
+        self._write("a", "3,7,1.0,30\n")
+        self.assertEqual(fingerprints.detect_change(self.path, self.previous, current), fingerprints.APPENDED)
+        new_rows = fingerprints.read_appended_rows(self.path, self.previous["size"], current["size"])
+        self.assertEqual(new_rows.values.tolist(), [[2, 5, 3.5, 20]])
+
+    def test_rewritten_file_is_modified(self):
+        self._write("w", "userId,movieId,rating,timestamp\n1,1,5.0,10\n3,3,1.0,30\n")
+        self.assertEqual(fingerprints.detect_change(self.path, self.previous), fingerprints.MODIFIED)
+
+    def test_missing_state_is_new(self):
+        self.assertEqual(fingerprints.detect_change(self.path, None), fingerprints.NEW)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import unittest
+
+import pandas as pd
+
+import instrumentation
+from recommendation_cache import RecommendationCache
+from recommender import recommend_movies
+from recommender_index import RecommenderIndex
+
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self):
+        instrumentation.reset()
+        instrumentation.enable()
+
+    def tearDown(self):
+        instrumentation.disable()
+        instrumentation.reset()
+
+    def test_disabled_by_default_records_nothing(self):
+        instrumentation.disable()
+        instrumentation.increment("requests_total")
+        instrumentation.observe("latency_seconds", 0.1)
+        with instrumentation.span("stage_seconds", stage="score"):
+            pass
+        self.assertEqual(instrumentation.snapshot(), {"counters": {}, "histograms": {}})
+
+    def test_counters_and_histograms(self):
+        instrumentation.increment("cache_requests_total", result="hit")
+        instrumentation.increment("cache_requests_total", 2, result="hit")
+        instrumentation.increment("cache_requests_total", result="miss")
+        for value in (0.0002, 0.003, 0.003, 20.0):
+            instrumentation.observe("latency_seconds", value)
+
+        snapshot = instrumentation.snapshot()
+        self.assertEqual(snapshot["counters"], {"cache_requests_total{result=hit}": 3,
+                                                "cache_requests_total{result=miss}": 1})
+        histogram = snapshot["histograms"]["latency_seconds"]
+        self.assertEqual(histogram["count"], 4)
+        self.assertAlmostEqual(histogram["sum"], 20.0062)
+        self.assertEqual(histogram["p50"], 0.005)
+        self.assertEqual(histogram["buckets"]["+Inf"], 1)
+
+    def test_prometheus_text(self):
+        instrumentation.increment("cache_requests_total", result="hit")
+        instrumentation.observe("latency_seconds", 0.003, buckets=(0.001, 0.01), stage="score")
+        text = instrumentation.prometheus_text({"service_ready": 1.0})
+
+        self.assertIn("# TYPE filminsight_service_ready gauge\nfilminsight_service_ready 1.0\n", text)
+        self.assertIn('filminsight_cache_requests_total{result="hit"} 1\n', text)
+        self.assertIn("# TYPE filminsight_latency_seconds histogram\n", text)
+        self.assertIn('filminsight_latency_seconds_bucket{stage="score",le="0.001"} 0\n', text)
+        self.assertIn('filminsight_latency_seconds_bucket{stage="score",le="0.01"} 1\n', text)
+        self.assertIn('filminsight_latency_seconds_bucket{stage="score",le="+Inf"} 1\n', text)
+        self.assertIn('filminsight_latency_seconds_count{stage="score"} 1\n', text)
+
+    def test_prometheus_text_with_mixed_label_types(self):
+        # Stesso istogramma con uno stato HTTP numerico e uno stato "error"
+        instrumentation.observe("request_seconds", 0.1, buckets=(1.0,), status=200)
+        instrumentation.observe("request_seconds", 0.2, buckets=(1.0,), status="error")
+        instrumentation.increment("requests_total", status=503)
+        instrumentation.increment("requests_total", status="error")
+        text = instrumentation.prometheus_text()
+
+        self.assertIn('filminsight_request_seconds_count{status="200"} 1\n', text)
+        self.assertIn('filminsight_request_seconds_count{status="error"} 1\n', text)
+        self.assertIn('filminsight_requests_total{status="503"} 1\n', text)
+        self.assertEqual(instrumentation.snapshot()["counters"]["requests_total{status=503}"], 1)
+
+    def test_recommend_movies_stages_and_cache(self):
+        movies = pd.DataFrame({
+            "movieId": [1, 2, 3],
+            "title": ["Heat (1995)", "Casino (1995)", "Babe (1995)"],
+            "genres": [["Crime"], ["Crime"], ["Comedy"]],
+        })
+        ratings = pd.DataFrame({"userId": [1], "movieId": [1], "rating": [5.0]})
+        index = RecommenderIndex.from_frames(movies, ratings)
+        index.data_version = "1.1"
+        cache = RecommendationCache()
+        recommend_movies(1, None, None, top_k=1, index=index, cache=cache)
+        recommend_movies(1, None, None, top_k=1, index=index, cache=cache)
+        recommend_movies(2, ratings, movies, top_k=1)
+
+        snapshot = instrumentation.snapshot()
+        self.assertEqual(snapshot["counters"]["recommend_requests_total"], 2)
+        self.assertEqual(snapshot["counters"]["recommend_empty_profiles_total"], 1)
+        self.assertEqual(snapshot["counters"]["result_cache_requests_total{result=hit}"], 1)
+        self.assertEqual(snapshot["counters"]["result_cache_requests_total{result=miss}"], 1)
+        stages = {name for name in snapshot["histograms"] if name.startswith("recommend_stage_seconds")}
+        self.assertEqual(stages, {"recommend_stage_seconds{stage=filter}", "recommend_stage_seconds{stage=score}",
+                                  "recommend_stage_seconds{stage=top_k}"})
+        self.assertEqual(snapshot["histograms"]["recommend_seconds"]["count"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from item_cf import build_item_cf, center_by_user, load_item_cf, rating_matrix, ITEM_CF_TABLE
+from recommender import recommend_movies
+
+
+class TestItemCF(unittest.TestCase):
+    def setUp(self):
+        # I film 1 e 2 piacciono agli stessi utenti, il film 3 a quelli a cui non piacciono
+        self.ratings = pd.DataFrame({
+            "userId": [1, 1, 1, 2, 2, 2, 3, 3, 3, 4],
+            "movieId": [1, 2, 3, 1, 2, 3, 1, 2, 3, 4],
+            "rating": [5.0, 5.0, 1.0, 4.0, 5.0, 2.0, 1.0, 2.0, 5.0, 3.0],
+        })
+
+    def test_rating_matrix_keeps_last_rating(self):
+        ratings = pd.DataFrame({"userId": [7, 7, 8], "movieId": [5, 5, 9], "rating": [1.0, 4.0, 3.0]})
+        matrix, movie_ids, user_ids = rating_matrix(ratings)
+        self.assertEqual(movie_ids.tolist(), [5, 9])
+        self.assertEqual(user_ids.tolist(), [7, 8])
+        np.testing.assert_array_equal(matrix.toarray(), [[4.0, 0.0], [0.0, 3.0]])
+
+    def test_center_by_user(self):
+        matrix, _, _ = rating_matrix(self.ratings)
+        centered = center_by_user(matrix).toarray()
+        np.testing.assert_allclose(centered[:, 0], [5 - 11 / 3, 5 - 11 / 3, 1 - 11 / 3, 0.0], rtol=1e-6)
+        self.assertEqual(centered[3, 3], 0.0)  # Utente con un solo rating
+
+    def test_neighbors(self):
+        index = build_item_cf(self.ratings, n_neighbors=2, n_workers=1)
+        self.assertEqual(index.similar(1)[0].tolist(), [2])  # Il film 3 ha similarità negativa
+        self.assertEqual(index.similar(4)[0].tolist(), [])
+        cosine = build_item_cf(self.ratings, n_neighbors=2, similarity="cosine", n_workers=1)
+        self.assertEqual(cosine.similar(1)[0].tolist(), [2, 3])
+        with self.assertRaises(ValueError):
+            build_item_cf(self.ratings, similarity="pearson")
+
+    def test_save_and_load(self):
+        index = build_item_cf(self.ratings, n_neighbors=2, n_workers=1)
+        with tempfile.TemporaryDirectory() as directory:
+            index.save(directory, ITEM_CF_TABLE)
+            loaded = load_item_cf(directory)
+            np.testing.assert_array_equal(loaded.neighbors, index.neighbors)
+            np.testing.assert_allclose(loaded.similarities, index.similarities)
+
+    def test_recommend_movies_with_cf(self):
+        movies = pd.DataFrame({
+            "movieId": [1, 2, 3, 4],
+            "title": ["Heat (1995)", "Casino (1995)", "Babe (1995)", "Fargo (1996)"],
+            "genres": [["Crime"], ["Crime"], ["Crime"], ["Crime"]],
+        })
+        ratings = pd.concat([self.ratings, pd.DataFrame({"userId": [5], "movieId": [1], "rating": [5.0]})])
+        index = build_item_cf(self.ratings, n_neighbors=2, n_workers=1)
+        result = recommend_movies(5, ratings, movies, top_k=3, cf=index)
+        self.assertEqual(result["title"].iloc[0], "Casino (1995)")
+        self.assertGreater(result["score"].iloc[0], result["score"].iloc[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
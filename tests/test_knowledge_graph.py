@@ -0,0 +1,86 @@
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from knowledge_graph import KnowledgeGraph, recommend_from_graph, split_uris
+from recommender import recommend_movies
+
+DBR = "http://dbpedia.org/resource/"
+
+
+class TestKnowledgeGraph(unittest.TestCase):
+    def setUp(self):
+        self.movies = pd.DataFrame({
+            "movieId": [1, 2, 3, 4, 5],
+            "title": ["Heat (1995)", "Casino (1995)", "Toy Story (1995)", "Collateral (2004)", "Big (1988)"],
+            "genres": [["Crime"], ["Crime"], ["Comedy"], ["Crime"], ["Comedy"]],
+            "director": [DBR + "Michael_Mann", DBR + "Martin_Scorsese", None, DBR + "Michael_Mann", None],
+            "starring": [f"{DBR}Robert_De_Niro|{DBR}Al_Pacino", DBR + "Robert_De_Niro", DBR + "Tom_Hanks",
+                         DBR + "Tom_Cruise", DBR + "Tom_Hanks"],
+        })
+        self.graph = KnowledgeGraph.from_movies(self.movies)
+
+    def test_split_uris(self):
+        self.assertEqual(split_uris(f" {DBR}A | {DBR}B |"), [DBR + "A", DBR + "B"])
+        self.assertEqual(split_uris(float("nan")), [])
+
+    def test_interning_and_adjacency(self):
+        # Gli URI sono internati in ordine: De Niro è un solo nodo per entrambi i film
+        self.assertEqual(self.graph.n_entities, 8)
+        self.assertEqual(self.graph.uris[0], DBR + "Al_Pacino")
+        self.assertEqual(self.graph.entity_id("movielens:genre:Crime"), 7)
+        self.assertEqual(self.graph.entity_id(DBR + "Unknown"), -1)
+        self.assertEqual(list(self.graph.entity_movies_of(DBR + "Robert_De_Niro")), [1, 2])
+        self.assertEqual(sorted(self.graph.movie_entities_of(4)), [
+            ("actor", DBR + "Tom_Cruise"), ("director", DBR + "Michael_Mann"),
+            ("movielens_genre", "movielens:genre:Crime")])
+        self.assertEqual(self.graph.movie_entities_of(42), [])
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as directory:
+            self.graph.save(directory)
+            loaded = KnowledgeGraph.load(directory)
+            self.assertIsInstance(loaded.movie_entities, np.memmap)
+            self.assertEqual(loaded.relations, self.graph.relations)
+            self.assertEqual(loaded.entity_id(DBR + "Tom_Hanks"), self.graph.entity_id(DBR + "Tom_Hanks"))
+            np.testing.assert_allclose(loaded.neighbor_scores([1], [5.0])[1],
+                                       self.graph.neighbor_scores([1], [5.0])[1])
+
+    def test_personalized_pagerank(self):
+        movie_ids, scores = self.graph.neighbor_scores([3], [4.0])
+        # Da Toy Story si raggiunge solo Big, tramite Tom Hanks e il genere Comedy
+        self.assertEqual(list(movie_ids), [5])
+        self.assertGreater(scores[0], 0)
+
+        # Da Heat: Casino (De Niro + Crime) e Collateral (Mann + Crime) a pari merito, le commedie mai
+        movie_ids, scores = self.graph.neighbor_scores([1], [5.0])
+        self.assertEqual(list(movie_ids), [2, 4])
+        self.assertAlmostEqual(scores[0], scores[1])
+
+    def test_recommend_from_graph_matches_single_user(self):
+        ratings = pd.DataFrame({"userId": [1, 2, 2, 3], "movieId": [1, 3, 2, 42], "rating": [5.0, 4.0, 2.0, 5.0]})
+        batch = recommend_from_graph(self.graph, [1, 2, 3], ratings, top_k=2, block_size=1, n_workers=2)
+        self.assertEqual(list(batch["userId"]), [1, 1, 2, 2])
+        self.assertNotIn(3, set(batch["userId"]))
+
+        movie_ids, scores = self.graph.neighbor_scores([3, 2], [4.0, 2.0])
+        order = np.argsort(-scores, kind="stable")[:2]
+        user = batch[batch["userId"] == 2]
+        self.assertEqual(list(user["movieId"]), list(movie_ids[order]))
+        np.testing.assert_allclose(user["score"], scores[order], rtol=1e-5)
+
+    def test_recommend_movies_with_graph(self):
+        movies = self.movies.copy()
+        movies.loc[1, "starring"] = DBR + "Joe_Pesci"
+        graph = KnowledgeGraph.from_movies(movies)
+        ratings = pd.DataFrame({"userId": [1], "movieId": [1], "rating": [5.0]})
+        # Casino e Collateral hanno lo stesso punteggio dei generi; solo Collateral condivide il regista di Heat
+        self.assertEqual(list(recommend_movies(1, ratings, movies, top_k=1)["title"]), ["Casino (1995)"])
+        self.assertEqual(list(recommend_movies(1, ratings, movies, top_k=1, graph=graph)["title"]),
+                         ["Collateral (2004)"])
+
+
+if __name__ == "__main__":
+    unittest.main()
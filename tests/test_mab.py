@@ -0,0 +1,74 @@
+import unittest
+
+import numpy as np
+
+from mab import ArmStore, EpsilonGreedyMAB, MaxSegmentTree, ThompsonSamplingMAB, UCB1MAB
+
+
+class TestMaxSegmentTree(unittest.TestCase):
+    def test_argmax_and_top_k(self):
+        rng = np.random.default_rng(0)
+        values = rng.integers(0, 20, 100).astype(float)
+        tree = MaxSegmentTree(10)
+        tree.grow(100)
+        tree.update(np.arange(100), values)
+        expected = np.argsort(-values, kind="stable")
+        self.assertEqual(tree.argmax(), expected[0])
+        np.testing.assert_array_equal(tree.top_k(10), expected[:10])
+        tree.update([expected[0]], [-1.0])
+        self.assertEqual(tree.argmax(), expected[1])
+        self.assertEqual(len(tree.top_k(500)), 100)
+
+
+class TestEpsilonGreedy(unittest.TestCase):
+    def test_update_many_matches_sequential_updates(self):
+        actions = ["a", "b", "a", "c", "a", "b"]
+        rewards = [1.0, 2.0, 3.0, 0.5, 5.0, 4.0]
+        sequential, batched = EpsilonGreedyMAB(decay="exponential"), EpsilonGreedyMAB(decay="exponential")
+        for action, reward in zip(actions, rewards):
+            sequential.update(action, reward)
+        batched.update_many(actions, rewards)
+        for action, value in sequential.get_action_values().items():
+            self.assertAlmostEqual(batched.get_action_values()[action], value)
+        self.assertAlmostEqual(batched.get_epsilon(), sequential.get_epsilon())
+        self.assertEqual(batched.get_action_counts(), {"a": 3, "b": 2, "c": 1})
+
+    def test_greedy_selection(self):
+        mab = EpsilonGreedyMAB(epsilon=0.0)
+        mab.update_many(["x", "y", "z", "w"], [1.0, 3.0, 2.0, 3.0])
+        self.assertEqual(mab.select_action(), "y")
+        self.assertEqual(mab.select_action(["x", "z", "unknown"]), "z")
+        self.assertEqual(mab.select_many(3), ["y", "w", "z"])
+        with self.assertRaises(ValueError):
+            mab.select_action([])
+
+    def test_seed_is_per_instance(self):
+        def picks(seed):
+            mab = EpsilonGreedyMAB(epsilon=1.0, seed=seed)
+            mab.update_many(range(50), np.zeros(50))
+            return [mab.select_action() for _ in range(10)]
+
+        first = picks(7)
+        np.random.default_rng(123).random(100)
+        self.assertEqual(picks(7), first)
+        exploring = EpsilonGreedyMAB(epsilon=1.0, seed=3)
+        exploring.update_many(range(20), np.arange(20.0))
+        self.assertEqual(len(set(exploring.select_many(20))), 20)
+
+
+class TestSharedStore(unittest.TestCase):
+    def test_policies_share_statistics(self):
+        store = ArmStore(capacity=2)
+        greedy = EpsilonGreedyMAB(epsilon=0.0, store=store)
+        ucb = UCB1MAB(store=store)
+        thompson = ThompsonSamplingMAB(sigma=0.01, seed=0, store=store)
+        greedy.update_many(["a", "b", "c"], [1.0, 0.2, 0.5])
+        greedy.update_many(["a", "a"], [1.0, 1.0])
+        self.assertEqual(ucb.select_action(["a", "b", "new"]), "new")  # mai scelta: priorità
+        self.assertEqual(ucb.select_many(2), ["c", "a"])
+        self.assertEqual(thompson.select_action(), "a")
+        self.assertEqual(len(store), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
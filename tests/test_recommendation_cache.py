@@ -0,0 +1,141 @@
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from dbpedia_cache import MISSING
+from bandit_state import BanditStateStore
+from recommendation_cache import RecommendationCache, invalidate_shared_users
+from recommender import recommend_movies
+from recommender_index import RecommenderIndex
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def result(*titles):
+    return pd.DataFrame({"title": list(titles), "score": [1.0] * len(titles)})
+
+
+class TestRecommendationCache(unittest.TestCase):
+    def test_lru_eviction(self):
+        cache = RecommendationCache(max_entries=2, ttl=None)
+        cache.put(1, 5, result("A"))
+        cache.put(2, 5, result("B"))
+        self.assertIsNot(cache.get(1, 5), MISSING)  # 1 diventa il più recente
+        cache.put(3, 5, result("C"))
+        self.assertIs(cache.get(2, 5), MISSING)
+        self.assertEqual(list(cache.get(1, 5)["title"]), ["A"])
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_ttl(self):
+        clock = FakeClock()
+        cache = RecommendationCache(ttl=10, clock=clock)
+        cache.put(1, 5, result("A"))
+        clock.now = 9.0
+        self.assertIsNot(cache.get(1, 5), MISSING)
+        clock.now = 10.0
+        self.assertIs(cache.get(1, 5), MISSING)
+        self.assertEqual(cache.stats()["expirations"], 1)
+
+    def test_key_includes_top_k_and_versions(self):
+        cache = RecommendationCache()
+        cache.put(1, 5, result("A"))
+        self.assertIs(cache.get(1, 10), MISSING)
+        self.assertIs(cache.get(1, 5, ratings_version="other"), MISSING)
+        cache.invalidate_user(1)
+        self.assertIs(cache.get(1, 5), MISSING)
+        cache.put(1, 5, result("B"))
+        cache.set_data_version("2")
+        self.assertIs(cache.get(1, 5), MISSING)
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["invalidations"]), (0, 4, 1))
+
+    def test_shared_backend(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "results.sqlite3")
+            writer, reader = RecommendationCache.shared(path), RecommendationCache.shared(path)
+            writer.put(1, 5, result("A", "B"))
+            self.assertEqual(list(reader.get(1, 5)["title"]), ["A", "B"])
+            self.assertEqual(reader.stats()["backend_hits"], 1)
+            writer.invalidate_user(1)  # Vista subito anche dall'altro processo
+            self.assertIs(reader.get(1, 5), MISSING)
+            writer.close()
+            reader.close()
+
+    def test_recommend_movies_uses_cache(self):
+        movies = pd.DataFrame({
+            "movieId": [1, 2, 3],
+            "title": ["Heat (1995)", "Casino (1995)", "Babe (1995)"],
+            "genres": [["Crime"], ["Crime"], ["Comedy"]],
+        })
+        ratings = pd.DataFrame({"userId": [1], "movieId": [1], "rating": [5.0]})
+        index = RecommenderIndex.from_frames(movies, ratings)
+        index.data_version = "1.1"
+        cache = RecommendationCache()
+        first = recommend_movies(1, None, None, top_k=1, index=index, cache=cache)
+        self.assertIs(recommend_movies(1, None, None, top_k=1, index=index, cache=cache), first)
+
+        index = RecommenderIndex.from_frames(movies, pd.DataFrame({"userId": [1, 1], "movieId": [1, 2],
+                                                                   "rating": [5.0, 1.0]}))
+        index.data_version = "1.1"
+        cache.invalidate_user(1)
+        self.assertTrue(recommend_movies(1, None, None, top_k=1, index=index, cache=cache).empty)
+        self.assertEqual(cache.stats()["hits"], 1)
+
+    def test_cache_is_bypassed_without_data_version(self):
+        movies = pd.DataFrame({"movieId": [1, 2], "title": ["Heat (1995)", "Casino (1995)"],
+                               "genres": [["Crime"], ["Crime"]]})
+        cache = RecommendationCache()
+        ratings = pd.DataFrame({"userId": [1], "movieId": [1], "rating": [5.0]})
+        self.assertEqual(list(recommend_movies(1, ratings, movies, top_k=1, cache=cache)["title"]),
+                         ["Casino (1995)"])
+        # Altri DataFrame per lo stesso utente: nessun risultato della chiamata precedente
+        ratings = pd.DataFrame({"userId": [1], "movieId": [2], "rating": [5.0]})
+        self.assertEqual(list(recommend_movies(1, ratings, movies, top_k=1, cache=cache)["title"]),
+                         ["Heat (1995)"])
+        self.assertEqual((len(cache), cache.stats()["misses"]), (0, 0))
+
+    def test_key_includes_scoring_options_and_index_version(self):
+        movies = pd.DataFrame({
+            "movieId": [1, 2, 3],
+            "title": ["Heat (1995)", "Casino (1995)", "Babe (1995)"],
+            "genres": [["Crime"], ["Crime"], ["Comedy"]],
+        })
+        ratings = pd.DataFrame({"userId": [1], "movieId": [1], "rating": [5.0]})
+        cache = RecommendationCache()
+        index = RecommenderIndex.from_frames(movies, ratings)
+        index.data_version = "1.1"
+        recommend_movies(1, None, None, top_k=1, index=index, cache=cache)
+        with tempfile.TemporaryDirectory() as directory:
+            state = BanditStateStore(directory)
+            recommend_movies(1, None, None, top_k=1, index=index, state=state, cache=cache)
+            recommend_movies(1, None, None, top_k=1, index=index, state=state, pseudo_count=1.0, cache=cache)
+        index.data_version = "1.2"
+        recommend_movies(1, None, None, top_k=1, index=index, cache=cache)
+        self.assertEqual(cache.stats()["misses"], 4)
+        self.assertEqual(len(cache), 4)
+
+    def test_ingestion_invalidates_users(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = RecommendationCache()
+            BanditStateStore(os.path.join(directory, "state"), cache=cache).record([1, 1, 2], [10, 20, 10], [1, 0, 1])
+            self.assertEqual((cache.user_version(1), cache.user_version(2), cache.user_version(3)), (1, 1, 0))
+
+            path = os.path.join(directory, "results.sqlite3")
+            invalidate_shared_users([3], path)  # Nessuna cache condivisa: niente da invalidare
+            self.assertFalse(os.path.exists(path))
+            shared = RecommendationCache.shared(path)
+            invalidate_shared_users([3, 3], path)
+            self.assertEqual(shared.user_version(3), 1)
+            shared.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,13 +1,41 @@
 import unittest
-from src.recommender import recommend_movies
+
+import pandas as pd
+
+from recommender import recommend_for_users, recommend_movies
+
 
 class TestRecommender(unittest.TestCase):
+    def setUp(self):
+        self.movies = pd.DataFrame({
+            "movieId": [1, 2, 3, 4, 5],
+            "title": ["Heat (1995)", "Casino (1995)", "Toy Story (1995)", "Se7en (1995)", "Babe (1995)"],
+            "genres": [["Action", "Crime"], ["Crime", "Drama"], ["Animation", "Comedy"],
+                       ["Crime", "Thriller"], ["Comedy"]],
+        })
+        self.ratings = pd.DataFrame({
+            "userId": [1, 1, 2, 2],
+            "movieId": [1, 3, 3, 5],
+            "rating": [5.0, 1.0, 4.0, 4.0],
+        })
+
     def test_recommend_movies(self):
-        # Simula dati di esempio
-        movies = ...
-        ratings = ...
-        result = recommend_movies(1, ratings, movies)
-        self.assertGreater(len(result), 0)
+        result = recommend_movies(1, self.ratings, self.movies, top_k=2)
+        self.assertEqual(list(result.columns), ["title", "score"])
+        self.assertEqual(list(result["title"]), ["Casino (1995)", "Se7en (1995)"])
+        self.assertEqual(list(result["score"]), [5.0, 5.0])
+
+    def test_unknown_user_has_no_recommendations(self):
+        self.assertTrue(recommend_movies(42, self.ratings, self.movies).empty)
+
+    def test_batch_matches_single_user(self):
+        batch = recommend_for_users([1, 2], self.ratings, self.movies, top_k=2, n_workers=1)
+        for user_id in (1, 2):
+            single = recommend_movies(user_id, self.ratings, self.movies, top_k=2)
+            user_batch = batch[batch["userId"] == user_id]
+            self.assertEqual(list(user_batch["title"]), list(single["title"]))
+            self.assertEqual(list(user_batch["score"]), list(single["score"]))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from recommender_index import RecommenderIndex
+
+
+class TestRecommenderIndex(unittest.TestCase):
+    def setUp(self):
+        movies = pd.DataFrame({
+            "movieId": [10, 20, 30],
+            "title": ["A", "B", "C"],
+            "genres": ["Comedy", "Drama", "Comedy|Drama"],
+        })
+        ratings = pd.DataFrame({
+            "userId": [2, 1, 2, 1, 3],
+            "movieId": [30, 10, 10, 99, 20],
+            "rating": [3.0, 4.0, 5.0, 2.0, 1.0],
+        })
+        self.index = RecommenderIndex.from_frames(movies, ratings)
+
+    def test_user_ratings(self):
+        movie_ids, ratings = self.index.user_ratings(2)
+        np.testing.assert_array_equal(movie_ids, [30, 10])
+        np.testing.assert_array_equal(ratings, [3.0, 5.0])
+        self.assertEqual(len(self.index.user_ratings(42)[0]), 0)
+
+    def test_user_rows_marks_unknown_movies(self):
+        rows, _ = self.index.user_rows(1)
+        np.testing.assert_array_equal(rows, [0, -1])
+
+    def test_gather(self):
+        codes, rows, ratings = self.index.gather(np.array([3, 42, 2]))
+        np.testing.assert_array_equal(codes, [0, 2, 2])
+        np.testing.assert_array_equal(rows, [1, 2, 0])
+        np.testing.assert_array_equal(ratings, [1.0, 3.0, 5.0])
+
+    def test_recommend(self):
+        result = self.index.recommend(1, top_k=5)
+        self.assertEqual(list(result["title"]), ["C"])
+        self.assertTrue(self.index.recommend(42).empty)
+
+
+if __name__ == "__main__":
+    unittest.main()
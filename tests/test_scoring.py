@@ -0,0 +1,73 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from scoring import GenreScorer, positions_in
+
+
+class TestGenreScorer(unittest.TestCase):
+    def setUp(self):
+        self.movies = pd.DataFrame({
+            "movieId": [1, 2, 3, 4, 5],
+            "title": ["A", "B", "C", "D", "C"],
+            "genres": ["Comedy|Drama", ["Action"], "Drama", float("nan"), "Comedy"],
+        })
+        self.scorer = GenreScorer.from_movies(self.movies)
+
+    def test_genre_weights(self):
+        rows = self.scorer.rows([1, 99])
+        weights, present = self.scorer.genre_weights(rows, np.array([4.0, 5.0]))
+        self.assertEqual(self.scorer.genres, ["Action", "Comedy", "Drama"])
+        np.testing.assert_array_equal(weights, [0.0, 4.0, 4.0])
+        np.testing.assert_array_equal(present, [False, True, True])
+
+    def test_rank_excludes_rated_and_averages_duplicate_titles(self):
+        rows, scores = self.scorer.rank(self.scorer.rows([1]), np.array([4.0]), top_k=5)
+        # "C" compare due volte (Drama e Comedy): il punteggio è la media
+        self.assertEqual(list(self.scorer.titles[rows]), ["C"])
+        np.testing.assert_array_equal(scores, [4.0])
+
+    def test_rank_ties_follow_catalog_order(self):
+        rows, _ = self.scorer.rank(self.scorer.rows([2, 3]), np.array([3.0, 3.0]), top_k=1)
+        self.assertEqual(list(self.scorer.titles[rows]), ["A"])
+
+    def test_rank_block_matches_rank(self):
+        profiles = [([1], [4.0]), ([2, 3], [3.0, 3.0]), ([4], [5.0]), ([5, 2], [2.5, 1.0])]
+        codes = np.repeat(np.arange(len(profiles)), [len(p[0]) for p in profiles])
+        rows = self.scorer.rows([m for p in profiles for m in p[0]])
+        ratings = np.array([r for p in profiles for r in p[1]])
+        users, block_rows, block_scores = self.scorer.rank_block(codes, rows, ratings, len(profiles), top_k=2)
+        for code, (movie_ids, user_ratings) in enumerate(profiles):
+            expected = self.scorer.rank(self.scorer.rows(movie_ids), np.array(user_ratings), top_k=2)
+            selected = users == code
+            if expected is None:
+                self.assertFalse(selected.any())
+            else:
+                np.testing.assert_array_equal(block_rows[selected], expected[0])
+                np.testing.assert_array_equal(block_scores[selected], expected[1])
+
+    def test_candidate_bitsets(self):
+        _, present = self.scorer.genre_weights(self.scorer.rows([3]), np.array([4.0]))
+        rows = self.scorer.candidate_rows(present, self.scorer.rows([3]))
+        self.assertEqual(rows.tolist(), [0])  # Unico altro film Drama
+        expected = self.scorer.matrix @ present.astype(np.float64) > 0
+        expected[self.scorer.rows([3])] = False
+        np.testing.assert_array_equal(self.scorer.candidate_mask(present, self.scorer.rows([3])), expected)
+        self.assertEqual(self.scorer.candidate_rows(np.zeros(3, dtype=bool), []).tolist(), [])
+
+    def test_scores_of_candidates_match_catalog(self):
+        weights = np.array([1.0, 2.0, 3.5])
+        np.testing.assert_array_equal(self.scorer.scores(weights), self.scorer.matrix @ weights)
+        np.testing.assert_array_equal(self.scorer.scores(weights, np.array([4, 0])), (self.scorer.matrix @ weights)[[4, 0]])
+
+    def test_positions_in(self):
+        np.testing.assert_array_equal(positions_in(np.array([2, 5, 9]), np.array([5, 3, -1, 9, 10])), [1, -1, -1, 2, -1])
+        np.testing.assert_array_equal(positions_in(np.array([], dtype=np.int64), np.array([1])), [-1])
+
+    def test_rank_empty_profile(self):
+        self.assertIsNone(self.scorer.rank(self.scorer.rows([4]), np.array([5.0]), top_k=5))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import asyncio
+import json
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+from recommender import recommend_movies
+from recommender_index import RecommenderIndex
+import service
+from service import MicroBatcher, RecommendationService, ServiceMetrics, main
+
+
+async def http_get(port, path):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n".encode())
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    if b"text/plain" in head:
+        return int(head.split()[1]), body.decode("utf-8")
+    return int(head.split()[1]), json.loads(body)
+
+
+class TestService(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.movies = pd.DataFrame({
+            "movieId": [1, 2, 3, 4, 5],
+            "title": ["Heat (1995)", "Casino (1995)", "Toy Story (1995)", "Se7en (1995)", "Babe (1995)"],
+            "genres": [["Action", "Crime"], ["Crime", "Drama"], ["Animation", "Comedy"],
+                       ["Crime", "Thriller"], ["Comedy"]],
+        })
+        self.ratings = pd.DataFrame({
+            "userId": [1, 1, 2, 2],
+            "movieId": [1, 3, 3, 5],
+            "rating": [5.0, 1.0, 4.0, 4.0],
+        })
+        self.index = RecommenderIndex.from_frames(self.movies, self.ratings)
+
+    async def test_micro_batches_group_concurrent_requests(self):
+        sizes = []
+
+        async def score(user_ids, top_k):
+            sizes.append(len(user_ids))
+            await asyncio.sleep(0.01)
+            return [[user_id] * top_k for user_id in user_ids]
+
+        batcher = MicroBatcher(score, max_batch_size=8, concurrency=1)
+        batcher.start()
+        results = await asyncio.gather(*(batcher.submit(user_id, 1 + user_id % 2) for user_id in range(20)))
+        await batcher.close()
+        self.assertEqual(results[3], [3, 3])
+        self.assertEqual(results[4], [4])
+        self.assertEqual(sum(sizes), 20)
+        self.assertLessEqual(max(sizes), 8)
+        self.assertLess(len(sizes), 20)
+
+    async def test_endpoints(self):
+        service = RecommendationService(index=self.index, n_workers=1)
+        await service.start("127.0.0.1", 0)
+        try:
+            await service.wait_ready()
+            self.assertEqual(await http_get(service.port, "/ready"), (200, {"ready": True}))
+
+            responses = await asyncio.gather(*(http_get(service.port, f"/recommend?user_id={user_id}&top_k=2")
+                                               for user_id in (1, 2, 1, 42)))
+            for user_id, (status, body) in zip((1, 2, 1), responses):
+                self.assertEqual(status, 200)
+                expected = recommend_movies(user_id, self.ratings, self.movies, top_k=2)
+                self.assertEqual([r["title"] for r in body["recommendations"]], list(expected["title"]))
+            self.assertEqual(responses[3][1]["recommendations"], [])
+
+            self.assertEqual((await http_get(service.port, "/recommend?top_k=2"))[0], 400)
+            self.assertEqual((await http_get(service.port, "/recommend?user_id=1&top_k=0"))[0], 400)
+            self.assertEqual((await http_get(service.port, "/unknown"))[0], 404)
+
+            status, metrics = await http_get(service.port, "/metrics")
+            self.assertEqual(status, 200)
+            self.assertEqual(metrics["requests"], 4)
+            self.assertGreaterEqual(metrics["batches"], 1)
+
+            status, text = await http_get(service.port, "/metrics?format=prometheus")
+            self.assertEqual(status, 200)
+            self.assertIn("filminsight_service_requests 4.0\n", text)
+        finally:
+            await service.close()
+
+
+class TestServiceMetrics(unittest.TestCase):
+    def test_throughput_beyond_latency_window(self):
+        now = [0.0]
+        with mock.patch.object(service.time, "monotonic", lambda: now[0]):
+            metrics = ServiceMetrics()
+            # 2000 richieste al secondo per 10 secondi: il doppio di LATENCY_WINDOW
+            requests = 2 * service.LATENCY_WINDOW
+            for i in range(requests):
+                now[0] = i * 10.0 / requests
+                metrics.observe(0.001)
+            now[0] = 10.0
+            self.assertEqual(metrics.as_dict()["throughput_rps"], 2000.0)
+            self.assertEqual(len(metrics.latencies), service.LATENCY_WINDOW)
+            # Oltre THROUGHPUT_WINDOW le completate più vecchie escono dal conteggio
+            now[0] = 10.0 + service.THROUGHPUT_WINDOW
+            metrics.observe(0.001)
+            self.assertEqual(metrics.as_dict()["throughput_rps"], round(1 / service.THROUGHPUT_WINDOW, 3))
+
+
+class TestServiceMain(unittest.TestCase):
+    def test_load_failure_exits_with_error(self):
+        # I worker non riescono a caricare i dati: il servizio termina invece di restare non pronto
+        with self.assertLogs("service", "ERROR") as logs, self.assertRaises(SystemExit) as exit_status:
+            main(["--data-path", "/nonexistent/", "--workers", "1", "--port", "0"])
+        self.assertEqual(exit_status.exception.code, 1)
+        self.assertIn("Caricamento dei dati da '/nonexistent/' fallito", logs.output[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from scoring import GenreScorer
+from streaming import aggregate_ratings, stream_ratings
+
+
+class TestStreaming(unittest.TestCase):
+    def test_stream_matches_in_memory_aggregation(self):
+        movies = pd.DataFrame({
+            "movieId": [1, 2, 3],
+            "title": ["A", "B", "C"],
+            "genres": ["Comedy|Drama", "Action", "Drama"],
+        })
+        ratings = pd.DataFrame({
+            "userId": [3, 1, 3, 2, 1, 3],
+            "movieId": [1, 2, 3, 9, 1, 2],
+            "rating": [4.0, 3.5, 5.0, 1.0, 2.0, 0.5],
+            "timestamp": [1, 2, 3, 4, 5, 6],
+        })
+        path = os.path.join(tempfile.mkdtemp(), "ratings.csv")
+        ratings.to_csv(path, index=False)
+        scorer = GenreScorer.from_movies(movies)
+
+        expected = aggregate_ratings(ratings, scorer)
+        # Un budget minimo forza blocchi da una riga
+        streamed = stream_ratings(path, scorer, memory_budget=1)
+
+        np.testing.assert_array_equal(streamed.user_ids, [1, 2, 3])
+        for field in ("user_ids", "genre_weights", "genre_counts", "user_counts",
+                      "movie_counts", "movie_rating_sums"):
+            np.testing.assert_array_equal(getattr(streamed, field), getattr(expected, field))
+        np.testing.assert_array_equal(streamed.movie_means(), [3.0, 2.0, 5.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+import columnar
+import tag_index
+from recommender import recommend_movies
+from tag_index import TagIndex, normalize_tags, update_tag_index
+
+
+class TestTagIndex(unittest.TestCase):
+    def setUp(self):
+        self.tags = pd.DataFrame({
+            "userId": [1, 1, 2, 2, 3, 3],
+            "movieId": [10, 20, 10, 30, 20, 30],
+            "tag": ["Heist", "  heist!", "De Niro", "funny", "Funny", "de  niro"],
+            "timestamp": [0, 1, 2, 3, 4, 5],
+        })
+
+    def test_normalize_tags(self):
+        result = normalize_tags(["  Will  Ferrell!! ", "Sci-Fi", None, "'quoted'"])
+        self.assertEqual(result.tolist(), ["will ferrell", "sci-fi", "", "quoted"])
+
+    def test_postings_and_candidates(self):
+        index = TagIndex.from_frame(self.tags)
+        self.assertEqual(index.vocabulary, ["heist", "de niro", "funny"])
+        self.assertEqual(index.postings("HEIST")[0].tolist(), [10, 20])
+        self.assertEqual(index.postings("unknown")[0].tolist(), [])
+
+        movie_ids, scores = index.candidates(["heist", "funny"], mode="any")
+        self.assertEqual(movie_ids.tolist(), [10, 20, 30])
+        self.assertAlmostEqual(scores[1], 2 * np.log1p(3 / 2))
+        self.assertEqual(index.candidates(["heist", "de niro"], mode="all")[0].tolist(), [10])
+        self.assertEqual(index.candidates(["heist", "missing"], mode="all")[0].tolist(), [])
+
+    def test_incremental_add_matches_full_build(self):
+        full = TagIndex.from_frame(self.tags)
+        incremental = TagIndex.from_frame(self.tags.iloc[:3])
+        self.assertEqual(incremental.add(self.tags.iloc[3:]), 3)
+        np.testing.assert_array_equal(incremental.movie_keys, full.movie_keys)
+        np.testing.assert_array_equal(incremental.user_keys, full.user_keys)
+        self.assertEqual(incremental.user_profile(3)[0], full.user_profile(3)[0])
+
+    def test_recommend_excludes_seen(self):
+        index = TagIndex.from_frame(self.tags)
+        self.assertEqual(index.user_profile(1)[0], ["heist"])
+        result = index.recommend(1, exclude=[10])
+        self.assertEqual(result["movieId"].tolist(), [20])
+        # top_k nullo o più grande dei candidati rimasti
+        self.assertTrue(index.recommend(1, top_k=0).empty)
+        self.assertEqual(list(index.recommend(1, top_k=0).columns), ["movieId", "score"])
+        self.assertEqual(index.recommend(1, top_k=5, exclude=[10])["movieId"].tolist(), [20])
+        self.assertTrue(index.recommend(1, top_k=5, exclude=[10, 20]).empty)
+
+    def test_update_saved_index(self):
+        full = TagIndex.from_frame(self.tags)
+        with tempfile.TemporaryDirectory() as directory, mock.patch.object(tag_index, "MAX_TAG_SEGMENTS", 2):
+            update_tag_index(self.tags.iloc[:2], directory)
+            # I nuovi tag vengono accodati come segmenti e fusi al caricamento
+            self.assertEqual(update_tag_index(self.tags.iloc[2:4], directory), 2)
+            self.assertEqual(update_tag_index(self.tags.iloc[4:5], directory), 1)
+            self.assertEqual(len(columnar.load_meta(directory, "tags")["segments"]), 2)
+            loaded, expected = TagIndex.load(directory), TagIndex.from_frame(self.tags.iloc[:5])
+            self.assertEqual(loaded.vocabulary, expected.vocabulary)
+            np.testing.assert_array_equal(loaded.movie_keys, expected.movie_keys)
+            np.testing.assert_array_equal(loaded.movie_counts, expected.movie_counts)
+            np.testing.assert_array_equal(loaded.user_counts, expected.user_counts)
+
+            # Oltre MAX_TAG_SEGMENTS l'indice viene riscritto e i segmenti eliminati
+            update_tag_index(self.tags.iloc[5:], directory)
+            self.assertNotIn("segments", columnar.load_meta(directory, "tags"))
+            self.assertEqual(sorted(os.listdir(os.path.join(directory, "tags"))), ["CURRENT", "r-000005"])
+            self.assertEqual(sorted(os.listdir(os.path.join(directory, "tags", "r-000005"))),
+                             ["meta.json", "movie_counts.npy", "movie_keys.npy", "user_counts.npy", "user_keys.npy"])
+            np.testing.assert_array_equal(TagIndex.load(directory).user_keys, full.user_keys)
+            np.testing.assert_array_equal(TagIndex.load(directory).movie_counts, full.movie_counts)
+
+    def test_recommend_movies_with_tags(self):
+        movies = pd.DataFrame({
+            "movieId": [10, 20, 30, 40],
+            "title": ["Heat (1995)", "Casino (1995)", "Babe (1995)", "Fargo (1996)"],
+            "genres": [["Crime"], ["Crime"], ["Crime"], ["Crime"]],
+        })
+        ratings = pd.DataFrame({"userId": [1], "movieId": [10], "rating": [5.0]})
+        index = TagIndex.from_frame(self.tags)
+        result = recommend_movies(1, ratings, movies, top_k=1, tags=index)
+        self.assertEqual(result["title"].tolist(), ["Casino (1995)"])
+
+
+if __name__ == "__main__":
+    unittest.main()